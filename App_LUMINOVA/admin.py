@@ -460,10 +460,10 @@ class MovimientoStockAdmin(admin.ModelAdmin):
 
 @admin.register(NotificacionSistema)
 class NotificacionSistemaAdmin(admin.ModelAdmin):
-    list_display = ("titulo", "tipo", "destinatario_grupo", "prioridad", "remitente", "leida", "atendida", "fecha_creacion")
+    list_display = ("titulo", "tipo", "destinatario_grupo", "prioridad", "remitente", "leida", "atendida", "repeticiones", "fecha_creacion")
     list_filter = ("tipo", "destinatario_grupo", "prioridad", "leida", "atendida", "fecha_creacion")
     search_fields = ("titulo", "mensaje", "remitente__username")
-    readonly_fields = ("fecha_creacion", "fecha_lectura", "fecha_atencion")
+    readonly_fields = ("fecha_creacion", "fecha_lectura", "fecha_atencion", "repeticiones", "fecha_ultima_ocurrencia")
     
     fieldsets = (
         ("Información Principal", {
@@ -480,7 +480,7 @@ class NotificacionSistemaAdmin(admin.ModelAdmin):
             "classes": ("collapse",)
         }),
         ("Timestamps", {
-            "fields": ("fecha_creacion", "fecha_lectura", "fecha_atencion"),
+            "fields": ("fecha_creacion", "fecha_lectura", "fecha_atencion", "repeticiones", "fecha_ultima_ocurrencia"),
             "classes": ("collapse",)
         }),
     )
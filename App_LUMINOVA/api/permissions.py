@@ -162,22 +162,23 @@ class NotificacionPermission(permissions.BasePermission):
         if obj.remitente == request.user:
             return True
         
-        # Verificar si el usuario pertenece al grupo destino
-        user_groups = request.user.groups.values_list('name', flat=True)
+        # Verificar si el usuario pertenece al grupo destino (roles normalizados y cacheados)
+        from App_LUMINOVA.utils import roles_usuario
+        user_roles = roles_usuario(request.user)
         
         group_mapping = {
-            'compras': ['Compras', 'compras'],
-            'ventas': ['Ventas', 'ventas'],
-            'deposito': ['Depósito', 'deposito', 'Deposito'],
-            'produccion': ['Producción', 'produccion', 'Produccion'],
-            'control_calidad': ['Control de Calidad', 'control_calidad'],
-            'administrador': ['Administrador', 'administrador', 'Admin'],
-            'todos': list(user_groups),  # Todos pueden ver
+            'compras': ['compras'],
+            'ventas': ['ventas'],
+            'deposito': ['depósito', 'deposito'],
+            'produccion': ['producción', 'produccion'],
+            'control_calidad': ['control de calidad', 'control_calidad'],
+            'administrador': ['administrador', 'admin'],
+            'todos': list(user_roles),  # Todos pueden ver
         }
         
         allowed_groups = group_mapping.get(obj.destinatario_grupo, [])
         
-        return any(g in allowed_groups for g in user_groups)
+        return any(g in user_roles for g in allowed_groups)
 
 
 class IsOwnerOrAdmin(permissions.BasePermission):
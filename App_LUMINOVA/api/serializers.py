@@ -7,6 +7,9 @@ a formato JSON y viceversa, con soporte para multi-tenancy.
 
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 from App_LUMINOVA.models import (
     Empresa,
@@ -39,6 +42,9 @@ from App_LUMINOVA.models import (
     PerfilUsuario,
     RolEmpresa,
 )
+from App_LUMINOVA.services.document_services import generar_siguiente_numero_documento
+from App_LUMINOVA.services.historico_stock import corte_del_dia
+from App_LUMINOVA.services.transferencia_lote import MAXIMO_LINEAS_MANIFIESTO
 
 
 # =============================================================================
@@ -301,9 +307,73 @@ class MovimientoStockSerializer(serializers.ModelSerializer):
             'id', 'insumo', 'insumo_descripcion', 'producto', 'producto_descripcion',
             'deposito_origen', 'deposito_origen_nombre',
             'deposito_destino', 'deposito_destino_nombre',
-            'cantidad', 'tipo', 'fecha', 'usuario', 'usuario_nombre', 'motivo', 'empresa'
-        ]
-        read_only_fields = ['id', 'empresa', 'fecha', 'usuario']
+            'cantidad', 'tipo', 'fecha', 'usuario', 'usuario_nombre', 'motivo', 'empresa',
+            'insumo_destino', 'producto_destino'
+        ]
+        read_only_fields = ['id', 'empresa', 'fecha', 'usuario', 'insumo_destino', 'producto_destino']
+
+    def validate(self, attrs):
+        """Un único ítem, cantidad positiva y los depósitos que pide el tipo."""
+        if bool(attrs.get('insumo')) == bool(attrs.get('producto')):
+            raise serializers.ValidationError('Indique un insumo o un producto (solo uno).')
+        if attrs.get('cantidad', 0) <= 0:
+            raise serializers.ValidationError({'cantidad': 'Debe ser mayor a cero.'})
+        tipo = attrs.get('tipo')
+        requeridos = {
+            'entrada': ['deposito_destino'],
+            'salida': ['deposito_origen'],
+            'transferencia': ['deposito_origen', 'deposito_destino'],
+        }[tipo]
+        faltantes = {campo: 'Requerido para este tipo de movimiento.' for campo in requeridos if not attrs.get(campo)}
+        if faltantes:
+            raise serializers.ValidationError(faltantes)
+        if tipo == 'transferencia' and attrs['deposito_origen'] == attrs['deposito_destino']:
+            raise serializers.ValidationError('El depósito de origen y el de destino deben ser distintos.')
+        return attrs
+
+
+
+class TransferenciaLineaSerializer(serializers.Serializer):
+    """Una línea del manifiesto de transferencia."""
+    item = serializers.IntegerField()
+    cantidad = serializers.IntegerField(min_value=1)
+
+
+class TransferenciaLoteSerializer(serializers.Serializer):
+    """Manifiesto: varios insumos o productos de un depósito a otro."""
+    tipo_item = serializers.ChoiceField(choices=['insumo', 'producto'])
+    deposito_origen = serializers.PrimaryKeyRelatedField(queryset=Deposito.objects.all())
+    deposito_destino = serializers.PrimaryKeyRelatedField(queryset=Deposito.objects.all())
+    motivo = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    lineas = TransferenciaLineaSerializer(many=True, allow_empty=False, max_length=MAXIMO_LINEAS_MANIFIESTO)
+
+
+class StockAFechaSerializer(serializers.Serializer):
+    """Parámetros de la consulta de stock a una fecha pasada."""
+    fecha = serializers.CharField(help_text='AAAA-MM-DD (cierre de ese día) o fecha y hora ISO 8601')
+    tipo_item = serializers.ChoiceField(choices=['insumo', 'producto'], required=False)
+    deposito = serializers.PrimaryKeyRelatedField(queryset=Deposito.objects.all(), required=False)
+
+    def validate_fecha(self, valor):
+        """Devuelve el instante de la consulta (con zona horaria)."""
+        momento = parse_datetime(valor)
+        if momento is not None:
+            return momento if timezone.is_aware(momento) else timezone.make_aware(momento)
+        dia = parse_date(valor)
+        if dia is None:
+            raise serializers.ValidationError('Use AAAA-MM-DD o una fecha y hora ISO 8601.')
+        return corte_del_dia(dia)
+
+
+class KardexSerializer(serializers.Serializer):
+    """Parámetros del kardex de un ítem en un depósito."""
+    tipo_item = serializers.ChoiceField(choices=['insumo', 'producto'])
+    item = serializers.IntegerField(min_value=1)
+    deposito = serializers.PrimaryKeyRelatedField(queryset=Deposito.objects.all())
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    cursor = serializers.CharField(required=False)
+    formato = serializers.ChoiceField(choices=['json', 'csv'], default='json')
 
 
 # =============================================================================
@@ -376,11 +446,10 @@ class OrdenVentaCreateSerializer(serializers.ModelSerializer):
         fields = ['cliente', 'notas']
     
     def create(self, validated_data):
-        # Generar número de OV automáticamente
-        from django.utils import timezone
-        timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-        validated_data['numero_ov'] = f"OV-{timestamp}"
-        return super().create(validated_data)
+        # Número reservado en la secuencia: se libera si la creación falla
+        with transaction.atomic():
+            validated_data['numero_ov'] = generar_siguiente_numero_documento(OrdenVenta, 'OV', 'numero_ov')
+            return super().create(validated_data)
 
 
 class FacturaSerializer(serializers.ModelSerializer):
@@ -465,10 +534,10 @@ class OrdenProduccionCreateSerializer(serializers.ModelSerializer):
         ]
     
     def create(self, validated_data):
-        from django.utils import timezone
-        timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-        validated_data['numero_op'] = f"OP-{timestamp}"
-        return super().create(validated_data)
+        # Número reservado en la secuencia: se libera si la creación falla
+        with transaction.atomic():
+            validated_data['numero_op'] = generar_siguiente_numero_documento(OrdenProduccion, 'OP', 'numero_op')
+            return super().create(validated_data)
 
 
 class ReportesSerializer(serializers.ModelSerializer):
@@ -556,16 +625,27 @@ class OrdenCompraSerializer(serializers.ModelSerializer):
             'id', 'numero_orden', 'tipo', 'fecha_creacion', 'proveedor',
             'proveedor_nombre', 'estado', 'estado_display', 'insumo_principal',
             'insumo_descripcion', 'cantidad_principal', 'precio_unitario_compra',
-            'deposito', 'deposito_nombre', 'total_orden_compra',
+            'cantidad_recibida', 'deposito', 'deposito_nombre', 'total_orden_compra',
             'fecha_estimada_entrega', 'numero_tracking', 'notas', 'empresa'
         ]
-        read_only_fields = ['id', 'empresa', 'numero_orden', 'total_orden_compra']
+        read_only_fields = ['id', 'empresa', 'numero_orden', 'cantidad_recibida', 'total_orden_compra']
     
     def get_total_orden_compra(self, obj) -> str:
         """Retorna el total calculado de la orden de compra."""
         return str(obj.total_orden_compra)
 
 
+class RecepcionOCSerializer(serializers.Serializer):
+    """Una OC a recibir: sin cantidad se recibe todo lo pendiente."""
+    oc_id = serializers.IntegerField()
+    cantidad = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+
+
+class RecepcionLoteSerializer(serializers.Serializer):
+    """Recepción de varias OCs en una sola transacción."""
+    recepciones = RecepcionOCSerializer(many=True, allow_empty=False, max_length=200)
+
+
 # =============================================================================
 # SERIALIZADORES DE SISTEMA
 # =============================================================================
@@ -5,12 +5,15 @@ Este módulo define los ViewSets que exponen las operaciones CRUD
 para todos los modelos del sistema, con soporte multi-tenant.
 """
 
-from rest_framework import viewsets, status, mixins
+from datetime import timedelta
+
+from rest_framework import viewsets, status, mixins, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from django.db.models import Sum
 
@@ -71,6 +74,10 @@ from .serializers import (
     FacturaSerializer,
     OrdenCompraSerializer,
     OrdenCompraListSerializer,
+    RecepcionLoteSerializer,
+    TransferenciaLoteSerializer,
+    StockAFechaSerializer,
+    KardexSerializer,
     LoteProductoTerminadoSerializer,
     HistorialOVSerializer,
     UsuarioDepositoSerializer,
@@ -106,6 +113,14 @@ from .filters import (
     ClienteFilter,
     ProveedorFilter,
 )
+from App_LUMINOVA.services.notification_service import NotificationService
+from App_LUMINOVA.services.historico_stock import corte_del_dia, stock_a_fecha, totales_por_deposito, valorizar_stock
+from App_LUMINOVA.services.kardex import (
+    CursorKardexInvalido, alcance_kardex, filas_csv, movimientos_kardex, pagina_kardex, saldo_inicial,
+)
+from App_LUMINOVA.services.libro_stock import StockInsuficienteError, unidad_de_trabajo
+from App_LUMINOVA.services.recepcion_oc import recibir_ocs
+from App_LUMINOVA.services.transferencia_lote import transferir_lote
 
 
 # =============================================================================
@@ -412,9 +427,169 @@ class MovimientoStockViewSet(EmpresaScopedViewSet):
     http_method_names = ['get', 'post', 'head', 'options']  # No permitir edición/eliminación
 
     def perform_create(self, serializer):
-        """Asigna el usuario actual al crear un movimiento."""
+        """Aplica el movimiento al stock a través del libro de stock."""
+        datos = serializer.validated_data
+        item = datos.get('insumo') or datos.get('producto')
+        origen = datos.get('deposito_origen')
+        destino = datos.get('deposito_destino')
+        motivo = datos.get('motivo', '')
+        try:
+            with unidad_de_trabajo(usuario=self.request.user) as uow:
+                if datos['tipo'] == 'entrada':
+                    uow.entrada(item, destino.id, datos['cantidad'], motivo=motivo)
+                elif datos['tipo'] == 'salida':
+                    uow.salida(item, origen.id, datos['cantidad'], motivo=motivo)
+                else:
+                    uow.transferencia(item, origen.id, destino.id, datos['cantidad'], motivo=motivo)
+                uow.aplicar()
+        except StockInsuficienteError as e:
+            raise serializers.ValidationError({'cantidad': str(e)})
+        serializer.instance = uow.movimientos_registrados[0]
+
+    @action(detail=False, methods=['post'])
+    def transferir_lote(self, request):
+        """
+        Transfiere varios insumos o productos entre dos depósitos en una sola
+        transacción (manifiesto). Si algún ítem no alcanza, no se transfiere nada.
+        """
+        serializer = TransferenciaLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+        empresa = self.get_empresa()
+        if empresa and {datos['deposito_origen'].empresa_id, datos['deposito_destino'].empresa_id} != {empresa.id}:
+            return Response(
+                {'error': 'Los depósitos deben pertenecer a su empresa'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        lineas = {}
+        for linea in datos['lineas']:
+            lineas[linea['item']] = lineas.get(linea['item'], 0) + linea['cantidad']
+        modelo = Insumo if datos['tipo_item'] == 'insumo' else ProductoTerminado
+        try:
+            transferidos = transferir_lote(
+                modelo, datos['deposito_origen'], datos['deposito_destino'], lineas,
+                usuario=request.user, motivo=datos.get('motivo', ''),
+            )
+        except StockInsuficienteError as e:
+            return Response({'error': str(e), 'faltantes': e.faltantes}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'transferidos': len(transferidos),
+            'lineas': [
+                {
+                    'item': linea['item_id'],
+                    'item_destino': linea['item_destino'].id,
+                    'descripcion': linea['descripcion'],
+                    'cantidad': linea['cantidad'],
+                }
+                for linea in transferidos
+            ],
+        })
+
+    @action(detail=False, methods=['get'])
+    def stock_a_fecha(self, request):
+        """
+        Stock por ítem y depósito a una fecha pasada, valorizado. Parte del último
+        snapshot diario y reproduce solo los movimientos posteriores.
+        """
+        serializer = StockAFechaSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+        empresa = self.get_empresa()
+        if not empresa:
+            return Response(
+                {'error': 'El usuario no tiene una empresa asignada'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        deposito = datos.get('deposito')
+        if deposito and deposito.empresa_id != empresa.id:
+            return Response(
+                {'error': 'El depósito debe pertenecer a su empresa'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        consulta = stock_a_fecha(
+            empresa.id, datos['fecha'], tipo_item=datos.get('tipo_item'),
+            deposito_id=deposito.id if deposito else None,
+        )
+        lineas = valorizar_stock(consulta['cantidades'])
+        snapshot = consulta['snapshot']
+        return Response({
+            'fecha': consulta['momento'],
+            'snapshot': snapshot.fecha if snapshot else None,
+            'movimientos_reproducidos': consulta['movimientos'],
+            'valor_total': sum((linea['valor'] for linea in lineas), 0),
+            'depositos': totales_por_deposito(lineas),
+            'lineas': lineas,
+        })
+
+    @action(detail=False, methods=['get'])
+    def kardex(self, request):
+        """
+        Kardex de un insumo o producto en un depósito con el saldo acumulado,
+        paginado por cursor. Con ``formato=csv`` devuelve el período completo
+        en streaming.
+        """
+        serializer = KardexSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+        deposito = datos['deposito']
         empresa = self.get_empresa()
-        serializer.save(usuario=self.request.user, empresa=empresa)
+        if empresa and deposito.empresa_id != empresa.id:
+            return Response(
+                {'error': 'El depósito debe pertenecer a su empresa'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        modelo = Insumo if datos['tipo_item'] == 'insumo' else ProductoTerminado
+        item = modelo.objects.filter(pk=datos['item'], empresa_id=deposito.empresa_id).first()
+        if item is None:
+            return Response({'error': 'Ítem no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+        inicio = corte_del_dia(datos['desde'] - timedelta(days=1)) if datos.get('desde') else None
+        fin = corte_del_dia(datos['hasta']) if datos.get('hasta') else None
+        movimientos = movimientos_kardex(modelo, item.pk, deposito.pk, inicio, fin)
+        alcance = alcance_kardex(modelo, item.pk, deposito.pk, inicio, fin)
+        cursor = datos.get('cursor')
+
+        # El saldo inicial solo se calcula en la primera página y en el CSV
+        saldo = None
+        if datos['formato'] == 'csv' or not cursor:
+            inicio, saldo = saldo_inicial(modelo, item, deposito, inicio)
+
+        if datos['formato'] == 'csv':
+            response = StreamingHttpResponse(filas_csv(movimientos, saldo), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = (
+                f'attachment; filename="kardex_{datos["tipo_item"]}_{item.pk}_{deposito.pk}.csv"'
+            )
+            return response
+
+        try:
+            filas, siguiente_cursor = pagina_kardex(movimientos, alcance, saldo, cursor)
+        except CursorKardexInvalido as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'item': item.pk,
+            'descripcion': item.descripcion,
+            'deposito': deposito.pk,
+            'desde': inicio,
+            'saldo_inicial': saldo,
+            'movimientos': [
+                {
+                    'id': movimiento.id,
+                    'fecha': movimiento.fecha,
+                    'tipo': movimiento.tipo,
+                    'motivo': movimiento.motivo,
+                    'deposito_origen': movimiento.deposito_origen_id,
+                    'deposito_destino': movimiento.deposito_destino_id,
+                    'delta': movimiento.delta,
+                    'saldo': movimiento.saldo,
+                    'usuario': movimiento.usuario.username if movimiento.usuario else None,
+                }
+                for movimiento in filas
+            ],
+            'siguiente_cursor': siguiente_cursor,
+        })
 
 
 # =============================================================================
@@ -661,6 +836,25 @@ class OrdenCompraViewSet(EmpresaScopedViewSet):
         orden.save()
         return Response({'status': 'Orden marcada como recibida'})
 
+    @action(detail=False, methods=['post'])
+    def recibir_lote(self, request):
+        """
+        Recibe varias órdenes (con cantidades parciales) en una sola transacción:
+        actualiza stock, cantidades en pedido y estados y registra los movimientos.
+        Devuelve el resultado de cada OC; las inválidas no se aplican.
+        """
+        serializer = RecepcionLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recepciones = {
+            item['oc_id']: item.get('cantidad')
+            for item in serializer.validated_data['recepciones']
+        }
+        resultados = recibir_ocs(recepciones, usuario=request.user, ocs=self.get_queryset())
+        return Response({
+            'recibidas': sum(1 for resultado in resultados if resultado['ok']),
+            'resultados': resultados,
+        })
+
 
 # =============================================================================
 # VIEWSETS DE SISTEMA
@@ -695,8 +889,8 @@ class NotificacionSistemaViewSet(EmpresaScopedViewSet):
 
     @action(detail=False, methods=['get'])
     def no_leidas(self, request):
-        """Retorna solo notificaciones no leídas."""
-        queryset = self.get_queryset().filter(leida=False)
+        """Retorna solo notificaciones no leídas por el usuario actual."""
+        queryset = NotificationService.excluir_leidas(self.get_queryset(), request.user)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -704,11 +898,12 @@ class NotificacionSistemaViewSet(EmpresaScopedViewSet):
     def contador(self, request):
         """Retorna el conteo de notificaciones por estado."""
         queryset = self.get_queryset()
+        no_leidas = NotificationService.excluir_leidas(queryset, request.user)
         return Response({
             'total': queryset.count(),
-            'no_leidas': queryset.filter(leida=False).count(),
+            'no_leidas': no_leidas.count(),
             'no_atendidas': queryset.filter(atendida=False).count(),
-            'criticas': queryset.filter(prioridad='critica', leida=False).count()
+            'criticas': no_leidas.filter(prioridad='critica').count()
         })
 
     @action(detail=True, methods=['post'])
@@ -727,10 +922,10 @@ class NotificacionSistemaViewSet(EmpresaScopedViewSet):
 
     @action(detail=False, methods=['post'])
     def marcar_todas_leidas(self, request):
-        """Marca todas las notificaciones como leídas."""
-        queryset = self.get_queryset().filter(leida=False)
-        count = queryset.count()
-        queryset.update(leida=True, fecha_lectura=timezone.now())
+        """Marca todas las notificaciones como leídas para el usuario actual."""
+        count = NotificationService.marcar_notificaciones_como_leidas(
+            request.user, queryset=self.get_queryset()
+        )
         return Response({'status': f'{count} notificaciones marcadas como leídas'})
 
 
@@ -6,6 +6,9 @@ from django.contrib.auth.models import Group, Permission
 from django.db.models import Q, F, Subquery, OuterRef
 from django.utils import timezone
 
+from .services.document_services import previsualizar_numero_documento
+from .services.ofertas_proveedor import proveedores_con_oferta
+from .threadlocals import get_current_empresa
 from .utils import es_admin as es_admin_func, tiene_rol
 from .models import (
     CategoriaInsumo,
@@ -248,10 +251,13 @@ class OrdenVentaForm(forms.ModelForm):
             self.fields["estado"].widget.attrs["disabled"] = True
             self.fields["estado"].required = False  # No se envía, la vista lo asigna
 
-            # El numero_ov se sugiere en la vista ventas_crear_ov_view y se pasa como initial.
-            # Podríamos hacerlo readonly aquí también si siempre viene de initial.
-            if self.initial.get("numero_ov"):
-                self.fields["numero_ov"].widget.attrs["readonly"] = True
+            # El numero_ov se muestra como sugerencia: la vista reserva el número
+            # definitivo de la secuencia al guardar (ver services/document_services.py).
+            if not self.initial.get("numero_ov"):
+                self.initial["numero_ov"] = previsualizar_numero_documento(
+                    OrdenVenta, "OV", "numero_ov"
+                )
+            self.fields["numero_ov"].disabled = True
 
         else:  # EDICIÓN DE OV EXISTENTE
             # Hacer numero_ov siempre readonly después de la creación
@@ -511,15 +517,12 @@ class FacturaForm(forms.ModelForm):
         }
 
     def __init__(self, *args, **kwargs):
+        empresa = kwargs.pop("empresa", None) or get_current_empresa()
         super().__init__(*args, **kwargs)
-        # Sugerir N° de Factura
-        last_factura = Factura.objects.order_by("id").last()
-        next_factura_number = (
-            f"FACT-{str(last_factura.id + 1).zfill(5)}"
-            if last_factura
-            else "FACT-00001"
+        # Sugerir N° de Factura (el definitivo se reserva al guardar)
+        self.fields["numero_factura"].initial = previsualizar_numero_documento(
+            Factura, "FACT", "numero_factura", empresa=empresa
         )
-        self.fields["numero_factura"].initial = next_factura_number
 
         # Hacer que el campo sea de solo lectura para el usuario
         self.fields["numero_factura"].widget.attrs["readonly"] = True
@@ -632,14 +635,13 @@ class OrdenCompraForm(forms.ModelForm):
         self.fields["numero_orden"].widget.attrs[
             "class"
         ] = "form-control-plaintext mb-3 text-muted"
-        if is_new_instance and not self.initial.get("numero_orden"):
-            last_oc = Orden.objects.filter(tipo="compra").order_by("id").last()
-            next_id = (last_oc.id + 1) if last_oc else 1
-            next_oc_number = f"OC-{str(next_id).zfill(5)}"
-            while Orden.objects.filter(numero_orden=next_oc_number).exists():
-                next_id += 1
-                next_oc_number = f"OC-{str(next_id).zfill(5)}"
-            self.initial["numero_orden"] = next_oc_number
+        if is_new_instance:
+            # Sugerencia: la vista reserva el número definitivo de la secuencia al guardar
+            if not self.initial.get("numero_orden"):
+                self.initial["numero_orden"] = previsualizar_numero_documento(
+                    Orden, "OC", "numero_orden"
+                )
+            self.fields["numero_orden"].disabled = True
 
         # --- Configuración de Insumo Principal ---
         if self.insumo_fijo:
@@ -707,11 +709,9 @@ class OrdenCompraForm(forms.ModelForm):
         
         proveedor_ids = []
         if insumo_for_filter:
-            proveedor_ids = list(
-                OfertaProveedor.objects.filter(insumo=insumo_for_filter)
-                .values_list("proveedor_id", flat=True)
-                .distinct()
-            )
+            proveedor_ids = [
+                proveedor["id"] for proveedor in proveedores_con_oferta(insumo_for_filter.pk)
+            ]
         
         # Incluir proveedor preseleccionado o enviado en POST
         proveedores_a_incluir = []
@@ -879,11 +879,12 @@ class InsumoForm(forms.ModelForm):
         model = Insumo
         # Para edición, NO incluir el campo depósito (se preserva automáticamente)
         # NOTA: stock se elimina porque ahora es una @property calculada
-        fields = ["descripcion", "categoria", "fabricante", "imagen"]
+        fields = ["descripcion", "categoria", "fabricante", "stock_minimo", "imagen"]
         widgets = {
             "descripcion": forms.TextInput(attrs={"class": "form-control"}),
             "categoria": forms.Select(attrs={"class": "form-select"}),
             "fabricante": forms.Select(attrs={"class": "form-select"}),
+            "stock_minimo": forms.NumberInput(attrs={"class": "form-control", "min": "0"}),
             "imagen": forms.ClearableFileInput(attrs={"class": "form-control"}),
         }
 
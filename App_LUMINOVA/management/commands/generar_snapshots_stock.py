@@ -0,0 +1,47 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from App_LUMINOVA.services.historico_stock import generar_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Genera los snapshots diarios de stock pendientes desde el último punto de control (correr una vez por día)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empresa-id',
+            type=int,
+            help='ID de la empresa a procesar (opcional, por defecto todas)',
+        )
+        parser.add_argument(
+            '--hasta',
+            metavar='AAAA-MM-DD',
+            help='Último día a cerrar (por defecto, ayer)',
+        )
+
+    def handle(self, *args, **options):
+        hasta = None
+        if options.get('hasta'):
+            try:
+                hasta = date.fromisoformat(options['hasta'])
+            except ValueError:
+                raise CommandError(f"Fecha inválida '{options['hasta']}', se espera AAAA-MM-DD")
+
+        self.stdout.write(self.style.SUCCESS('Generando snapshots de stock...'))
+        try:
+            resumenes = generar_snapshots(empresa_id=options.get('empresa_id'), hasta=hasta)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for resumen in resumenes:
+            fechas = resumen['fechas']
+            if fechas:
+                self.stdout.write(
+                    f"  - Empresa {resumen['empresa_id']}: {len(fechas)} snapshots "
+                    f"({fechas[0]:%d/%m/%Y} a {fechas[-1]:%d/%m/%Y}), "
+                    f"{resumen['movimientos']} movimientos procesados"
+                )
+            else:
+                self.stdout.write(f"  - Empresa {resumen['empresa_id']}: al día")
+        self.stdout.write(self.style.SUCCESS('  ✓ Snapshots generados'))
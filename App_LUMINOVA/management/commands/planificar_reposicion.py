@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from App_LUMINOVA.models import Empresa
+from App_LUMINOVA.services.reposicion import DIAS_HISTORIAL, planificar_reposicion
+
+
+class Command(BaseCommand):
+    help = 'Calcula puntos de reorden, niveles objetivo y EOQ de los insumos y genera OCs sugeridas en BORRADOR (pensado para correr de noche)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empresa-id',
+            type=int,
+            help='ID de la empresa a procesar (opcional, por defecto todas las activas)',
+        )
+        parser.add_argument(
+            '--dias-historial',
+            type=int,
+            default=DIAS_HISTORIAL,
+            help=f'Días de consumo histórico a considerar (por defecto {DIAS_HISTORIAL})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo calcula el plan sin crear órdenes de compra',
+        )
+
+    def handle(self, *args, **options):
+        empresa_id = options.get('empresa_id')
+        dry_run = options.get('dry_run')
+
+        empresas = Empresa.objects.filter(activa=True)
+        if empresa_id:
+            empresas = Empresa.objects.filter(id=empresa_id)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{'[SIMULACIÓN] ' if dry_run else ''}Planificando reposición de insumos..."
+            )
+        )
+
+        for empresa in empresas:
+            inicio = time.monotonic()
+            plan, ocs_creadas = planificar_reposicion(
+                empresa,
+                persistir=not dry_run,
+                dias_historial=options['dias_historial'],
+            )
+            con_necesidad = int((plan['cantidad_sugerida'] > 0).sum())
+            self.stdout.write(
+                f"  ✓ {empresa.nombre}: {len(plan)} insumos, {con_necesidad} a reponer, "
+                f"{len(ocs_creadas)} OCs creadas ({time.monotonic() - inicio:.1f}s)"
+            )
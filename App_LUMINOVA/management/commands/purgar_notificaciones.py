@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from App_LUMINOVA.services.retencion_notificaciones import (
+    PAUSA_ENTRE_LOTES,
+    RETENCION_DIAS_DEFECTO,
+    RETENCION_NO_LEIDAS_DIAS,
+    TAMANO_LOTE,
+    purgar_notificaciones,
+)
+
+
+class Command(BaseCommand):
+    help = 'Purga por lotes las notificaciones expiradas, las leídas más antiguas que la retención de su tipo y las no leídas muy antiguas (opcionalmente las archiva)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empresa-id',
+            type=int,
+            help='ID de la empresa a procesar (opcional, por defecto todas)',
+        )
+        parser.add_argument(
+            '--retencion',
+            action='append',
+            default=[],
+            metavar='TIPO=DIAS',
+            help='Días de retención para un tipo de notificación (repetible, ej. --retencion stock_bajo=15)',
+        )
+        parser.add_argument(
+            '--dias-defecto',
+            type=int,
+            default=RETENCION_DIAS_DEFECTO,
+            help=f'Retención de los tipos sin configuración (por defecto {RETENCION_DIAS_DEFECTO} días)',
+        )
+        parser.add_argument(
+            '--dias-no-leidas',
+            type=int,
+            default=RETENCION_NO_LEIDAS_DIAS,
+            help=f'Antigüedad a partir de la cual se purgan las notificaciones que nadie leyó (por defecto {RETENCION_NO_LEIDAS_DIAS} días)',
+        )
+        parser.add_argument(
+            '--tamano-lote',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Ancho de cada rango de ids (por defecto {TAMANO_LOTE})',
+        )
+        parser.add_argument(
+            '--pausa',
+            type=float,
+            default=PAUSA_ENTRE_LOTES,
+            help=f'Segundos de pausa entre lotes (por defecto {PAUSA_ENTRE_LOTES})',
+        )
+        parser.add_argument(
+            '--archivar',
+            metavar='RUTA',
+            help='Archivo .jsonl.gz donde guardar las notificaciones antes de borrarlas',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informa lo que se purgaría',
+        )
+
+    def handle(self, *args, **options):
+        retencion = {}
+        for valor in options['retencion']:
+            tipo, _, dias = valor.partition('=')
+            if not tipo or not dias.isdigit():
+                raise CommandError(f"Retención inválida '{valor}', se espera TIPO=DIAS")
+            retencion[tipo] = int(dias)
+
+        dry_run = options.get('dry_run')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{'[SIMULACIÓN] ' if dry_run else ''}Purgando notificaciones..."
+            )
+        )
+
+        resumen = purgar_notificaciones(
+            empresa_id=options.get('empresa_id'),
+            retencion=retencion,
+            dias_defecto=options['dias_defecto'],
+            dias_no_leidas=options['dias_no_leidas'],
+            tamano_lote=options['tamano_lote'],
+            pausa=options['pausa'],
+            archivo=options.get('archivar'),
+            dry_run=dry_run,
+        )
+
+        for tipo, cantidad in sorted(resumen['por_tipo'].items()):
+            self.stdout.write(f"  - {tipo}: {cantidad}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"  ✓ {resumen['total']} notificaciones {'a purgar' if dry_run else 'purgadas'} "
+                f"en {resumen['lotes']} lotes ({resumen['segundos']:.1f}s)"
+            )
+        )
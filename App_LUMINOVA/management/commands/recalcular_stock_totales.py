@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from App_LUMINOVA.models import Insumo, ProductoTerminado
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el stock total materializado (stock_total) de insumos y productos desde las filas de stock por depósito'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empresa-id',
+            type=int,
+            help='ID de la empresa a procesar (opcional, por defecto todas)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informa las diferencias encontradas sin corregirlas',
+        )
+
+    def handle(self, *args, **options):
+        empresa_id = options.get('empresa_id')
+        dry_run = options.get('dry_run')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{'[SIMULACIÓN] ' if dry_run else ''}Reconciliando stock total materializado..."
+            )
+        )
+
+        for modelo in (Insumo, ProductoTerminado):
+            self._reconciliar(modelo, empresa_id, dry_run)
+
+    def _reconciliar(self, modelo, empresa_id, dry_run):
+        nombre = modelo._meta.verbose_name_plural
+        queryset = modelo.objects.all()
+        if empresa_id:
+            queryset = queryset.filter(empresa_id=empresa_id)
+
+        desfasados = (
+            queryset.annotate(stock_real=modelo.subquery_stock_real())
+            .exclude(stock_total=F('stock_real'))
+            .values_list('id', 'stock_total', 'stock_real')
+        )
+        desfasados = list(desfasados)
+
+        if not desfasados:
+            self.stdout.write(f"  ✓ {nombre}: sin diferencias")
+            return
+
+        self.stdout.write(
+            self.style.WARNING(f"  - {nombre}: {len(desfasados)} con stock total desactualizado")
+        )
+        for item_id, stock_total, stock_real in desfasados[:10]:
+            self.stdout.write(f"      ID {item_id}: {stock_total} -> {stock_real}")
+
+        if dry_run:
+            return
+
+        with transaction.atomic():
+            actualizados = modelo.recalcular_stock_total([item_id for item_id, _, _ in desfasados])
+        self.stdout.write(self.style.SUCCESS(f"  ✓ {nombre}: {actualizados} corregidos"))
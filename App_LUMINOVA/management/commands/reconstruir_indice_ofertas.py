@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from App_LUMINOVA.models import Insumo
+from App_LUMINOVA.services.ofertas_proveedor import recalcular_indice_ofertas
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de mejores ofertas de proveedor por insumo (precio, entrega y puntaje)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empresa-id',
+            type=int,
+            help='ID de la empresa a procesar (opcional, por defecto todas)',
+        )
+
+    def handle(self, *args, **options):
+        empresa_id = options.get('empresa_id')
+
+        insumos = Insumo.objects.all()
+        if empresa_id:
+            insumos = insumos.filter(empresa_id=empresa_id)
+
+        indexados = recalcular_indice_ofertas(insumos.values_list('id', flat=True))
+        self.stdout.write(self.style.SUCCESS(f"  ✓ {indexados} insumos con ofertas indexados"))
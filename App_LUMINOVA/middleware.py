@@ -1,8 +1,29 @@
+from django.core.cache import cache
 from django.shortcuts import redirect
 from django.urls import reverse
 
 from .models import PasswordChangeRequired
 from .threadlocals import set_current_empresa
+from .utils import clave_tenant
+
+# El valor cacheado se invalida por señales (ver signals.py); el timeout es solo
+# una red de seguridad.
+MIDDLEWARE_CACHE_TIMEOUT = 5 * 60
+_CLAVE_CAMBIO_PASSWORD = "luminova:password_change:{user_id}"
+
+
+def requiere_cambio_password(user):
+    """Indica si el usuario debe cambiar su contraseña (cacheado por tenant y usuario)."""
+    clave = clave_tenant(_CLAVE_CAMBIO_PASSWORD.format(user_id=user.pk))
+    requiere = cache.get(clave)
+    if requiere is None:
+        requiere = PasswordChangeRequired.objects.filter(user=user).exists()
+        cache.set(clave, requiere, MIDDLEWARE_CACHE_TIMEOUT)
+    return requiere
+
+
+def invalidar_cambio_password(user_id):
+    cache.delete(clave_tenant(_CLAVE_CAMBIO_PASSWORD.format(user_id=user_id)))
 
 
 class PasswordChangeMiddleware:
@@ -32,7 +53,7 @@ class PasswordChangeMiddleware:
             return response
 
         # La comprobación clave: ¿Necesita cambiar la contraseña?
-        if PasswordChangeRequired.objects.filter(user=request.user).exists():
+        if requiere_cambio_password(request.user):
             # Si está aquí, significa que intentó acceder a una página no permitida.
             # Lo redirigimos forzosamente.
             return redirect("App_LUMINOVA:change_password")
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:04
+
+from django.db import migrations, models
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar_stock_total(apps, schema_editor):
+    """Inicializa stock_total con la suma actual de las filas de stock por depósito."""
+    for item_model, stock_model, item_field in (
+        ("Insumo", "StockInsumo", "insumo"),
+        ("ProductoTerminado", "StockProductoTerminado", "producto"),
+    ):
+        Item = apps.get_model("App_LUMINOVA", item_model)
+        Stock = apps.get_model("App_LUMINOVA", stock_model)
+        total = (
+            Stock.objects.filter(**{item_field: OuterRef("pk")})
+            .values(item_field)
+            .annotate(total=Sum("cantidad"))
+            .values("total")
+        )
+        Item.objects.update(
+            stock_total=Coalesce(Subquery(total), Value(0), output_field=IntegerField())
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("App_LUMINOVA", "0040_add_tenant_domain_models"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="insumo",
+            name="stock_total",
+            field=models.IntegerField(
+                default=0,
+                editable=False,
+                help_text="Suma del stock en todos los depósitos (mantenido automáticamente)",
+                verbose_name="Stock Total",
+            ),
+        ),
+        migrations.AddField(
+            model_name="productoterminado",
+            name="stock_total",
+            field=models.IntegerField(
+                default=0,
+                editable=False,
+                help_text="Suma del stock en todos los depósitos (mantenido automáticamente)",
+                verbose_name="Stock Total",
+            ),
+        ),
+        migrations.RunPython(poblar_stock_total, migrations.RunPython.noop),
+    ]
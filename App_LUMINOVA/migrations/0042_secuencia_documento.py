@@ -0,0 +1,55 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("App_LUMINOVA", "0041_stock_total_materializado"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SecuenciaDocumento",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("prefijo", models.CharField(max_length=10)),
+                ("ultimo_numero", models.PositiveBigIntegerField(default=0)),
+                (
+                    "empresa",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="secuencias_documento",
+                        to="App_LUMINOVA.empresa",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Secuencia de Documento",
+                "verbose_name_plural": "Secuencias de Documentos",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("empresa", "prefijo"),
+                        name="secuencia_documento_empresa_prefijo",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("empresa__isnull", True)),
+                        fields=("prefijo",),
+                        name="secuencia_documento_global_prefijo",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("App_LUMINOVA", "0042_secuencia_documento"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="insumo",
+            name="stock_minimo",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Piso del punto de reorden usado por el planificador de reposición",
+                verbose_name="Stock Mínimo",
+            ),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("App_LUMINOVA", "0043_insumo_stock_minimo"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IndiceOfertaInsumo",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("cantidad_ofertas", models.PositiveIntegerField(default=0)),
+                ("fecha_actualizacion", models.DateTimeField(auto_now=True)),
+                (
+                    "empresa",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="%(app_label)s_%(class)s",
+                        to="App_LUMINOVA.empresa",
+                    ),
+                ),
+                (
+                    "insumo",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="indice_ofertas",
+                        to="App_LUMINOVA.insumo",
+                    ),
+                ),
+                (
+                    "oferta_mejor_puntaje",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="App_LUMINOVA.ofertaproveedor",
+                    ),
+                ),
+                (
+                    "oferta_menor_entrega",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="App_LUMINOVA.ofertaproveedor",
+                    ),
+                ),
+                (
+                    "oferta_menor_precio",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="App_LUMINOVA.ofertaproveedor",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Índice de Ofertas por Insumo",
+                "verbose_name_plural": "Índices de Ofertas por Insumo",
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("App_LUMINOVA", "0044_indice_oferta_insumo"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="orden",
+            index=models.Index(
+                fields=["empresa", "tipo", "estado", "-fecha_creacion", "-id"],
+                name="App_LUMINOV_empresa_0500d0_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("App_LUMINOVA", "0045_orden_indice_listado"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LecturaNotificacion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "fecha_lectura",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "notificacion",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lecturas",
+                        to="App_LUMINOVA.notificacionsistema",
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lecturas_notificaciones",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Lectura de Notificación",
+                "verbose_name_plural": "Lecturas de Notificaciones",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("usuario", "notificacion"),
+                        name="lectura_notificacion_usuario_unica",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("App_LUMINOVA", "0046_lecturanotificacion"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificacionsistema",
+            name="clave_agrupacion",
+            field=models.CharField(
+                blank=True, editable=False, max_length=100, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="notificacionsistema",
+            name="fecha_ultima_ocurrencia",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="notificacionsistema",
+            name="repeticiones",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddConstraint(
+            model_name="notificacionsistema",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(
+                    ("clave_agrupacion__isnull", False), ("leida", False)
+                ),
+                fields=("clave_agrupacion",),
+                name="notificacion_abierta_por_clave",
+            ),
+        ),
+    ]
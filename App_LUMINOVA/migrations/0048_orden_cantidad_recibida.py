@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("App_LUMINOVA", "0047_notificacion_agrupacion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orden",
+            name="cantidad_recibida",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Unidades del insumo principal ya recibidas (recepciones parciales)",
+                verbose_name="Cantidad Recibida",
+            ),
+        ),
+    ]
@@ -0,0 +1,142 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("App_LUMINOVA", "0048_orden_cantidad_recibida"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movimientostock",
+            name="insumo_destino",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="App_LUMINOVA.insumo",
+            ),
+        ),
+        migrations.AddField(
+            model_name="movimientostock",
+            name="producto_destino",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="App_LUMINOVA.productoterminado",
+            ),
+        ),
+        migrations.CreateModel(
+            name="SnapshotStock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("fecha", models.DateField()),
+                ("fecha_corte", models.DateTimeField()),
+                ("movimientos_procesados", models.PositiveIntegerField(default=0)),
+                ("fecha_generacion", models.DateTimeField(auto_now_add=True)),
+                (
+                    "empresa",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="%(app_label)s_%(class)s",
+                        to="App_LUMINOVA.empresa",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Snapshot de Stock",
+                "verbose_name_plural": "Snapshots de Stock",
+                "ordering": ["-fecha"],
+            },
+        ),
+        migrations.CreateModel(
+            name="SnapshotStockLinea",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("cantidad", models.IntegerField()),
+                (
+                    "deposito",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="App_LUMINOVA.deposito",
+                    ),
+                ),
+                (
+                    "insumo",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="App_LUMINOVA.insumo",
+                    ),
+                ),
+                (
+                    "producto",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="App_LUMINOVA.productoterminado",
+                    ),
+                ),
+                (
+                    "snapshot",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lineas",
+                        to="App_LUMINOVA.snapshotstock",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Línea de Snapshot de Stock",
+                "verbose_name_plural": "Líneas de Snapshot de Stock",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="snapshotstock",
+            index=models.Index(
+                fields=["empresa", "fecha_corte"], name="App_LUMINOV_empresa_ef01a9_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="snapshotstock",
+            constraint=models.UniqueConstraint(
+                fields=("empresa", "fecha"), name="snapshot_stock_empresa_fecha_unico"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="snapshotstocklinea",
+            index=models.Index(
+                fields=["snapshot", "deposito"], name="App_LUMINOV_snapsho_a82c8f_idx"
+            ),
+        ),
+    ]
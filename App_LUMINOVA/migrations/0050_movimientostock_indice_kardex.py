@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("App_LUMINOVA", "0049_historico_stock"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="movimientostock",
+            index=models.Index(
+                fields=["insumo", "fecha", "id"], name="App_LUMINOV_insumo__bcd39c_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movimientostock",
+            index=models.Index(
+                fields=["producto", "fecha", "id"],
+                name="App_LUMINOV_product_fc6634_idx",
+            ),
+        ),
+    ]
@@ -3,8 +3,9 @@
 from django.conf import settings
 from django.contrib.auth.models import Group, User
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Sum, F
+from django.db import models, transaction
+from django.db.models import Sum, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 # Django-tenants para multi-tenancy
@@ -77,6 +78,8 @@ class EmpresaScopedModel(models.Model):
     def save(self, *args, **kwargs):
         self.ensure_empresa()
         super().save(*args, **kwargs)
+
+
 # TP_LUMINOVA-main/App_LUMINOVA/models.py
 
 from django.contrib.auth.models import Group, User
@@ -85,6 +88,104 @@ from django.db import models
 from django.utils import timezone  # Importar timezone
 
 
+class StockTotalizadoModel(EmpresaScopedModel):
+    """
+    Base abstracta para ítems (Insumo, ProductoTerminado) con el stock total
+    materializado en la columna ``stock_total``.
+
+    La columna se recalcula desde la tabla de stock por depósito en cada
+    escritura de una fila de stock (ver signals.py). Las escrituras masivas
+    (bulk_create, bulk_update, QuerySet.update) no disparan señales y deben
+    llamar a ``recalcular_stock_total`` con los ids afectados.
+    """
+
+    # Modelo de stock por depósito y nombre del FK hacia el ítem.
+    STOCK_MODEL_NAME = None
+    STOCK_ITEM_FIELD = None
+
+    stock_total = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Stock Total",
+        help_text="Suma del stock en todos los depósitos (mantenido automáticamente)",
+    )
+
+    class Meta:
+        abstract = True
+
+    @property
+    def stock(self) -> int:
+        """Stock total del ítem en todos sus depósitos (columna materializada o snapshot)"""
+        snapshot = getattr(self, "_stock_por_deposito", None)
+        if snapshot is not None:
+            return sum(snapshot.values())
+        return self.stock_total
+
+    def get_stock_by_deposito(self, deposito) -> int:
+        """Stock del ítem en un depósito específico (acepta instancia o id)"""
+        deposito_id = getattr(deposito, "pk", deposito)
+        snapshot = getattr(self, "_stock_por_deposito", None)
+        if snapshot is not None:
+            return snapshot.get(deposito_id, 0)
+        cantidad = (
+            self.get_stock_model().objects.filter(
+                **{self.STOCK_ITEM_FIELD: self, "deposito_id": deposito_id}
+            )
+            .values_list("cantidad", flat=True)
+            .first()
+        )
+        return cantidad or 0
+
+    def save(self, *args, **kwargs):
+        # stock_total lo mantienen las filas de stock: no pisarlo con el valor
+        # en memoria (posiblemente desactualizado) al guardar el ítem completo.
+        if not self._state.adding and self.pk and kwargs.get("update_fields") is None:
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name != "stock_total"
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def get_stock_model(cls):
+        return cls._meta.apps.get_model(cls._meta.app_label, cls.STOCK_MODEL_NAME)
+
+    @classmethod
+    def subquery_stock_real(cls):
+        """Subquery con la suma de stock por depósito para el ítem externo (OuterRef('pk'))."""
+        item_field = cls.STOCK_ITEM_FIELD
+        total = (
+            cls.get_stock_model().objects.filter(**{item_field: OuterRef("pk")})
+            .values(item_field)
+            .annotate(total=Sum("cantidad"))
+            .values("total")
+        )
+        return Coalesce(Subquery(total), Value(0), output_field=models.IntegerField())
+
+    @classmethod
+    def recalcular_stock_total(cls, ids=None):
+        """
+        Recalcula stock_total con un único UPDATE.
+
+        Args:
+            ids: Iterable de ids a recalcular (None = todos).
+
+        Returns:
+            int: Cantidad de filas actualizadas.
+        """
+        queryset = cls.objects.all()
+        if ids is not None:
+            ids = [item_id for item_id in set(ids) if item_id is not None]
+            if not ids:
+                return 0
+            queryset = queryset.filter(pk__in=ids)
+        return queryset.update(stock_total=cls.subquery_stock_real())
+
+
 # --- CATEGORÍAS Y ENTIDADES BASE ---
 class CategoriaProductoTerminado(EmpresaScopedModel):
     EMPRESA_FALLBACK_FIELDS = ("deposito",)
@@ -109,8 +210,10 @@ class CategoriaProductoTerminado(EmpresaScopedModel):
         return self.nombre
 
 
-class ProductoTerminado(EmpresaScopedModel):
+class ProductoTerminado(StockTotalizadoModel):
     EMPRESA_FALLBACK_FIELDS = ("deposito", "categoria")
+    STOCK_MODEL_NAME = "StockProductoTerminado"
+    STOCK_ITEM_FIELD = "producto"
     descripcion = models.CharField(max_length=255)  # Aumentado max_length
     categoria = models.ForeignKey(
         CategoriaProductoTerminado,
@@ -118,7 +221,7 @@ class ProductoTerminado(EmpresaScopedModel):
         related_name="productos_terminados",
     )
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
-    # NOTA: stock se calcula desde StockProductoTerminado (campo eliminado en migration)
+    # NOTA: stock_total se mantiene desde StockProductoTerminado (ver StockTotalizadoModel)
     # Campos para gestión de stock
     stock_minimo = models.IntegerField(
         default=0, 
@@ -163,26 +266,6 @@ class ProductoTerminado(EmpresaScopedModel):
     def __str__(self):
         return f"{self.descripcion} (Modelo: {self.modelo or 'N/A'})"
     
-    @property
-    def stock(self) -> int:
-        """Stock total del producto en todos sus depósitos (desde StockProductoTerminado)"""
-        # IMPORTANTE: Esta es una property, NO un campo de BD
-        result = StockProductoTerminado.objects.filter(
-            producto=self
-        ).aggregate(total=Sum('cantidad'))['total']
-        return result if result is not None else 0
-    
-    def get_stock_by_deposito(self, deposito: 'Deposito') -> int:
-        """Stock del producto en un depósito específico"""
-        try:
-            stock_record = StockProductoTerminado.objects.get(
-                producto=self,
-                deposito=deposito
-            )
-            return stock_record.cantidad
-        except StockProductoTerminado.DoesNotExist:
-            return 0
-    
     @property
     def necesita_reposicion(self):
         """Indica si el producto necesita reposición de stock"""
@@ -287,8 +370,10 @@ class Fabricante(EmpresaScopedModel):
         return insumo.empresa if insumo else None
 
 
-class Insumo(EmpresaScopedModel):
+class Insumo(StockTotalizadoModel):
     EMPRESA_FALLBACK_FIELDS = ("deposito", "categoria")
+    STOCK_MODEL_NAME = "StockInsumo"
+    STOCK_ITEM_FIELD = "insumo"
     notificado_a_compras = models.BooleanField(default=False, help_text="¿Ya fue notificado a compras por stock bajo?")
     descripcion = models.CharField(max_length=255)
     categoria = models.ForeignKey(
@@ -302,10 +387,15 @@ class Insumo(EmpresaScopedModel):
         related_name="insumos_fabricados",
     )
     imagen = models.ImageField(null=True, blank=True, upload_to="insumos/")
-    # NOTA: stock se calcula desde StockInsumo (campo eliminado en migration)
+    # NOTA: stock_total se mantiene desde StockInsumo (ver StockTotalizadoModel)
     cantidad_en_pedido = models.PositiveIntegerField(
         default=0, verbose_name="Cantidad en Pedido", blank=True, null=True
     )
+    stock_minimo = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Stock Mínimo",
+        help_text="Piso del punto de reorden usado por el planificador de reposición",
+    )
     deposito = models.ForeignKey(
         "Deposito",
         on_delete=models.PROTECT,
@@ -327,26 +417,6 @@ class Insumo(EmpresaScopedModel):
 
     def __str__(self):
         return self.descripcion
-    
-    @property
-    def stock(self) -> int:
-        """Stock total del insumo en todos sus depósitos (desde StockInsumo)"""
-        # IMPORTANTE: Esta es una property, NO un campo de BD
-        result = StockInsumo.objects.filter(
-            insumo=self
-        ).aggregate(total=Sum('cantidad'))['total']
-        return result if result is not None else 0
-    
-    def get_stock_by_deposito(self, deposito: 'Deposito') -> int:
-        """Stock del insumo en un depósito específico"""
-        try:
-            stock_record = StockInsumo.objects.get(
-                insumo=self,
-                deposito=deposito
-            )
-            return stock_record.cantidad
-        except StockInsumo.DoesNotExist:
-            return 0
 
 
 # --- NUEVO MODELO INTERMEDIO ---
@@ -386,6 +456,36 @@ class OfertaProveedor(EmpresaScopedModel):
         return f"{self.insumo.descripcion} - {self.proveedor.nombre} (${self.precio_unitario_compra})"
 
 
+class IndiceOfertaInsumo(EmpresaScopedModel):
+    """
+    Mejores ofertas de proveedor de cada insumo: por precio, por tiempo de entrega y
+    por puntaje ponderado. Se recalcula al guardar o eliminar una OfertaProveedor
+    (ver services/ofertas_proveedor.py).
+    """
+    EMPRESA_FALLBACK_FIELDS = ("insumo",)
+    insumo = models.OneToOneField(
+        Insumo, on_delete=models.CASCADE, related_name="indice_ofertas"
+    )
+    oferta_menor_precio = models.ForeignKey(
+        OfertaProveedor, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    oferta_menor_entrega = models.ForeignKey(
+        OfertaProveedor, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    oferta_mejor_puntaje = models.ForeignKey(
+        OfertaProveedor, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    cantidad_ofertas = models.PositiveIntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Índice de Ofertas por Insumo"
+        verbose_name_plural = "Índices de Ofertas por Insumo"
+
+    def __str__(self):
+        return f"Mejores ofertas de {self.insumo_id}"
+
+
 class ComponenteProducto(EmpresaScopedModel):
     EMPRESA_FALLBACK_FIELDS = ("producto_terminado", "insumo")
     producto_terminado = models.ForeignKey(
@@ -482,6 +582,9 @@ class OrdenVenta(EmpresaScopedModel):
         """Total calculado dinámicamente desde items de la orden de venta."""
         from decimal import Decimal
         from django.db.models import Sum
+        # Si los ítems ya vienen con prefetch_related (listados), sumar en memoria
+        if 'items_ov' in getattr(self, '_prefetched_objects_cache', {}):
+            return sum((item.subtotal or Decimal('0.00') for item in self.items_ov.all()), Decimal('0.00'))
         total = self.items_ov.aggregate(total=Sum('subtotal'))['total']
         return total or Decimal('0.00')
 
@@ -503,114 +606,19 @@ class OrdenVenta(EmpresaScopedModel):
     def actualizar_estado_por_ops(self):
         """
         Actualiza el estado de una OV basado en el estado más avanzado de sus OPs asociadas.
-        
-        Lógica para estados mixtos:
-        - Si todas las OPs están completadas -> COMPLETADA
-        - Si hay OPs completadas y otras pendientes/en proceso -> Según el estado más avanzado
-        - Si hay OPs canceladas, se consideran en la evaluación pero no bloquean el progreso
-        - Si todas las OPs están canceladas -> CANCELADA
+        La lógica (estados mixtos, no degradación) vive en services/estado_ov.py,
+        que también la aplica por lotes.
         """
-        from collections import Counter
-        
-        # Mapeo de estados de OP a estados de OV y su prioridad
-        MAPEO_ESTADOS_OP_A_OV = {
-            "Completada": "COMPLETADA",
-            "En Proceso": "PRODUCCION_INICIADA", 
-            "Producción Iniciada": "PRODUCCION_INICIADA",
-            "Insumos Recibidos": "INSUMOS_SOLICITADOS",
-            "Insumos Solicitados": "INSUMOS_SOLICITADOS",
-            "Planificada": "CONFIRMADA",
-            "Pendiente": "PENDIENTE",
-            "Cancelada": "CANCELADA",
-        }
-        
-        ESTADOS_PRIORIDAD = {
-            "COMPLETADA": 6,
-            "LISTA_ENTREGA": 5,
-            "PRODUCCION_INICIADA": 4,
-            "INSUMOS_SOLICITADOS": 3,
-            "CONFIRMADA": 2,
-            "PENDIENTE": 1,
-            "CANCELADA": 0,
-        }
-
-        ops_asociadas = self.ops_generadas.all()
-        if not ops_asociadas.exists():
-            return  # No hay OPs asociadas, no se actualiza el estado
-
-        # Obtener todos los estados de las OPs y mapearlos a estados de OV
-        estados_ops = []
-        contador_estados = Counter()
-        
-        for op in ops_asociadas:
-            if op.estado_op and op.estado_op.nombre:
-                estado_op_nombre = op.estado_op.nombre
-                estado_ov_mapeado = MAPEO_ESTADOS_OP_A_OV.get(estado_op_nombre)
-                if estado_ov_mapeado:
-                    estados_ops.append(estado_ov_mapeado)
-                    contador_estados[estado_op_nombre] += 1
-        
-        if not estados_ops:
-            return  # No hay estados válidos para mapear
-
-        total_ops = len(estados_ops)
-        ops_completadas = contador_estados.get("Completada", 0)
-        ops_canceladas = contador_estados.get("Cancelada", 0)
-        ops_activas = total_ops - ops_canceladas  # OPs que no están canceladas
+        from .services.estado_ov import derivar_estado_ov, resumir_ops_por_ov
 
-        # Lógica especial para estados mixtos
-        nuevo_estado = None
-        
-        # Caso 1: Todas las OPs están canceladas
-        if ops_canceladas == total_ops:
-            nuevo_estado = "CANCELADA"
-        
-        # Caso 2: Todas las OPs activas están completadas
-        elif ops_completadas == ops_activas and ops_activas > 0:
-            nuevo_estado = "LISTA_ENTREGA"  # Listo para entrega
-        
-        # Caso 3: Hay OPs completadas y otras en proceso (estado mixto)
-        elif ops_completadas > 0 and ops_activas > ops_completadas:
-            # En estados mixtos, NO permitir COMPLETADA hasta que todas estén listas
-            # Obtener el estado más avanzado de las OPs no completadas
-            estados_no_completados = [
-                estado for estado in estados_ops 
-                if estado not in ["COMPLETADA", "CANCELADA"]
-            ]
-            if estados_no_completados:
-                estado_mas_avanzado_activo = max(
-                    estados_no_completados,
-                    key=lambda estado: ESTADOS_PRIORIDAD.get(estado, 0),
-                )
-                # En estado mixto, usar el estado más avanzado pero NO permitir degradación
-                # Si ya está en COMPLETADA y hay OPs pendientes, mantener COMPLETADA pero registrar inconsistencia
-                if self.estado == "COMPLETADA":
-                    print(f"⚠️  INCONSISTENCIA: OV {self.numero_ov} está COMPLETADA pero tiene OPs pendientes")
-                    nuevo_estado = None  # No cambiar estado para evitar degradación
-                else:
-                    nuevo_estado = estado_mas_avanzado_activo
-            else:
-                nuevo_estado = "PRODUCCION_INICIADA"  # Fallback
-        
-        # Caso 4: Ninguna OP completada, usar el estado más avanzado
-        else:
-            nuevo_estado = max(
-                estados_ops,
-                key=lambda estado: ESTADOS_PRIORIDAD.get(estado, 0),
-            )
+        resumen = resumir_ops_por_ov([self.pk]).get(self.pk)
+        if not resumen:
+            return  # No hay OPs asociadas con estados válidos, no se actualiza el estado
 
-        # Solo actualizar si el estado cambió y no degrada el progreso
-        if (nuevo_estado and 
-            nuevo_estado != self.estado and 
-            ESTADOS_PRIORIDAD.get(nuevo_estado, 0) >= ESTADOS_PRIORIDAD.get(self.estado, 0)):
-            
+        nuevo_estado = derivar_estado_ov(self.estado, resumen)
+        if nuevo_estado:
             self.estado = nuevo_estado
             self.save(update_fields=["estado"])
-            
-            # Log para debug
-            print(f"OV {self.numero_ov}: Estado actualizado de {self.estado} a {nuevo_estado}")
-            print(f"  - OPs completadas: {ops_completadas}/{ops_activas}")
-            print(f"  - OPs canceladas: {ops_canceladas}")
 
     def get_resumen_estados_ops(self):
         """
@@ -914,6 +922,14 @@ class AuditoriaAcceso(models.Model):
 
 class Orden(EmpresaScopedModel):
     EMPRESA_FALLBACK_FIELDS = ("deposito", "insumo_principal")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado leído de la base, para detectar transiciones (ver signals.py)
+        instance._estado_cargado = instance.__dict__.get("estado")
+        return instance
+
     @staticmethod
     def pedidos_por_deposito(deposito_id):
         """
@@ -964,6 +980,10 @@ class Orden(EmpresaScopedModel):
     cantidad_principal = models.PositiveIntegerField(
         null=True, blank=True, verbose_name="Cantidad Insumo Principal"
     )
+    cantidad_recibida = models.PositiveIntegerField(
+        default=0, verbose_name="Cantidad Recibida",
+        help_text="Unidades del insumo principal ya recibidas (recepciones parciales)"
+    )
     precio_unitario_compra = models.DecimalField(
         max_digits=10,
         decimal_places=2,
@@ -997,6 +1017,8 @@ class Orden(EmpresaScopedModel):
             models.Index(fields=['empresa', 'deposito']),
             models.Index(fields=['estado', 'fecha_creacion']),
             models.Index(fields=['proveedor', 'estado']),
+            # Paginación por cursor del listado de OCs (services/listado_oc.py)
+            models.Index(fields=['empresa', 'tipo', 'estado', '-fecha_creacion', '-id']),
         ]
 
     def __str__(self):
@@ -1189,7 +1211,24 @@ class UsuarioDeposito(models.Model):
     def __str__(self):
         return f"{self.usuario.username} - {self.deposito.nombre}"
 
-class StockInsumo(EmpresaScopedModel):
+
+class StockPorDepositoModel(EmpresaScopedModel):
+    """
+    Base abstracta para filas de stock por depósito.
+
+    El guardado se ejecuta en un bloque atómico para que el recálculo del
+    stock total del ítem (post_save en signals.py) se confirme junto con la fila.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class StockInsumo(StockPorDepositoModel):
     EMPRESA_FALLBACK_FIELDS = ("insumo", "deposito")
     insumo = models.ForeignKey('Insumo', on_delete=models.CASCADE)
     deposito = models.ForeignKey('Deposito', on_delete=models.CASCADE)
@@ -1204,7 +1243,7 @@ class StockInsumo(EmpresaScopedModel):
             models.Index(fields=['insumo']),
         ]
 
-class StockProductoTerminado(EmpresaScopedModel):
+class StockProductoTerminado(StockPorDepositoModel):
     EMPRESA_FALLBACK_FIELDS = ("producto", "deposito")
     producto = models.ForeignKey('ProductoTerminado', on_delete=models.CASCADE)
     deposito = models.ForeignKey('Deposito', on_delete=models.CASCADE)
@@ -1235,6 +1274,10 @@ class MovimientoStock(EmpresaScopedModel):
     fecha = models.DateTimeField(auto_now_add=True)
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     motivo = models.CharField(max_length=255, blank=True)
+    # Ítem que recibe el stock en el destino de una transferencia cuando es otra
+    # instancia (copias por depósito); vacío si es el mismo ítem
+    insumo_destino = models.ForeignKey('Insumo', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    producto_destino = models.ForeignKey('ProductoTerminado', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
 
     class Meta:
         verbose_name = "Movimiento de Stock"
@@ -1245,6 +1288,53 @@ class MovimientoStock(EmpresaScopedModel):
             models.Index(fields=['empresa', 'tipo']),
             models.Index(fields=['deposito_origen', 'fecha']),
             models.Index(fields=['deposito_destino', 'fecha']),
+            # Kardex por ítem en orden cronológico
+            models.Index(fields=['insumo', 'fecha', 'id']),
+            models.Index(fields=['producto', 'fecha', 'id']),
+        ]
+
+
+class SnapshotStock(EmpresaScopedModel):
+    """
+    Cierre diario del stock de una empresa: cantidades por (ítem, depósito) al
+    final de ``fecha``, calculadas desde el libro de movimientos (ver
+    services/historico_stock.py). El último snapshot es el punto de control del
+    proceso incremental.
+    """
+    fecha = models.DateField()
+    # Incluye los movimientos con fecha anterior a este instante (fin del día)
+    fecha_corte = models.DateTimeField()
+    movimientos_procesados = models.PositiveIntegerField(default=0)
+    fecha_generacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Snapshot de Stock"
+        verbose_name_plural = "Snapshots de Stock"
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['empresa', 'fecha'], name='snapshot_stock_empresa_fecha_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['empresa', 'fecha_corte']),
+        ]
+
+    def __str__(self):
+        return f"Snapshot de stock {self.fecha:%d/%m/%Y}"
+
+
+class SnapshotStockLinea(models.Model):
+    """Cantidad de un ítem en un depósito dentro de un SnapshotStock."""
+    snapshot = models.ForeignKey(SnapshotStock, on_delete=models.CASCADE, related_name='lineas')
+    insumo = models.ForeignKey('Insumo', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    producto = models.ForeignKey('ProductoTerminado', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    deposito = models.ForeignKey('Deposito', on_delete=models.CASCADE, related_name='+')
+    cantidad = models.IntegerField()
+
+    class Meta:
+        verbose_name = "Línea de Snapshot de Stock"
+        verbose_name_plural = "Líneas de Snapshot de Stock"
+        indexes = [
+            models.Index(fields=['snapshot', 'deposito']),
         ]
 
 
@@ -1301,6 +1391,12 @@ class NotificacionSistema(EmpresaScopedModel):
     # Para notificaciones que expiran
     fecha_expiracion = models.DateTimeField(null=True, blank=True)
     
+    # Agrupación: las repeticiones de una notificación abierta con la misma clave
+    # (ej. "stock_bajo:<insumo>:<deposito>") actualizan la existente
+    clave_agrupacion = models.CharField(max_length=100, null=True, blank=True, editable=False)
+    repeticiones = models.PositiveIntegerField(default=1)
+    fecha_ultima_ocurrencia = models.DateTimeField(null=True, blank=True)
+    
     class Meta:
         ordering = ['-fecha_creacion']
         verbose_name = "Notificación del Sistema"
@@ -1310,24 +1406,40 @@ class NotificacionSistema(EmpresaScopedModel):
             models.Index(fields=['tipo', 'fecha_creacion']),
             models.Index(fields=['prioridad', 'fecha_creacion']),
         ]
+        constraints = [
+            # Una sola notificación abierta por clave, aun con clics concurrentes
+            models.UniqueConstraint(
+                fields=['clave_agrupacion'],
+                condition=models.Q(leida=False, clave_agrupacion__isnull=False),
+                name='notificacion_abierta_por_clave',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.titulo} - {self.get_destinatario_grupo_display()}"
     
     def marcar_como_leida(self, usuario=None):
-        """Marca la notificación como leída"""
+        """
+        Marca la notificación como leída.
+
+        Con ``usuario`` registra solo la lectura de ese usuario (LecturaNotificacion);
+        sin usuario la marca como leída para todo el grupo (resolución global).
+        """
+        if usuario is not None:
+            from .services.notification_service import NotificationService
+
+            NotificationService.marcar_notificaciones_como_leidas(usuario, [self.pk])
+            return
         self.leida = True
         self.fecha_lectura = timezone.now()
         self.save(update_fields=['leida', 'fecha_lectura'])
     
     def marcar_como_atendida(self, usuario=None):
-        """Marca la notificación como atendida"""
+        """Marca la notificación como atendida (y como leída)"""
         self.atendida = True
         self.fecha_atencion = timezone.now()
-        if not self.leida:
-            self.marcar_como_leida(usuario)
-        else:
-            self.save(update_fields=['atendida', 'fecha_atencion'])
+        self.save(update_fields=['atendida', 'fecha_atencion'])
+        self.marcar_como_leida(usuario)
     
     def esta_expirada(self):
         """Verifica si la notificación ha expirado"""
@@ -1363,6 +1475,31 @@ class NotificacionSistema(EmpresaScopedModel):
         return mapping.get(self.tipo, 'bi-bell-fill')
 
 
+class LecturaNotificacion(models.Model):
+    """
+    Confirmación de lectura de una notificación por un usuario.
+
+    Una notificación está no leída para un usuario si no fue resuelta globalmente
+    (``NotificacionSistema.leida``) y no tiene una lectura de ese usuario.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lecturas_notificaciones')
+    notificacion = models.ForeignKey(NotificacionSistema, on_delete=models.CASCADE, related_name='lecturas')
+    fecha_lectura = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Lectura de Notificación"
+        verbose_name_plural = "Lecturas de Notificaciones"
+        # El índice único (usuario, notificacion) resuelve el anti-join de no leídas
+        constraints = [
+            models.UniqueConstraint(
+                fields=['usuario', 'notificacion'], name='lectura_notificacion_usuario_unica'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario} leyó {self.notificacion_id}"
+
+
 # --- MODELO PARA HISTORIAL DE IMPORTACIONES ---
 class HistorialImportacion(EmpresaScopedModel):
     """
@@ -1455,3 +1592,39 @@ class HistorialImportacion(EmpresaScopedModel):
         if total == 0:
             return 0
         return round((self.registros_importados + self.registros_actualizados) / total * 100, 1)
+
+
+class SecuenciaDocumento(models.Model):
+    """
+    Último número asignado por prefijo de documento (OV, OP, OC, RP, FACT...).
+
+    Los números se reservan con un bloqueo de fila (select_for_update) sobre este
+    registro, ver services/document_services.py. ``empresa`` vacía indica una
+    secuencia global, usada para documentos cuyo número es único en toda la base.
+    """
+    empresa = models.ForeignKey(
+        'Empresa',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='secuencias_documento',
+    )
+    prefijo = models.CharField(max_length=10)
+    ultimo_numero = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Secuencia de Documento"
+        verbose_name_plural = "Secuencias de Documentos"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['empresa', 'prefijo'], name='secuencia_documento_empresa_prefijo'
+            ),
+            models.UniqueConstraint(
+                fields=['prefijo'],
+                condition=models.Q(empresa__isnull=True),
+                name='secuencia_documento_global_prefijo',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.prefijo}: {self.ultimo_numero}"
@@ -0,0 +1,72 @@
+"""
+Reserva y consumo de insumos de una Orden de Producción.
+
+Reemplaza el descuento insumo por insumo (leer ``stock`` y luego ``UPDATE``) por
+una operación de todo o nada sobre el depósito de la OP: arma los requerimientos
+del BOM (agrupados por insumo) y los descuenta en una unidad de trabajo del libro
+de stock (services/libro_stock.py). La escritura toma los bloqueos de todas las
+filas en orden fijo, así dos envíos concurrentes con componentes en común esperan
+en el mismo orden y no se producen deadlocks; y valida el BOM completo sobre las
+cantidades resultantes, así no hay sobreventa: si falta algo no se descuenta nada.
+"""
+
+from .libro_stock import unidad_de_trabajo
+
+
+def requerimientos_op(op):
+    """
+    Cantidades de insumos que requiere la OP según el BOM del producto.
+
+    Returns:
+        dict: insumo_id -> (insumo, cantidad requerida).
+    """
+    from ..models import ComponenteProducto
+
+    requeridos = {}
+    componentes = ComponenteProducto.objects.filter(
+        producto_terminado_id=op.producto_a_producir_id
+    ).select_related("insumo")
+    for comp in componentes:
+        _, cantidad = requeridos.get(comp.insumo_id, (comp.insumo, 0))
+        requeridos[comp.insumo_id] = (
+            comp.insumo,
+            cantidad + comp.cantidad_necesaria * op.cantidad_a_producir,
+        )
+    return requeridos
+
+
+def consumir_insumos_op(op, usuario=None, deposito_id=None):
+    """
+    Descuenta del depósito los insumos del BOM de la OP, todo o nada.
+
+    Args:
+        op: OrdenProduccion con ``producto_a_producir``.
+        usuario: Usuario que registra el envío (para los movimientos).
+        deposito_id: Depósito del que se descuenta (por defecto, el del producto
+            de la OP; si el producto no tiene, el de cada insumo).
+
+    Returns:
+        dict: insumo_id -> cantidad descontada.
+
+    Raises:
+        StockInsuficienteError: Si algún insumo no alcanza (no se descuenta nada).
+        ValueError: Si el producto no tiene BOM definido.
+    """
+    requeridos = requerimientos_op(op)
+    if not requeridos:
+        raise ValueError(
+            f"No hay BOM definido para el producto '{op.producto_a_producir.descripcion}'."
+        )
+    if deposito_id is None:
+        deposito_id = op.producto_a_producir.deposito_id
+
+    with unidad_de_trabajo(usuario=usuario) as uow:
+        for insumo, cantidad in requeridos.values():
+            uow.salida(
+                insumo,
+                deposito_id or insumo.deposito_id,
+                cantidad,
+                motivo=f"Envío de insumos a OP {op.numero_op}",
+            )
+
+    return {insumo_id: cantidad for insumo_id, (_, cantidad) in requeridos.items()}
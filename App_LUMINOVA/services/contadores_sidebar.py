@@ -0,0 +1,160 @@
+"""
+Contadores de notificaciones/badges del sidebar cacheados por (tenant, empresa, depósito).
+
+Los valores se guardan en la caché de Django bajo una clave que incluye el schema
+del tenant y una versión por empresa. Las señales de Orden, OrdenProduccion, Reportes, Insumo y de las tablas
+de stock incrementan esa versión al confirmarse la transacción (ver signals.py),
+con lo que la próxima lectura recalcula los contadores.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+
+from ..models import Insumo, Orden, OrdenProduccion, Reportes
+from ..utils import UMBRAL_STOCK_BAJO, clave_tenant
+
+ESTADOS_OC_EN_PROCESO = [
+    "APROBADA",
+    "ENVIADA_PROVEEDOR",
+    "EN_TRANSITO",
+    "RECIBIDA_PARCIAL",
+    "RECIBIDA_TOTAL",
+    "COMPLETADA",
+]
+
+# Red de seguridad ante escrituras que no disparan señales (QuerySet.update, bulk_*)
+CONTADORES_TIMEOUT = 300
+
+_CLAVE_VERSION = "luminova:contadores:version:{empresa}"
+_CLAVE_CONTADORES = "luminova:contadores:{empresa}:{version}:{deposito}"
+
+
+def _clave_version(empresa_id):
+    return clave_tenant(_CLAVE_VERSION.format(empresa=empresa_id or "todas"))
+
+
+def _version(empresa_id):
+    clave = _clave_version(empresa_id)
+    version = cache.get(clave)
+    if version is None:
+        version = 1
+        cache.add(clave, version, None)
+    return version
+
+
+def _incrementar_version(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 2, None)
+
+
+def invalidar_contadores(empresa_id=None):
+    """
+    Invalida los contadores de la empresa (y los de la vista sin empresa) al confirmar
+    la transacción en curso, para no cachear datos todavía no visibles.
+    """
+    # Las claves se resuelven ahora, con el schema del tenant que hizo la escritura
+    claves = [_clave_version(None)]
+    if empresa_id:
+        claves.append(_clave_version(empresa_id))
+
+    def _invalidar():
+        for clave in claves:
+            _incrementar_version(clave)
+
+    transaction.on_commit(_invalidar)
+
+
+def obtener_contadores(empresa=None, deposito_id=None):
+    """
+    Devuelve los contadores del sidebar para la empresa y el depósito seleccionado.
+
+    Args:
+        empresa: Empresa actual (None = sin filtro de empresa).
+        deposito_id: Depósito seleccionado en sesión; None o "-1" significa todos.
+    """
+    empresa_id = getattr(empresa, "pk", None)
+    if deposito_id in (None, "", "-1"):
+        deposito_id = None
+
+    clave = clave_tenant(_CLAVE_CONTADORES.format(
+        empresa=empresa_id or "todas", version=_version(empresa_id), deposito=deposito_id or "todos"
+    ))
+    contadores = cache.get(clave)
+    if contadores is None:
+        contadores = calcular_contadores(empresa, deposito_id)
+        cache.set(clave, contadores, CONTADORES_TIMEOUT)
+    return contadores
+
+
+def calcular_contadores(empresa=None, deposito_id=None):
+    """Calcula los contadores del sidebar directamente desde la base de datos."""
+    # Base querysets filtrados por empresa
+    base_reportes = Reportes.objects.all()
+    base_ops = OrdenProduccion.objects.all()
+    base_ordenes = Orden.objects.all()
+    base_insumos = Insumo.objects.all()
+
+    if empresa:
+        base_reportes = base_reportes.filter(empresa=empresa)
+        base_ops = base_ops.filter(empresa=empresa)
+        base_ordenes = base_ordenes.filter(empresa=empresa)
+        base_insumos = base_insumos.filter(empresa=empresa)
+
+    # Notificaciones de OPs con problemas
+    ops_con_problemas_count = (
+        base_reportes.filter(resuelto=False, orden_produccion_asociada__isnull=False)
+        .values("orden_produccion_asociada_id")
+        .distinct()
+        .count()
+    )
+
+    solicitudes = base_ops.filter(estado_op__nombre__iexact="Insumos Solicitados")
+    ocs_para_aprobar = base_ordenes.filter(tipo="compra", estado="BORRADOR")
+    ocs_en_transito = base_ordenes.filter(tipo="compra", estado="EN_TRANSITO")
+
+    # Solicitudes y OCs SOLO del depósito seleccionado
+    if deposito_id:
+        try:
+            solicitudes_insumos_count = solicitudes.filter(producto_a_producir__deposito_id=deposito_id).count()
+            ocs_para_aprobar_count = ocs_para_aprobar.filter(insumo_principal__deposito_id=deposito_id).count()
+            ocs_en_transito_count = ocs_en_transito.filter(insumo_principal__deposito_id=deposito_id).count()
+        except (ValueError, TypeError):
+            # Si deposito_id no es válido, usar totales de la empresa
+            deposito_id = None
+    if not deposito_id:
+        solicitudes_insumos_count = solicitudes.count()
+        ocs_para_aprobar_count = ocs_para_aprobar.count()
+        ocs_en_transito_count = ocs_en_transito.count()
+
+    # Excluimos los insumos que ya tienen una OC "en firme" (de la misma empresa)
+    insumos_con_oc_en_firme = base_ordenes.filter(
+        tipo="compra", estado__in=ESTADOS_OC_EN_PROCESO
+    ).values_list("insumo_principal_id", flat=True)
+
+    insumos_stock_bajo_count = (
+        base_insumos.filter(stock_total__lt=UMBRAL_STOCK_BAJO)
+        .exclude(id__in=insumos_con_oc_en_firme)
+        .count()
+    )
+
+    total_notificaciones = (
+        ops_con_problemas_count
+        + solicitudes_insumos_count
+        + ocs_para_aprobar_count
+        + ocs_en_transito_count
+        + insumos_stock_bajo_count
+    )
+
+    return {
+        "ops_con_problemas_count": ops_con_problemas_count,
+        "solicitudes_insumos_count": solicitudes_insumos_count,
+        "ocs_para_aprobar_count": ocs_para_aprobar_count,
+        "ocs_en_transito_count": ocs_en_transito_count,
+        "insumos_stock_bajo_count": insumos_stock_bajo_count,
+        "total_notificaciones": total_notificaciones,
+        # Para los badges de sidebar
+        "ocs_en_transito_count_sidebar": ocs_en_transito_count,
+        "solicitudes_insumos_count_sidebar": solicitudes_insumos_count,
+    }
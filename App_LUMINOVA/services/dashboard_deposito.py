@@ -0,0 +1,134 @@
+"""
+Métricas del dashboard global de depósitos (vista "todos los depósitos" del administrador).
+
+Todas las métricas por depósito se calculan con consultas agrupadas por depósito
+(GROUP BY deposito), por lo que la cantidad de consultas no depende de cuántos
+depósitos tenga la empresa.
+"""
+
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from ..models import Deposito, EstadoOrden, Insumo, Orden, OrdenProduccion, ProductoTerminado
+from ..utils import UMBRAL_STOCK_BAJO
+
+INSUMOS_CRITICOS_POR_DEPOSITO = 5
+
+
+def _conteos_por_deposito(queryset, campo_deposito="deposito_id", **extra):
+    """Devuelve {deposito_id: {alias: conteo}} a partir de un único GROUP BY."""
+    filas = queryset.order_by().values(campo_deposito).annotate(total=Count("id"), **extra)
+    return {fila[campo_deposito]: fila for fila in filas}
+
+
+def construir_dashboard_global(empresa=None, incluir_todas_las_empresas=False):
+    """
+    Construye el contexto del dashboard global de depósitos.
+
+    Args:
+        empresa: Empresa actual; si es None solo se muestran datos cuando
+            ``incluir_todas_las_empresas`` es True (superusuarios).
+        incluir_todas_las_empresas: Permite ver todas las empresas sin filtro.
+
+    Returns:
+        dict: Contexto listo para ``deposito/deposito_dashboard.html``.
+    """
+    if empresa:
+        base_insumos = Insumo.objects.filter(empresa=empresa)
+        base_productos = ProductoTerminado.objects.filter(empresa=empresa)
+        base_depositos = Deposito.objects.filter(empresa=empresa)
+        base_ordenes = Orden.objects.filter(empresa=empresa)
+        base_ops = OrdenProduccion.objects.filter(empresa=empresa)
+    elif incluir_todas_las_empresas:
+        base_insumos = Insumo.objects.all()
+        base_productos = ProductoTerminado.objects.all()
+        base_depositos = Deposito.objects.all()
+        base_ordenes = Orden.objects.all()
+        base_ops = OrdenProduccion.objects.all()
+    else:
+        base_insumos = Insumo.objects.none()
+        base_productos = ProductoTerminado.objects.none()
+        base_depositos = Deposito.objects.none()
+        base_ordenes = Orden.objects.none()
+        base_ops = OrdenProduccion.objects.none()
+
+    depositos = list(base_depositos)
+
+    # OCs en tránsito y por aprobar
+    ocs_en_transito = base_ordenes.filter(tipo="compra", estado="EN_TRANSITO").select_related(
+        "proveedor", "insumo_principal", "deposito"
+    )
+    ocs_por_aprobar = base_ordenes.filter(tipo="compra", estado="BORRADOR").select_related(
+        "proveedor", "insumo_principal", "deposito"
+    )
+    ocs_transito_por_deposito = _conteos_por_deposito(ocs_en_transito)
+
+    # Solicitudes de insumos pendientes (OPs)
+    estado_sol = EstadoOrden.objects.filter(nombre__iexact="Insumos Solicitados").first()
+    if estado_sol:
+        ops_solicitudes = base_ops.filter(estado_op=estado_sol).select_related("producto_a_producir__deposito")
+    else:
+        ops_solicitudes = OrdenProduccion.objects.none()
+    ops_por_deposito = _conteos_por_deposito(ops_solicitudes, "producto_a_producir__deposito_id")
+
+    # Totales y críticos de insumos/productos por depósito
+    insumos_por_deposito = _conteos_por_deposito(
+        base_insumos, criticos=Count("id", filter=Q(stock_total__lt=UMBRAL_STOCK_BAJO))
+    )
+    productos_por_deposito = _conteos_por_deposito(base_productos)
+
+    # Primeros insumos más críticos de cada depósito en una sola consulta
+    criticos_top = (
+        base_insumos.filter(deposito_id__in=[d.id for d in depositos], stock_total__lt=UMBRAL_STOCK_BAJO)
+        .annotate(
+            stock_calculado=F("stock_total"),
+            posicion=Window(
+                expression=RowNumber(),
+                partition_by=[F("deposito_id")],
+                order_by=[F("stock_total").asc(), F("id").asc()],
+            ),
+        )
+        .filter(posicion__lte=INSUMOS_CRITICOS_POR_DEPOSITO)
+        .order_by("deposito_id", "posicion")
+    )
+    criticos_por_deposito = {}
+    for insumo in criticos_top:
+        criticos_por_deposito.setdefault(insumo.deposito_id, []).append(insumo)
+
+    depositos_con_stock_critico = []
+    depositos_resumen = []
+    for deposito in depositos:
+        conteo_insumos = insumos_por_deposito.get(deposito.id, {})
+        criticos = conteo_insumos.get("criticos", 0)
+        if criticos:
+            depositos_con_stock_critico.append({
+                "deposito": deposito,
+                "insumos_criticos_count": criticos,
+                "insumos_criticos": criticos_por_deposito.get(deposito.id, []),
+            })
+        depositos_resumen.append({
+            "deposito": deposito,
+            "ocs_en_transito": ocs_transito_por_deposito.get(deposito.id, {}).get("total", 0),
+            "ops_solicitando": ops_por_deposito.get(deposito.id, {}).get("total", 0),
+            "insumos_criticos": criticos,
+            "total_insumos": conteo_insumos.get("total", 0),
+            "total_productos": productos_por_deposito.get(deposito.id, {}).get("total", 0),
+        })
+
+    return {
+        "deposito": None,
+        "insumos_count": sum(fila["total"] for fila in insumos_por_deposito.values()),
+        "productos_count": sum(fila["total"] for fila in productos_por_deposito.values()),
+        "depositos_count": len(depositos),
+        "dashboard_global": True,
+        # Información detallada global
+        "ocs_en_transito_count": sum(fila["total"] for fila in ocs_transito_por_deposito.values()),
+        "ocs_en_transito_list": ocs_en_transito[:10],  # Primeras 10
+        "ops_solicitudes_count": sum(fila["total"] for fila in ops_por_deposito.values()),
+        "ops_solicitudes_list": ops_solicitudes[:10],  # Primeras 10
+        "ocs_por_aprobar_count": ocs_por_aprobar.count(),
+        "ocs_por_aprobar_list": ocs_por_aprobar[:10],  # Primeras 10
+        "depositos_con_stock_critico": depositos_con_stock_critico,
+        "depositos_resumen": depositos_resumen,
+        "umbral_stock_bajo": UMBRAL_STOCK_BAJO,
+    }
@@ -1,25 +1,111 @@
+from typing import List, Optional
+
+from django.db import IntegrityError, transaction
 from django.db.models import Model
 
-def generar_siguiente_numero_documento(model: Model, prefix: str, field_name: str) -> str:
+
+def _formatear_numero(prefix: str, numero: int) -> str:
+    return f"{prefix}-{str(numero).zfill(5)}"
+
+
+def _maximo_numero_existente(model: Model, prefix: str, field_name: str, empresa=None) -> int:
+    """
+    Mayor número ya usado con el prefijo dado. Solo se consulta al crear la secuencia,
+    para continuar la numeración de los documentos existentes.
+    """
+    queryset = model.objects.filter(**{f"{field_name}__startswith": f"{prefix}-"})
+    if empresa is not None:
+        queryset = queryset.filter(empresa=empresa)
+
+    maximo = 0
+    for valor in queryset.values_list(field_name, flat=True).iterator():
+        sufijo = valor[len(prefix) + 1:]
+        if sufijo.isdigit():
+            maximo = max(maximo, int(sufijo))
+    return maximo
+
+
+def _obtener_secuencia_bloqueada(model: Model, prefix: str, field_name: str, empresa=None):
+    """Devuelve la secuencia (empresa, prefijo) bloqueada con SELECT ... FOR UPDATE."""
+    from ..models import SecuenciaDocumento
+
+    secuencias = SecuenciaDocumento.objects.select_for_update()
+    filtro = {"empresa": empresa, "prefijo": prefix}
+    secuencia = secuencias.filter(**filtro).first()
+    if secuencia is not None:
+        return secuencia
+
+    try:
+        with transaction.atomic():
+            SecuenciaDocumento.objects.create(
+                ultimo_numero=_maximo_numero_existente(model, prefix, field_name, empresa),
+                **filtro,
+            )
+    except IntegrityError:
+        pass  # Otro proceso la creó al mismo tiempo
+    return secuencias.get(**filtro)
+
+
+def reservar_numeros_documento(
+    model: Model, prefix: str, field_name: str, cantidad: int = 1, empresa=None
+) -> List[str]:
     """
-    Genera el siguiente número de documento secuencial para un modelo dado.
+    Reserva ``cantidad`` números de documento consecutivos.
+
+    La reserva es un único incremento sobre la fila de la secuencia, bloqueada hasta
+    el fin de la transacción, por lo que dos usuarios nunca obtienen el mismo número.
+    Si la transacción que reservó se revierte, los números vuelven a estar disponibles.
+
+    Args:
+        model: La clase del modelo de Django (ej: OrdenProduccion).
+        prefix: El prefijo para el número (ej: 'OP').
+        field_name: El nombre del campo que almacena el número (ej: 'numero_op').
+        cantidad: Cantidad de números a reservar (ej: una OP por ítem de una OV).
+        empresa: Empresa de la secuencia; None para documentos con número único global.
+
+    Returns:
+        Lista de números (ej: ['OP-00005', 'OP-00006']).
+    """
+    if cantidad < 1:
+        return []
+
+    with transaction.atomic():
+        secuencia = _obtener_secuencia_bloqueada(model, prefix, field_name, empresa)
+        inicio = secuencia.ultimo_numero + 1
+        secuencia.ultimo_numero += cantidad
+        secuencia.save(update_fields=["ultimo_numero"])
+
+    return [_formatear_numero(prefix, numero) for numero in range(inicio, inicio + cantidad)]
+
+
+def generar_siguiente_numero_documento(model: Model, prefix: str, field_name: str, empresa=None) -> str:
+    """
+    Reserva y devuelve el siguiente número de documento secuencial para un modelo dado.
 
     Args:
         model: La clase del modelo de Django (ej: OrdenVenta).
         prefix: El prefijo para el número (ej: 'OV').
         field_name: El nombre del campo que almacena el número (ej: 'numero_ov').
+        empresa: Empresa de la secuencia; None para documentos con número único global.
 
     Returns:
         Una cadena con el nuevo número de documento único (ej: 'OV-00005').
     """
-    
-    last_item = model.objects.order_by('id').last()
-    next_id = (last_item.id + 1) if last_item else 1
+    return reservar_numeros_documento(model, prefix, field_name, 1, empresa)[0]
 
-    while True:
-        # Crea un diccionario para el filtro dinámico
-        filter_kwargs = {f"{field_name}__exact": f"{prefix}-{str(next_id).zfill(5)}"}
 
-        if not model.objects.filter(**filter_kwargs).exists():
-            return f"{prefix}-{str(next_id).zfill(5)}"
-        next_id += 1
\ No newline at end of file
+def previsualizar_numero_documento(model: Model, prefix: str, field_name: str, empresa=None) -> str:
+    """
+    Número que probablemente se asigne al próximo documento, sin reservarlo.
+    Sirve para mostrarlo en formularios; el número definitivo se reserva al guardar.
+    """
+    from ..models import SecuenciaDocumento
+
+    ultimo: Optional[int] = (
+        SecuenciaDocumento.objects.filter(empresa=empresa, prefijo=prefix)
+        .values_list("ultimo_numero", flat=True)
+        .first()
+    )
+    if ultimo is None:
+        ultimo = _maximo_numero_existente(model, prefix, field_name, empresa)
+    return _formatear_numero(prefix, ultimo + 1)
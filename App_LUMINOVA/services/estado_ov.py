@@ -0,0 +1,210 @@
+"""
+Derivación del estado de las Órdenes de Venta a partir de sus Órdenes de Producción.
+
+Cuando cambia una OP, la OV de origen se marca como pendiente de recálculo y el
+recálculo se ejecuta una sola vez por OV al confirmarse la transacción, aunque en
+la misma transacción se hayan guardado varias OPs de esa OV.
+
+El cálculo es por lotes: una consulta con agregación condicional agrupada por
+``orden_venta_origen`` resume las OPs de muchas OVs a la vez y solo las OVs cuyo
+estado cambia se escriben, con ``bulk_update``.
+"""
+
+import logging
+from threading import local
+
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Max, Q, Value, When
+
+logger = logging.getLogger(__name__)
+
+# Mapeo de estados de OP a estados de OV y su prioridad
+MAPEO_ESTADOS_OP_A_OV = {
+    "Completada": "COMPLETADA",
+    "En Proceso": "PRODUCCION_INICIADA",
+    "Producción Iniciada": "PRODUCCION_INICIADA",
+    "Insumos Recibidos": "INSUMOS_SOLICITADOS",
+    "Insumos Solicitados": "INSUMOS_SOLICITADOS",
+    "Planificada": "CONFIRMADA",
+    "Pendiente": "PENDIENTE",
+    "Cancelada": "CANCELADA",
+}
+
+ESTADOS_PRIORIDAD = {
+    "COMPLETADA": 6,
+    "LISTA_ENTREGA": 5,
+    "PRODUCCION_INICIADA": 4,
+    "INSUMOS_SOLICITADOS": 3,
+    "CONFIRMADA": 2,
+    "PENDIENTE": 1,
+    "CANCELADA": 0,
+}
+
+ESTADO_POR_PRIORIDAD = {prioridad: estado for estado, prioridad in ESTADOS_PRIORIDAD.items()}
+
+TAMANO_LOTE = 1000
+
+_pendientes = local()
+
+
+def _ovs_pendientes():
+    if not hasattr(_pendientes, "ids"):
+        _pendientes.ids = set()
+    return _pendientes.ids
+
+
+def programar_recalculo_estado_ov(ov_id):
+    """Agenda el recálculo del estado de la OV para el commit de la transacción en curso."""
+    if not ov_id:
+        return
+    _ovs_pendientes().add(ov_id)
+    # Cada callback procesa todo lo pendiente; los siguientes encuentran el conjunto vacío.
+    transaction.on_commit(recalcular_estados_pendientes)
+
+
+def recalcular_estados_pendientes():
+    """Recalcula el estado de las OVs agendadas en este hilo."""
+    pendientes = _ovs_pendientes()
+    if not pendientes:
+        return
+    ov_ids = list(pendientes)
+    pendientes.clear()
+    try:
+        recalcular_estados_ov(ov_ids)
+    except Exception as e:
+        logger.error(f"Error actualizando estado de OVs {ov_ids}: {e}")
+
+
+def recalcular_estados_ov(ov_ids, tamano_lote=TAMANO_LOTE):
+    """
+    Recalcula y persiste el estado de las OVs indicadas según sus OPs.
+
+    Returns:
+        int: Cantidad de OVs cuyo estado cambió.
+    """
+    ov_ids = list(ov_ids)
+    actualizadas = 0
+    for inicio in range(0, len(ov_ids), tamano_lote):
+        actualizadas += _recalcular_lote(ov_ids[inicio:inicio + tamano_lote])
+    return actualizadas
+
+
+def sincronizar_todas_las_ov(empresa=None, tamano_lote=TAMANO_LOTE):
+    """Recalcula el estado de todas las OVs (opcionalmente de una empresa) por lotes."""
+    from ..models import OrdenVenta
+
+    ovs = OrdenVenta.objects.order_by("id")
+    if empresa is not None:
+        ovs = ovs.filter(empresa=empresa)
+
+    actualizadas = 0
+    lote = []
+    for ov_id in ovs.values_list("id", flat=True).iterator(chunk_size=tamano_lote):
+        lote.append(ov_id)
+        if len(lote) == tamano_lote:
+            actualizadas += _recalcular_lote(lote)
+            lote = []
+    if lote:
+        actualizadas += _recalcular_lote(lote)
+    return actualizadas
+
+
+def resumir_ops_por_ov(ov_ids):
+    """
+    Resume las OPs de las OVs indicadas en una única consulta agrupada.
+
+    Returns:
+        dict: {ov_id: {"total", "completadas", "canceladas", "prioridad_max", "prioridad_max_activa"}}
+    """
+    from ..models import OrdenProduccion
+
+    prioridad_op = Case(
+        *[
+            When(estado_op__nombre=nombre_op, then=Value(ESTADOS_PRIORIDAD[estado_ov]))
+            for nombre_op, estado_ov in MAPEO_ESTADOS_OP_A_OV.items()
+        ],
+        output_field=IntegerField(),
+    )
+    no_terminada = ~Q(estado_op__nombre__in=["Completada", "Cancelada"])
+
+    filas = (
+        OrdenProduccion.objects.filter(
+            orden_venta_origen_id__in=ov_ids,
+            estado_op__nombre__in=list(MAPEO_ESTADOS_OP_A_OV),
+        )
+        .order_by()
+        .values("orden_venta_origen_id")
+        .annotate(
+            total=Count("id"),
+            completadas=Count("id", filter=Q(estado_op__nombre="Completada")),
+            canceladas=Count("id", filter=Q(estado_op__nombre="Cancelada")),
+            prioridad_max=Max(prioridad_op),
+            prioridad_max_activa=Max(prioridad_op, filter=no_terminada),
+        )
+    )
+    return {fila.pop("orden_venta_origen_id"): fila for fila in filas}
+
+
+def derivar_estado_ov(estado_actual, resumen):
+    """
+    Calcula el nuevo estado de una OV a partir del resumen de sus OPs.
+
+    Lógica para estados mixtos:
+    - Si todas las OPs están canceladas -> CANCELADA
+    - Si todas las OPs activas están completadas -> LISTA_ENTREGA
+    - Si hay OPs completadas y otras pendientes/en proceso -> el estado más avanzado
+      de las no completadas (sin degradar una OV ya COMPLETADA)
+    - Si ninguna está completada -> el estado más avanzado
+
+    Returns:
+        str | None: El nuevo estado, o None si no corresponde cambiarlo.
+    """
+    total_ops = resumen["total"]
+    ops_completadas = resumen["completadas"]
+    ops_canceladas = resumen["canceladas"]
+    ops_activas = total_ops - ops_canceladas
+
+    nuevo_estado = None
+    if not total_ops:
+        return None
+    if ops_canceladas == total_ops:
+        nuevo_estado = "CANCELADA"
+    elif ops_completadas == ops_activas and ops_activas > 0:
+        nuevo_estado = "LISTA_ENTREGA"
+    elif ops_completadas > 0 and ops_activas > ops_completadas:
+        if estado_actual == "COMPLETADA":
+            logger.warning("OV COMPLETADA con OPs pendientes: se mantiene el estado")
+            return None
+        prioridad = resumen["prioridad_max_activa"]
+        nuevo_estado = ESTADO_POR_PRIORIDAD.get(prioridad, "PRODUCCION_INICIADA")
+    else:
+        nuevo_estado = ESTADO_POR_PRIORIDAD.get(resumen["prioridad_max"])
+
+    # Solo actualizar si el estado cambió y no degrada el progreso
+    if (
+        nuevo_estado
+        and nuevo_estado != estado_actual
+        and ESTADOS_PRIORIDAD.get(nuevo_estado, 0) >= ESTADOS_PRIORIDAD.get(estado_actual, 0)
+    ):
+        return nuevo_estado
+    return None
+
+
+def _recalcular_lote(ov_ids):
+    from ..models import OrdenVenta
+
+    resumenes = resumir_ops_por_ov(ov_ids)
+    if not resumenes:
+        return 0
+
+    cambiadas = []
+    for ov in OrdenVenta.objects.filter(id__in=list(resumenes)).only("id", "numero_ov", "estado"):
+        nuevo_estado = derivar_estado_ov(ov.estado, resumenes[ov.id])
+        if nuevo_estado:
+            logger.info(f"OV {ov.numero_ov}: Estado actualizado de {ov.estado} a {nuevo_estado}")
+            ov.estado = nuevo_estado
+            cambiadas.append(ov)
+
+    if cambiadas:
+        OrdenVenta.objects.bulk_update(cambiadas, ["estado"])
+    return len(cambiadas)
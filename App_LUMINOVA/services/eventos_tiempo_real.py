@@ -0,0 +1,161 @@
+"""
+Eventos en tiempo real (Server-Sent Events) por (tenant, empresa, grupo de notificación).
+
+Un bus de publicación/suscripción en memoria del proceso reemplaza el polling de
+cada pestaña por una conexión SSE ociosa:
+
+- ``NotificationService`` publica las notificaciones nuevas, el feed publica sus
+  invalidaciones y las escrituras de stock publican los cambios; siempre al
+  confirmarse la transacción (``publicar_al_confirmar``).
+- Cada canal guarda los últimos ``HISTORIAL_POR_CANAL`` eventos. Al reconectarse,
+  el navegador envía ``Last-Event-ID`` y se le reenvía lo que se perdió; si el
+  cursor es más viejo que el historial recibe un evento ``resincronizar``.
+- Los canales llevan el schema del tenant: los ids de empresa se repiten entre
+  schemas y la vista sin empresa es común a todas las del tenant.
+- Los ids arrancan en el timestamp en milisegundos del arranque del proceso, así un
+  cursor anterior a un reinicio sigue siendo menor que los ids nuevos.
+
+El bus vive en el proceso: con varios workers ASGI cada uno tiene el suyo y solo
+ve los eventos publicados en él (para escalar haría falta un bus compartido).
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.db import connection, transaction
+
+HISTORIAL_POR_CANAL = 200
+KEEPALIVE_SEGUNDOS = 15
+REINTENTO_MS = 5000
+
+# Grupos que reciben los cambios de stock
+GRUPOS_STOCK = ("deposito", "compras", "produccion", "administrador")
+
+
+def canales(schema, empresa_id, grupos):
+    """Canales de los grupos en la empresa del tenant (``None``: vista sin empresa)."""
+    return [(schema, empresa_id or None, grupo) for grupo in grupos]
+
+
+class BusEventos:
+    """Pub/sub en memoria con historial acotado por canal."""
+
+    def __init__(self, historial=HISTORIAL_POR_CANAL):
+        self._lock = threading.Lock()
+        self._secuencia = itertools.count(int(time.time() * 1000))
+        self._historial = defaultdict(lambda: deque(maxlen=historial))
+        self._suscriptores = defaultdict(set)
+
+    def publicar(self, canales, tipo, datos):
+        """
+        Publica un evento en los canales (se puede llamar desde cualquier hilo).
+
+        Returns:
+            int: Id del evento.
+        """
+        with self._lock:
+            evento = {"id": next(self._secuencia), "tipo": tipo, "datos": datos}
+            destinos = set()
+            for canal in set(canales):
+                self._historial[canal].append(evento)
+                destinos |= self._suscriptores.get(canal, set())
+        for loop, cola in destinos:
+            try:
+                loop.call_soon_threadsafe(cola.put_nowait, evento)
+            except RuntimeError:
+                # El loop del suscriptor ya cerró; se desuscribe al terminar su flujo
+                pass
+        return evento["id"]
+
+    def suscribir(self, canales, desde_id=None):
+        """
+        Registra un suscriptor en el loop actual.
+
+        Returns:
+            tuple: (suscriptor, eventos a reenviar desde ``desde_id``, si hay que resincronizar)
+        """
+        suscriptor = (asyncio.get_running_loop(), asyncio.Queue())
+        pendientes = {}
+        resincronizar = False
+        with self._lock:
+            for canal in canales:
+                self._suscriptores[canal].add(suscriptor)
+                if desde_id is None:
+                    continue
+                historial = self._historial.get(canal)
+                if not historial:
+                    continue
+                if len(historial) == historial.maxlen and historial[0]["id"] > desde_id + 1:
+                    resincronizar = True
+                for evento in historial:
+                    if evento["id"] > desde_id:
+                        pendientes[evento["id"]] = evento
+        return suscriptor, [pendientes[i] for i in sorted(pendientes)], resincronizar
+
+    def desuscribir(self, suscriptor, canales):
+        with self._lock:
+            for canal in canales:
+                suscriptores = self._suscriptores.get(canal)
+                if suscriptores is not None:
+                    suscriptores.discard(suscriptor)
+                    if not suscriptores:
+                        del self._suscriptores[canal]
+
+
+bus = BusEventos()
+
+
+def publicar_al_confirmar(empresa_id, grupos, tipo, datos):
+    """
+    Publica el evento al confirmarse la transacción en curso, en los canales de la
+    empresa y en los de la vista sin empresa, dentro del tenant actual.
+    """
+    schema = getattr(connection, "schema_name", "public")
+    destinos = canales(schema, empresa_id, grupos)
+    if empresa_id:
+        destinos += canales(schema, None, grupos)
+    transaction.on_commit(lambda: bus.publicar(destinos, tipo, datos))
+
+
+def publicar_cambios_stock(empresa_id, items):
+    """
+    Publica un evento ``stock`` con los cambios dados al confirmar.
+
+    Args:
+        items: dicts con ``tipo`` ("insumo" o "producto"), ``id``, ``deposito_id``
+            y ``cantidad``.
+    """
+    if items:
+        publicar_al_confirmar(empresa_id, GRUPOS_STOCK, "stock", {"items": list(items)})
+
+
+def formatear_evento(evento):
+    datos = json.dumps(evento["datos"], ensure_ascii=False, default=str)
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {datos}\n\n"
+
+
+async def flujo_eventos(canales, desde_id=None, keepalive=KEEPALIVE_SEGUNDOS, bus_eventos=None):
+    """Generador asíncrono del cuerpo SSE para los canales dados."""
+    bus_eventos = bus_eventos or bus
+    suscriptor, pendientes, resincronizar = bus_eventos.suscribir(canales, desde_id)
+    _, cola = suscriptor
+    try:
+        yield f"retry: {REINTENTO_MS}\n\n"
+        if resincronizar:
+            yield formatear_evento({"id": pendientes[0]["id"] - 1, "tipo": "resincronizar", "datos": {}})
+        for evento in pendientes:
+            yield formatear_evento(evento)
+        while True:
+            try:
+                evento = await asyncio.wait_for(cola.get(), keepalive)
+            except asyncio.TimeoutError:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ": keepalive\n\n"
+                continue
+            yield formatear_evento(evento)
+    finally:
+        bus_eventos.desuscribir(suscriptor, canales)
@@ -0,0 +1,342 @@
+"""
+Stock a una fecha pasada a partir del libro de movimientos (MovimientoStock).
+
+Las tablas de stock por depósito solo guardan el presente. Para responder "¿cuánto
+había el 31/03?" sin recorrer todo el libro:
+
+- ``generar_snapshots`` (comando ``generar_snapshots_stock``, pensado para correr
+  una vez por día) guarda un SnapshotStock por cada día cerrado con movimientos.
+  Es incremental: parte del último snapshot, que hace de punto de control, y
+  procesa solo los movimientos posteriores a su corte. La primera corrida crea la
+  línea de base desde el stock actual, descontando lo movido después del corte,
+  así el stock cargado antes de existir el libro también queda incluido.
+- ``stock_a_fecha`` parte del último snapshot anterior al momento pedido y suma
+  solo el delta de movimientos entre su corte y ese momento. Si el momento es
+  anterior a todos los snapshots, retrocede desde el primero (o desde el stock
+  actual si todavía no hay ninguno).
+
+El delta se agrega en la base (una fila por tipo, ítem y depósitos), de modo que
+el costo depende de la cantidad de ítems y no de la de movimientos: una
+valorización de fin de mes lee un snapshot y un puñado de filas agrupadas.
+
+Solo se pueden reproducir las escrituras de stock registradas en el libro
+(services/libro_stock.py).
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+CAMPOS_ITEM = ("insumo", "producto")
+
+_CAMPOS_DELTA = (
+    "tipo",
+    "insumo_id",
+    "producto_id",
+    "insumo_destino_id",
+    "producto_destino_id",
+    "deposito_origen_id",
+    "deposito_destino_id",
+)
+
+
+def corte_del_dia(fecha):
+    """Instante en que termina ``fecha`` (zona horaria del sistema)."""
+    return timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min))
+
+
+def _delta_agrupado(movimientos, *agrupar):
+    """Suma las cantidades en la base por tipo, ítem y depósitos."""
+    # order_by() descarta el ordering por fecha, que rompería la agrupación
+    return (
+        movimientos.order_by()
+        .values(*agrupar, *_CAMPOS_DELTA)
+        .annotate(total=Sum("cantidad"), movimientos=Count("id"))
+    )
+
+
+def _aplicar_fila(cantidades, fila, signo=1):
+    """Suma (o resta, con ``signo=-1``) una fila de ``_delta_agrupado``."""
+    campo = next((campo for campo in CAMPOS_ITEM if fila[f"{campo}_id"] is not None), None)
+    if campo is None:
+        return
+    item_id = fila[f"{campo}_id"]
+    total = fila["total"] * signo
+    if fila["tipo"] in ("salida", "transferencia") and fila["deposito_origen_id"]:
+        cantidades[(campo, item_id, fila["deposito_origen_id"])] -= total
+    if fila["tipo"] in ("entrada", "transferencia") and fila["deposito_destino_id"]:
+        # Las transferencias a una copia del ítem registran qué ítem recibió el stock
+        item_destino_id = fila[f"{campo}_destino_id"] or item_id
+        cantidades[(campo, item_destino_id, fila["deposito_destino_id"])] += total
+
+
+def _movimientos_empresa(empresa_id, tipo_item=None, deposito_id=None, item_id=None):
+    from ..models import MovimientoStock
+
+    movimientos = MovimientoStock.objects.filter(empresa_id=empresa_id)
+    if tipo_item:
+        movimientos = movimientos.filter(**{f"{tipo_item}__isnull": False})
+    if item_id:
+        movimientos = movimientos.filter(
+            Q(**{f"{tipo_item}_id": item_id}) | Q(**{f"{tipo_item}_destino_id": item_id})
+        )
+    if deposito_id:
+        movimientos = movimientos.filter(
+            Q(deposito_origen_id=deposito_id) | Q(deposito_destino_id=deposito_id)
+        )
+    return movimientos
+
+
+def _cantidades_snapshot(snapshot, tipo_item=None, deposito_id=None, item_id=None):
+    lineas = snapshot.lineas.all()
+    if tipo_item:
+        lineas = lineas.filter(**{f"{tipo_item}__isnull": False})
+    if item_id:
+        lineas = lineas.filter(**{f"{tipo_item}_id": item_id})
+    if deposito_id:
+        lineas = lineas.filter(deposito_id=deposito_id)
+
+    cantidades = defaultdict(int)
+    for insumo_id, producto_id, deposito, cantidad in lineas.values_list(
+        "insumo_id", "producto_id", "deposito_id", "cantidad"
+    ):
+        if insumo_id is not None:
+            cantidades[("insumo", insumo_id, deposito)] = cantidad
+        else:
+            cantidades[("producto", producto_id, deposito)] = cantidad
+    return cantidades
+
+
+def _cantidades_actuales(empresa_id, tipo_item=None, deposito_id=None, item_id=None):
+    from ..models import Insumo, ProductoTerminado
+
+    cantidades = defaultdict(int)
+    for modelo in (Insumo, ProductoTerminado):
+        campo = modelo.STOCK_ITEM_FIELD
+        if tipo_item and campo != tipo_item:
+            continue
+        filas = modelo.get_stock_model().objects.filter(deposito__empresa_id=empresa_id)
+        if deposito_id:
+            filas = filas.filter(deposito_id=deposito_id)
+        if item_id:
+            filas = filas.filter(**{f"{campo}_id": item_id})
+        for item, deposito, cantidad in filas.values_list(f"{campo}_id", "deposito_id", "cantidad"):
+            cantidades[(campo, item, deposito)] = cantidad
+    return cantidades
+
+
+def stock_a_fecha(empresa_id, momento, tipo_item=None, deposito_id=None, item_id=None):
+    """
+    Stock por (ítem, depósito) de la empresa en ``momento``: el resultado de los
+    movimientos registrados antes de ese instante.
+
+    Args:
+        momento: datetime con zona horaria (para el cierre de un día, usar
+            ``corte_del_dia``).
+        tipo_item: "insumo" o "producto" para limitar la consulta (opcional).
+        deposito_id: Depósito al que limitar la consulta (opcional).
+        item_id: Ítem al que limitar la consulta (opcional, requiere ``tipo_item``).
+
+    Returns:
+        dict: ``cantidades`` ({(tipo_item, item_id, deposito_id): cantidad}, sin
+        ceros), ``snapshot`` (SnapshotStock de partida, o None si se partió del
+        stock actual) y ``movimientos`` (cantidad de movimientos reproducidos).
+    """
+    from ..models import SnapshotStock
+
+    snapshots = SnapshotStock.objects.filter(empresa_id=empresa_id)
+    movimientos = _movimientos_empresa(empresa_id, tipo_item, deposito_id, item_id)
+
+    base = snapshots.filter(fecha_corte__lte=momento).order_by("-fecha_corte").first()
+    if base is not None:
+        cantidades = _cantidades_snapshot(base, tipo_item, deposito_id, item_id)
+        delta, signo = movimientos.filter(fecha__gte=base.fecha_corte, fecha__lt=momento), 1
+    else:
+        # Momento anterior a todos los snapshots: se retrocede desde el primero
+        base = snapshots.order_by("fecha_corte").first()
+        if base is not None:
+            cantidades = _cantidades_snapshot(base, tipo_item, deposito_id, item_id)
+            delta = movimientos.filter(fecha__gte=momento, fecha__lt=base.fecha_corte)
+        else:
+            cantidades = _cantidades_actuales(empresa_id, tipo_item, deposito_id, item_id)
+            delta = movimientos.filter(fecha__gte=momento)
+        signo = -1
+
+    reproducidos = 0
+    for fila in _delta_agrupado(delta):
+        _aplicar_fila(cantidades, fila, signo)
+        reproducidos += fila["movimientos"]
+
+    return {
+        "momento": momento,
+        "snapshot": base,
+        "movimientos": reproducidos,
+        "cantidades": {
+            clave: cantidad
+            for clave, cantidad in cantidades.items()
+            if cantidad
+            and (deposito_id is None or clave[2] == deposito_id)
+            and (item_id is None or clave[1] == item_id)
+        },
+    }
+
+
+def _guardar_snapshot(empresa_id, fecha, cantidades, movimientos_procesados):
+    from ..models import SnapshotStock, SnapshotStockLinea
+
+    snapshot = SnapshotStock.objects.create(
+        empresa_id=empresa_id,
+        fecha=fecha,
+        fecha_corte=corte_del_dia(fecha),
+        movimientos_procesados=movimientos_procesados,
+    )
+    SnapshotStockLinea.objects.bulk_create(
+        [
+            SnapshotStockLinea(snapshot=snapshot, deposito_id=deposito_id, cantidad=cantidad, **{f"{campo}_id": item_id})
+            for (campo, item_id, deposito_id), cantidad in sorted(cantidades.items())
+            if cantidad
+        ],
+        batch_size=1000,
+    )
+    return snapshot
+
+
+@transaction.atomic
+def _generar_snapshots_empresa(empresa_id, hasta):
+    from ..models import SnapshotStock
+
+    resumen = {"empresa_id": empresa_id, "fechas": [], "movimientos": 0}
+    movimientos = _movimientos_empresa(empresa_id)
+    ultimo = SnapshotStock.objects.filter(empresa_id=empresa_id).order_by("-fecha").first()
+
+    if ultimo is None:
+        # Línea de base: el stock actual sin lo movido después del corte
+        cantidades = _cantidades_actuales(empresa_id)
+        for fila in _delta_agrupado(movimientos.filter(fecha__gte=corte_del_dia(hasta))):
+            _aplicar_fila(cantidades, fila, signo=-1)
+        _guardar_snapshot(empresa_id, hasta, cantidades, 0)
+        resumen["fechas"].append(hasta)
+        return resumen
+
+    if ultimo.fecha >= hasta:
+        return resumen
+
+    # Solo los movimientos posteriores al punto de control, agrupados por día
+    pendientes = movimientos.filter(
+        fecha__gte=ultimo.fecha_corte, fecha__lt=corte_del_dia(hasta)
+    ).annotate(dia=TruncDate("fecha"))
+    por_dia = defaultdict(list)
+    for fila in _delta_agrupado(pendientes, "dia"):
+        por_dia[fila["dia"]].append(fila)
+
+    cantidades = _cantidades_snapshot(ultimo)
+    for dia in sorted(por_dia):
+        for fila in por_dia[dia]:
+            _aplicar_fila(cantidades, fila)
+        procesados = sum(fila["movimientos"] for fila in por_dia[dia])
+        _guardar_snapshot(empresa_id, dia, cantidades, procesados)
+        resumen["fechas"].append(dia)
+        resumen["movimientos"] += procesados
+    return resumen
+
+
+def generar_snapshots(empresa_id=None, hasta=None):
+    """
+    Genera los snapshots diarios pendientes de cada empresa.
+
+    Los días sin movimientos no generan snapshot: su stock es el del último
+    snapshot anterior.
+
+    Args:
+        empresa_id: Empresa a procesar (por defecto, todas).
+        hasta: Último día a cerrar (por defecto, ayer). Debe ser un día terminado.
+
+    Returns:
+        list: Un dict por empresa con ``empresa_id``, ``fechas`` (snapshots
+        creados) y ``movimientos`` (movimientos procesados).
+
+    Raises:
+        ValueError: Si ``hasta`` no es un día terminado.
+    """
+    from ..models import Empresa
+
+    hoy = timezone.localdate()
+    hasta = hasta or hoy - timedelta(days=1)
+    if hasta >= hoy:
+        raise ValueError("Solo se pueden cerrar días terminados.")
+
+    if empresa_id:
+        empresas = [empresa_id]
+    else:
+        empresas = list(Empresa.objects.order_by("id").values_list("id", flat=True))
+    return [_generar_snapshots_empresa(empresa, hasta) for empresa in empresas]
+
+
+def valorizar_stock(cantidades):
+    """
+    Detalle valorizado de las cantidades devueltas por ``stock_a_fecha``.
+
+    Los productos se valorizan a su precio unitario y los insumos al menor precio
+    de compra ofertado (índice de ofertas). Son los precios actuales: no se
+    guarda historial de precios.
+
+    Returns:
+        list: Un dict por línea con ``tipo_item``, ``item_id``, ``descripcion``,
+        ``deposito_id``, ``deposito``, ``cantidad``, ``costo_unitario`` y
+        ``valor``, ordenado por depósito, tipo y descripción.
+    """
+    from ..models import Deposito, Insumo, ProductoTerminado
+
+    ids = defaultdict(set)
+    for campo, item_id, _ in cantidades:
+        ids[campo].add(item_id)
+
+    items = {}
+    for item_id, descripcion, costo in Insumo.objects.filter(id__in=ids["insumo"]).values_list(
+        "id", "descripcion", "indice_ofertas__oferta_menor_precio__precio_unitario_compra"
+    ):
+        items[("insumo", item_id)] = (descripcion, costo)
+    for item_id, descripcion, costo in ProductoTerminado.objects.filter(id__in=ids["producto"]).values_list(
+        "id", "descripcion", "precio_unitario"
+    ):
+        items[("producto", item_id)] = (descripcion, costo)
+    depositos = dict(
+        Deposito.objects.filter(id__in={deposito_id for _, _, deposito_id in cantidades}).values_list("id", "nombre")
+    )
+
+    lineas = []
+    for (campo, item_id, deposito_id), cantidad in cantidades.items():
+        descripcion, costo = items.get((campo, item_id), (f"#{item_id} (eliminado)", None))
+        costo = costo or Decimal("0")
+        lineas.append({
+            "tipo_item": campo,
+            "item_id": item_id,
+            "descripcion": descripcion,
+            "deposito_id": deposito_id,
+            "deposito": depositos.get(deposito_id, ""),
+            "cantidad": cantidad,
+            "costo_unitario": costo,
+            "valor": costo * cantidad,
+        })
+    lineas.sort(key=lambda linea: (linea["deposito"], linea["tipo_item"], linea["descripcion"]))
+    return lineas
+
+
+def totales_por_deposito(lineas):
+    """Cantidad y valor totales por depósito de las líneas de ``valorizar_stock``."""
+    totales = {}
+    for linea in lineas:
+        total = totales.setdefault(linea["deposito_id"], {
+            "deposito_id": linea["deposito_id"],
+            "deposito": linea["deposito"],
+            "cantidad": 0,
+            "valor": Decimal("0"),
+        })
+        total["cantidad"] += linea["cantidad"]
+        total["valor"] += linea["valor"]
+    return list(totales.values())
@@ -0,0 +1,182 @@
+"""
+Kardex (ficha de stock) de un insumo o producto en un depósito.
+
+Lista en orden cronológico cada MovimientoStock que afecta al par (ítem, depósito)
+con su saldo acumulado, calculado en la base con una función de ventana
+(``SUM(delta) OVER (ORDER BY fecha, id)``):
+
+- el saldo inicial sale de ``stock_a_fecha`` (services/historico_stock.py), así que
+  incluye el stock cargado antes de existir el libro;
+- la paginación es por cursor (keyset) sobre (fecha, id) ascendente. El cursor
+  lleva también el saldo al final de la página, y la página siguiente arranca la
+  ventana desde ahí sin recalcular el saldo inicial: el costo de una página no
+  crece con la historia del ítem. El cursor va firmado (``django.core.signing``)
+  y atado al ítem, depósito y rango consultados, así que no se puede alterar el
+  saldo que transporta;
+- la exportación CSV recorre la consulta con ``iterator()`` (cursor del lado del
+  servidor en PostgreSQL) y escribe fila por fila en una respuesta en streaming,
+  con memoria constante aunque el kardex tenga cientos de miles de movimientos.
+"""
+
+import csv
+
+from django.core import signing
+from django.db.models import Case, F, Q, Sum, Value, When, Window
+from django.db.models.expressions import RowRange
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .historico_stock import stock_a_fecha
+
+TAMANO_PAGINA = 50
+
+_SAL_CURSOR = "luminova.kardex.cursor"
+
+ENCABEZADO_CSV = ["Fecha", "Tipo", "Motivo", "Origen", "Destino", "Entrada", "Salida", "Saldo", "Usuario"]
+
+
+def movimientos_kardex(modelo, item_id, deposito_id, desde=None, hasta=None):
+    """
+    Movimientos que afectan al ítem en el depósito, con ``delta`` (positivo si
+    entra, negativo si sale), en orden cronológico.
+
+    Args:
+        modelo: Insumo o ProductoTerminado.
+        desde, hasta: Rango [desde, hasta) de fechas con zona horaria (opcionales).
+    """
+    from ..models import MovimientoStock
+
+    campo = modelo.STOCK_ITEM_FIELD
+    # En las transferencias a una copia del ítem, el destino es ``<campo>_destino``
+    entra = Q(deposito_destino_id=deposito_id, tipo__in=("entrada", "transferencia")) & (
+        Q(**{f"{campo}_destino_id": item_id})
+        | Q(**{f"{campo}_destino__isnull": True, f"{campo}_id": item_id})
+    )
+    sale = Q(deposito_origen_id=deposito_id, tipo__in=("salida", "transferencia"), **{f"{campo}_id": item_id})
+
+    movimientos = MovimientoStock.objects.filter(entra | sale)
+    if desde:
+        movimientos = movimientos.filter(fecha__gte=desde)
+    if hasta:
+        movimientos = movimientos.filter(fecha__lt=hasta)
+    return (
+        movimientos.annotate(delta=Case(When(entra, then=F("cantidad")), default=-F("cantidad")))
+        .select_related("usuario", "deposito_origen", "deposito_destino")
+        .order_by("fecha", "id")
+    )
+
+
+def con_saldo(movimientos, saldo_base):
+    """Anota ``saldo``: ``saldo_base`` más la suma acumulada de ``delta`` (en SQL)."""
+    return movimientos.annotate(
+        saldo=Value(saldo_base) + Window(
+            Sum("delta"),
+            order_by=[F("fecha").asc(), F("id").asc()],
+            frame=RowRange(start=None, end=0),
+        )
+    )
+
+
+def saldo_inicial(modelo, item, deposito, desde=None):
+    """
+    Stock del ítem en el depósito al comienzo del kardex.
+
+    Returns:
+        tuple: (momento de inicio, saldo). Sin ``desde``, el kardex empieza en
+        el primer movimiento del ítem en el depósito.
+    """
+    if desde is None:
+        desde = movimientos_kardex(modelo, item.pk, deposito.pk).values_list("fecha", flat=True).first()
+        if desde is None:
+            desde = timezone.now()
+    campo = modelo.STOCK_ITEM_FIELD
+    cantidades = stock_a_fecha(
+        deposito.empresa_id, desde, tipo_item=campo, deposito_id=deposito.pk, item_id=item.pk
+    )["cantidades"]
+    return desde, cantidades.get((campo, item.pk, deposito.pk), 0)
+
+
+class CursorKardexInvalido(ValueError):
+    """El cursor no fue emitido para este kardex o fue alterado."""
+
+
+def alcance_kardex(modelo, item_id, deposito_id, desde=None, hasta=None):
+    """Identifica la consulta a la que pertenece un cursor (ítem, depósito y rango)."""
+    return ":".join([
+        modelo.STOCK_ITEM_FIELD, str(item_id), str(deposito_id),
+        desde.isoformat() if desde else "", hasta.isoformat() if hasta else "",
+    ])
+
+
+def codificar_cursor(movimiento, alcance):
+    datos = [movimiento.fecha.isoformat(), movimiento.id, movimiento.saldo]
+    return signing.dumps(datos, salt=f"{_SAL_CURSOR}:{alcance}")
+
+
+def decodificar_cursor(cursor, alcance):
+    """
+    Devuelve (fecha, id, saldo) del cursor.
+
+    Raises:
+        CursorKardexInvalido: Firma inválida, otro alcance o contenido mal formado.
+    """
+    try:
+        fecha, movimiento_id, saldo = signing.loads(cursor, salt=f"{_SAL_CURSOR}:{alcance}")
+        fecha = parse_datetime(fecha)
+        movimiento_id, saldo = int(movimiento_id), int(saldo)
+    except (signing.BadSignature, ValueError, TypeError) as e:
+        raise CursorKardexInvalido("Cursor de kardex inválido.") from e
+    if fecha is None:
+        raise CursorKardexInvalido("Cursor de kardex inválido.")
+    return fecha, movimiento_id, saldo
+
+
+def pagina_kardex(movimientos, alcance, saldo_base=None, cursor=None, tamano=TAMANO_PAGINA):
+    """
+    Una página del kardex con ``delta`` y ``saldo`` anotados.
+
+    Args:
+        movimientos: QuerySet de ``movimientos_kardex``.
+        alcance: ``alcance_kardex`` de la consulta (firma los cursores).
+        saldo_base: Saldo antes del primer movimiento; solo se usa en la primera
+            página, las siguientes toman el saldo del cursor.
+
+    Returns:
+        tuple: (lista de movimientos, cursor de la página siguiente o None)
+
+    Raises:
+        CursorKardexInvalido: Si el cursor no es válido para este alcance.
+    """
+    if cursor:
+        fecha, movimiento_id, saldo_base = decodificar_cursor(cursor, alcance)
+        movimientos = movimientos.filter(Q(fecha__gt=fecha) | Q(fecha=fecha, id__gt=movimiento_id))
+
+    filas = list(con_saldo(movimientos, saldo_base)[:tamano + 1])
+    siguiente = codificar_cursor(filas[tamano - 1], alcance) if len(filas) > tamano else None
+    return filas[:tamano], siguiente
+
+
+class _Eco:
+    """Pseudo-archivo para ``csv.writer``: devuelve cada línea en lugar de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def filas_csv(movimientos, saldo_base):
+    """Genera el kardex completo como líneas CSV, una por movimiento."""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(ENCABEZADO_CSV)
+    yield escritor.writerow(["", "Saldo inicial", "", "", "", "", "", saldo_base, ""])
+    for movimiento in con_saldo(movimientos, saldo_base).iterator(chunk_size=2000):
+        yield escritor.writerow([
+            timezone.localtime(movimiento.fecha).strftime("%d/%m/%Y %H:%M:%S"),
+            movimiento.get_tipo_display(),
+            movimiento.motivo,
+            movimiento.deposito_origen.nombre if movimiento.deposito_origen else "",
+            movimiento.deposito_destino.nombre if movimiento.deposito_destino else "",
+            movimiento.cantidad if movimiento.delta > 0 else "",
+            movimiento.cantidad if movimiento.delta < 0 else "",
+            movimiento.saldo,
+            movimiento.usuario.username if movimiento.usuario else "",
+        ])
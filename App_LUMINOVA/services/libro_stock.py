@@ -0,0 +1,242 @@
+"""
+Libro de stock: unidad de trabajo para las escrituras de stock por depósito.
+
+Las vistas y la API ya no leen, modifican y guardan cada fila de stock por su
+cuenta. Registran los movimientos en una ``UnidadDeTrabajoStock``, que:
+
+1. acumula los deltas y los agrupa por (ítem, depósito);
+2. al aplicarse escribe cada tabla de stock con un único
+   ``INSERT ... ON CONFLICT DO UPDATE SET cantidad = cantidad + delta``, que crea
+   las filas que falten y bloquea las filas en orden fijo (ítem, depósito): dos
+   transacciones con filas en común esperan en el mismo orden, sin deadlocks;
+3. valida sobre las cantidades resultantes que ninguna quede negativa (si alguna
+   queda, se revierte todo y se lanza ``StockInsuficienteError``);
+4. registra los ``MovimientoStock`` con un solo ``bulk_create``, recalcula
+   ``stock_total`` y avisa a contadores y clientes SSE.
+
+Así una operación de N líneas cuesta una cantidad constante de consultas.
+Uso habitual::
+
+    with unidad_de_trabajo(usuario=request.user) as uow:
+        uow.salida(insumo, deposito_id, 5, motivo="Ajuste")
+        uow.transferencia(producto, origen_id, destino_id, 2)
+
+Las unidades anidadas se suman a la exterior, que es la única que escribe.
+"""
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+from .contadores_sidebar import invalidar_contadores
+from .eventos_tiempo_real import publicar_cambios_stock
+
+_local = threading.local()
+
+
+class StockInsuficienteError(Exception):
+    """Alguna fila de stock quedaría negativa (no se aplica nada)."""
+
+    def __init__(self, faltantes):
+        self.faltantes = faltantes
+        super().__init__(
+            "; ".join(
+                f"Stock insuficiente para '{f['descripcion']}'. "
+                f"Requeridos: {f['requerido']}, Disponible: {f['disponible']}"
+                for f in faltantes
+            )
+        )
+
+
+class UnidadDeTrabajoStock:
+    """Acumula movimientos de stock y los escribe juntos con ``aplicar()``."""
+
+    def __init__(self, usuario=None):
+        self.usuario = usuario
+        self._deltas = defaultdict(int)
+        self._items = {}
+        self._movimientos = []
+        # Movimientos creados por el último aplicar()
+        self.movimientos_registrados = []
+
+    def _delta(self, item, deposito_id, cantidad):
+        clave = (type(item), item.pk, deposito_id)
+        self._items[clave] = item
+        self._deltas[clave] += cantidad
+
+    def _movimiento(self, tipo, item, cantidad, motivo, deposito_origen_id=None, deposito_destino_id=None,
+                    item_destino=None):
+        movimiento = {
+            type(item).STOCK_ITEM_FIELD: item,
+            "tipo": tipo,
+            "cantidad": cantidad,
+            "motivo": motivo,
+            "deposito_origen_id": deposito_origen_id,
+            "deposito_destino_id": deposito_destino_id,
+        }
+        if item_destino is not None and item_destino.pk != item.pk:
+            # El libro se puede reproducir: el destino sabe qué ítem recibió el stock
+            movimiento[f"{type(item).STOCK_ITEM_FIELD}_destino"] = item_destino
+        self._movimientos.append(movimiento)
+
+    def entrada(self, item, deposito_id, cantidad, motivo=""):
+        """Suma ``cantidad`` de ``item`` (Insumo o ProductoTerminado) al depósito."""
+        self._delta(item, deposito_id, cantidad)
+        self._movimiento("entrada", item, cantidad, motivo or "Entrada registrada automáticamente",
+                         deposito_destino_id=deposito_id)
+
+    def salida(self, item, deposito_id, cantidad, motivo=""):
+        """Descuenta ``cantidad`` de ``item`` del depósito."""
+        self._delta(item, deposito_id, -cantidad)
+        self._movimiento("salida", item, cantidad, motivo or "Salida registrada automáticamente",
+                         deposito_origen_id=deposito_id)
+
+    def transferencia(self, item, deposito_origen_id, deposito_destino_id, cantidad, motivo="", item_destino=None):
+        """
+        Mueve ``cantidad`` entre depósitos.
+
+        Args:
+            item_destino: Ítem que recibe el stock en el destino, si es otra
+                instancia (copias por depósito); por defecto el mismo ``item``.
+        """
+        self._delta(item, deposito_origen_id, -cantidad)
+        self._delta(item_destino or item, deposito_destino_id, cantidad)
+        self._movimiento("transferencia", item, cantidad, motivo or "Transferencia entre depósitos",
+                         deposito_origen_id=deposito_origen_id, deposito_destino_id=deposito_destino_id,
+                         item_destino=item_destino)
+
+    def aplicar(self):
+        """
+        Escribe los deltas acumulados y los movimientos.
+
+        Returns:
+            dict: (modelo, item_id, deposito_id) -> cantidad resultante.
+
+        Raises:
+            StockInsuficienteError: Si alguna fila quedaría negativa.
+        """
+        from ..models import Deposito, MovimientoStock
+
+        if not self._movimientos:
+            return {}
+
+        depositos = {deposito_id for _, _, deposito_id in self._deltas}
+        for movimiento in self._movimientos:
+            depositos |= {movimiento["deposito_origen_id"], movimiento["deposito_destino_id"]}
+        empresas = dict(
+            Deposito.objects.filter(id__in=depositos - {None}).values_list("id", "empresa_id")
+        )
+
+        por_modelo = defaultdict(dict)
+        for (modelo, item_id, deposito_id), delta in self._deltas.items():
+            if delta:
+                por_modelo[modelo][(item_id, deposito_id)] = delta
+
+        with transaction.atomic():
+            resultado = {}
+            faltantes = []
+            for modelo, deltas in por_modelo.items():
+                for (item_id, deposito_id), cantidad in _upsert_deltas(modelo, deltas, empresas).items():
+                    resultado[(modelo, item_id, deposito_id)] = cantidad
+                    if cantidad < 0:
+                        delta = deltas[(item_id, deposito_id)]
+                        faltantes.append({
+                            "item_id": item_id,
+                            "deposito_id": deposito_id,
+                            "descripcion": self._items[(modelo, item_id, deposito_id)].descripcion,
+                            "requerido": -delta,
+                            "disponible": cantidad - delta,
+                        })
+            if faltantes:
+                raise StockInsuficienteError(faltantes)
+
+            self.movimientos_registrados = MovimientoStock.objects.bulk_create([
+                MovimientoStock(
+                    **movimiento,
+                    usuario=self.usuario,
+                    # bulk_create no pasa por save(): la empresa se asigna explícitamente
+                    empresa_id=empresas.get(movimiento["deposito_origen_id"] or movimiento["deposito_destino_id"]),
+                )
+                for movimiento in self._movimientos
+            ])
+
+            # Las escrituras en crudo no disparan señales
+            for modelo in por_modelo:
+                modelo.recalcular_stock_total(
+                    item_id for (m, item_id, _) in resultado if m is modelo
+                )
+            por_empresa = defaultdict(list)
+            for (modelo, item_id, deposito_id), cantidad in resultado.items():
+                por_empresa[empresas.get(deposito_id)].append({
+                    "tipo": modelo.STOCK_ITEM_FIELD,
+                    "id": item_id,
+                    "deposito_id": deposito_id,
+                    "cantidad": cantidad,
+                })
+            for empresa_id, items in por_empresa.items():
+                invalidar_contadores(empresa_id)
+                publicar_cambios_stock(empresa_id, items)
+
+        self._deltas.clear()
+        self._movimientos.clear()
+        return resultado
+
+
+def _upsert_deltas(modelo, deltas, empresas):
+    """
+    Aplica los deltas a la tabla de stock del modelo con una única sentencia.
+
+    Returns:
+        dict: (item_id, deposito_id) -> cantidad resultante.
+    """
+    modelo_stock = modelo.get_stock_model()
+    opts = modelo_stock._meta
+    quote = connection.ops.quote_name
+    tabla = quote(opts.db_table)
+    columna_item = quote(opts.get_field(modelo.STOCK_ITEM_FIELD).column)
+
+    # Orden fijo: dos transacciones con filas en común las bloquean en el mismo orden
+    pares = sorted(deltas)
+    valores = ", ".join(["(%s, %s, %s, %s)"] * len(pares))
+    params = []
+    for item_id, deposito_id in pares:
+        params += [item_id, deposito_id, deltas[(item_id, deposito_id)], empresas.get(deposito_id)]
+
+    sql = (
+        f"INSERT INTO {tabla} ({columna_item}, {quote('deposito_id')}, {quote('cantidad')}, {quote('empresa_id')}) "
+        f"VALUES {valores} "
+        f"ON CONFLICT ({columna_item}, {quote('deposito_id')}) "
+        f"DO UPDATE SET {quote('cantidad')} = {tabla}.{quote('cantidad')} + EXCLUDED.{quote('cantidad')} "
+        f"RETURNING {columna_item}, {quote('deposito_id')}, {quote('cantidad')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {(item_id, deposito_id): cantidad for item_id, deposito_id, cantidad in cursor.fetchall()}
+
+
+def unidad_de_trabajo_actual():
+    """Unidad de trabajo abierta en el hilo, o None."""
+    return getattr(_local, "unidad", None)
+
+
+@contextmanager
+def unidad_de_trabajo(usuario=None):
+    """
+    Abre una transacción con una unidad de trabajo de stock y la aplica al salir
+    del bloque (antes del commit). Si ya hay una abierta en el hilo, se reutiliza.
+    """
+    actual = unidad_de_trabajo_actual()
+    if actual is not None:
+        yield actual
+        return
+
+    with transaction.atomic():
+        unidad = UnidadDeTrabajoStock(usuario=usuario)
+        _local.unidad = unidad
+        try:
+            yield unidad
+            unidad.aplicar()
+        finally:
+            _local.unidad = None
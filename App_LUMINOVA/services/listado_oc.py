@@ -0,0 +1,96 @@
+"""
+Listado de Órdenes de Compra por pestañas de estado.
+
+Los encabezados de las pestañas se arman con una sola consulta agrupada por estado
+y las filas de cada pestaña se piden por separado (fragmento HTML) con paginación
+por cursor (keyset) sobre (fecha_creacion, id) descendente, de modo que el costo de
+una página no crece con la cantidad histórica de OCs.
+"""
+
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Count, Q
+from django.utils.dateparse import parse_datetime
+
+ESTADOS_OC = OrderedDict([
+    ("BORRADOR", "Borrador"),
+    ("APROBADA", "Aprobada"),
+    ("ENVIADA_PROVEEDOR", "Enviada a Proveedor"),
+    ("EN_TRANSITO", "En Tránsito"),
+    ("RECIBIDA_PARCIAL", "Recibida Parcial"),
+    ("RECIBIDA_TOTAL", "Recibida Total"),
+    ("COMPLETADA", "Completada"),
+    ("CANCELADA", "Cancelada"),
+])
+
+# Estados considerados "en seguimiento"
+ESTADOS_SEGUIMIENTO = [
+    "ENVIADA_PROVEEDOR",
+    "EN_TRANSITO",
+    "RECIBIDA_PARCIAL",
+    "RECIBIDA_TOTAL",
+    "COMPLETADA",
+]
+
+TAMANO_PAGINA = 25
+
+
+def contar_ocs_por_estado(queryset):
+    """Cantidad de OCs por estado, en una única consulta agrupada."""
+    filas = queryset.order_by().values("estado").annotate(total=Count("id"))
+    return {fila["estado"]: fila["total"] for fila in filas}
+
+
+def construir_pestanas(queryset, estados=ESTADOS_OC, solo_con_ocs=False):
+    """
+    Pestañas del listado como tuplas (estado, nombre, total).
+
+    Args:
+        queryset: OCs ya filtradas por empresa.
+        estados: Estados (y sus nombres) a mostrar, en orden.
+        solo_con_ocs: Omitir las pestañas sin OCs.
+    """
+    totales = contar_ocs_por_estado(queryset)
+    return [
+        (estado, nombre, totales.get(estado, 0))
+        for estado, nombre in estados.items()
+        if totales.get(estado, 0) or not solo_con_ocs
+    ]
+
+
+def codificar_cursor(oc):
+    datos = json.dumps([oc.fecha_creacion.isoformat(), oc.id])
+    return base64.urlsafe_b64encode(datos.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (fecha_creacion, id) o None si el cursor no es válido."""
+    try:
+        fecha, oc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        fecha = parse_datetime(fecha)
+        oc_id = int(oc_id)
+    except (ValueError, TypeError):
+        return None
+    if fecha is None:
+        return None
+    return fecha, oc_id
+
+
+def pagina_ocs(queryset, estado, cursor=None, tamano=TAMANO_PAGINA):
+    """
+    Una página de OCs del estado dado, más recientes primero.
+
+    Returns:
+        tuple: (lista de OCs, cursor de la página siguiente o None)
+    """
+    ocs = queryset.filter(estado=estado).order_by("-fecha_creacion", "-id")
+    posicion = decodificar_cursor(cursor) if cursor else None
+    if posicion:
+        fecha, oc_id = posicion
+        ocs = ocs.filter(Q(fecha_creacion__lt=fecha) | Q(fecha_creacion=fecha, id__lt=oc_id))
+
+    filas = list(ocs[:tamano + 1])
+    siguiente = codificar_cursor(filas[tamano - 1]) if len(filas) > tamano else None
+    return filas[:tamano], siguiente
@@ -0,0 +1,101 @@
+"""
+Necesidades de compra de insumos calculadas en una sola consulta.
+
+Cada insumo se anota con su stock (columna materializada ``stock_total``), la
+cantidad ya pedida en OCs en firme (post-borrador) para su depósito y si tiene
+una OC en BORRADOR, mediante subconsultas correlacionadas. Así el desglose de
+compras no ejecuta consultas por insumo.
+"""
+
+from django.db.models import (
+    Exists,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce
+
+from ..models import Insumo, Orden
+from ..utils import UMBRAL_STOCK_BAJO
+from .contadores_sidebar import ESTADOS_OC_EN_PROCESO
+
+
+def annotate_necesidades_compra(queryset=None):
+    """
+    Anota ``stock_calculado``, ``cantidad_en_oc`` y ``tiene_oc_borrador`` sobre un
+    queryset de Insumo.
+
+    Tanto ``cantidad_en_oc`` (suma de OCs en firme) como ``tiene_oc_borrador``
+    consideran las OCs del insumo para su depósito o sin depósito asignado; la
+    rama ``deposito__isnull`` es la que cubre a los insumos sin depósito, ya que
+    ``deposito = NULL`` nunca es verdadero en SQL.
+    """
+    if queryset is None:
+        queryset = Insumo.objects.all()
+
+    ocs_compra = Orden.objects.filter(tipo="compra", insumo_principal=OuterRef("pk"))
+    del_deposito = Q(deposito=OuterRef("deposito")) | Q(deposito__isnull=True)
+    cantidad_en_oc = (
+        ocs_compra.filter(estado__in=ESTADOS_OC_EN_PROCESO)
+        .filter(del_deposito)
+        .order_by()
+        .values("insumo_principal")
+        .annotate(total=Sum("cantidad_principal"))
+        .values("total")
+    )
+    oc_borrador = ocs_compra.filter(del_deposito, estado="BORRADOR")
+
+    return queryset.annotate(
+        stock_calculado=F("stock_total"),
+        cantidad_en_oc=Coalesce(
+            Subquery(cantidad_en_oc, output_field=IntegerField()), Value(0)
+        ),
+        tiene_oc_borrador=Exists(oc_borrador),
+    )
+
+
+def insumos_que_necesitan_compra(queryset=None, umbral=UMBRAL_STOCK_BAJO):
+    """
+    Insumos con stock bajo el umbral que no quedan cubiertos por lo ya pedido
+    en OCs en firme (stock + cantidad en OC < umbral).
+    """
+    return (
+        annotate_necesidades_compra(queryset)
+        .filter(stock_calculado__lt=umbral)
+        .filter(stock_calculado__lt=Value(umbral) - F("cantidad_en_oc"))
+    )
+
+
+def agrupar_insumos_criticos(insumos):
+    """
+    Agrupa insumos por (descripción, categoría) sumando el stock y armando el
+    desglose por depósito. Espera insumos anotados con ``annotate_necesidades_compra``.
+    """
+    agrupados = {}
+    for insumo in insumos:
+        key = (insumo.descripcion, insumo.categoria_id)
+        stock_actual = insumo.stock_calculado or 0
+        if key not in agrupados:
+            agrupados[key] = {
+                "id": insumo.id,
+                "descripcion": insumo.descripcion,
+                "categoria": insumo.categoria,
+                "imagen": getattr(insumo, "imagen", None),
+                "stock_total": 0,
+                "desglose_depositos": [],
+                "tiene_oc_borrador": False,
+            }
+        grupo = agrupados[key]
+        grupo["stock_total"] += stock_actual
+        grupo["desglose_depositos"].append({
+            "deposito": insumo.deposito.nombre if insumo.deposito else "Sin depósito",
+            "stock": stock_actual,
+        })
+        # Si algún depósito tiene OC en borrador, marcarlo
+        if insumo.tiene_oc_borrador:
+            grupo["tiene_oc_borrador"] = True
+    return list(agrupados.values())
@@ -0,0 +1,193 @@
+"""
+Feed de notificaciones no leídas de solo lectura, con ETag.
+
+Cada (tenant, empresa, grupo de notificación) tiene un contador de versión en la caché de
+Django que se incrementa al confirmarse cualquier cambio en sus notificaciones
+(ver signals.py). El ETag del feed de un usuario se arma con las versiones de sus
+grupos, así que un poll sin cambios cuesta una lectura de caché y responde 304;
+el contenido del feed también se cachea por versión.
+
+Como las lecturas son por usuario (LecturaNotificacion), el ETag incluye además una
+versión de lecturas del usuario, que se incrementa cuando marca notificaciones.
+
+La resolución automática de las notificaciones de stock bajo ya no ocurre al
+consultar el feed sino cuando una OC del insumo sale de BORRADOR.
+
+No hay long-poll: la vista es sincrónica y cada espera ocuparía un worker. Para
+recibir cambios al instante está el flujo SSE (services/eventos_tiempo_real.py).
+"""
+
+import hashlib
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from ..utils import clave_tenant
+from .eventos_tiempo_real import publicar_al_confirmar
+
+FEED_CACHE_TIMEOUT = 300
+FEED_LIMITE = 20
+
+_CLAVE_VERSION = "luminova:notificaciones:version:{empresa}:{grupo}"
+_CLAVE_LECTURAS = "luminova:notificaciones:lecturas:{usuario}"
+_CLAVE_FEED = "luminova:notificaciones:feed:{etag}"
+
+
+def _clave_version(empresa_id, grupo):
+    return clave_tenant(_CLAVE_VERSION.format(empresa=empresa_id or "todas", grupo=grupo))
+
+
+def _clave_lecturas(usuario_id):
+    return clave_tenant(_CLAVE_LECTURAS.format(usuario=usuario_id))
+
+
+def versiones_grupos(empresa_id, grupos, usuario_id=None):
+    """
+    Versión actual de cada grupo de la empresa (y de las lecturas del usuario, al
+    final), en una sola lectura de caché.
+    """
+    claves = [_clave_version(empresa_id, grupo) for grupo in grupos]
+    if usuario_id:
+        claves.append(_clave_lecturas(usuario_id))
+    actuales = cache.get_many(claves)
+    versiones = []
+    for clave in claves:
+        version = actuales.get(clave)
+        if version is None:
+            version = 1
+            cache.add(clave, version, None)
+        versiones.append(version)
+    return versiones
+
+
+def _incrementar(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 2, None)
+
+
+def invalidar_feed(empresa_id, grupos):
+    """
+    Incrementa la versión de los grupos (de la empresa y de la vista sin empresa)
+    al confirmar la transacción en curso.
+    """
+    grupos = set(grupos)
+    # Las claves se resuelven ahora, con el schema del tenant que hizo la escritura
+    claves = [_clave_version(None, grupo) for grupo in grupos]
+    if empresa_id:
+        claves += [_clave_version(empresa_id, grupo) for grupo in grupos]
+
+    def _invalidar():
+        for clave in claves:
+            _incrementar(clave)
+
+    transaction.on_commit(_invalidar)
+    # Las conexiones SSE de los grupos vuelven a pedir el feed (con su ETag)
+    publicar_al_confirmar(empresa_id, grupos, "feed", {})
+
+
+def invalidar_lecturas_usuario(usuario_id):
+    """Incrementa la versión de lecturas del usuario al confirmar la transacción."""
+    clave = _clave_lecturas(usuario_id)
+    transaction.on_commit(lambda: _incrementar(clave))
+
+
+def calcular_etag(empresa_id, grupos, usuario_id=None):
+    versiones = versiones_grupos(empresa_id, grupos, usuario_id)
+    datos = f"{empresa_id or 'todas'}|{','.join(grupos)}|{usuario_id or ''}|{versiones}"
+    return '"' + hashlib.md5(datos.encode()).hexdigest() + '"'
+
+
+def _serializar(notificacion):
+    return {
+        'id': notificacion.id,
+        'titulo': notificacion.titulo,
+        'mensaje': notificacion.mensaje,
+        'tipo': notificacion.tipo,
+        'fecha': timezone.localtime(
+            notificacion.fecha_ultima_ocurrencia or notificacion.fecha_creacion
+        ).strftime('%d/%m/%Y %H:%M'),
+        'prioridad': notificacion.prioridad,
+        'repeticiones': notificacion.repeticiones,
+    }
+
+
+def calcular_feed(empresa_id, grupos, usuario_id=None, limite=FEED_LIMITE):
+    """
+    Últimas notificaciones no leídas y vigentes de los grupos (solo lectura).
+    Con ``usuario_id`` se excluyen las que ese usuario ya leyó.
+    Se muestra una sola notificación de stock bajo por insumo.
+    """
+    from ..models import LecturaNotificacion, NotificacionSistema
+
+    if not grupos:
+        return []
+
+    notificaciones = NotificacionSistema.objects.filter(
+        Q(fecha_expiracion__isnull=True) | Q(fecha_expiracion__gt=timezone.now()),
+        leida=False,
+        destinatario_grupo__in=grupos,
+    )
+    if usuario_id:
+        notificaciones = notificaciones.exclude(
+            Exists(LecturaNotificacion.objects.filter(usuario_id=usuario_id, notificacion=OuterRef('pk')))
+        )
+    if empresa_id:
+        notificaciones = notificaciones.filter(empresa_id=empresa_id)
+
+    data = []
+    # Para evitar duplicados, llevamos registro de insumos ya notificados
+    insumos_notificados = set()
+    for notificacion in notificaciones.order_by('-fecha_creacion')[:limite]:
+        if notificacion.tipo == 'stock_bajo':
+            insumo_id = (notificacion.datos_contexto or {}).get('insumo_id')
+            if insumo_id in insumos_notificados:
+                continue
+            if insumo_id:
+                insumos_notificados.add(insumo_id)
+        data.append(_serializar(notificacion))
+    return data
+
+
+def obtener_feed(empresa_id, grupos, etag=None, usuario_id=None):
+    """Contenido del feed (cacheado por ETag)."""
+    etag = etag or calcular_etag(empresa_id, grupos, usuario_id)
+    clave = clave_tenant(_CLAVE_FEED.format(etag=etag.strip('"')))
+    data = cache.get(clave)
+    if data is None:
+        data = calcular_feed(empresa_id, grupos, usuario_id)
+        cache.set(clave, data, FEED_CACHE_TIMEOUT)
+    return data
+
+
+def resolver_notificaciones_stock_bajo(insumo_ids):
+    """
+    Marca como leídas las notificaciones de stock bajo pendientes de los insumos
+    indicados. Se llama cuando una OC de esos insumos sale de BORRADOR.
+
+    Returns:
+        int: Cantidad de notificaciones resueltas.
+    """
+    from ..models import NotificacionSistema
+
+    insumo_ids = [insumo_id for insumo_id in set(insumo_ids) if insumo_id]
+    if not insumo_ids:
+        return 0
+
+    pendientes = NotificacionSistema.objects.filter(
+        leida=False, tipo='stock_bajo', datos_contexto__insumo_id__in=insumo_ids
+    )
+    afectados = set(
+        pendientes.order_by().values_list('empresa_id', 'destinatario_grupo').distinct()
+    )
+    if not afectados:
+        return 0
+
+    resueltas = pendientes.update(leida=True, fecha_lectura=timezone.now())
+    # QuerySet.update no dispara señales
+    for empresa_id, grupo in afectados:
+        invalidar_feed(empresa_id, [grupo])
+    return resueltas
@@ -5,10 +5,13 @@ Este servicio permite que cada módulo notifique a otros sin acceso directo a su
 
 from django.utils import timezone
 from django.contrib.auth.models import User, Group
-from django.db.models import Q
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, F, OuterRef, Q
 from typing import Dict, List, Optional, Any
 import logging
 
+from .eventos_tiempo_real import publicar_al_confirmar
+
 logger = logging.getLogger(__name__)
 
 
@@ -24,7 +27,8 @@ class NotificationService:
         destinatario_grupo: str,
         prioridad: str = 'media',
         datos_contexto: Optional[Dict[str, Any]] = None,
-        fecha_expiracion: Optional[timezone.datetime] = None
+        fecha_expiracion: Optional[timezone.datetime] = None,
+        clave_agrupacion: Optional[str] = None
     ) -> 'NotificacionSistema':
         """
         Crea una nueva notificación en el sistema
@@ -38,32 +42,97 @@ class NotificationService:
             prioridad: Prioridad de la notificación (baja, media, alta, critica)
             datos_contexto: Datos adicionales en formato dict
             fecha_expiracion: Fecha de expiración opcional
+            clave_agrupacion: Si hay una notificación abierta con esta clave, se
+                actualiza (contador y última ocurrencia) en lugar de crear otra
         
         Returns:
-            NotificacionSistema: La notificación creada
+            NotificacionSistema: La notificación creada (o agrupada)
         """
         from ..models import NotificacionSistema
         
-        notificacion = NotificacionSistema.objects.create(
-            tipo=tipo,
-            titulo=titulo,
-            mensaje=mensaje,
-            remitente=remitente,
-            destinatario_grupo=destinatario_grupo,
-            prioridad=prioridad,
-            datos_contexto=datos_contexto or {},
-            fecha_expiracion=fecha_expiracion
-        )
+        campos = {
+            'tipo': tipo,
+            'titulo': titulo,
+            'mensaje': mensaje,
+            'remitente': remitente,
+            'destinatario_grupo': destinatario_grupo,
+            'prioridad': prioridad,
+            'datos_contexto': datos_contexto or {},
+            'fecha_expiracion': fecha_expiracion,
+        }
         
-        logger.info(
-            f"Notificación creada: {tipo} de {remitente.username} para {destinatario_grupo} - {titulo}"
-        )
+        if clave_agrupacion:
+            notificacion = NotificationService._agrupar_notificacion(clave_agrupacion, campos)
+        else:
+            notificacion = NotificacionSistema.objects.create(**campos)
+            logger.info(
+                f"Notificación creada: {tipo} de {remitente.username} para {destinatario_grupo} - {titulo}"
+            )
+        
+        # Aviso en tiempo real a las conexiones SSE del grupo
+        publicar_al_confirmar(notificacion.empresa_id, [destinatario_grupo], 'notificacion', {
+            'id': notificacion.id,
+            'titulo': notificacion.titulo,
+            'tipo': notificacion.tipo,
+            'prioridad': notificacion.prioridad,
+            'repeticiones': notificacion.repeticiones,
+        })
         
         return notificacion
     
+    @staticmethod
+    def _agrupar_notificacion(clave_agrupacion: str, campos: Dict[str, Any]) -> 'NotificacionSistema':
+        """
+        Actualiza la notificación abierta (no leída) con la clave dada o la crea.
+        Al agrupar se descartan las lecturas por usuario, así la repetición vuelve
+        a aparecer como no leída para todos.
+
+        El índice único parcial ``notificacion_abierta_por_clave`` impide duplicados
+        ante creaciones concurrentes: quien pierde la carrera agrupa sobre la otra.
+        """
+        from ..models import NotificacionSistema
+        from .notificaciones_feed import invalidar_lecturas_usuario
+        
+        with transaction.atomic():
+            for intento in range(2):
+                abierta = NotificacionSistema.objects.select_for_update().filter(
+                    clave_agrupacion=clave_agrupacion, leida=False
+                ).first()
+                if abierta:
+                    for campo, valor in campos.items():
+                        setattr(abierta, campo, valor)
+                    abierta.repeticiones = F('repeticiones') + 1
+                    abierta.fecha_ultima_ocurrencia = timezone.now()
+                    abierta.save(update_fields=[*campos, 'repeticiones', 'fecha_ultima_ocurrencia'])
+                    abierta.refresh_from_db(fields=['repeticiones'])
+                    # La nueva ocurrencia vuelve a quedar pendiente para quienes ya la habían leído
+                    lectores = list(abierta.lecturas.values_list('usuario_id', flat=True))
+                    if lectores:
+                        abierta.lecturas.all().delete()
+                        for usuario_id in lectores:
+                            invalidar_lecturas_usuario(usuario_id)
+                    logger.info(
+                        f"Notificación agrupada: {clave_agrupacion} ({abierta.repeticiones} repeticiones)"
+                    )
+                    return abierta
+                try:
+                    with transaction.atomic():
+                        return NotificacionSistema.objects.create(
+                            clave_agrupacion=clave_agrupacion,
+                            fecha_ultima_ocurrencia=timezone.now(),
+                            **campos,
+                        )
+                except IntegrityError:
+                    # Otra petición la creó en paralelo: reintentar agrupando
+                    if intento:
+                        raise
+    
     @staticmethod
     def notificar_stock_bajo(insumo, deposito, usuario_remitente, umbral_critico: int = 10) -> 'NotificacionSistema':
-        """Notifica al departamento de compras sobre stock bajo"""
+        """
+        Notifica al departamento de compras sobre stock bajo. Las repeticiones para el
+        mismo insumo y depósito se agrupan en la notificación abierta.
+        """
         titulo = f"Stock crítico: {insumo.descripcion}"
         mensaje = (
             f"El insumo '{insumo.descripcion}' en el depósito '{deposito.nombre}' "
@@ -90,7 +159,8 @@ class NotificationService:
             remitente=usuario_remitente,
             destinatario_grupo='compras',
             prioridad=prioridad,
-            datos_contexto=datos_contexto
+            datos_contexto=datos_contexto,
+            clave_agrupacion=f"stock_bajo:{insumo.id}:{deposito.id}"
         )
     
     @staticmethod
@@ -211,71 +281,121 @@ class NotificationService:
             datos_contexto=datos_contexto
         )
     
+    # Mapeo de roles (grupos Django normalizados, ver utils.roles_usuario) a grupos de notificación
+    MAPEO_GRUPOS = {
+        'administrador': 'administrador',
+        'depósito': 'deposito',
+        'compras': 'compras',
+        'ventas': 'ventas',
+        'producción': 'produccion',
+        'control de calidad': 'control_calidad',
+    }
+
+    @staticmethod
+    def grupos_notificacion(usuario: User) -> List[str]:
+        """Grupos de notificación del usuario, ordenados (usa los roles cacheados)"""
+        from ..utils import roles_usuario
+
+        roles = roles_usuario(usuario)
+        grupos_notificacion = {
+            grupo for rol, grupo in NotificationService.MAPEO_GRUPOS.items() if rol in roles
+        }
+
+        # Si es administrador, puede ver todas las notificaciones
+        if usuario.is_superuser or 'administrador' in grupos_notificacion:
+            grupos_notificacion.add('todos')
+
+        return sorted(grupos_notificacion)
+
+    @staticmethod
+    def excluir_leidas(queryset, usuario: User):
+        """
+        Filtra las notificaciones no leídas por el usuario: sin resolución global y
+        sin lectura propia (anti-join sobre el índice único (usuario, notificacion)).
+        """
+        from ..models import LecturaNotificacion
+
+        return queryset.filter(leida=False).exclude(
+            Exists(LecturaNotificacion.objects.filter(usuario=usuario, notificacion=OuterRef('pk')))
+        )
+
     @staticmethod
     def obtener_notificaciones_usuario(usuario: User, solo_no_leidas: bool = True) -> List['NotificacionSistema']:
         """Obtiene las notificaciones para un usuario según sus grupos"""
         from ..models import NotificacionSistema
         
-        # Obtener grupos del usuario
-        grupos_usuario = list(usuario.groups.values_list('name', flat=True))
-        
-        # Mapeo de grupos Django a grupos de notificación
-        mapeo_grupos = {
-            'administrador': 'administrador',
-            'Depósito': 'deposito',
-            'Compras': 'compras',
-            'Ventas': 'ventas',
-            'Producción': 'produccion',
-            'Control de Calidad': 'control_calidad'
-        }
-        
-        grupos_notificacion = []
-        for grupo in grupos_usuario:
-            if grupo in mapeo_grupos:
-                grupos_notificacion.append(mapeo_grupos[grupo])
-        
-        # Si es administrador, puede ver todas las notificaciones
-        if usuario.is_superuser or 'administrador' in grupos_notificacion:
-            grupos_notificacion.append('todos')
+        grupos_notificacion = NotificationService.grupos_notificacion(usuario)
         
         if not grupos_notificacion:
-            return []
+            return NotificacionSistema.objects.none()
         
-        # Filtrar notificaciones
-        filtros = Q(destinatario_grupo__in=grupos_notificacion)
+        # Filtrar notificaciones y excluir las expiradas
+        notificaciones = NotificacionSistema.objects.filter(
+            Q(fecha_expiracion__isnull=True) | Q(fecha_expiracion__gt=timezone.now()),
+            destinatario_grupo__in=grupos_notificacion,
+        )
         
         if solo_no_leidas:
-            filtros &= Q(leida=False)
+            notificaciones = NotificationService.excluir_leidas(notificaciones, usuario)
         
-        # Excluir notificaciones expiradas
-        filtros &= Q(Q(fecha_expiracion__isnull=True) | Q(fecha_expiracion__gt=timezone.now()))
-        
-        return NotificacionSistema.objects.filter(filtros).order_by('-fecha_creacion')
+        return notificaciones.order_by('-fecha_creacion')
+
+    @staticmethod
+    def contar_no_leidas(usuario: User) -> int:
+        """Cantidad de notificaciones no leídas por el usuario"""
+        return NotificationService.obtener_notificaciones_usuario(usuario, solo_no_leidas=True).count()
     
     @staticmethod
-    def marcar_notificaciones_como_leidas(usuario: User, notificacion_ids: List[int] = None):
-        """Marca notificaciones como leídas"""
-        notificaciones = NotificationService.obtener_notificaciones_usuario(usuario, solo_no_leidas=True)
+    def marcar_notificaciones_como_leidas(usuario: User, notificacion_ids: List[int] = None, queryset=None) -> int:
+        """
+        Registra la lectura de las notificaciones no leídas del usuario (o solo de
+        ``notificacion_ids``) con una única sentencia INSERT ... SELECT.
+
+        Args:
+            queryset: Notificaciones candidatas; por defecto las de los grupos del usuario.
+
+        Returns:
+            int: Cantidad de notificaciones marcadas.
+        """
+        from ..models import LecturaNotificacion
+        from .notificaciones_feed import invalidar_lecturas_usuario
+
+        if queryset is None:
+            notificaciones = NotificationService.obtener_notificaciones_usuario(usuario, solo_no_leidas=True)
+        else:
+            notificaciones = NotificationService.excluir_leidas(queryset, usuario)
         
-        if notificacion_ids:
+        if notificacion_ids is not None:
             notificaciones = notificaciones.filter(id__in=notificacion_ids)
-        
-        for notificacion in notificaciones:
-            notificacion.marcar_como_leida(usuario)
-        
-        logger.info(f"Usuario {usuario.username} marcó {notificaciones.count()} notificaciones como leídas")
+
+        pendientes_sql, params = notificaciones.order_by().values('id').query.sql_with_params()
+        quote = connection.ops.quote_name
+        # "WHERE 1 = 1" evita la ambigüedad de INSERT ... SELECT ... ON CONFLICT en SQLite
+        sql = (
+            f"INSERT INTO {quote(LecturaNotificacion._meta.db_table)} "
+            f"({quote('usuario_id')}, {quote('notificacion_id')}, {quote('fecha_lectura')}) "
+            f"SELECT %s, pendientes.id, %s FROM ({pendientes_sql}) pendientes WHERE 1 = 1 "
+            f"ON CONFLICT DO NOTHING"
+        )
+        fecha = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [usuario.pk, fecha, *params])
+            marcadas = max(cursor.rowcount, 0)
+
+        if marcadas:
+            invalidar_lecturas_usuario(usuario.pk)
+        logger.info(f"Usuario {usuario.username} marcó {marcadas} notificaciones como leídas")
+        return marcadas
     
     @staticmethod
     def limpiar_notificaciones_expiradas():
-        """Limpia notificaciones expiradas (para ejecutar periódicamente)"""
-        from ..models import NotificacionSistema
-        
-        notificaciones_expiradas = NotificacionSistema.objects.filter(
-            fecha_expiracion__lt=timezone.now()
-        )
+        """
+        Limpia notificaciones expiradas y resueltas antiguas por lotes (para ejecutar
+        periódicamente). Ver services/retencion_notificaciones.py.
+        """
+        from .retencion_notificaciones import purgar_notificaciones
         
-        count = notificaciones_expiradas.count()
-        notificaciones_expiradas.delete()
+        count = purgar_notificaciones()['total']
         
         logger.info(f"Eliminadas {count} notificaciones expiradas")
         return count
@@ -0,0 +1,225 @@
+"""
+Índice de mejores ofertas de proveedor por insumo y consulta cacheada de ofertas.
+
+``IndiceOfertaInsumo`` guarda, por insumo, la oferta de menor precio, la de menor
+tiempo de entrega y la de mejor puntaje ponderado. Se recalcula al guardar o
+eliminar una OfertaProveedor (ver signals.py).
+
+``obtener_ofertas_insumo`` devuelve las ofertas de un insumo junto con esas mejores
+ofertas desde la caché de Django (por tenant); la creación de OCs y los endpoints AJAX la usan
+en lugar de consultar OfertaProveedor en cada request.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+
+from ..models import IndiceOfertaInsumo, OfertaProveedor
+from ..utils import clave_tenant
+
+# Pesos del puntaje ponderado (menor puntaje = mejor oferta)
+PESO_PRECIO = 0.7
+PESO_ENTREGA = 0.3
+
+# Red de seguridad ante escrituras que no disparan señales (QuerySet.update, bulk_*)
+OFERTAS_CACHE_TIMEOUT = 3600
+
+_CLAVE_OFERTAS = "luminova:ofertas_insumo:{insumo_id}"
+
+TAMANO_LOTE = 1000
+
+
+def elegir_mejores_ofertas(ofertas):
+    """
+    Elige las mejores ofertas de un insumo.
+
+    El puntaje de cada oferta es ``PESO_PRECIO * precio / menor_precio +
+    PESO_ENTREGA * (días + 1) / (menor_días + 1)``: 1.0 para una oferta que es la
+    más barata y la más rápida a la vez.
+
+    Args:
+        ofertas: Secuencia de dicts con ``id``, ``precio_unitario_compra`` y
+            ``tiempo_entrega_estimado_dias``.
+
+    Returns:
+        dict: {"menor_precio", "menor_entrega", "mejor_puntaje"} con ids de oferta (o None).
+    """
+    if not ofertas:
+        return {"menor_precio": None, "menor_entrega": None, "mejor_puntaje": None}
+
+    def _dias(oferta):
+        return max(oferta["tiempo_entrega_estimado_dias"] or 0, 0)
+
+    menor_precio = min(ofertas, key=lambda o: (o["precio_unitario_compra"], _dias(o), o["id"]))
+    menor_entrega = min(ofertas, key=lambda o: (_dias(o), o["precio_unitario_compra"], o["id"]))
+    precio_base = float(menor_precio["precio_unitario_compra"]) or 1.0
+    dias_base = _dias(menor_entrega) + 1
+
+    def _puntaje(oferta):
+        return (
+            PESO_PRECIO * float(oferta["precio_unitario_compra"]) / precio_base
+            + PESO_ENTREGA * (_dias(oferta) + 1) / dias_base
+        )
+
+    mejor_puntaje = min(ofertas, key=lambda o: (_puntaje(o), o["id"]))
+    return {
+        "menor_precio": menor_precio["id"],
+        "menor_entrega": menor_entrega["id"],
+        "mejor_puntaje": mejor_puntaje["id"],
+    }
+
+
+def _leer_ofertas(insumo_ids):
+    """Ofertas de los insumos indicados, agrupadas por insumo, en una sola consulta."""
+    por_insumo = {}
+    filas = (
+        OfertaProveedor.objects.filter(insumo_id__in=insumo_ids)
+        .order_by("precio_unitario_compra", "tiempo_entrega_estimado_dias", "id")
+        .values(
+            "id",
+            "insumo_id",
+            "insumo__empresa_id",
+            "proveedor_id",
+            "proveedor__nombre",
+            "precio_unitario_compra",
+            "tiempo_entrega_estimado_dias",
+            "fecha_actualizacion_precio",
+        )
+    )
+    for fila in filas:
+        por_insumo.setdefault(fila["insumo_id"], []).append(fila)
+    return por_insumo
+
+
+def recalcular_indice_ofertas(insumo_ids):
+    """
+    Recalcula el índice de mejores ofertas de los insumos indicados e invalida su
+    caché. Los insumos sin ofertas quedan fuera del índice.
+
+    Returns:
+        int: Cantidad de insumos con ofertas indexados.
+    """
+    insumo_ids = list(set(insumo_ids))
+    indexados = 0
+    for inicio in range(0, len(insumo_ids), TAMANO_LOTE):
+        lote = insumo_ids[inicio:inicio + TAMANO_LOTE]
+        por_insumo = _leer_ofertas(lote)
+
+        filas = []
+        for insumo_id, ofertas in por_insumo.items():
+            mejores = elegir_mejores_ofertas(ofertas)
+            filas.append(
+                IndiceOfertaInsumo(
+                    insumo_id=insumo_id,
+                    empresa_id=ofertas[0]["insumo__empresa_id"],
+                    oferta_menor_precio_id=mejores["menor_precio"],
+                    oferta_menor_entrega_id=mejores["menor_entrega"],
+                    oferta_mejor_puntaje_id=mejores["mejor_puntaje"],
+                    cantidad_ofertas=len(ofertas),
+                )
+            )
+        with transaction.atomic():
+            IndiceOfertaInsumo.objects.filter(insumo_id__in=lote).exclude(
+                insumo_id__in=list(por_insumo)
+            ).delete()
+            IndiceOfertaInsumo.objects.bulk_create(
+                filas,
+                update_conflicts=True,
+                unique_fields=["insumo"],
+                update_fields=[
+                    "empresa",
+                    "oferta_menor_precio",
+                    "oferta_menor_entrega",
+                    "oferta_mejor_puntaje",
+                    "cantidad_ofertas",
+                    "fecha_actualizacion",
+                ],
+            )
+        indexados += len(filas)
+    invalidar_ofertas_insumos(insumo_ids)
+    return indexados
+
+
+def invalidar_ofertas_insumos(insumo_ids):
+    """
+    Descarta las ofertas cacheadas de los insumos. Se invalida de inmediato y otra
+    vez al confirmar, por si otro request cacheó el valor previo mientras tanto.
+    """
+    claves = [clave_tenant(_CLAVE_OFERTAS.format(insumo_id=insumo_id)) for insumo_id in insumo_ids]
+    if not claves:
+        return
+    cache.delete_many(claves)
+    transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+def _calcular_ofertas_insumo(insumo_id):
+    ofertas = [
+        {
+            "id": fila["id"],
+            "proveedor_id": fila["proveedor_id"],
+            "proveedor": {"id": fila["proveedor_id"], "nombre": fila["proveedor__nombre"]},
+            "precio_unitario_compra": fila["precio_unitario_compra"],
+            "tiempo_entrega_estimado_dias": fila["tiempo_entrega_estimado_dias"],
+            "fecha_actualizacion_precio": fila["fecha_actualizacion_precio"],
+        }
+        for fila in _leer_ofertas([insumo_id]).get(insumo_id, [])
+    ]
+
+    indice = (
+        IndiceOfertaInsumo.objects.filter(insumo_id=insumo_id)
+        .values("oferta_menor_precio_id", "oferta_menor_entrega_id", "oferta_mejor_puntaje_id")
+        .first()
+    )
+    if indice:
+        mejores = {
+            "menor_precio": indice["oferta_menor_precio_id"],
+            "menor_entrega": indice["oferta_menor_entrega_id"],
+            "mejor_puntaje": indice["oferta_mejor_puntaje_id"],
+        }
+    else:
+        # Índice todavía no construido (ver comando reconstruir_indice_ofertas)
+        mejores = elegir_mejores_ofertas(ofertas)
+
+    return {"ofertas": ofertas, "mejores": mejores}
+
+
+def obtener_ofertas_insumo(insumo_id):
+    """
+    Ofertas de un insumo (ordenadas por precio y tiempo de entrega) y sus mejores
+    ofertas, desde la caché.
+
+    Returns:
+        dict: {"ofertas": [dict, ...], "mejores": {"menor_precio", "menor_entrega", "mejor_puntaje"}}
+    """
+    clave = clave_tenant(_CLAVE_OFERTAS.format(insumo_id=insumo_id))
+    datos = cache.get(clave)
+    if datos is None:
+        datos = _calcular_ofertas_insumo(insumo_id)
+        cache.set(clave, datos, OFERTAS_CACHE_TIMEOUT)
+    return datos
+
+
+def obtener_oferta(insumo_id, proveedor_id):
+    """Oferta del proveedor para el insumo (dict) o None."""
+    for oferta in obtener_ofertas_insumo(insumo_id)["ofertas"]:
+        if oferta["proveedor_id"] == proveedor_id:
+            return oferta
+    return None
+
+
+def obtener_mejor_oferta(insumo_id, criterio="mejor_puntaje"):
+    """Mejor oferta del insumo según ``criterio`` (menor_precio, menor_entrega o mejor_puntaje)."""
+    datos = obtener_ofertas_insumo(insumo_id)
+    oferta_id = datos["mejores"].get(criterio)
+    for oferta in datos["ofertas"]:
+        if oferta["id"] == oferta_id:
+            return oferta
+    return None
+
+
+def proveedores_con_oferta(insumo_id):
+    """Proveedores con oferta para el insumo, como dicts {id, nombre} ordenados por nombre."""
+    proveedores = {
+        oferta["proveedor_id"]: oferta["proveedor"]
+        for oferta in obtener_ofertas_insumo(insumo_id)["ofertas"]
+    }
+    return sorted(proveedores.values(), key=lambda p: p["nombre"])
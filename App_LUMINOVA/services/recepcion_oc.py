@@ -0,0 +1,116 @@
+"""
+Recepción de Órdenes de Compra en lote.
+
+Recibe muchas OCs (con cantidades parciales) en una sola transacción, en lugar de
+un POST y una transacción por OC:
+
+1. bloquea las OCs en orden de id;
+2. valida cada OC y arma un resultado por OC (las inválidas no se aplican);
+3. escribe cantidades en pedido y estados con ``UPDATE``/``bulk_update``;
+4. registra las entradas en una unidad de trabajo del libro de stock
+   (services/libro_stock.py), que escribe stock y movimientos en lote.
+"""
+
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+
+from .libro_stock import unidad_de_trabajo
+
+ESTADOS_RECIBIBLES = ("EN_TRANSITO", "RECIBIDA_PARCIAL")
+
+
+def _resultado(oc_id, oc=None, error=None, cantidad=0):
+    return {
+        "oc_id": oc_id,
+        "numero_orden": oc.numero_orden if oc else None,
+        "ok": error is None,
+        "cantidad": cantidad,
+        "cantidad_recibida": oc.cantidad_recibida if oc else None,
+        "estado": oc.estado if oc else None,
+        "error": error,
+    }
+
+
+def _validar(oc, cantidad):
+    """Devuelve (cantidad a recibir, error)."""
+    if oc.estado not in ESTADOS_RECIBIBLES:
+        return 0, f"La OC está en estado '{oc.get_estado_display()}' y no puede recibirse."
+    if not (oc.insumo_principal_id and oc.cantidad_principal and oc.deposito_id):
+        return 0, "La OC no tiene un insumo, cantidad o depósito válidos."
+    pendiente = oc.cantidad_principal - oc.cantidad_recibida
+    if cantidad is None:
+        cantidad = pendiente
+    if cantidad <= 0:
+        return 0, "La cantidad a recibir debe ser mayor a cero."
+    if cantidad > pendiente:
+        return 0, f"La cantidad a recibir ({cantidad}) supera lo pendiente ({pendiente})."
+    return cantidad, None
+
+
+def recibir_ocs(recepciones, usuario=None, ocs=None):
+    """
+    Recibe varias OCs en una transacción.
+
+    Args:
+        recepciones: dict oc_id -> cantidad a recibir (None = todo lo pendiente).
+        usuario: Usuario que registra la recepción (para los movimientos).
+        ocs: QuerySet de OCs permitidas (ya filtrado por empresa/depósito).
+
+    Returns:
+        list: Un dict por OC pedida con ``ok``, ``cantidad``, ``cantidad_recibida``,
+        ``estado`` y ``error``, en el orden de ``recepciones``.
+    """
+    from ..models import Insumo, Orden
+
+    recepciones = {int(oc_id): cantidad for oc_id, cantidad in recepciones.items()}
+    if ocs is None:
+        ocs = Orden.objects.all()
+
+    with unidad_de_trabajo(usuario=usuario) as uow:
+        bloqueadas = {
+            oc.id: oc
+            for oc in ocs.select_for_update(of=("self",))
+            .select_related("insumo_principal")
+            .filter(tipo="compra", id__in=recepciones)
+            .order_by("id")
+        }
+
+        resultados = {}
+        aplicables = []
+        for oc_id, cantidad in recepciones.items():
+            oc = bloqueadas.get(oc_id)
+            if oc is None:
+                resultados[oc_id] = _resultado(oc_id, error="La OC no existe o no tiene acceso a ella.")
+                continue
+            cantidad, error = _validar(oc, cantidad)
+            if error:
+                resultados[oc_id] = _resultado(oc_id, oc, error)
+            else:
+                aplicables.append((oc, cantidad))
+
+        if aplicables:
+            en_pedido = {}
+            for oc, cantidad in aplicables:
+                uow.entrada(
+                    oc.insumo_principal, oc.deposito_id, cantidad,
+                    motivo=f"Recepción OC {oc.numero_orden}",
+                )
+                en_pedido[oc.insumo_principal_id] = en_pedido.get(oc.insumo_principal_id, 0) + cantidad
+
+                oc.cantidad_recibida += cantidad
+                oc.estado = "COMPLETADA" if oc.cantidad_recibida >= oc.cantidad_principal else "RECIBIDA_PARCIAL"
+                resultados[oc.id] = _resultado(oc.id, oc, cantidad=cantidad)
+
+            Insumo.objects.filter(pk__in=en_pedido).update(
+                cantidad_en_pedido=Greatest(
+                    Case(
+                        *(When(pk=insumo_id, then=F("cantidad_en_pedido") - Value(total))
+                          for insumo_id, total in en_pedido.items()),
+                        output_field=IntegerField(),
+                    ),
+                    Value(0),
+                )
+            )
+            Orden.objects.bulk_update([oc for oc, _ in aplicables], ["cantidad_recibida", "estado"])
+
+    return [resultados[oc_id] for oc_id in recepciones]
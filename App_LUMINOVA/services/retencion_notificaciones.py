@@ -0,0 +1,165 @@
+"""
+Retención de notificaciones: purga (y archivo opcional) por lotes.
+
+Se eliminan las notificaciones expiradas, las leídas más antiguas que la retención
+de su tipo y las que nadie leyó en ``RETENCION_NO_LEIDAS_DIAS``. Una notificación
+cuenta como leída si fue resuelta globalmente (``leida``) o si algún usuario
+registró su lectura (LecturaNotificacion). En lugar de un único ``delete()`` (que pasa por el
+Collector de Django, dispara señales por fila y bloquea la tabla), se recorre la
+tabla en rangos acotados de id, cada uno en su propia transacción corta:
+
+1. se leen los ids candidatos del rango (usa el índice de la clave primaria);
+2. opcionalmente se archivan como JSON Lines;
+3. se borran sus lecturas y luego las notificaciones con un DELETE por ids;
+4. se invalida una vez el feed de los grupos afectados y se pausa antes del
+   siguiente lote, para no bloquear a quienes escriben.
+"""
+
+import gzip
+import json
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Exists, Max, Min, OuterRef, Q
+from django.utils import timezone
+
+# Días que se conserva una notificación leída, por tipo (desde su creación)
+RETENCION_DIAS_POR_TIPO = {
+    "stock_bajo": 30,
+    "oc_creada": 90,
+    "oc_enviada": 90,
+    "oc_recibida": 90,
+    "pedido_recibido": 90,
+    "transferencia_solicitada": 60,
+    "produccion_completada": 60,
+    "solicitud_insumos": 60,
+    "general": 30,
+}
+RETENCION_DIAS_DEFECTO = 90
+# Notificaciones que nadie leyó: se descartan al cumplir este plazo
+RETENCION_NO_LEIDAS_DIAS = 365
+
+TAMANO_LOTE = 500
+PAUSA_ENTRE_LOTES = 0.1
+
+
+def filtro_retencion(
+    retencion=None,
+    dias_defecto=RETENCION_DIAS_DEFECTO,
+    dias_no_leidas=RETENCION_NO_LEIDAS_DIAS,
+    ahora=None,
+):
+    """
+    Condición de las notificaciones a purgar: expiradas, leídas y más antiguas que
+    la retención de su tipo, o sin leer y más antiguas que ``dias_no_leidas``.
+    """
+    from ..models import LecturaNotificacion, NotificacionSistema
+
+    ahora = ahora or timezone.now()
+    retencion = {**RETENCION_DIAS_POR_TIPO, **(retencion or {})}
+
+    vencidas_por_tipo = Q()
+    for tipo, _ in NotificacionSistema.TIPOS_NOTIFICACION:
+        dias = retencion.get(tipo, dias_defecto)
+        vencidas_por_tipo |= Q(tipo=tipo, fecha_creacion__lt=ahora - timedelta(days=dias))
+    leida = Q(leida=True) | Exists(
+        LecturaNotificacion.objects.filter(notificacion=OuterRef("pk"))
+    )
+
+    return (
+        Q(fecha_expiracion__lt=ahora)
+        | Q(fecha_creacion__lt=ahora - timedelta(days=dias_no_leidas))
+        | (leida & vencidas_por_tipo)
+    )
+
+
+def _borrar_por_ids(modelo, ids):
+    """DELETE directo por ids, sin Collector ni señales."""
+    tabla = connection.ops.quote_name(modelo._meta.db_table)
+    marcadores = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {tabla} WHERE id IN ({marcadores})", ids)
+        return cursor.rowcount
+
+
+def purgar_notificaciones(
+    empresa_id=None,
+    retencion=None,
+    dias_defecto=RETENCION_DIAS_DEFECTO,
+    dias_no_leidas=RETENCION_NO_LEIDAS_DIAS,
+    tamano_lote=TAMANO_LOTE,
+    pausa=PAUSA_ENTRE_LOTES,
+    archivo=None,
+    dry_run=False,
+):
+    """
+    Purga las notificaciones según la retención, por rangos de id.
+
+    Args:
+        empresa_id: Limitar a una empresa (opcional).
+        retencion: Días de retención por tipo que reemplazan a los por defecto.
+        dias_no_leidas: Antigüedad a partir de la cual se purgan aunque nadie las leyó.
+        archivo: Ruta de un .jsonl.gz donde archivar las filas antes de borrarlas.
+        dry_run: Solo contar lo que se purgaría.
+
+    Returns:
+        dict: Resumen con ``total``, ``por_tipo``, ``lotes`` y ``segundos``.
+    """
+    from ..models import LecturaNotificacion, NotificacionSistema
+    from .notificaciones_feed import invalidar_feed
+
+    inicio = time.monotonic()
+    candidatas = NotificacionSistema.objects.filter(
+        filtro_retencion(retencion, dias_defecto, dias_no_leidas)
+    ).order_by()
+    if empresa_id:
+        candidatas = candidatas.filter(empresa_id=empresa_id)
+
+    resumen = {"total": 0, "por_tipo": Counter(), "lotes": 0, "segundos": 0.0}
+    rango = candidatas.aggregate(desde=Min("id"), hasta=Max("id"))
+    if rango["desde"] is None:
+        return resumen
+
+    salida = gzip.open(archivo, "at", encoding="utf-8") if archivo and not dry_run else None
+    try:
+        desde = rango["desde"]
+        while desde <= rango["hasta"]:
+            hasta = desde + tamano_lote
+            with transaction.atomic():
+                filas = list(
+                    candidatas.filter(id__gte=desde, id__lt=hasta).values(
+                        *(["id", "tipo", "empresa_id", "destinatario_grupo"] if salida is None else [])
+                    )
+                )
+                if filas:
+                    ids = [fila["id"] for fila in filas]
+                    if salida is not None:
+                        for fila in filas:
+                            salida.write(json.dumps(fila, cls=DjangoJSONEncoder) + "\n")
+                    if not dry_run:
+                        LecturaNotificacion.objects.filter(notificacion_id__in=ids).delete()
+                        _borrar_por_ids(NotificacionSistema, ids)
+                        afectados = {(f["empresa_id"], f["destinatario_grupo"]) for f in filas}
+                        for empresa, grupo in afectados:
+                            invalidar_feed(empresa, [grupo])
+                    resumen["total"] += len(ids)
+                    resumen["por_tipo"].update(fila["tipo"] for fila in filas)
+                    resumen["lotes"] += 1
+            if not filas:
+                # Rango vacío: saltar directo a la próxima candidata
+                desde = candidatas.filter(id__gte=hasta).aggregate(siguiente=Min("id"))["siguiente"]
+                if desde is None:
+                    break
+                continue
+            desde = hasta
+            if pausa and not dry_run:
+                time.sleep(pausa)
+    finally:
+        if salida is not None:
+            salida.close()
+
+    resumen["segundos"] = time.monotonic() - inicio
+    return resumen
@@ -0,0 +1,57 @@
+"""
+Snapshot de stock por depósito para vistas que recorren muchos ítems (BOM, dashboards).
+
+Carga en una sola consulta por modelo las filas de StockInsumo/StockProductoTerminado
+de un conjunto de ítems y las adjunta a las instancias, de modo que ``.stock`` y
+``get_stock_by_deposito()`` se respondan desde memoria durante el request.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+
+def adjuntar_snapshot_stock(items: Iterable) -> List:
+    """
+    Adjunta el stock por depósito a cada instancia (Insumo o ProductoTerminado).
+
+    Args:
+        items: Iterable de instancias; se admiten modelos mezclados y valores None.
+
+    Returns:
+        list: Las instancias recibidas (sin los None), ya con el snapshot adjunto.
+    """
+    instancias = [item for item in items if item is not None]
+
+    por_modelo = defaultdict(list)
+    for item in instancias:
+        por_modelo[type(item)].append(item)
+
+    for modelo, items_modelo in por_modelo.items():
+        snapshot = cargar_stock_por_deposito(modelo, {item.pk for item in items_modelo})
+        for item in items_modelo:
+            item._stock_por_deposito = snapshot.get(item.pk, {})
+
+    return instancias
+
+
+def cargar_stock_por_deposito(modelo, ids: Iterable[int]) -> Dict[int, Dict[int, int]]:
+    """
+    Devuelve {item_id: {deposito_id: cantidad}} para los ids indicados en una única consulta.
+
+    Args:
+        modelo: Insumo o ProductoTerminado (subclases de StockTotalizadoModel).
+        ids: Ids de los ítems a cargar.
+    """
+    ids = [item_id for item_id in ids if item_id is not None]
+    if not ids:
+        return {}
+
+    item_field = f"{modelo.STOCK_ITEM_FIELD}_id"
+    filas = modelo.get_stock_model().objects.filter(
+        **{f"{item_field}__in": ids}
+    ).values_list(item_field, "deposito_id", "cantidad")
+
+    snapshot = defaultdict(dict)
+    for item_id, deposito_id, cantidad in filas:
+        snapshot[item_id][deposito_id] = cantidad
+    return dict(snapshot)
@@ -0,0 +1,186 @@
+"""
+Transferencia de muchos ítems entre dos depósitos (manifiesto de transferencia).
+
+Cada depósito tiene sus propias categorías e ítems, así que transferir un insumo o
+producto a otro depósito lo "copia" allí (misma descripción y categoría) y mueve
+el stock de la copia de origen a la de destino. Antes cada ítem se transfería en
+su propio request con varios ``get_or_create`` (categoría, ítem y una oferta de
+proveedor por vez); acá se resuelve el manifiesto completo por lotes:
+
+1. carga los ítems del manifiesto en una consulta;
+2. resuelve las categorías, los ítems y (para insumos) las ofertas de proveedor
+   del destino con una consulta por tabla, y crea lo que falte con ``bulk_create``;
+3. registra las transferencias en una unidad de trabajo del libro de stock
+   (services/libro_stock.py): si algún ítem no alcanza no se transfiere nada.
+
+Rebalancear cientos de ítems es una sola transacción con un puñado de consultas.
+"""
+
+from .libro_stock import unidad_de_trabajo
+from .ofertas_proveedor import recalcular_indice_ofertas
+
+MAXIMO_LINEAS_MANIFIESTO = 500
+
+# Campos que se copian al crear el ítem en el depósito destino
+CAMPOS_COPIA = {
+    "insumo": ("imagen", "cantidad_en_pedido", "notificado_a_compras"),
+    "producto": ("precio_unitario", "modelo", "potencia", "acabado", "color_luz", "material", "imagen"),
+}
+
+
+def _clave_item(item, categoria_id):
+    """Identifica un ítem dentro de un depósito (como los get_or_create anteriores)."""
+    if item.STOCK_ITEM_FIELD == "insumo":
+        return (item.descripcion, item.fabricante_id, categoria_id)
+    return (item.descripcion, categoria_id)
+
+
+def _resolver_categorias(modelo, items, deposito_destino):
+    """Devuelve nombre -> categoría del destino, creando las que falten."""
+    modelo_categoria = modelo._meta.get_field("categoria").related_model
+    origen = {item.categoria.nombre: item.categoria for item in items}
+
+    def leer(nombres):
+        return {
+            categoria.nombre: categoria
+            for categoria in modelo_categoria.objects.filter(deposito=deposito_destino, nombre__in=nombres)
+        }
+
+    categorias = leer(origen)
+    faltantes = [nombre for nombre in origen if nombre not in categorias]
+    if faltantes:
+        # (nombre, depósito) es único: ignore_conflicts tolera una creación concurrente
+        modelo_categoria.objects.bulk_create(
+            [
+                modelo_categoria(
+                    nombre=nombre,
+                    deposito=deposito_destino,
+                    imagen=origen[nombre].imagen,
+                    empresa_id=deposito_destino.empresa_id,
+                )
+                for nombre in faltantes
+            ],
+            ignore_conflicts=True,
+        )
+        categorias.update(leer(faltantes))
+    return categorias
+
+
+def _resolver_items_destino(modelo, items, deposito_destino):
+    """Devuelve item_id de origen -> ítem equivalente del destino, creando los que falten."""
+    categorias = _resolver_categorias(modelo, items, deposito_destino)
+    claves = {item.id: _clave_item(item, categorias[item.categoria.nombre].id) for item in items}
+
+    existentes = {}
+    candidatos = modelo.objects.filter(
+        deposito=deposito_destino,
+        categoria_id__in={categoria.id for categoria in categorias.values()},
+        descripcion__in={item.descripcion for item in items},
+    ).order_by("id")
+    for candidato in candidatos:
+        existentes.setdefault(_clave_item(candidato, candidato.categoria_id), candidato)
+
+    nuevos = {}
+    for item in items:
+        clave = claves[item.id]
+        if clave in existentes or clave in nuevos:
+            continue
+        campos = {campo: getattr(item, campo) for campo in CAMPOS_COPIA[modelo.STOCK_ITEM_FIELD]}
+        if modelo.STOCK_ITEM_FIELD == "insumo":
+            campos["fabricante_id"] = item.fabricante_id
+        nuevos[clave] = modelo(
+            descripcion=item.descripcion,
+            categoria=categorias[item.categoria.nombre],
+            deposito=deposito_destino,
+            # bulk_create no pasa por save(): la empresa se asigna explícitamente
+            empresa_id=deposito_destino.empresa_id,
+            **campos,
+        )
+    if nuevos:
+        modelo.objects.bulk_create(nuevos.values())
+        existentes.update(nuevos)
+
+    return {item.id: existentes[claves[item.id]] for item in items}
+
+
+def _copiar_ofertas(destinos):
+    """Copia a los insumos del destino las ofertas de proveedor que les falten."""
+    from ..models import OfertaProveedor
+
+    pares = {origen_id: destino.id for origen_id, destino in destinos.items() if origen_id != destino.id}
+    if not pares:
+        return
+    existentes = set(
+        OfertaProveedor.objects.filter(insumo_id__in=pares.values()).values_list("insumo_id", "proveedor_id")
+    )
+    nuevas = {}
+    for oferta in OfertaProveedor.objects.filter(insumo_id__in=pares).order_by("id"):
+        clave = (pares[oferta.insumo_id], oferta.proveedor_id)
+        if clave in existentes or clave in nuevas:
+            continue
+        nuevas[clave] = OfertaProveedor(
+            insumo=destinos[oferta.insumo_id],
+            proveedor_id=oferta.proveedor_id,
+            precio_unitario_compra=oferta.precio_unitario_compra,
+            tiempo_entrega_estimado_dias=oferta.tiempo_entrega_estimado_dias,
+            fecha_actualizacion_precio=oferta.fecha_actualizacion_precio,
+            empresa_id=destinos[oferta.insumo_id].empresa_id or oferta.empresa_id,
+        )
+    if nuevas:
+        OfertaProveedor.objects.bulk_create(nuevas.values(), ignore_conflicts=True)
+        # bulk_create no dispara la señal que mantiene el índice de ofertas
+        recalcular_indice_ofertas({insumo_id for insumo_id, _ in nuevas})
+
+
+def transferir_lote(modelo, deposito_origen, deposito_destino, lineas, usuario=None, motivo=""):
+    """
+    Transfiere varios ítems de un depósito a otro en una transacción.
+
+    Args:
+        modelo: Insumo o ProductoTerminado.
+        lineas: dict item_id -> cantidad a transferir.
+        motivo: Motivo de los movimientos (uno por línea).
+
+    Returns:
+        list: Un dict por línea con ``item_id``, ``descripcion``, ``item_destino``
+        (instancia en el destino) y ``cantidad``.
+
+    Raises:
+        ValueError: Si el manifiesto es inválido.
+        StockInsuficienteError: Si algún ítem no alcanza (no se transfiere nada).
+    """
+    if deposito_origen.id == deposito_destino.id:
+        raise ValueError("El depósito de origen y el de destino deben ser distintos.")
+    lineas = {int(item_id): int(cantidad) for item_id, cantidad in lineas.items()}
+    if not lineas:
+        raise ValueError("El manifiesto no tiene ítems.")
+    if len(lineas) > MAXIMO_LINEAS_MANIFIESTO:
+        raise ValueError(f"El manifiesto admite hasta {MAXIMO_LINEAS_MANIFIESTO} ítems.")
+    if any(cantidad <= 0 for cantidad in lineas.values()):
+        raise ValueError("Las cantidades a transferir deben ser mayores a cero.")
+
+    items = {item.id: item for item in modelo.objects.select_related("categoria").filter(pk__in=lineas)}
+    inexistentes = set(lineas) - set(items)
+    if inexistentes:
+        raise ValueError(f"Ítems inexistentes: {', '.join(map(str, sorted(inexistentes)))}.")
+
+    motivo = motivo or "Transferencia entre depósitos"
+    with unidad_de_trabajo(usuario=usuario) as uow:
+        destinos = _resolver_items_destino(modelo, list(items.values()), deposito_destino)
+        if modelo.STOCK_ITEM_FIELD == "insumo":
+            _copiar_ofertas(destinos)
+        for item_id, cantidad in lineas.items():
+            uow.transferencia(
+                items[item_id], deposito_origen.id, deposito_destino.id, cantidad,
+                motivo=motivo, item_destino=destinos[item_id],
+            )
+
+    return [
+        {
+            "item_id": item_id,
+            "descripcion": items[item_id].descripcion,
+            "item_destino": destinos[item_id],
+            "cantidad": cantidad,
+        }
+        for item_id, cantidad in lineas.items()
+    ]
@@ -1,16 +1,146 @@
-from .models import Insumo, ProductoTerminado, StockInsumo, StockProductoTerminado, OrdenProduccion
+from .models import Insumo, ProductoTerminado, StockInsumo, StockProductoTerminado, OrdenProduccion, Orden, Reportes, PasswordChangeRequired, OfertaProveedor, Proveedor, NotificacionSistema
+from .middleware import invalidar_cambio_password
+from .services.contadores_sidebar import ESTADOS_OC_EN_PROCESO, invalidar_contadores
+from .services.estado_ov import programar_recalculo_estado_ov
+from .services.eventos_tiempo_real import publicar_cambios_stock
+from .services.notificaciones_feed import invalidar_feed, resolver_notificaciones_stock_bajo
+from .services.ofertas_proveedor import invalidar_ofertas_insumos, recalcular_indice_ofertas
+from .utils import invalidar_roles_usuarios
 # Sincronizar StockInsumo al crear o actualizar un Insumo
 from django.db import transaction
-from django.db.models.signals import post_save
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
 @receiver(post_save, sender=Insumo)
 def sync_stock_insumo(sender, instance, **kwargs):
-    if instance.deposito:
-        StockInsumo.objects.update_or_create(
+    # Solo asegura la fila del depósito del insumo: el total se deriva de StockInsumo,
+    # así que copiar instance.stock (valor en memoria) pisaría movimientos recientes.
+    if instance.deposito_id:
+        StockInsumo.objects.get_or_create(
             insumo=instance,
-            deposito=instance.deposito,
-            defaults={"cantidad": instance.stock},
+            deposito_id=instance.deposito_id,
+            defaults={"cantidad": 0},
+        )
+
+# Mantener el stock total materializado (Insumo.stock_total / ProductoTerminado.stock_total)
+# en cada escritura de una fila de stock por depósito.
+@receiver(post_save, sender=StockInsumo)
+@receiver(post_delete, sender=StockInsumo)
+def actualizar_stock_total_insumo(sender, instance, **kwargs):
+    Insumo.recalcular_stock_total([instance.insumo_id])
+
+
+@receiver(post_save, sender=StockProductoTerminado)
+@receiver(post_delete, sender=StockProductoTerminado)
+def actualizar_stock_total_producto(sender, instance, **kwargs):
+    ProductoTerminado.recalcular_stock_total([instance.producto_id])
+
+
+# Publicar los cambios de stock por depósito a las conexiones SSE (services/eventos_tiempo_real.py)
+@receiver(post_save, sender=StockInsumo)
+@receiver(post_delete, sender=StockInsumo)
+@receiver(post_save, sender=StockProductoTerminado)
+@receiver(post_delete, sender=StockProductoTerminado)
+def publicar_cambio_stock(sender, instance, signal, **kwargs):
+    if sender is StockInsumo:
+        tipo, item_id = "insumo", instance.insumo_id
+    else:
+        tipo, item_id = "producto", instance.producto_id
+    publicar_cambios_stock(instance.empresa_id, [{
+        "tipo": tipo,
+        "id": item_id,
+        "deposito_id": instance.deposito_id,
+        "cantidad": 0 if signal is post_delete else instance.cantidad,
+    }])
+
+
+# Invalidar los contadores cacheados del sidebar (services/contadores_sidebar.py)
+@receiver(post_save, sender=Orden)
+@receiver(post_delete, sender=Orden)
+@receiver(post_save, sender=OrdenProduccion)
+@receiver(post_delete, sender=OrdenProduccion)
+@receiver(post_save, sender=Reportes)
+@receiver(post_delete, sender=Reportes)
+@receiver(post_save, sender=Insumo)
+@receiver(post_delete, sender=Insumo)
+@receiver(post_save, sender=StockInsumo)
+@receiver(post_delete, sender=StockInsumo)
+@receiver(post_save, sender=StockProductoTerminado)
+@receiver(post_delete, sender=StockProductoTerminado)
+def invalidar_contadores_sidebar(sender, instance, **kwargs):
+    invalidar_contadores(instance.empresa_id)
+
+# Invalidar los roles cacheados (utils.roles_usuario) cuando cambian los grupos de un usuario
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_roles_por_cambio_de_grupos(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action not in ("post_add", "post_remove", "post_clear"):
+            return
+        # Descartar el memo del request en curso para esta instancia
+        instance.__dict__.pop("_luminova_roles", None)
+        user_ids = [instance.pk]
+    elif action == "pre_clear":
+        user_ids = list(instance.user_set.values_list("id", flat=True))
+    elif action in ("post_add", "post_remove"):
+        user_ids = list(pk_set or ())
+    else:
+        return
+    transaction.on_commit(lambda: invalidar_roles_usuarios(user_ids))
+
+
+# Renombrar o eliminar un grupo cambia los roles de todos sus usuarios
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidar_roles_por_cambio_en_grupo(sender, instance, **kwargs):
+    user_ids = list(instance.user_set.values_list("id", flat=True))
+    if user_ids:
+        transaction.on_commit(lambda: invalidar_roles_usuarios(user_ids))
+
+# Invalidar lo cacheado por PasswordChangeMiddleware (middleware.py). Se invalida de inmediato
+# y otra vez al confirmar, por si otro request cacheó el valor previo mientras tanto.
+@receiver(post_save, sender=PasswordChangeRequired)
+@receiver(post_delete, sender=PasswordChangeRequired)
+def invalidar_cache_cambio_password(sender, instance, **kwargs):
+    invalidar_cambio_password(instance.user_id)
+    transaction.on_commit(lambda: invalidar_cambio_password(instance.user_id))
+
+
+# Feed de notificaciones (services/notificaciones_feed.py): nueva versión por grupo
+@receiver(post_save, sender=NotificacionSistema)
+@receiver(post_delete, sender=NotificacionSistema)
+def invalidar_feed_notificaciones(sender, instance, **kwargs):
+    invalidar_feed(instance.empresa_id, [instance.destinatario_grupo])
+
+
+# Cuando una OC sale de BORRADOR, el stock bajo de su insumo ya está gestionado
+@receiver(post_save, sender=Orden)
+def resolver_stock_bajo_por_oc_confirmada(sender, instance, created, **kwargs):
+    estado_anterior = None if created else getattr(instance, "_estado_cargado", None)
+    instance._estado_cargado = instance.estado
+    if (
+        instance.tipo == "compra"
+        and instance.insumo_principal_id
+        and instance.estado in ESTADOS_OC_EN_PROCESO
+        and estado_anterior not in ESTADOS_OC_EN_PROCESO
+    ):
+        insumo_id = instance.insumo_principal_id
+        transaction.on_commit(lambda: resolver_notificaciones_stock_bajo([insumo_id]))
+
+
+# Mantener el índice de mejores ofertas (services/ofertas_proveedor.py)
+@receiver(post_save, sender=OfertaProveedor)
+@receiver(post_delete, sender=OfertaProveedor)
+def actualizar_indice_ofertas(sender, instance, **kwargs):
+    recalcular_indice_ofertas([instance.insumo_id])
+
+
+# El nombre del proveedor forma parte de las ofertas cacheadas
+@receiver(post_save, sender=Proveedor)
+def invalidar_ofertas_por_proveedor(sender, instance, created, **kwargs):
+    if not created:
+        invalidar_ofertas_insumos(
+            list(instance.provee_insumos.values_list("insumo_id", flat=True))
         )
 
 # Sincronizar StockProductoTerminado al crear o actualizar un ProductoTerminado
@@ -110,20 +240,14 @@ def registrar_creacion_reporte_en_historial_ov(sender, instance, created, **kwar
 
 # --- SEÑALES PARA SINCRONIZACIÓN DE ESTADOS OV-OP ---
 @receiver(post_save, sender=OrdenProduccion)
+@receiver(post_delete, sender=OrdenProduccion)
 def actualizar_estado_ov_por_cambio_op(sender, instance, **kwargs):
     """
-    Actualiza automáticamente el estado de la OV cuando cambia el estado de una OP asociada.
+    Agenda el recálculo del estado de la OV cuando cambia una OP asociada.
+    Se ejecuta una vez por OV al confirmar la transacción (ver services/estado_ov.py).
     """
-    if instance.orden_venta_origen:
-        try:
-            # Usar transaction para evitar problemas de concurrencia
-            with transaction.atomic():
-                instance.orden_venta_origen.actualizar_estado_por_ops()
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Error actualizando estado OV {instance.orden_venta_origen.numero_ov} "
-                        f"por cambio en OP {instance.numero_op}: {e}")
+    if instance.orden_venta_origen_id:
+        programar_recalculo_estado_ov(instance.orden_venta_origen_id)
 
 
 def get_client_ip(request):
@@ -2,6 +2,7 @@ from django.urls import path
 from ..views import ajax_marcar_notificacion_leida
 from ..views import (
     compras_lista_oc_view,
+    compras_lista_oc_fragmento_view,
     compras_crear_oc_view,
     compras_seleccionar_proveedor_para_insumo_view,
     compras_detalle_oc_view,
@@ -20,6 +21,11 @@ urlpatterns = [
     path(
         "compras/", compras_lista_oc_view, name="compras_lista_oc"
     ),  # Vista principal de compras
+    path(
+        "compras/ordenes/filas/",
+        compras_lista_oc_fragmento_view,
+        name="compras_lista_oc_fragmento",
+    ),
     path("compras/desglose/", compras_desglose_view, name="compras_desglose"),
     path("compras/seguimiento/", compras_seguimiento_view, name="compras_seguimiento"),
     path(
@@ -10,6 +10,7 @@ from ..views import (
     deposito_enviar_lote_pt_view,
     recepcion_pedidos_view,
     recibir_pedido_oc_view,
+    recibir_pedidos_lote_view,
     ProveedorListView,
     ProveedorDetailView,
     proveedor_create_view, # Vista para crear un nuevo proveedor - Refactorizar a ProveedorCreateView usando CBV
@@ -36,12 +37,16 @@ from ..views import (
 )
 from App_LUMINOVA.views_compras import (
     ajax_notificaciones_no_leidas,
+    eventos_tiempo_real_view,
 )
 from ..views_deposito import (
     seleccionar_deposito_view, 
     deposito_dashboard_view, 
     transferencia_insumo_view,
     transferencia_producto_view,
+    transferencia_lote_view,
+    stock_a_fecha_view,
+    kardex_view,
     entrada_stock_insumo,
     salida_stock_insumo,
     entrada_stock_producto,
@@ -84,9 +89,15 @@ urlpatterns = [
         recibir_pedido_oc_view,
         name="deposito_recibir_pedido",
     ),
+    path(
+        "deposito/recibir-pedidos/",
+        recibir_pedidos_lote_view,
+        name="deposito_recibir_pedidos_lote",
+    ),
     path('deposito/seleccionar/', seleccionar_deposito_view, name='seleccionar_deposito'),
     path('deposito/dashboard/', deposito_dashboard_view, name='deposito_dashboard'),
     path('ajax/notificaciones-no-leidas/', ajax_notificaciones_no_leidas, name='ajax_notificaciones_no_leidas'),
+    path('ajax/eventos/', eventos_tiempo_real_view, name='eventos_tiempo_real'),
     # CRUDs para Fabricantes, Proveedores (Class-Based Views)
     path(
         "ventas/proveedores/proveedor/",
@@ -208,6 +219,9 @@ urlpatterns = [
     ),
     path("deposito/transferir-insumo/", transferencia_insumo_view, name="transferencia_insumo"),
     path("deposito/transferir-producto/", transferencia_producto_view, name="transferencia_producto"),
+    path("deposito/transferir-lote/", transferencia_lote_view, name="transferencia_lote"),
+    path("deposito/stock-a-fecha/", stock_a_fecha_view, name="stock_a_fecha"),
+    path("deposito/kardex/<str:tipo_item>/<int:item_id>/", kardex_view, name="kardex"),
     path("deposito/entrada-insumo/<int:insumo_id>/<int:deposito_id>/", entrada_stock_insumo, name="entrada_stock_insumo"),
     path("deposito/salida-insumo/<int:insumo_id>/<int:deposito_id>/", salida_stock_insumo, name="salida_stock_insumo"),
     path("deposito/entrada-producto/<int:producto_id>/<int:deposito_id>/", entrada_stock_producto, name="entrada_stock_producto"),
@@ -1,5 +1,86 @@
-from django.db.models import Sum, Subquery, OuterRef, IntegerField, Value
-from django.db.models.functions import Coalesce
+from django.db.models import F
+
+
+# =============================================================================
+# CLAVES DE CACHÉ POR TENANT
+# =============================================================================
+
+def clave_tenant(clave):
+    """
+    Antepone el schema del tenant actual a una clave de caché.
+
+    Cada tenant tiene sus propias tablas (usuarios incluidos), así que los ids se
+    repiten entre schemas: toda clave cacheada que incluya ids debe pasar por acá.
+    """
+    from django.db import connection
+
+    return f"{getattr(connection, 'schema_name', 'public')}:{clave}"
+
+
+# =============================================================================
+# RESOLUCIÓN DE ROLES (cacheada por request y entre requests)
+# =============================================================================
+
+# La versión por usuario invalida al instante; el timeout acota lo que puede durar
+# un valor viejo si una escritura no pasó por las señales.
+ROLES_CACHE_TIMEOUT = 5 * 60
+_CLAVE_VERSION_ROLES = "luminova:roles:version:{user_id}"
+_CLAVE_ROLES = "luminova:roles:{user_id}:{version}"
+
+
+def _normalizar_roles(nombres_grupos):
+    """
+    Normaliza los nombres de grupo a un conjunto de roles en minúsculas.
+    Incluye el nombre completo y, en formato multi-tenant ('ID__Rol'), el rol sin prefijo.
+    """
+    roles = set()
+    for nombre in nombres_grupos:
+        nombre_lower = nombre.lower()
+        roles.add(nombre_lower)
+        if '__' in nombre_lower:
+            roles.add(nombre_lower.split('__', 1)[1])
+        # Formato con prefijo de empresa (ej: '2__Administrador')
+        if nombre_lower.endswith('__administrador'):
+            roles.add('administrador')
+    return frozenset(roles)
+
+
+def roles_usuario(user):
+    """
+    Devuelve el conjunto normalizado de roles del usuario.
+
+    Se calcula una vez por request (memo en la instancia del usuario) y se cachea
+    entre requests, por tenant, bajo una versión por usuario que se incrementa cuando cambian
+    sus grupos (ver signals.py), por lo que el camino habitual no consulta la base.
+    """
+    roles = getattr(user, '_luminova_roles', None)
+    if roles is not None:
+        return roles
+    if not user.pk:
+        return frozenset()
+
+    from django.core.cache import cache
+
+    version = cache.get(clave_tenant(_CLAVE_VERSION_ROLES.format(user_id=user.pk)), 0)
+    clave = clave_tenant(_CLAVE_ROLES.format(user_id=user.pk, version=version))
+    roles = cache.get(clave)
+    if roles is None:
+        roles = _normalizar_roles(user.groups.values_list('name', flat=True))
+        cache.set(clave, roles, ROLES_CACHE_TIMEOUT)
+    user._luminova_roles = roles
+    return roles
+
+
+def invalidar_roles_usuarios(user_ids):
+    """Invalida los roles cacheados de los usuarios indicados."""
+    from django.core.cache import cache
+
+    for user_id in user_ids:
+        clave = clave_tenant(_CLAVE_VERSION_ROLES.format(user_id=user_id))
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, 1, None)
 
 
 def es_admin(user):
@@ -9,13 +90,7 @@ def es_admin(user):
     """
     if user.is_superuser:
         return True
-    # Buscar grupo administrador en cualquier formato
-    for grupo in user.groups.all():
-        nombre_lower = grupo.name.lower()
-        # Formato directo o con prefijo de empresa (ej: '2__Administrador')
-        if nombre_lower == 'administrador' or nombre_lower.endswith('__administrador'):
-            return True
-    return False
+    return 'administrador' in roles_usuario(user)
 
 
 def tiene_rol(user, nombre_rol):
@@ -34,18 +109,7 @@ def tiene_rol(user, nombre_rol):
     # Normalizar variantes de depósito
     if nombre_rol_lower == "deposito":
         nombre_rol_lower = "depósito"
-    
-    for grupo in user.groups.all():
-        nombre_grupo = grupo.name.lower()
-        # Formato directo
-        if nombre_grupo == nombre_rol_lower:
-            return True
-        # Formato multi-tenant (ej: '2__Depósito')
-        if '__' in nombre_grupo:
-            rol_sin_prefijo = nombre_grupo.split('__', 1)[1]
-            if rol_sin_prefijo == nombre_rol_lower:
-                return True
-    return False
+    return nombre_rol_lower in roles_usuario(user)
 
 
 def es_admin_o_rol(user, roles_permitidos=None):
@@ -69,18 +133,7 @@ def es_admin_o_rol(user, roles_permitidos=None):
     # Siempre incluir administrador
     roles_normalizados.add("administrador")
     
-    # Verificar si el usuario tiene alguno de los roles
-    for grupo in user.groups.all():
-        nombre_grupo = grupo.name.lower()
-        # Verificar formato directo
-        if nombre_grupo in roles_normalizados:
-            return True
-        # Verificar formato multi-tenant (ej: '2__ventas')
-        if '__' in nombre_grupo:
-            rol_sin_prefijo = nombre_grupo.split('__', 1)[1]
-            if rol_sin_prefijo in roles_normalizados:
-                return True
-    return False
+    return not roles_normalizados.isdisjoint(roles_usuario(user))
 
 
 def redirigir_segun_rol(user):
@@ -119,9 +172,13 @@ def redirigir_segun_rol(user):
 # HELPERS PARA STOCK CALCULADO (Normalización BD)
 # =============================================================================
 
+# Stock total por debajo del cual un insumo se considera crítico. Es el único
+# lugar donde se define: dashboards, badges del sidebar y compras lo importan.
+UMBRAL_STOCK_BAJO = 15000
+
 def annotate_insumo_stock(queryset):
     """
-    Anota el queryset de Insumo con el stock calculado desde StockInsumo.
+    Anota el queryset de Insumo con el stock total (columna materializada stock_total).
     
     Uso:
         from App_LUMINOVA.utils import annotate_insumo_stock
@@ -134,22 +191,12 @@ def annotate_insumo_stock(queryset):
     Returns:
         QuerySet anotado con campo 'stock_calculado'
     """
-    from App_LUMINOVA.models import StockInsumo
-    
-    stock_subquery = StockInsumo.objects.filter(
-        insumo=OuterRef('pk')
-    ).values('insumo').annotate(
-        total=Sum('cantidad')
-    ).values('total')
-    
-    return queryset.annotate(
-        stock_calculado=Coalesce(Subquery(stock_subquery), Value(0), output_field=IntegerField())
-    )
+    return queryset.annotate(stock_calculado=F('stock_total'))
 
 
 def annotate_producto_stock(queryset):
     """
-    Anota el queryset de ProductoTerminado con el stock calculado desde StockProductoTerminado.
+    Anota el queryset de ProductoTerminado con el stock total (columna materializada stock_total).
     
     Uso:
         from App_LUMINOVA.utils import annotate_producto_stock
@@ -162,26 +209,16 @@ def annotate_producto_stock(queryset):
     Returns:
         QuerySet anotado con campo 'stock_calculado'
     """
-    from App_LUMINOVA.models import StockProductoTerminado
-    
-    stock_subquery = StockProductoTerminado.objects.filter(
-        producto=OuterRef('pk')
-    ).values('producto').annotate(
-        total=Sum('cantidad')
-    ).values('total')
-    
-    return queryset.annotate(
-        stock_calculado=Coalesce(Subquery(stock_subquery), Value(0), output_field=IntegerField())
-    )
+    return queryset.annotate(stock_calculado=F('stock_total'))
 
 
-def get_insumos_stock_bajo(depositos=None, umbral=15000, empresa=None):
+def get_insumos_stock_bajo(depositos=None, umbral=UMBRAL_STOCK_BAJO, empresa=None):
     """
     Obtiene insumos con stock bajo el umbral especificado.
     
     Args:
         depositos: QuerySet o lista de depósitos para filtrar (opcional)
-        umbral: Umbral de stock mínimo (default: 15000)
+        umbral: Umbral de stock mínimo (default: UMBRAL_STOCK_BAJO)
         empresa: Empresa para filtrar (opcional)
         
     Returns:
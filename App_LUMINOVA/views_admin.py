@@ -31,6 +31,7 @@ from .models import (
     RolEmpresa,
 )
 
+from .middleware import requiere_cambio_password
 from .utils import es_admin
 
 logger = logging.getLogger(__name__)
@@ -206,7 +207,7 @@ def change_password_view(request):
             form.fields["new_password2"].widget.attrs["autocomplete"] = "new-password"
             messages.error(request, "Por favor, corrige los errores a continuación.")
     else:
-        if not PasswordChangeRequired.objects.filter(user=request.user).exists():
+        if not requiere_cambio_password(request.user):
             return redirect("App_LUMINOVA:dashboard")
 
         form = PasswordChangeForm(request.user)
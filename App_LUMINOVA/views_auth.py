@@ -7,7 +7,7 @@ from django.db.models import Sum, F
 from datetime import timedelta
 
 from .models import AuditoriaAcceso, Reportes, OrdenProduccion, Orden, Insumo, OrdenVenta, Deposito
-from .utils import annotate_insumo_stock, get_insumos_stock_bajo
+from .utils import UMBRAL_STOCK_BAJO, annotate_insumo_stock, get_insumos_stock_bajo
 
 def get_client_ip(request):
     """Obtener la IP del cliente desde el request."""
@@ -127,7 +127,6 @@ def dashboard_view(request):
     ).count()
 
     # --- 2. Tarjeta: Stock Crítico ---
-    UMBRAL_STOCK_BAJO = 15000
     # Solo mostrar insumos críticos que NO tengan OC activa (aprobada, enviada, en tránsito, etc.)
     ESTADOS_OC_ACTIVA = [
         "APROBADA",
@@ -20,7 +20,6 @@ def ajax_marcar_notificacion_leida(request):
         logger.info(f"[AJAX] Intentando marcar notificación {notif_id} como leída. insumo_id={insumo_id}")
         if insumo_id:
             from App_LUMINOVA.models import Insumo, Orden
-            UMBRAL_STOCK_BAJO_INSUMOS = 15000
             try:
                 insumo = Insumo.objects.get(id=insumo_id)
                 stock_actual = insumo.stock
@@ -40,9 +39,10 @@ def ajax_marcar_notificacion_leida(request):
                 ).filter(
                     Q(deposito=insumo.deposito) | Q(deposito__isnull=True)
                 ).aggregate(total=Sum('cantidad_principal'))['total'] or 0
-                logger.info(f"[AJAX] Insumo {insumo_id}: stock_actual={stock_actual}, total_en_ocs={total_en_ocs}, umbral={UMBRAL_STOCK_BAJO_INSUMOS}")
-                if (stock_actual + total_en_ocs) >= UMBRAL_STOCK_BAJO_INSUMOS:
-                    notif.marcar_como_leida(request.user)
+                logger.info(f"[AJAX] Insumo {insumo_id}: stock_actual={stock_actual}, total_en_ocs={total_en_ocs}, umbral={UMBRAL_STOCK_BAJO}")
+                if (stock_actual + total_en_ocs) >= UMBRAL_STOCK_BAJO:
+                    # El insumo dejó de ser crítico: se resuelve para todo el grupo
+                    notif.marcar_como_leida()
                     logger.info(f"[AJAX] Notificación {notif_id} marcada como leída (insumo ya no crítico)")
                     return JsonResponse({'success': True, 'marcada': True})
                 else:
@@ -69,105 +69,66 @@ from App_LUMINOVA.models import NotificacionSistema
 @login_required
 @require_GET
 def ajax_notificaciones_no_leidas(request):
-    user = request.user
-    grupos = user.groups.values_list('name', flat=True)
-    # Antes de obtener las notificaciones, marcar como leídas todas las de insumos con OC post-borrador
-    from App_LUMINOVA.models import Insumo, Orden
-    from django.db.models import Q, Sum
-    UMBRAL_STOCK_BAJO_INSUMOS = 15000
-    ESTADOS_OC_POST_BORRADOR = [
-        "APROBADA",
-        "ENVIADA_PROVEEDOR",
-        "EN_TRANSITO",
-        "RECIBIDA_PARCIAL",
-        "RECIBIDA_TOTAL",
-        "COMPLETADA",
-    ]
-    # Buscar todos los insumos con OC post-borrador
-    insumos_con_oc_post_borrador = set(
-        Orden.objects.filter(
-            tipo="compra",
-            estado__in=ESTADOS_OC_POST_BORRADOR
-        ).values_list('insumo_principal', flat=True)
+    """
+    Feed de notificaciones no leídas de los grupos del usuario (solo lectura).
+
+    Responde 304 si el ETag enviado en If-None-Match sigue vigente. Para recibir
+    cambios sin hacer polling está eventos_tiempo_real_view (SSE).
+    Ver services/notificaciones_feed.py.
+    """
+    empresa = getattr(request, 'empresa_actual', None)
+    empresa_id = empresa.pk if empresa else None
+    grupos = NotificationService.grupos_notificacion(request.user)
+    etag_cliente = request.headers.get('If-None-Match')
+    etag = calcular_etag(empresa_id, grupos, request.user.pk)
+
+    if etag_cliente == etag:
+        response = HttpResponse(status=304)
+    else:
+        response = JsonResponse({'notificaciones': obtener_feed(empresa_id, grupos, etag, request.user.pk)})
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# --- VISTA ASÍNCRONA: eventos en tiempo real (SSE) para el usuario/grupo ---
+@login_required
+async def eventos_tiempo_real_view(request):
+    """
+    Flujo Server-Sent Events con las notificaciones y los cambios de stock de los
+    grupos del usuario en la empresa actual (ver services/eventos_tiempo_real.py).
+
+    Reanuda desde ``Last-Event-ID`` (o ``?desde=``). Requiere ASGI: bajo WSGI cada
+    conexión ocuparía un worker, así que se responde 204 y el navegador no reintenta.
+    Lo mismo sin un tenant resuelto (schema public): no hay canales propios que escuchar.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    tenant = getattr(request, 'tenant', None)
+    if tenant is None or tenant.schema_name == get_public_schema_name():
+        return HttpResponse(status=204)
+
+    usuario = await request.auser()
+    grupos = await sync_to_async(NotificationService.grupos_notificacion)(usuario)
+    if not grupos:
+        return HttpResponse(status=204)
+
+    empresa = getattr(request, 'empresa_actual', None)
+    try:
+        desde_id = int(request.headers.get('Last-Event-ID') or request.GET.get('desde', ''))
+    except ValueError:
+        desde_id = None
+
+    response = StreamingHttpResponse(
+        flujo_eventos(canales_eventos(tenant.schema_name, empresa.pk if empresa else None, grupos), desde_id),
+        content_type='text/event-stream',
     )
-    # Marcar como leídas todas las notificaciones de stock bajo de esos insumos
-    if insumos_con_oc_post_borrador:
-        NotificacionSistema.objects.filter(
-            leida=False,
-            tipo='stock_bajo',
-            datos_contexto__insumo_id__in=insumos_con_oc_post_borrador,
-            destinatario_grupo__in=grupos
-        ).update(leida=True)
-
-    # Ahora sí, obtener solo las no leídas (ya filtradas)
-    notificaciones = NotificacionSistema.objects.filter(
-        leida=False,
-        destinatario_grupo__in=grupos
-    ).order_by('-fecha_creacion')[:20]
-
-    # Solo mostrar notificaciones de insumos que realmente siguen críticos
-    data = []
-    from App_LUMINOVA.models import Insumo, Orden
-    from django.db.models import Q, Sum
-    UMBRAL_STOCK_BAJO_INSUMOS = 15000
-    ESTADOS_OC_POST_BORRADOR = [
-        "APROBADA",
-        "ENVIADA_PROVEEDOR",
-        "EN_TRANSITO",
-        "RECIBIDA_PARCIAL",
-        "RECIBIDA_TOTAL",
-        "COMPLETADA",
-    ]
-    # Para evitar duplicados, llevamos registro de insumos ya notificados
-    insumos_notificados = set()
-    for n in notificaciones:
-        insumo_id = n.datos_contexto.get('insumo_id') if n.datos_contexto else None
-        if n.tipo == 'stock_bajo' and insumo_id:
-            try:
-                insumo = Insumo.objects.get(id=insumo_id)
-                # Si existe al menos una OC en estado post-borrador para este insumo y depósito, marcar todas las notificaciones como leídas
-                existe_oc_post_borrador = Orden.objects.filter(
-                    tipo="compra",
-                    estado__in=ESTADOS_OC_POST_BORRADOR,
-                    insumo_principal=insumo
-                ).filter(
-                    Q(deposito=insumo.deposito) | Q(deposito__isnull=True)
-                ).exists()
-                if existe_oc_post_borrador:
-                    # Marcar todas las notificaciones de stock bajo de este insumo como leídas para este usuario
-                    NotificacionSistema.objects.filter(
-                        leida=False,
-                        tipo='stock_bajo',
-                        datos_contexto__insumo_id=insumo_id,
-                        destinatario_grupo__in=grupos
-                    ).update(leida=True)
-                    continue  # No mostrar ninguna notificación de este insumo
-                # Evitar duplicados: solo mostrar una notificación por insumo
-                if insumo_id in insumos_notificados:
-                    continue
-                insumos_notificados.add(insumo_id)
-                data.append({
-                    'id': n.id,
-                    'titulo': n.titulo,
-                    'mensaje': n.mensaje,
-                    'tipo': n.tipo,
-                    'fecha': n.fecha_creacion.strftime('%d/%m/%Y %H:%M'),
-                    'prioridad': n.prioridad,
-                })
-            except Insumo.DoesNotExist:
-                continue
-        else:
-            # Para otros tipos de notificación, mostrar normalmente
-            data.append({
-                'id': n.id,
-                'titulo': n.titulo,
-                'mensaje': n.mensaje,
-                'tipo': n.tipo,
-                'fecha': n.fecha_creacion.strftime('%d/%m/%Y %H:%M'),
-                'prioridad': n.prioridad,
-            })
-    return JsonResponse({'notificaciones': data})
+    response['Cache-Control'] = 'no-cache'
+    # Evita que nginx acumule el flujo en su buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
 import logging
+from collections import OrderedDict
 from datetime import timedelta
 
 from django.contrib import messages
@@ -184,7 +145,9 @@ from django.db import transaction
 from django.db.models import Exists, F, OuterRef, Prefetch, ProtectedError, Q, Sum
 
 # Django Core Imports
-from django.http import HttpResponse, JsonResponse
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
 from django.utils import timezone
@@ -197,6 +160,7 @@ from django.views.generic import (
     ListView,
     UpdateView,
 )
+from django_tenants.utils import get_public_schema_name
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet
@@ -251,12 +215,17 @@ from .models import (
 )
 
 # Local Application Imports (Services)
+from .services.listado_oc import ESTADOS_OC, ESTADOS_SEGUIMIENTO, construir_pestanas, pagina_ocs
+from .services.necesidades_compra import agrupar_insumos_criticos, insumos_que_necesitan_compra
 from .services.notification_service import NotificationService
+from .services.eventos_tiempo_real import canales as canales_eventos, flujo_eventos
+from .services.notificaciones_feed import calcular_etag, obtener_feed
+from .services.ofertas_proveedor import obtener_oferta, obtener_ofertas_insumo, proveedores_con_oferta
 from .signals import get_client_ip
 
 from .services.document_services import generar_siguiente_numero_documento
 from .services.pdf_services import generar_pdf_factura
-from .utils import es_admin, es_admin_o_rol, annotate_insumo_stock
+from .utils import UMBRAL_STOCK_BAJO, es_admin, es_admin_o_rol, annotate_insumo_stock
 from .empresa_filters import (
     get_depositos_empresa,
     filter_ordenes_compra_por_empresa,
@@ -267,51 +236,58 @@ from .empresa_filters import (
 logger = logging.getLogger(__name__)
 
 # --- COMPRAS VIEWS ---
+def _ocs_compra_empresa(request):
+    # FILTRO POR EMPRESA: Solo OCs de la empresa actual
+    return filter_ordenes_compra_por_empresa(request, Orden.objects.filter(tipo="compra"))
+
+
 @login_required
 def compras_lista_oc_view(request):
     # if not es_admin_o_rol(request.user, ['compras', 'administrador']):
     #     messages.error(request, "Acceso denegado.")
     #     return redirect('App_LUMINOVA:dashboard')
 
-    # FILTRO POR EMPRESA: Solo mostrar OCs de la empresa actual
-    # Filtrar órdenes de tipo 'compra'
-    # Asumiendo que tu modelo Orden tiene un campo 'tipo' y 'proveedor'
-    # Agrupar OCs por estado para las pestañas
-    from collections import OrderedDict
-    ESTADOS_OC = OrderedDict([
-        ("BORRADOR", "Borrador"),
-        ("APROBADA", "Aprobada"),
-        ("ENVIADA_PROVEEDOR", "Enviada a Proveedor"),
-        ("EN_TRANSITO", "En Tránsito"),
-        ("RECIBIDA_PARCIAL", "Recibida Parcial"),
-        ("RECIBIDA_TOTAL", "Recibida Total"),
-        ("COMPLETADA", "Completada"),
-        ("CANCELADA", "Cancelada"),
-    ])
-    
-    # Aplicar filtro de empresa
-    ordenes_compra = filter_ordenes_compra_por_empresa(
-        request,
-        Orden.objects.filter(tipo="compra")
-        .select_related("proveedor", "insumo_principal")
-        .order_by("-fecha_creacion")
-    )
-    ordenes_por_estado = {estado: [] for estado in ESTADOS_OC.keys()}
-    for oc in ordenes_compra:
-        if oc.estado in ordenes_por_estado:
-            ordenes_por_estado[oc.estado].append(oc)
-    # Preparar lista de tuplas para la plantilla: (estado, nombre, ocs)
-    estados_oc_tabs = []
-    for estado, nombre in ESTADOS_OC.items():
-        ocs = ordenes_por_estado.get(estado, [])
-        estados_oc_tabs.append((estado, nombre, ocs))
+    # Los totales de las pestañas salen de una consulta agrupada por estado; las filas
+    # de cada pestaña se cargan bajo demanda (ver compras_lista_oc_fragmento_view).
     context = {
-        "estados_oc_tabs": estados_oc_tabs,
+        "estados_oc_tabs": construir_pestanas(_ocs_compra_empresa(request)),
+        "vista_listado": "lista",
         "titulo_seccion": "Listado de Órdenes de Compra",
     }
     return render(request, "compras/compras_lista_oc.html", context)
 
 
+@login_required
+@require_GET
+def compras_lista_oc_fragmento_view(request):
+    """
+    Filas de una pestaña del listado de OCs (fragmento HTML), paginadas por cursor.
+    Parámetros: estado, vista ("lista" o "seguimiento") y cursor (opcional).
+    """
+    vista = request.GET.get("vista", "lista")
+    estado = request.GET.get("estado")
+    estados_validos = ESTADOS_SEGUIMIENTO if vista == "seguimiento" else ESTADOS_OC
+    if estado not in estados_validos:
+        return HttpResponse("Estado inválido", status=400)
+
+    ocs, siguiente_cursor = pagina_ocs(
+        _ocs_compra_empresa(request).select_related("proveedor", "insumo_principal", "deposito"),
+        estado,
+        request.GET.get("cursor"),
+    )
+    plantilla = (
+        "compras/oc_filas_seguimiento.html" if vista == "seguimiento" else "compras/oc_filas_lista.html"
+    )
+    context = {
+        "ocs": ocs,
+        "estado": estado,
+        "vista_listado": vista,
+        "siguiente_cursor": siguiente_cursor,
+        "es_primera_pagina": not request.GET.get("cursor"),
+    }
+    return render(request, plantilla, context)
+
+
 @login_required
 def compras_desglose_view(request):
     """Vista principal de compras con notificaciones de depósito"""
@@ -335,147 +311,23 @@ def compras_desglose_view(request):
     else:
         notificaciones_stock_bajo = [n for n in notificaciones_usuario if getattr(n, 'tipo', None) == 'stock_bajo']
 
-    UMBRAL_STOCK_BAJO_INSUMOS = 15000
-
-    # --- LÓGICA CORREGIDA ---
-    # Un insumo necesita gestión si su OC o no existe, o si está SOLAMENTE en estado 'BORRADOR'.
-    # Si ya está 'APROBADA' o más allá, el equipo de compras ya hizo su parte principal.
-
-    # 1. Obtenemos los IDs de insumos que ya tienen una OC "en firme" (es decir, post-borrador)
-    # con cantidad suficiente para cubrir el déficit
-    ESTADOS_OC_POST_BORRADOR = [
-        "APROBADA",
-        "ENVIADA_PROVEEDOR",
-        "EN_TRANSITO",
-        "RECIBIDA_PARCIAL",
-        "RECIBIDA_TOTAL",
-        "COMPLETADA",
-    ]
-    
-    # Obtener insumos con OC aprobadas y verificar si la cantidad es suficiente
-    from django.db.models import Sum
-    insumos_con_oc_suficiente = []
-    
-    # FILTRO POR EMPRESA: Solo evaluar insumos de la empresa
-    # Usar anotación de stock calculado para filtrar
-    insumos_bajo_stock = filter_insumos_por_empresa(
-        request,
-        annotate_insumo_stock(Insumo.objects.all()).filter(stock_calculado__lt=UMBRAL_STOCK_BAJO_INSUMOS)
-    )
-    
-    for insumo in insumos_bajo_stock:
-        # Calcular total en órdenes de compra activas para este insumo y su depósito
-        from django.db.models import Q
-        total_en_ocs = Orden.objects.filter(
-            tipo="compra",
-            estado__in=ESTADOS_OC_POST_BORRADOR,
-            insumo_principal=insumo
-        ).filter(
-            Q(deposito=insumo.deposito) | Q(deposito__isnull=True)
-        ).aggregate(total=Sum('cantidad_principal'))['total'] or 0
-        # Si el stock actual + lo que viene en OCs >= umbral, no necesita más gestión
-        # Usar stock_calculado si está anotado, sino property stock
-        stock_actual = getattr(insumo, 'stock_calculado', insumo.stock)
-        if (stock_actual + total_en_ocs) >= UMBRAL_STOCK_BAJO_INSUMOS:
-            insumos_con_oc_suficiente.append(insumo.id)
-    
-    insumos_ya_gestionados_ids = insumos_con_oc_suficiente
-
-    logger.info(
-        f"IDs de insumos que ya tienen OC post-borrador con cantidad suficiente: {list(insumos_ya_gestionados_ids)}"
-    )
-
-    # Debug detallado para verificar cada insumo - FILTRADO POR EMPRESA
-    all_insumos_bajo_stock = filter_insumos_por_empresa(
-        request,
-        annotate_insumo_stock(Insumo.objects.all()).filter(stock_calculado__lt=UMBRAL_STOCK_BAJO_INSUMOS)
-    )
-    logger.info(f"=== DEBUG DESGLOSE DE COMPRAS ===")
-    logger.info(f"Umbral de stock bajo: {UMBRAL_STOCK_BAJO_INSUMOS}")
-    if hasattr(all_insumos_bajo_stock, 'count'):
-        logger.info(f"Total de insumos con stock bajo: {all_insumos_bajo_stock.count()}")
-    else:
-        logger.info(f"Total de insumos con stock bajo: {len(all_insumos_bajo_stock)}")
-    
-    for insumo in all_insumos_bajo_stock:
-        ocs_activas = Orden.objects.filter(
-            tipo="compra",
-            estado__in=ESTADOS_OC_POST_BORRADOR,
-            insumo_principal=insumo
-        )
-        total_en_ocs = ocs_activas.aggregate(total=Sum('cantidad_principal'))['total'] or 0
-        stock_actual = getattr(insumo, 'stock_calculado', insumo.stock)
-        stock_final = stock_actual + total_en_ocs
-        necesita_compra = stock_final < UMBRAL_STOCK_BAJO_INSUMOS
-        
-        logger.info(f"  Insumo '{insumo.descripcion}' (ID: {insumo.id}):")
-        logger.info(f"    Stock actual: {stock_actual}")
-        logger.info(f"    En OCs activas: {total_en_ocs}")
-        logger.info(f"    Stock proyectado: {stock_final}")
-        logger.info(f"    Necesita compra: {necesita_compra}")
-        logger.info(f"    OCs activas: {ocs_activas.count()}")
-        
-        for oc in ocs_activas:
-            logger.info(f"      - OC #{oc.id}: Estado={oc.estado}, Cantidad={oc.cantidad_principal}")
-
-    # 2. Buscamos insumos críticos, EXCLUYENDO los que ya están gestionados.
-    #    La lista resultante solo contendrá insumos sin OC o con OC en 'BORRADOR'.
-    # Agrupar insumos globalmente y sumar stock/desglose por depósito
-    from collections import defaultdict
-    
-    # FILTRO POR EMPRESA: Solo insumos críticos de la empresa
-    # Usamos annotate_insumo_stock porque 'stock' ahora es una propiedad calculada
+    # Un insumo necesita gestión si no tiene OC o si solo la tiene en 'BORRADOR'.
+    # Si ya hay OCs 'APROBADA' o más allá que cubren el déficit, el equipo de compras
+    # ya hizo su parte. Stock, cantidad pedida y OC en borrador se resuelven en una
+    # sola consulta (ver services/necesidades_compra.py).
     insumos_criticos_qs = filter_insumos_por_empresa(
         request,
-        annotate_insumo_stock(Insumo.objects.all())
-        .filter(stock_calculado__lt=UMBRAL_STOCK_BAJO_INSUMOS)
-        .exclude(id__in=insumos_ya_gestionados_ids)
+        insumos_que_necesitan_compra(umbral=UMBRAL_STOCK_BAJO)
         .select_related("categoria", "deposito")
         .order_by("descripcion")
     )
-    insumos_dict = {}
-    for insumo in insumos_criticos_qs:
-        key = (insumo.descripcion, insumo.categoria_id)
-        stock_actual = getattr(insumo, 'stock_calculado', 0)
-        if key not in insumos_dict:
-            insumos_dict[key] = {
-                "id": insumo.id,
-                "descripcion": insumo.descripcion,
-                "categoria": insumo.categoria,
-                "imagen": getattr(insumo, "imagen", None),
-                "stock_total": 0,
-                "desglose_depositos": [],
-                "tiene_oc_borrador": False,
-            }
-        insumos_dict[key]["stock_total"] += stock_actual
-        insumos_dict[key]["desglose_depositos"].append({
-            "deposito": insumo.deposito.nombre if insumo.deposito else "Sin depósito",
-            "stock": stock_actual,
-        })
-        # Si algún depósito tiene OC en borrador, marcarlo
-        tiene_oc_borrador = Orden.objects.filter(
-            tipo="compra",
-            estado="BORRADOR",
-            insumo_principal=insumo,
-            deposito=insumo.deposito
-        ).exists()
-        if tiene_oc_borrador:
-            insumos_dict[key]["tiene_oc_borrador"] = True
-    insumos_criticos_globales = list(insumos_dict.values())
+    insumos_criticos_globales = agrupar_insumos_criticos(insumos_criticos_qs)
     context = {
         "insumos_criticos_globales": insumos_criticos_globales,
         "notificaciones_stock_bajo": notificaciones_stock_bajo,
-        "umbral_stock_bajo": UMBRAL_STOCK_BAJO_INSUMOS,
+        "umbral_stock_bajo": UMBRAL_STOCK_BAJO,
         "titulo_seccion": "Gestionar Compra por Stock Bajo",
     }
-    
-    if hasattr(notificaciones_stock_bajo, 'count'):
-        try:
-            logger.info(f"Notificaciones de stock bajo: {notificaciones_stock_bajo.count()}")
-        except TypeError:
-            logger.info(f"Notificaciones de stock bajo: {len(list(notificaciones_stock_bajo))}")
-    else:
-        logger.info(f"Notificaciones de stock bajo: {len(notificaciones_stock_bajo)}")
     return render(request, "compras/compras_desglose.html", context)
 
 
@@ -485,37 +337,16 @@ def compras_seguimiento_view(request):
     Muestra las Órdenes de Compra que ya fueron gestionadas y están
     en proceso de envío o recepción.
     """
-    # Agrupar dinámicamente por todos los estados presentes en OCs de seguimiento
-    from collections import OrderedDict
-    # Estados considerados "en seguimiento"
-    ESTADOS_SEGUIMIENTO = [
-        "ENVIADA_PROVEEDOR",
-        "EN_TRANSITO",
-        "RECIBIDA_PARCIAL",
-        "RECIBIDA_TOTAL",
-        "COMPLETADA",
-    ]
-    
-    # FILTRO POR EMPRESA: Solo OCs de seguimiento de la empresa
-    # Buscar todos los estados realmente presentes en OCs de seguimiento
-    ocs_seguimiento = filter_ordenes_compra_por_empresa(
-        request,
-        Orden.objects.filter(tipo="compra", estado__in=ESTADOS_SEGUIMIENTO)
-        .select_related("proveedor")
-        .order_by("-fecha_creacion")
+    # Solo las pestañas de estados de seguimiento con OCs; las filas se cargan bajo demanda
+    ocs_seguimiento = _ocs_compra_empresa(request).filter(estado__in=ESTADOS_SEGUIMIENTO)
+    estados_seguimiento = OrderedDict(
+        (estado, ESTADOS_OC[estado]) for estado in ESTADOS_SEGUIMIENTO
     )
-    # Agrupar por estado, usando el display del modelo para el nombre
-    estados_oc_dict = OrderedDict()
-    for oc in ocs_seguimiento:
-        estado = oc.estado
-        nombre = oc.get_estado_display()
-        if estado not in estados_oc_dict:
-            estados_oc_dict[estado] = {"nombre": nombre, "ocs": []}
-        estados_oc_dict[estado]["ocs"].append(oc)
-    # Convertir a lista de tuplas para la plantilla
-    estados_oc_tabs = [(estado, data["nombre"], data["ocs"]) for estado, data in estados_oc_dict.items()]
     context = {
-        "estados_oc_tabs": estados_oc_tabs,
+        "estados_oc_tabs": construir_pestanas(
+            ocs_seguimiento, estados_seguimiento, solo_con_ocs=True
+        ),
+        "vista_listado": "seguimiento",
         "titulo_seccion": "Seguimiento de Órdenes de Compra",
     }
     return render(request, "compras/seguimiento.html", context)
@@ -570,15 +401,20 @@ def compras_seleccionar_proveedor_para_insumo_view(request, insumo_id):
         proveedor_id_final_para_oc = None  # Renombrado para claridad
 
         if oferta_id_seleccionada:
-            try:
-                oferta = OfertaProveedor.objects.get(
-                    id=oferta_id_seleccionada, insumo_id=insumo_id
-                )  # Asegurar que la oferta sea para este insumo
-                proveedor_id_final_para_oc = oferta.proveedor.id
+            # Asegurar que la oferta sea para este insumo
+            oferta = next(
+                (
+                    o for o in obtener_ofertas_insumo(insumo_id)["ofertas"]
+                    if str(o["id"]) == oferta_id_seleccionada
+                ),
+                None,
+            )
+            if oferta:
+                proveedor_id_final_para_oc = oferta["proveedor_id"]
                 logger.info(
                     f"Oferta ID {oferta_id_seleccionada} seleccionada. Proveedor ID: {proveedor_id_final_para_oc}"
                 )
-            except OfertaProveedor.DoesNotExist:
+            else:
                 messages.error(
                     request,
                     "La oferta seleccionada no es válida o no corresponde al insumo.",
@@ -610,22 +446,14 @@ def compras_seleccionar_proveedor_para_insumo_view(request, insumo_id):
         )  # <--- USA 'proveedor_id'
     # ... (resto de la lógica GET) ...
     # ... (código de la lógica GET de la vista) ...
-    ofertas = (
-        OfertaProveedor.objects.filter(insumo_id=insumo_id)
-        .select_related("proveedor")
-        .order_by("precio_unitario_compra", "tiempo_entrega_estimado_dias")
-    )
-    insumo_objetivo = get_object_or_404(
-        Insumo, id=insumo_id
-    )  # Necesario para el contexto GET
+    datos_ofertas = obtener_ofertas_insumo(insumo_id)
+    ofertas = datos_ofertas["ofertas"]
 
     proveedores_fallback = []
-    if not ofertas.exists():
+    if not ofertas:
         # FILTRO POR EMPRESA: Solo proveedores de la empresa
         proveedores_fallback = filter_proveedores_por_empresa(request, Proveedor.objects.all()).order_by("nombre")[:5]
 
-    UMBRAL_STOCK_BAJO_INSUMOS = 15000
-
     # --- Sugerencia de distribución por depósito ---
     from App_LUMINOVA.models import StockInsumo, Deposito
     depositos = Deposito.objects.all().order_by("nombre")
@@ -633,7 +461,7 @@ def compras_seleccionar_proveedor_para_insumo_view(request, insumo_id):
     for deposito in depositos:
         stock_deposito = StockInsumo.objects.filter(insumo=insumo_objetivo, deposito=deposito).first()
         cantidad_actual = stock_deposito.cantidad if stock_deposito else 0
-        cantidad_sugerida = max(0, UMBRAL_STOCK_BAJO_INSUMOS - cantidad_actual)
+        cantidad_sugerida = max(0, UMBRAL_STOCK_BAJO - cantidad_actual)
         sugerencia_distribucion.append({
             "deposito": deposito,
             "stock_actual": cantidad_actual,
@@ -643,9 +471,10 @@ def compras_seleccionar_proveedor_para_insumo_view(request, insumo_id):
     context = {
         "insumo_objetivo": insumo_objetivo,
         "ofertas_proveedores": ofertas,
+        "mejores_ofertas": datos_ofertas["mejores"],
         "proveedores_fallback": proveedores_fallback,
         "titulo_seccion": f"Seleccionar Oferta para: {insumo_objetivo.descripcion}",
-        "umbral_stock_bajo": UMBRAL_STOCK_BAJO_INSUMOS,
+        "umbral_stock_bajo": UMBRAL_STOCK_BAJO,
         "sugerencia_distribucion": sugerencia_distribucion,
     }
     return render(request, "compras/compras_seleccionar_proveedor.html", context)
@@ -704,19 +533,19 @@ def compras_crear_oc_view(request, insumo_id=None, proveedor_id=None):
         for deposito in depositos:
             stock_deposito = StockInsumo.objects.filter(insumo=insumo_preseleccionado_obj, deposito=deposito).first()
             cantidad_actual = stock_deposito.cantidad if stock_deposito else 0
-            cantidad_sugerida = max(0, 15000 - cantidad_actual)
+            cantidad_sugerida = max(0, UMBRAL_STOCK_BAJO - cantidad_actual)
             cantidad_total_sugerida += cantidad_sugerida
         initial_data['cantidad_principal'] = max(10, cantidad_total_sugerida)
 
         if proveedor_id:
             proveedor_preseleccionado_obj = get_object_or_404(Proveedor, id=proveedor_id)
             initial_data['proveedor'] = proveedor_preseleccionado_obj
-            oferta_seleccionada = OfertaProveedor.objects.filter(insumo=insumo_preseleccionado_obj, proveedor=proveedor_preseleccionado_obj).first()
+            oferta_seleccionada = obtener_oferta(insumo_preseleccionado_obj.id, proveedor_preseleccionado_obj.id)
             if oferta_seleccionada:
-                initial_data['precio_unitario_compra'] = oferta_seleccionada.precio_unitario_compra
-                if oferta_seleccionada.tiempo_entrega_estimado_dias is not None:
+                initial_data['precio_unitario_compra'] = oferta_seleccionada["precio_unitario_compra"]
+                if oferta_seleccionada["tiempo_entrega_estimado_dias"] is not None:
                     try:
-                        dias = int(oferta_seleccionada.tiempo_entrega_estimado_dias)
+                        dias = int(oferta_seleccionada["tiempo_entrega_estimado_dias"])
                         fecha_estimada = timezone.now().date() + timedelta(days=dias)
                         initial_data['fecha_estimada_entrega'] = fecha_estimada.strftime('%Y-%m-%d')
                     except (ValueError, TypeError): pass
@@ -775,7 +604,7 @@ def compras_crear_oc_view(request, insumo_id=None, proveedor_id=None):
         for deposito in depositos:
             stock_deposito = StockInsumo.objects.filter(insumo=insumo_preseleccionado_obj, deposito=deposito).first()
             cantidad_actual = stock_deposito.cantidad if stock_deposito else 0
-            cantidad_sugerida = max(0, 15000 - cantidad_actual)
+            cantidad_sugerida = max(0, UMBRAL_STOCK_BAJO - cantidad_actual)
             stock_por_deposito[deposito.nombre] = {
                 "deposito": deposito,
                 "stock_actual": cantidad_actual,
@@ -1011,15 +840,13 @@ def get_oferta_proveedor_ajax(request):
     except ValueError:
         return JsonResponse({"error": "IDs inválidos"}, status=400)
 
-    oferta = OfertaProveedor.objects.filter(
-        insumo_id=insumo_id, proveedor_id=proveedor_id
-    ).first()
+    oferta = obtener_oferta(insumo_id, proveedor_id)
 
     if oferta:
         fecha_estimada_entrega_calculada = None
-        if oferta.tiempo_entrega_estimado_dias is not None:
+        if oferta["tiempo_entrega_estimado_dias"] is not None:
             try:
-                dias = int(oferta.tiempo_entrega_estimado_dias)
+                dias = int(oferta["tiempo_entrega_estimado_dias"])
                 fecha_estimada_entrega_calculada = (
                     timezone.now().date() + timedelta(days=dias)
                 ).strftime("%Y-%m-%d")
@@ -1028,12 +855,12 @@ def get_oferta_proveedor_ajax(request):
 
         data = {
             "success": True,
-            "precio_unitario": oferta.precio_unitario_compra,
-            "tiempo_entrega_dias": oferta.tiempo_entrega_estimado_dias,
+            "precio_unitario": oferta["precio_unitario_compra"],
+            "tiempo_entrega_dias": oferta["tiempo_entrega_estimado_dias"],
             "fecha_estimada_entrega": fecha_estimada_entrega_calculada,
             "fecha_actualizacion_oferta": (
-                oferta.fecha_actualizacion_precio.strftime("%d/%m/%Y")
-                if oferta.fecha_actualizacion_precio
+                oferta["fecha_actualizacion_precio"].strftime("%d/%m/%Y")
+                if oferta["fecha_actualizacion_precio"]
                 else None
             ),
         }
@@ -1053,21 +880,10 @@ def ajax_get_proveedores_for_insumo(request):
         return JsonResponse({"proveedores": []})
 
     try:
-        # Obtiene los IDs de los proveedores que tienen una oferta para el insumo dado.
-        proveedor_ids = (
-            OfertaProveedor.objects.filter(insumo_id=insumo_id)
-            .values_list("proveedor_id", flat=True)
-            .distinct()
-        )
-
-        # Obtiene los objetos Proveedor correspondientes a esos IDs.
-        proveedores = (
-            Proveedor.objects.filter(id__in=proveedor_ids)
-            .values("id", "nombre")
-            .order_by("nombre")
-        )
+        # Proveedores con oferta para el insumo, desde el índice de ofertas cacheado
+        proveedores = proveedores_con_oferta(int(insumo_id))
 
-        return JsonResponse({"proveedores": list(proveedores)})
+        return JsonResponse({"proveedores": proveedores})
     except ValueError:
         return JsonResponse({"error": "ID de insumo inválido"}, status=400)
     except Exception as e:
@@ -2,15 +2,26 @@ from django.db import transaction
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.shortcuts import get_object_or_404, redirect, render
-from django.http import HttpResponseRedirect, JsonResponse
+from django.http import Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from .forms import TransferenciaInsumoForm, TransferenciaProductoForm, DepositoForm
 from .models import Insumo, ProductoTerminado, UsuarioDeposito, Deposito, StockInsumo, MovimientoStock, CategoriaInsumo, StockProductoTerminado, OrdenProduccion
 from django.db.models import Q
 from django.http import HttpResponseForbidden
 from .services.notification_service import NotificationService
+from .services.dashboard_deposito import construir_dashboard_global
+from .services.historico_stock import corte_del_dia, stock_a_fecha, totales_por_deposito, valorizar_stock
+from .services.kardex import (
+    CursorKardexInvalido, alcance_kardex, filas_csv, movimientos_kardex, pagina_kardex, saldo_inicial,
+)
+from .services.consumo_insumos_op import consumir_insumos_op
+from .services.libro_stock import StockInsuficienteError, unidad_de_trabajo
+from .services.recepcion_oc import ESTADOS_RECIBIBLES, recibir_ocs
+from .services.stock_snapshot import adjuntar_snapshot_stock
+from .services.transferencia_lote import MAXIMO_LINEAS_MANIFIESTO, transferir_lote
 from .empresa_filters import get_depositos_empresa, filter_ordenes_compra_por_empresa
 # --- TRANSFERENCIA DE INSUMOS ENTRE DEPÓSITOS ---
-from .utils import es_admin_o_rol, redirigir_segun_rol, es_admin, tiene_rol, annotate_insumo_stock
+from .utils import UMBRAL_STOCK_BAJO, es_admin_o_rol, redirigir_segun_rol, es_admin, tiene_rol, annotate_insumo_stock
 
 def _usuario_puede_acceder_deposito(user, deposito, accion="transferir"):
     """Verifica si el usuario puede acceder al depósito especificado para la acción dada"""
@@ -36,34 +47,6 @@ def _usuario_puede_acceder_deposito(user, deposito, accion="transferir"):
         # Ya no permitimos acceso automático por tener rol 'Depósito'
         return False
 
-def _auditar_movimiento(tipo, usuario, insumo=None, producto=None, deposito_origen=None, deposito_destino=None, cantidad=0, motivo=""):
-    """Registra el movimiento en la auditoría, evitando duplicados"""
-    from .models import MovimientoStock
-
-    # Verificar si ya existe un movimiento similar
-    if MovimientoStock.objects.filter(
-        insumo=insumo,
-        producto=producto,
-        deposito_origen=deposito_origen,
-        deposito_destino=deposito_destino,
-        cantidad=cantidad,
-        tipo=tipo,
-        usuario=usuario,
-        motivo=motivo
-    ).exists():
-        return  # No registrar duplicado
-
-    MovimientoStock.objects.create(
-        insumo=insumo,
-        producto=producto,
-        deposito_origen=deposito_origen,
-        deposito_destino=deposito_destino,
-        cantidad=cantidad,
-        tipo=tipo,
-        usuario=usuario,
-        motivo=motivo or f"{tipo.title()} registrado automáticamente"
-    )
-
 @login_required
 def notificar_stock_bajo_view(request, insumo_id):
     """Vista para que depósito notifique a compras sobre stock bajo (AJAX)"""
@@ -102,26 +85,22 @@ def notificar_stock_bajo_view(request, insumo_id):
         if not deposito:
             return JsonResponse({"success": False, "error": "No se pudo determinar el depósito"})
         
-        # Si ya fue notificado, no volver a notificar
-        if insumo.notificado_a_compras:
-            return JsonResponse({
-                "success": False,
-                "error": "Este insumo ya fue notificado a Compras."
-            })
-        # Crear la notificación usando el servicio
+        # Crear la notificación usando el servicio (si ya hay una abierta para el
+        # insumo y depósito, se agrupa en ella en lugar de duplicarla)
         notificacion = NotificationService.notificar_stock_bajo(
             insumo=insumo,
             deposito=deposito,
             usuario_remitente=request.user,
-            umbral_critico=15000  # O el umbral que uses
+            umbral_critico=UMBRAL_STOCK_BAJO,
         )
-        # Marcar insumo como notificado
-        insumo.notificado_a_compras = True
-        insumo.save(update_fields=["notificado_a_compras"])
+        mensaje = f"Notificación enviada a Compras sobre {insumo.descripcion}"
+        if notificacion.repeticiones > 1:
+            mensaje += f" (reiterada {notificacion.repeticiones} veces)"
         return JsonResponse({
             "success": True, 
-            "message": f"Notificación enviada a Compras sobre {insumo.descripcion}",
-            "notificacion_id": notificacion.id
+            "message": mensaje,
+            "notificacion_id": notificacion.id,
+            "repeticiones": notificacion.repeticiones
         })
         
     except Exception as e:
@@ -159,18 +138,10 @@ def transferencia_insumo_view(request):
                 return redirect("App_LUMINOVA:transferencia_insumo")
 
             try:
-                # Ejecutar la transferencia
-                insumo_destino = transferir_insumo_a_deposito(insumo, deposito_origen, deposito_destino, cantidad)
-
-                # Registrar movimiento
-                _auditar_movimiento(
-                    tipo="transferencia",
-                    usuario=request.user,
-                    insumo=insumo,
-                    deposito_origen=deposito_origen,
-                    deposito_destino=deposito_destino,
-                    cantidad=cantidad,
-                    motivo=motivo or "Transferencia entre depósitos"
+                # Ejecutar la transferencia (registra el movimiento)
+                insumo_destino = transferir_insumo_a_deposito(
+                    insumo, deposito_origen, deposito_destino, cantidad,
+                    usuario=request.user, motivo=motivo or "Transferencia entre depósitos",
                 )
 
                 messages.success(request, 
@@ -178,7 +149,7 @@ def transferencia_insumo_view(request):
                     f"de {deposito_origen.nombre} a {deposito_destino.nombre}")
                 return redirect("App_LUMINOVA:historial_transferencias")
                 
-            except ValueError as e:
+            except (ValueError, StockInsuficienteError) as e:
                 messages.error(request, f"Error en transferencia: {str(e)}")
             except Exception as e:
                 messages.error(request, f"Error inesperado: {str(e)}")
@@ -191,108 +162,19 @@ def transferencia_insumo_view(request):
         "deposito_actual": deposito_actual
     })
 
-def transferir_insumo_a_deposito(insumo, deposito_origen, deposito_destino, cantidad):
-    from .models import StockInsumo, CategoriaInsumo, OfertaProveedor, Insumo
-
-    # Verificar stock suficiente en origen
-    stock_origen = StockInsumo.objects.get(insumo=insumo, deposito=deposito_origen)
-    if stock_origen.cantidad < cantidad:
-        raise ValueError("Stock insuficiente en el depósito de origen.")
-
-    # Crear o buscar categoría en destino
-    categoria_destino, _ = CategoriaInsumo.objects.get_or_create(
-        nombre=insumo.categoria.nombre,
-        deposito=deposito_destino,
-        defaults={"imagen": getattr(insumo.categoria, 'imagen', None)}
-    )
-
-    # Crear o buscar insumo en destino (solo con campos válidos)
-    insumo_destino, _ = Insumo.objects.get_or_create(
-        descripcion=insumo.descripcion,
-        fabricante=insumo.fabricante,
-        categoria=categoria_destino,
-        deposito=deposito_destino,
-        defaults={
-            "imagen": getattr(insumo, "imagen", None),
-            "stock": 0,
-            "cantidad_en_pedido": getattr(insumo, "cantidad_en_pedido", 0),
-            "notificado_a_compras": getattr(insumo, "notificado_a_compras", False),
-        }
-    )
-
-    # Copiar ofertas de proveedor si corresponde
-    ofertas_origen = OfertaProveedor.objects.filter(insumo=insumo)
-    for oferta in ofertas_origen:
-        OfertaProveedor.objects.get_or_create(
-            proveedor=oferta.proveedor,
-            insumo=insumo_destino,
-            defaults={
-                'precio_unitario_compra': oferta.precio_unitario_compra,
-                'tiempo_entrega_estimado_dias': oferta.tiempo_entrega_estimado_dias,
-                'fecha_actualizacion_precio': oferta.fecha_actualizacion_precio,
-            }
-        )
-
-    # Actualizar stocks
-    stock_origen.cantidad -= cantidad
-    stock_origen.save(update_fields=['cantidad'])
-    stock_destino, _ = StockInsumo.objects.get_or_create(insumo=insumo_destino, deposito=deposito_destino, defaults={"cantidad": 0})
-    stock_destino.cantidad += cantidad
-    stock_destino.save(update_fields=['cantidad'])
-
-    # NOTA: stock ahora es una @property calculada desde StockInsumo
-    # Ya no es necesario sincronizar manualmente
-
-    return insumo_destino
-
-def transferir_producto_a_deposito(producto, deposito_origen, deposito_destino, cantidad):
-    from .models import StockProductoTerminado, CategoriaProductoTerminado, ProductoTerminado, ComponenteProducto
-
-    stock_origen = StockProductoTerminado.objects.get(producto=producto, deposito=deposito_origen)
-    if stock_origen.cantidad < cantidad:
-        raise ValueError("Stock insuficiente en el depósito de origen.")
-
-    categoria_destino, _ = CategoriaProductoTerminado.objects.get_or_create(
-        nombre=producto.categoria.nombre,
-        deposito=deposito_destino,
-        defaults={"imagen": producto.categoria.imagen}
+def transferir_insumo_a_deposito(insumo, deposito_origen, deposito_destino, cantidad, usuario=None, motivo=""):
+    """Transfiere un insumo (manifiesto de una línea); devuelve el insumo del destino."""
+    linea, = transferir_lote(
+        Insumo, deposito_origen, deposito_destino, {insumo.id: cantidad}, usuario=usuario, motivo=motivo
     )
+    return linea["item_destino"]
 
-    producto_destino, _ = ProductoTerminado.objects.get_or_create(
-        descripcion=producto.descripcion,
-        categoria=categoria_destino,
-        deposito=deposito_destino,
-        defaults={
-            "precio_unitario": producto.precio_unitario,
-            "modelo": producto.modelo,
-            "potencia": producto.potencia,
-            "acabado": producto.acabado,
-            "color_luz": producto.color_luz,
-            "material": producto.material,
-            "imagen": producto.imagen,
-            "stock": 0,
-        }
+def transferir_producto_a_deposito(producto, deposito_origen, deposito_destino, cantidad, usuario=None, motivo=""):
+    """Transfiere un producto (manifiesto de una línea); devuelve el producto del destino."""
+    linea, = transferir_lote(
+        ProductoTerminado, deposito_origen, deposito_destino, {producto.id: cantidad}, usuario=usuario, motivo=motivo
     )
-
-    # Copiar componentes (BOM)
-    if hasattr(producto, 'componentes'):
-        for componente in producto.componentes.all():
-            ComponenteProducto.objects.get_or_create(
-                producto_terminado=producto_destino,
-                insumo=componente.insumo,
-                defaults={'cantidad_necesaria': componente.cantidad_necesaria}
-            )
-
-    stock_origen.cantidad -= cantidad
-    stock_origen.save(update_fields=['cantidad'])
-    stock_destino, _ = StockProductoTerminado.objects.get_or_create(producto=producto_destino, deposito=deposito_destino, defaults={"cantidad": 0})
-    stock_destino.cantidad += cantidad
-    stock_destino.save(update_fields=['cantidad'])
-
-    # NOTA: stock ahora es una @property calculada desde StockProductoTerminado
-    # Ya no es necesario sincronizar manualmente
-
-    return producto_destino
+    return linea["item_destino"]
 @login_required
 @transaction.atomic
 def transferencia_producto_view(request):
@@ -322,18 +204,10 @@ def transferencia_producto_view(request):
                 return redirect("App_LUMINOVA:transferencia_producto")
             
             try:
-                # Ejecutar la transferencia
-                producto_destino = transferir_producto_a_deposito(producto, deposito_origen, deposito_destino, cantidad)
-
-                # Registrar movimiento
-                _auditar_movimiento(
-                    tipo="transferencia",
-                    usuario=request.user,
-                    producto=producto,
-                    deposito_origen=deposito_origen,
-                    deposito_destino=deposito_destino,
-                    cantidad=cantidad,
-                    motivo=motivo or "Transferencia entre depósitos"
+                # Ejecutar la transferencia (registra el movimiento)
+                producto_destino = transferir_producto_a_deposito(
+                    producto, deposito_origen, deposito_destino, cantidad,
+                    usuario=request.user, motivo=motivo or "Transferencia entre depósitos",
                 )
                 
                 messages.success(request, 
@@ -341,7 +215,7 @@ def transferencia_producto_view(request):
                     f"de {deposito_origen.nombre} a {deposito_destino.nombre}")
                 return redirect("App_LUMINOVA:historial_transferencias")
                 
-            except ValueError as e:
+            except (ValueError, StockInsuficienteError) as e:
                 messages.error(request, f"Error en transferencia: {str(e)}")
             except Exception as e:
                 messages.error(request, f"Error inesperado: {str(e)}")
@@ -355,6 +229,183 @@ def transferencia_producto_view(request):
     })
 
 
+@login_required
+def transferencia_lote_view(request):
+    """
+    Manifiesto de transferencia: mueve muchos insumos o productos del depósito
+    actual a otro en una sola operación (ver services/transferencia_lote.py).
+    """
+    deposito_actual = _validar_y_actualizar_deposito_sesion(request)
+    if isinstance(deposito_actual, HttpResponseRedirect):
+        return deposito_actual
+
+    if not es_admin_o_rol(request.user, ["deposito", "administrador"]):
+        messages.error(request, "Acceso denegado.")
+        return redirect("App_LUMINOVA:deposito_view")
+
+    modelos_item = {"insumo": Insumo, "producto": ProductoTerminado}
+    datos = request.POST if request.method == "POST" else request.GET
+    tipo_item = datos.get("tipo_item") if datos.get("tipo_item") in modelos_item else "insumo"
+    modelo = modelos_item[tipo_item]
+    # Los destinos posibles son los demás depósitos de la empresa del origen
+    depositos_destino = (
+        Deposito.objects.filter(empresa_id=deposito_actual.empresa_id)
+        .exclude(id=deposito_actual.id)
+        .order_by("nombre")
+    )
+
+    if request.method == "POST":
+        deposito_destino = depositos_destino.filter(id=request.POST.get("deposito_destino") or None).first()
+        lineas = {}
+        for item_id in request.POST.getlist("items"):
+            cantidad = request.POST.get(f"cantidad_{item_id}", "").strip()
+            if item_id.isdigit():
+                # Una cantidad vacía o inválida llega como 0 y la rechaza el servicio
+                lineas[int(item_id)] = int(cantidad) if cantidad.isdigit() else 0
+
+        if deposito_destino is None:
+            messages.error(request, "Seleccione un depósito destino válido.")
+        elif not _usuario_puede_acceder_deposito(request.user, deposito_actual, "transferir") or \
+                not _usuario_puede_acceder_deposito(request.user, deposito_destino, "transferir"):
+            messages.error(request, "No tiene permisos para transferir entre los depósitos seleccionados.")
+        else:
+            try:
+                transferidos = transferir_lote(
+                    modelo, deposito_actual, deposito_destino, lineas,
+                    usuario=request.user, motivo=request.POST.get("motivo", "").strip(),
+                )
+                messages.success(
+                    request,
+                    f"Transferencia exitosa: {len(transferidos)} ítem(s), "
+                    f"{sum(linea['cantidad'] for linea in transferidos)} unidades "
+                    f"de {deposito_actual.nombre} a {deposito_destino.nombre}.",
+                )
+                return redirect("App_LUMINOVA:historial_transferencias")
+            except (ValueError, StockInsuficienteError) as e:
+                messages.error(request, f"Error en transferencia: {str(e)}")
+
+    campo_item = modelo.STOCK_ITEM_FIELD
+    stocks = (
+        modelo.get_stock_model().objects.filter(deposito=deposito_actual, cantidad__gt=0)
+        .select_related(campo_item)
+        .order_by(f"{campo_item}__descripcion")
+    )
+    return render(request, "deposito/transferencia_lote.html", {
+        "deposito_actual": deposito_actual,
+        "depositos_destino": depositos_destino,
+        "tipo_item": tipo_item,
+        "items_stock": [(getattr(stock, campo_item), stock.cantidad) for stock in stocks],
+        "maximo_lineas": MAXIMO_LINEAS_MANIFIESTO,
+    })
+
+
+@login_required
+def stock_a_fecha_view(request):
+    """
+    Stock valorizado de la empresa al cierre de un día pasado, por depósito
+    (ver services/historico_stock.py).
+    """
+    deposito_actual = _validar_y_actualizar_deposito_sesion(request)
+    if isinstance(deposito_actual, HttpResponseRedirect):
+        return deposito_actual
+
+    if not es_admin_o_rol(request.user, ["deposito", "administrador"]):
+        messages.error(request, "Acceso denegado.")
+        return redirect("App_LUMINOVA:deposito_view")
+
+    depositos = Deposito.objects.filter(empresa_id=deposito_actual.empresa_id).order_by("nombre")
+    fecha = parse_date(request.GET.get("fecha", "")) or timezone.localdate()
+    tipo_item = request.GET.get("tipo_item") if request.GET.get("tipo_item") in ("insumo", "producto") else ""
+    deposito_id = request.GET.get("deposito", "")
+    deposito_filtro = depositos.filter(id=deposito_id).first() if deposito_id.isdigit() else None
+
+    consulta = stock_a_fecha(
+        deposito_actual.empresa_id, corte_del_dia(fecha), tipo_item=tipo_item or None,
+        deposito_id=deposito_filtro.id if deposito_filtro else None,
+    )
+    lineas = valorizar_stock(consulta["cantidades"])
+    return render(request, "deposito/stock_a_fecha.html", {
+        "deposito_actual": deposito_actual,
+        "depositos": depositos,
+        "fecha": fecha,
+        "tipo_item": tipo_item,
+        "deposito_filtro": deposito_filtro,
+        "consulta": consulta,
+        "lineas": lineas,
+        "totales": totales_por_deposito(lineas),
+        "valor_total": sum((linea["valor"] for linea in lineas), 0),
+    })
+
+
+@login_required
+def kardex_view(request, tipo_item, item_id):
+    """
+    Kardex de un insumo o producto en un depósito: cada movimiento con su saldo
+    acumulado, paginado por cursor y exportable a CSV (ver services/kardex.py).
+    """
+    deposito_actual = _validar_y_actualizar_deposito_sesion(request)
+    if isinstance(deposito_actual, HttpResponseRedirect):
+        return deposito_actual
+
+    if not es_admin_o_rol(request.user, ["deposito", "administrador"]):
+        messages.error(request, "Acceso denegado.")
+        return redirect("App_LUMINOVA:deposito_view")
+
+    modelos_item = {"insumo": Insumo, "producto": ProductoTerminado}
+    if tipo_item not in modelos_item:
+        raise Http404("Tipo de ítem inválido.")
+    modelo = modelos_item[tipo_item]
+    item = get_object_or_404(modelo, pk=item_id, empresa_id=deposito_actual.empresa_id)
+
+    depositos = Deposito.objects.filter(empresa_id=deposito_actual.empresa_id).order_by("nombre")
+    deposito_id = request.GET.get("deposito", "")
+    deposito = (depositos.filter(id=deposito_id).first() if deposito_id.isdigit() else None) or deposito_actual
+    desde = parse_date(request.GET.get("desde", ""))
+    hasta = parse_date(request.GET.get("hasta", ""))
+    # El día "desde" empieza donde termina el anterior; "hasta" se incluye completo
+    inicio = corte_del_dia(desde - timedelta(days=1)) if desde else None
+    fin = corte_del_dia(hasta) if hasta else None
+
+    movimientos = movimientos_kardex(modelo, item.pk, deposito.pk, inicio, fin)
+    alcance = alcance_kardex(modelo, item.pk, deposito.pk, inicio, fin)
+    cursor = request.GET.get("cursor")
+    parametros = request.GET.copy()
+    parametros.pop("cursor", None)
+    parametros.pop("formato", None)
+
+    # El saldo inicial solo hace falta en la primera página y en el CSV; las
+    # páginas siguientes lo toman del cursor
+    saldo = None
+    if request.GET.get("formato") == "csv" or not cursor:
+        inicio, saldo = saldo_inicial(modelo, item, deposito, inicio)
+
+    if request.GET.get("formato") == "csv":
+        response = StreamingHttpResponse(filas_csv(movimientos, saldo), content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="kardex_{tipo_item}_{item.pk}_{deposito.pk}.csv"'
+        return response
+
+    try:
+        filas, siguiente_cursor = pagina_kardex(movimientos, alcance, saldo, cursor)
+    except CursorKardexInvalido:
+        messages.error(request, "El enlace de paginación no es válido; se muestra la primera página.")
+        return redirect(f"{request.path}?{parametros.urlencode()}")
+    return render(request, "deposito/kardex.html", {
+        "deposito_actual": deposito_actual,
+        "item": item,
+        "tipo_item": tipo_item,
+        "deposito": deposito,
+        "depositos": depositos,
+        "desde": desde,
+        "hasta": hasta,
+        "inicio": inicio,
+        "saldo_inicial": saldo,
+        "movimientos": filas,
+        "siguiente_cursor": siguiente_cursor,
+        "es_primera_pagina": not cursor,
+        "parametros": parametros.urlencode(),
+    })
+
+
 @login_required
 @transaction.atomic
 def entrada_stock_insumo(request, insumo_id, deposito_id):
@@ -363,7 +414,7 @@ def entrada_stock_insumo(request, insumo_id, deposito_id):
         messages.error(request, "Acceso denegado.")
         return redirect("App_LUMINOVA:deposito_view")
     
-    from .models import Insumo, Deposito, StockInsumo
+    from .models import Insumo, Deposito
     
     insumo = get_object_or_404(Insumo, id=insumo_id)
     deposito = get_object_or_404(Deposito, id=deposito_id)
@@ -377,24 +428,9 @@ def entrada_stock_insumo(request, insumo_id, deposito_id):
         motivo = request.POST.get('motivo', 'Entrada manual de stock')
         
         if cantidad > 0:
-            # Actualizar stock
-            stock, created = StockInsumo.objects.get_or_create(
-                insumo=insumo, deposito=deposito, defaults={"cantidad": 0}
-            )
-            stock.cantidad += cantidad
-            stock.save()
-            
-            # NOTA: stock ahora es una @property calculada, no es necesario sincronizar
-            
-            # Auditar movimiento
-            _auditar_movimiento(
-                tipo="entrada",
-                usuario=request.user,
-                insumo=insumo,
-                deposito_destino=deposito,
-                cantidad=cantidad,
-                motivo=motivo
-            )
+            # Actualizar stock y registrar el movimiento
+            with unidad_de_trabajo(usuario=request.user) as uow:
+                uow.entrada(insumo, deposito.id, cantidad, motivo=motivo)
             
             messages.success(request, f"Entrada de {cantidad} unidades registrada correctamente.")
         else:
@@ -411,7 +447,7 @@ def salida_stock_insumo(request, insumo_id, deposito_id):
         messages.error(request, "Acceso denegado.")
         return redirect("App_LUMINOVA:deposito_view")
     
-    from .models import Insumo, Deposito, StockInsumo
+    from .models import Insumo, Deposito
     
     insumo = get_object_or_404(Insumo, id=insumo_id)
     deposito = get_object_or_404(Deposito, id=deposito_id)
@@ -426,28 +462,11 @@ def salida_stock_insumo(request, insumo_id, deposito_id):
         
         if cantidad > 0:
             try:
-                stock = StockInsumo.objects.get(insumo=insumo, deposito=deposito)
-                if stock.cantidad >= cantidad:
-                    stock.cantidad -= cantidad
-                    stock.save()
-                    
-                    # NOTA: stock ahora es una @property calculada, no es necesario sincronizar
-                    
-                    # Auditar movimiento
-                    _auditar_movimiento(
-                        tipo="salida",
-                        usuario=request.user,
-                        insumo=insumo,
-                        deposito_origen=deposito,
-                        cantidad=cantidad,
-                        motivo=motivo
-                    )
-                    
-                    messages.success(request, f"Salida de {cantidad} unidades registrada correctamente.")
-                else:
-                    messages.error(request, f"Stock insuficiente. Disponible: {stock.cantidad}")
-            except StockInsumo.DoesNotExist:
-                messages.error(request, "No hay stock disponible para este insumo en el depósito.")
+                with unidad_de_trabajo(usuario=request.user) as uow:
+                    uow.salida(insumo, deposito.id, cantidad, motivo=motivo)
+                messages.success(request, f"Salida de {cantidad} unidades registrada correctamente.")
+            except StockInsuficienteError as e:
+                messages.error(request, f"Stock insuficiente. Disponible: {e.faltantes[0]['disponible']}")
         else:
             messages.error(request, "La cantidad debe ser mayor a 0.")
     
@@ -462,7 +481,7 @@ def entrada_stock_producto(request, producto_id, deposito_id):
         messages.error(request, "Acceso denegado.")
         return redirect("App_LUMINOVA:deposito_view")
     
-    from .models import ProductoTerminado, Deposito, StockProductoTerminado
+    from .models import ProductoTerminado, Deposito
     
     producto = get_object_or_404(ProductoTerminado, id=producto_id)
     deposito = get_object_or_404(Deposito, id=deposito_id)
@@ -476,24 +495,9 @@ def entrada_stock_producto(request, producto_id, deposito_id):
         motivo = request.POST.get('motivo', 'Entrada manual de stock')
         
         if cantidad > 0:
-            # Actualizar stock
-            stock, created = StockProductoTerminado.objects.get_or_create(
-                producto=producto, deposito=deposito, defaults={"cantidad": 0}
-            )
-            stock.cantidad += cantidad
-            stock.save()
-            
-            # NOTA: stock ahora es una @property calculada, no es necesario sincronizar
-            
-            # Auditar movimiento
-            _auditar_movimiento(
-                tipo="entrada",
-                usuario=request.user,
-                producto=producto,
-                deposito_destino=deposito,
-                cantidad=cantidad,
-                motivo=motivo
-            )
+            # Actualizar stock y registrar el movimiento
+            with unidad_de_trabajo(usuario=request.user) as uow:
+                uow.entrada(producto, deposito.id, cantidad, motivo=motivo)
             
             messages.success(request, f"Entrada de {cantidad} unidades registrada correctamente.")
         else:
@@ -510,7 +514,7 @@ def salida_stock_producto(request, producto_id, deposito_id):
         messages.error(request, "Acceso denegado.")
         return redirect("App_LUMINOVA:deposito_view")
     
-    from .models import ProductoTerminado, Deposito, StockProductoTerminado
+    from .models import ProductoTerminado, Deposito
     
     producto = get_object_or_404(ProductoTerminado, id=producto_id)
     deposito = get_object_or_404(Deposito, id=deposito_id)
@@ -525,28 +529,11 @@ def salida_stock_producto(request, producto_id, deposito_id):
         
         if cantidad > 0:
             try:
-                stock = StockProductoTerminado.objects.get(producto=producto, deposito=deposito)
-                if stock.cantidad >= cantidad:
-                    stock.cantidad -= cantidad
-                    stock.save()
-                    
-                    # NOTA: stock ahora es una @property calculada, no es necesario sincronizar
-                    
-                    # Auditar movimiento
-                    _auditar_movimiento(
-                        tipo="salida",
-                        usuario=request.user,
-                        producto=producto,
-                        deposito_origen=deposito,
-                        cantidad=cantidad,
-                        motivo=motivo
-                    )
-                    
-                    messages.success(request, f"Salida de {cantidad} unidades registrada correctamente.")
-                else:
-                    messages.error(request, f"Stock insuficiente. Disponible: {stock.cantidad}")
-            except StockProductoTerminado.DoesNotExist:
-                messages.error(request, "No hay stock disponible para este producto en el depósito.")
+                with unidad_de_trabajo(usuario=request.user) as uow:
+                    uow.salida(producto, deposito.id, cantidad, motivo=motivo)
+                messages.success(request, f"Salida de {cantidad} unidades registrada correctamente.")
+            except StockInsuficienteError as e:
+                messages.error(request, f"Stock insuficiente. Disponible: {e.faltantes[0]['disponible']}")
         else:
             messages.error(request, "La cantidad debe ser mayor a 0.")
     
@@ -694,107 +681,9 @@ def deposito_dashboard_view(request):
     if es_admin_user and deposito_id == "-1":  # -1 significa "todos los depósitos"
         # Dashboard global para admin con información detallada de todos los depósitos
         # IMPORTANTE: Solo superusuarios ven TODAS las empresas, admins de empresa solo ven su empresa
-        from .models import EstadoOrden
-        
-        # Obtener empresa actual
-        empresa_actual = request.empresa_actual
-        
-        # Información básica filtrada por empresa
-        if empresa_actual:
-            insumos_count = Insumo.objects.filter(empresa=empresa_actual).count()
-            productos_count = ProductoTerminado.objects.filter(empresa=empresa_actual).count()
-            depositos_count = Deposito.objects.filter(empresa=empresa_actual).count()
-        elif request.user.is_superuser:
-            # Solo superusuarios pueden ver todo sin filtro de empresa
-            insumos_count = Insumo.objects.count()
-            productos_count = ProductoTerminado.objects.count()
-            depositos_count = Deposito.objects.count()
-        else:
-            insumos_count = productos_count = depositos_count = 0
-        
-        # Base querysets - SIEMPRE filtrar por empresa para usuarios no-superusuario
-        if empresa_actual:
-            base_ordenes = Orden.objects.filter(empresa=empresa_actual)
-            base_ops = OrdenProduccion.objects.filter(empresa=empresa_actual)
-            depositos_empresa = Deposito.objects.filter(empresa=empresa_actual)
-        elif request.user.is_superuser:
-            base_ordenes = Orden.objects.all()
-            base_ops = OrdenProduccion.objects.all()
-            depositos_empresa = Deposito.objects.all()
-        else:
-            base_ordenes = Orden.objects.none()
-            base_ops = OrdenProduccion.objects.none()
-            depositos_empresa = Deposito.objects.none()
-        
-        # OCs en tránsito (recepción pendiente) - FILTRADO POR EMPRESA
-        ocs_en_transito = base_ordenes.filter(tipo="compra", estado="EN_TRANSITO").select_related("proveedor", "insumo_principal", "deposito")
-        ocs_en_transito_count = ocs_en_transito.count()
-        
-        # Solicitudes de insumos pendientes (OPs) - FILTRADO POR EMPRESA
-        try:
-            estado_sol = EstadoOrden.objects.get(nombre__iexact="Insumos Solicitados")
-            ops_solicitudes = base_ops.filter(estado_op=estado_sol).select_related("producto_a_producir__deposito")
-            ops_solicitudes_count = ops_solicitudes.count()
-        except EstadoOrden.DoesNotExist:
-            ops_solicitudes = OrdenProduccion.objects.none()
-            ops_solicitudes_count = 0
-        
-        # Stock crítico por depósito
-        UMBRAL_STOCK_BAJO = 15000
-        depositos_con_stock_critico = []
-        for deposito in depositos_empresa:
-            insumos_criticos = annotate_insumo_stock(
-                Insumo.objects.filter(deposito=deposito)
-            ).filter(stock_calculado__lt=UMBRAL_STOCK_BAJO)
-            if insumos_criticos.exists():
-                depositos_con_stock_critico.append({
-                    'deposito': deposito,
-                    'insumos_criticos_count': insumos_criticos.count(),
-                    'insumos_criticos': insumos_criticos[:5]  # Primeros 5 más críticos
-                })
-        
-        # OCs por aprobar (estado BORRADOR) - FILTRADO POR EMPRESA
-        ocs_por_aprobar = base_ordenes.filter(tipo="compra", estado="BORRADOR").select_related("proveedor", "insumo_principal", "deposito")
-        ocs_por_aprobar_count = ocs_por_aprobar.count()
-        
-        # Resumen por depósito (ya está filtrado porque depositos_empresa está filtrado)
-        depositos_resumen = []
-        for deposito in depositos_empresa:
-            # OCs en tránsito para este depósito
-            ocs_deposito = ocs_en_transito.filter(deposito=deposito).count()
-            # OPs solicitando insumos para este depósito
-            ops_deposito = ops_solicitudes.filter(producto_a_producir__deposito=deposito).count()
-            # Insumos críticos en este depósito
-            criticos_deposito = annotate_insumo_stock(
-                Insumo.objects.filter(deposito=deposito)
-            ).filter(stock_calculado__lt=UMBRAL_STOCK_BAJO).count()
-            
-            depositos_resumen.append({
-                'deposito': deposito,
-                'ocs_en_transito': ocs_deposito,
-                'ops_solicitando': ops_deposito,
-                'insumos_criticos': criticos_deposito,
-                'total_insumos': Insumo.objects.filter(deposito=deposito).count(),
-                'total_productos': ProductoTerminado.objects.filter(deposito=deposito).count(),
-            })
-        
-        context = {
-            "deposito": None,
-            "insumos_count": insumos_count,
-            "productos_count": productos_count,
-            "depositos_count": depositos_count,
-            "dashboard_global": True,
-            # Información detallada global
-            "ocs_en_transito_count": ocs_en_transito_count,
-            "ocs_en_transito_list": ocs_en_transito[:10],  # Primeras 10
-            "ops_solicitudes_count": ops_solicitudes_count,
-            "ops_solicitudes_list": ops_solicitudes[:10],  # Primeras 10
-            "ocs_por_aprobar_count": ocs_por_aprobar_count,
-            "ocs_por_aprobar_list": ocs_por_aprobar[:10],  # Primeras 10
-            "depositos_con_stock_critico": depositos_con_stock_critico,
-            "depositos_resumen": depositos_resumen,
-            "umbral_stock_bajo": UMBRAL_STOCK_BAJO,
-        }
+        context = construir_dashboard_global(
+            request.empresa_actual, incluir_todas_las_empresas=request.user.is_superuser
+        )
         return render(request, "deposito/deposito_dashboard.html", context)
         
     # Verificar que el usuario tenga acceso al depósito seleccionado
@@ -866,9 +755,6 @@ def deposito_enviar_insumos_op_view(request, op_id):
             )
             return redirect("App_LUMINOVA:deposito_detalle_solicitud_op", op_id=op.id)
 
-        insumos_descontados_correctamente = True
-        errores_stock = []
-
         if not op.producto_a_producir:
             messages.error(
                 request,
@@ -876,55 +762,38 @@ def deposito_enviar_insumos_op_view(request, op_id):
             )
             return redirect("App_LUMINOVA:deposito_detalle_solicitud_op", op_id=op.id)
 
-        componentes_requeridos = ComponenteProducto.objects.filter(
-            producto_terminado=op.producto_a_producir
-        ).select_related("insumo")
-
-        if not componentes_requeridos.exists():
+        # Bloquear la OP: dos envíos simultáneos de la misma OP no descuentan dos veces
+        op_bloqueada = (
+            OrdenProduccion.objects.select_for_update()
+            .select_related("estado_op")
+            .get(pk=op.pk)
+        )
+        if not op_bloqueada.estado_op or op_bloqueada.estado_op.nombre.lower() != "insumos solicitados":
             messages.error(
                 request,
-                f"No se puede procesar: No hay BOM definido para el producto '{op.producto_a_producir.descripcion}'.",
+                f"Los insumos de la OP {op.numero_op} ya fueron enviados.",
             )
+            return redirect("App_LUMINOVA:deposito_detalle_solicitud_op", op_id=op.id)
+
+        insumos_descontados_correctamente = True
+        try:
+            descontados = consumir_insumos_op(op, usuario=request.user)
+            logger.info(
+                f"Stock descontado para OP {op.numero_op}: {len(descontados)} insumo(s) del depósito {op.producto_a_producir.deposito_id}."
+            )
+        except ValueError as e:
+            messages.error(request, f"No se puede procesar: {e}")
             logger.error(
                 f"BOM no definido para producto {op.producto_a_producir.id} en OP {op.numero_op}"
             )
             return redirect("App_LUMINOVA:deposito_detalle_solicitud_op", op_id=op.id)
-
-        for comp in componentes_requeridos:
-            cantidad_a_descontar = comp.cantidad_necesaria * op.cantidad_a_producir
-            try:
-                # Bloquear la fila del insumo para evitar condiciones de carrera (si tu DB lo soporta bien)
-                # insumo_a_actualizar = Insumo.objects.select_for_update().get(id=comp.insumo.id)
-                insumo_a_actualizar = Insumo.objects.get(
-                    id=comp.insumo.id
-                )  # Versión más simple
-
-                if insumo_a_actualizar.stock >= cantidad_a_descontar:
-                    # Usar F() expression para una actualización atómica es preferible
-                    Insumo.objects.filter(id=insumo_a_actualizar.id).update(
-                        stock=F("stock") - cantidad_a_descontar
-                    )
-                    logger.info(
-                        f"Stock de '{insumo_a_actualizar.descripcion}' (ID: {insumo_a_actualizar.id}) descontado en {cantidad_a_descontar}."
-                    )
-                else:
-                    errores_stock.append(
-                        f"Stock insuficiente para '{insumo_a_actualizar.descripcion}'. Requeridos: {cantidad_a_descontar}, Disponible: {insumo_a_actualizar.stock}"
-                    )
-                    insumos_descontados_correctamente = False
-                    # Aquí podrías decidir si continuar verificando otros insumos o hacer break.
-                    # Si haces break, solo se reportará el primer error de stock.
-            except Insumo.DoesNotExist:
-                errores_stock.append(
-                    f"Insumo '{comp.insumo.descripcion}' (ID: {comp.insumo.id}) no encontrado durante el descuento. Error de datos."
+        except StockInsuficienteError as e:
+            for faltante in e.faltantes:
+                messages.error(
+                    request,
+                    f"Stock insuficiente para '{faltante['descripcion']}'. Requeridos: {faltante['requerido']}, Disponible: {faltante['disponible']}",
                 )
-                insumos_descontados_correctamente = False
-                break  # Error crítico, no continuar si un insumo del BOM no existe
-
-        if errores_stock: # Si hubo algún error de stock
-            for error_msg in errores_stock:
-                messages.error(request, error_msg)
-            # No es necesario reasignar insumos_descontados_correctamente = False aquí, ya se hizo.
+            insumos_descontados_correctamente = False
 
         if insumos_descontados_correctamente:
             try:
@@ -1059,7 +928,8 @@ def deposito_solicitudes_insumos_view(request):
 @login_required
 def recepcion_pedidos_view(request):
     """
-    Muestra una lista de Órdenes de Compra que están "En Tránsito" y listas para ser recibidas.
+    Muestra una lista de Órdenes de Compra que están "En Tránsito" (o recibidas en forma
+    parcial) y listas para ser recibidas.
     Solo muestra pedidos del depósito asignado al usuario Y de la empresa actual.
     """
     # Validar permisos de acceso
@@ -1092,7 +962,7 @@ def recepcion_pedidos_view(request):
     # FILTRO POR EMPRESA: Filtrar OCs en tránsito por empresa
     qs = filter_ordenes_compra_por_empresa(
         request,
-        Orden.objects.filter(tipo="compra", estado="EN_TRANSITO")
+        Orden.objects.filter(tipo="compra", estado__in=ESTADOS_RECIBIBLES)
     )
     
     if mostrar_todos:
@@ -1101,7 +971,11 @@ def recepcion_pedidos_view(request):
         qs = qs.filter(deposito=deposito)
     elif es_admin and deposito_id and deposito_id != "-1":
         qs = qs.filter(deposito_id=deposito_id)
-    ocs_en_transito = qs.select_related("proveedor", "insumo_principal").order_by("fecha_estimada_entrega")
+    ocs_en_transito = (
+        qs.select_related("proveedor", "insumo_principal")
+        .annotate(cantidad_pendiente=F("cantidad_principal") - F("cantidad_recibida"))
+        .order_by("fecha_estimada_entrega")
+    )
 
     context = {
         "ordenes_a_recibir": ocs_en_transito,
@@ -1111,19 +985,31 @@ def recepcion_pedidos_view(request):
     return render(request, "deposito/deposito_recepcion.html", context)
 
 
+def _ocs_recibibles_usuario(request):
+    """OCs que el usuario puede recibir: de la empresa actual y, si no es superusuario, de sus depósitos."""
+    ocs = filter_ordenes_compra_por_empresa(
+        request, Orden.objects.filter(tipo="compra", estado__in=ESTADOS_RECIBIBLES)
+    )
+    if not request.user.is_superuser:
+        from .models import UsuarioDeposito
+        ocs = ocs.filter(
+            deposito_id__in=UsuarioDeposito.objects.filter(usuario=request.user).values("deposito_id")
+        )
+    return ocs
+
+
 @login_required
 @require_POST
-@transaction.atomic
 def recibir_pedido_oc_view(request, oc_id):
     """
-    Procesa la recepción de una Orden de Compra.
+    Procesa la recepción de una Orden de Compra (todo lo pendiente).
     Solo permite recibir pedidos del depósito asignado al usuario.
     """
     # Validar permisos de acceso
     if not es_admin_o_rol(request.user, ['deposito', 'administrador']):
         return render(request, "deposito/seleccionar_deposito.html", {"sin_permisos": True})
 
-    orden_a_recibir = get_object_or_404(Orden, id=oc_id, estado="EN_TRANSITO")
+    orden_a_recibir = get_object_or_404(Orden, id=oc_id, estado__in=ESTADOS_RECIBIBLES)
     
     # Verificar que el usuario tenga acceso al depósito de la orden
     if not request.user.is_superuser:
@@ -1132,45 +1018,68 @@ def recibir_pedido_oc_view(request, oc_id):
         if not asignaciones.exists():
             return render(request, "deposito/seleccionar_deposito.html", {"sin_permisos": True})
 
-    insumo_recibido = orden_a_recibir.insumo_principal
-    cantidad_recibida = orden_a_recibir.cantidad_principal
-    deposito_destino = orden_a_recibir.deposito
-
-    if insumo_recibido and cantidad_recibida and deposito_destino:
-        # 1. Incrementar el stock del insumo en StockInsumo (normalizado)
-        stock_record, created = StockInsumo.objects.get_or_create(
-            insumo=insumo_recibido,
-            deposito=deposito_destino,
-            defaults={'cantidad': 0, 'empresa': deposito_destino.empresa}
-        )
-        stock_record.cantidad = F("cantidad") + cantidad_recibida
-        stock_record.save(update_fields=["cantidad"])
+    # Stock, cantidad en pedido, estado y movimiento en una transacción (services/recepcion_oc.py)
+    resultado, = recibir_ocs({orden_a_recibir.id: None}, usuario=request.user)
 
-        # 2. Decrementar la cantidad en pedido
-        insumo_recibido.cantidad_en_pedido = F("cantidad_en_pedido") - cantidad_recibida
-        insumo_recibido.save(update_fields=["cantidad_en_pedido"])
-        
+    if resultado["ok"]:
         logger.info(
-            f"Stock de '{insumo_recibido.descripcion}' actualizado (+{cantidad_recibida}) y 'en pedido' actualizado (-{cantidad_recibida})."
+            f"OC {resultado['numero_orden']} recibida: +{resultado['cantidad']} de '{orden_a_recibir.insumo_principal.descripcion}'."
         )
-
-        # 3. Actualizar el estado de la OC a "Completada" (o "Recibida Totalmente")
-        orden_a_recibir.estado = "COMPLETADA"
-        orden_a_recibir.save(update_fields=["estado"])
-
         messages.success(
             request,
-            f"Pedido {orden_a_recibir.numero_orden} recibido exitosamente. Se agregaron {cantidad_recibida} unidades de '{insumo_recibido.descripcion}' al stock.",
+            f"Pedido {resultado['numero_orden']} recibido exitosamente. Se agregaron {resultado['cantidad']} unidades de '{orden_a_recibir.insumo_principal.descripcion}' al stock.",
         )
     else:
         messages.error(
             request,
-            f"Error: La OC {orden_a_recibir.numero_orden} no tiene un insumo o cantidad principal válidos.",
+            f"Error: La OC {orden_a_recibir.numero_orden} no pudo recibirse. {resultado['error']}",
         )
 
     return redirect("App_LUMINOVA:deposito_recepcion_pedidos")
 
 
+@login_required
+@require_POST
+def recibir_pedidos_lote_view(request):
+    """
+    Recibe en una sola transacción las OCs seleccionadas en la recepción de pedidos,
+    con la cantidad indicada para cada una (parcial o todo lo pendiente).
+    """
+    if not es_admin_o_rol(request.user, ['deposito', 'administrador']):
+        return render(request, "deposito/seleccionar_deposito.html", {"sin_permisos": True})
+
+    recepciones = {}
+    for oc_id in request.POST.getlist("oc_ids"):
+        cantidad = request.POST.get(f"cantidad_{oc_id}", "").strip()
+        try:
+            recepciones[int(oc_id)] = int(cantidad) if cantidad else None
+        except ValueError:
+            messages.error(request, f"Cantidad inválida para la OC {oc_id}.")
+            return redirect("App_LUMINOVA:deposito_recepcion_pedidos")
+
+    if not recepciones:
+        messages.warning(request, "No se seleccionó ninguna orden de compra.")
+        return redirect("App_LUMINOVA:deposito_recepcion_pedidos")
+
+    resultados = recibir_ocs(recepciones, usuario=request.user, ocs=_ocs_recibibles_usuario(request))
+
+    recibidas = [r for r in resultados if r["ok"]]
+    if recibidas:
+        parciales = sum(1 for r in recibidas if r["estado"] == "RECIBIDA_PARCIAL")
+        messages.success(
+            request,
+            f"Se recibieron {len(recibidas)} órdenes de compra"
+            + (f" ({parciales} en forma parcial)." if parciales else "."),
+        )
+    for resultado in resultados:
+        if not resultado["ok"]:
+            messages.error(
+                request, f"OC {resultado['numero_orden'] or resultado['oc_id']}: {resultado['error']}"
+            )
+
+    return redirect("App_LUMINOVA:deposito_recepcion_pedidos")
+
+
 @login_required
 def deposito_view(request):
     logger.info("--- deposito_view: INICIO ---")
@@ -1189,106 +1098,9 @@ def deposito_view(request):
     if es_admin_user and deposito_id == "-1":  # -1 significa "todos los depósitos"
         # Dashboard global para admin con información detallada de todos los depósitos
         # IMPORTANTE: Solo superusuarios ven TODAS las empresas, admins de empresa solo ven su empresa
-        
-        # Obtener empresa actual desde el middleware
-        empresa_actual = request.empresa_actual
-        
-        # Base querysets - SIEMPRE filtrar por empresa para usuarios no-superusuario
-        if empresa_actual:
-            base_insumos = Insumo.objects.filter(empresa=empresa_actual)
-            base_productos = ProductoTerminado.objects.filter(empresa=empresa_actual)
-            base_depositos = Deposito.objects.filter(empresa=empresa_actual)
-            base_ordenes = Orden.objects.filter(empresa=empresa_actual)
-            base_ops = OrdenProduccion.objects.filter(empresa=empresa_actual)
-        elif request.user.is_superuser:
-            # Solo superusuarios pueden ver todo sin filtro de empresa
-            base_insumos = Insumo.objects.all()
-            base_productos = ProductoTerminado.objects.all()
-            base_depositos = Deposito.objects.all()
-            base_ordenes = Orden.objects.all()
-            base_ops = OrdenProduccion.objects.all()
-        else:
-            base_insumos = Insumo.objects.none()
-            base_productos = ProductoTerminado.objects.none()
-            base_depositos = Deposito.objects.none()
-            base_ordenes = Orden.objects.none()
-            base_ops = OrdenProduccion.objects.none()
-        
-        # Información básica - FILTRADO POR EMPRESA
-        insumos_count = base_insumos.count()
-        productos_count = base_productos.count()
-        depositos_count = base_depositos.count()
-        
-        # OCs en tránsito (recepción pendiente) - FILTRADO POR EMPRESA
-        ocs_en_transito = base_ordenes.filter(tipo="compra", estado="EN_TRANSITO").select_related("proveedor", "insumo_principal", "deposito")
-        ocs_en_transito_count = ocs_en_transito.count()
-        
-        # Solicitudes de insumos pendientes (OPs) - FILTRADO POR EMPRESA
-        try:
-            estado_sol = EstadoOrden.objects.get(nombre__iexact="Insumos Solicitados")
-            ops_solicitudes = base_ops.filter(estado_op=estado_sol).select_related("producto_a_producir__deposito")
-            ops_solicitudes_count = ops_solicitudes.count()
-        except EstadoOrden.DoesNotExist:
-            ops_solicitudes = OrdenProduccion.objects.none()
-            ops_solicitudes_count = 0
-        
-        # Stock crítico por depósito (ya filtrado)
-        UMBRAL_STOCK_BAJO = 15000
-        depositos_empresa = base_depositos
-
-        depositos_con_stock_critico = []
-        for deposito in depositos_empresa:
-            insumos_criticos = annotate_insumo_stock(
-                Insumo.objects.filter(deposito=deposito)
-            ).filter(stock_calculado__lt=UMBRAL_STOCK_BAJO)
-            if insumos_criticos.exists():
-                depositos_con_stock_critico.append({
-                    'deposito': deposito,
-                    'insumos_criticos_count': insumos_criticos.count(),
-                    'insumos_criticos': insumos_criticos[:5]  # Primeros 5 más críticos
-                })
-        
-        # OCs por aprobar (estado BORRADOR) - FILTRADO POR EMPRESA
-        ocs_por_aprobar = base_ordenes.filter(tipo="compra", estado="BORRADOR").select_related("proveedor", "insumo_principal", "deposito")
-        ocs_por_aprobar_count = ocs_por_aprobar.count()
-        
-        # Resumen por depósito (ya está filtrado porque depositos_empresa está filtrado)
-        depositos_resumen = []
-        for deposito in depositos_empresa:
-            # OCs en tránsito para este depósito
-            ocs_deposito = ocs_en_transito.filter(deposito=deposito).count()
-            # OPs solicitando insumos para este depósito
-            ops_deposito = ops_solicitudes.filter(producto_a_producir__deposito=deposito).count()
-            # Insumos críticos en este depósito
-            criticos_deposito = annotate_insumo_stock(
-                Insumo.objects.filter(deposito=deposito)
-            ).filter(stock_calculado__lt=UMBRAL_STOCK_BAJO).count()
-            depositos_resumen.append({
-                'deposito': deposito,
-                'ocs_en_transito': ocs_deposito,
-                'ops_solicitando': ops_deposito,
-                'insumos_criticos': criticos_deposito,
-                'total_insumos': Insumo.objects.filter(deposito=deposito).count(),
-                'total_productos': ProductoTerminado.objects.filter(deposito=deposito).count(),
-            })
-        
-        context = {
-            "deposito": None,
-            "insumos_count": insumos_count,
-            "productos_count": productos_count,
-            "depositos_count": depositos_count,
-            "dashboard_global": True,
-            # Información detallada global
-            "ocs_en_transito_count": ocs_en_transito_count,
-            "ocs_en_transito_list": ocs_en_transito[:10],  # Primeras 10
-            "ops_solicitudes_count": ops_solicitudes_count,
-            "ops_solicitudes_list": ops_solicitudes[:10],  # Primeras 10
-            "ocs_por_aprobar_count": ocs_por_aprobar_count,
-            "ocs_por_aprobar_list": ocs_por_aprobar[:10],  # Primeras 10
-            "depositos_con_stock_critico": depositos_con_stock_critico,
-            "depositos_resumen": depositos_resumen,
-            "umbral_stock_bajo": UMBRAL_STOCK_BAJO,
-        }
+        context = construir_dashboard_global(
+            request.empresa_actual, incluir_todas_las_empresas=request.user.is_superuser
+        )
         return render(request, "deposito/deposito_dashboard.html", context)
     # Solo permitir acceso a depósitos individuales
     try:
@@ -1336,10 +1148,8 @@ def deposito_view(request):
     )
 
     # Insumos con stock bajo SOLO de este depósito
-    UMBRAL_STOCK_BAJO_INSUMOS = 15000
-
     insumos_del_deposito = Insumo.objects.filter(deposito=deposito)
-    insumos_con_stock_bajo = annotate_insumo_stock(insumos_del_deposito).filter(stock_calculado__lt=UMBRAL_STOCK_BAJO_INSUMOS)
+    insumos_con_stock_bajo = annotate_insumo_stock(insumos_del_deposito).filter(stock_calculado__lt=UMBRAL_STOCK_BAJO)
 
     ESTADOS_OC_EN_PROCESO = [
         "APROBADA",
@@ -1375,7 +1185,7 @@ def deposito_view(request):
         "lotes_productos_terminados_en_stock": lotes_en_stock,
         "insumos_a_gestionar_list": insumos_a_gestionar,
         "insumos_en_pedido_list": insumos_en_pedido,
-        "umbral_stock_bajo": UMBRAL_STOCK_BAJO_INSUMOS,
+        "umbral_stock_bajo": UMBRAL_STOCK_BAJO,
         "dashboard_global": False,
     }
     return render(request, "deposito/deposito.html", context)
@@ -1471,20 +1281,28 @@ def deposito_detalle_solicitud_op_view(request, op_id):
     )
 
     if op.producto_a_producir:
-        componentes_requeridos = ComponenteProducto.objects.filter(
-            producto_terminado=op.producto_a_producir
-        ).select_related("insumo")
+        componentes_requeridos = list(
+            ComponenteProducto.objects.filter(
+                producto_terminado=op.producto_a_producir
+            ).select_related("insumo")
+        )
 
-        if not componentes_requeridos.exists():
+        if not componentes_requeridos:
             messages.warning(
                 request,
                 f"No se ha definido el BOM (lista de componentes) para el producto '{op.producto_a_producir.descripcion}'. No se pueden determinar los insumos.",
             )
             todos_los_insumos_disponibles = False  # No se puede proceder
 
+        # Stock por depósito de todo el BOM en una sola consulta
+        adjuntar_snapshot_stock(comp.insumo for comp in componentes_requeridos)
         for comp in componentes_requeridos:
             cantidad_total_req = comp.cantidad_necesaria * op.cantidad_a_producir
-            suficiente = comp.insumo.stock >= cantidad_total_req
+            # Mismo depósito del que descuenta consumir_insumos_op
+            stock_insumo = comp.insumo.get_stock_by_deposito(
+                op.producto_a_producir.deposito_id or comp.insumo.deposito_id
+            )
+            suficiente = stock_insumo >= cantidad_total_req
             if not suficiente:
                 todos_los_insumos_disponibles = False
             insumos_necesarios_data.append(
@@ -1492,7 +1310,7 @@ def deposito_detalle_solicitud_op_view(request, op_id):
                     "insumo_id": comp.insumo.id,
                     "insumo_descripcion": comp.insumo.descripcion,
                     "cantidad_total_requerida_op": cantidad_total_req,
-                    "stock_actual_insumo": comp.insumo.stock,
+                    "stock_actual_insumo": stock_insumo,
                     "suficiente_stock": suficiente,
                 }
             )
@@ -1533,15 +1351,21 @@ def deposito_enviar_lote_pt_view(request, lote_id):
     producto_terminado = lote.producto
     cantidad_a_enviar = lote.cantidad
 
-    if producto_terminado.stock < cantidad_a_enviar:
+    # Descontar del depósito del lote (o del producto) y registrar el movimiento
+    try:
+        with unidad_de_trabajo(usuario=request.user) as uow:
+            uow.salida(
+                producto_terminado,
+                lote.deposito_id or producto_terminado.deposito_id,
+                cantidad_a_enviar,
+                motivo=f"Envío de lote de OP {lote.op_asociada.numero_op}",
+            )
+    except StockInsuficienteError as e:
         messages.error(
             request,
-            f"Error de consistencia de datos: No hay stock suficiente para '{producto_terminado.descripcion}' para enviar el lote. Stock actual: {producto_terminado.stock}, se necesita: {cantidad_a_enviar}.",
+            f"Error de consistencia de datos: No hay stock suficiente para '{producto_terminado.descripcion}' para enviar el lote. Stock actual: {e.faltantes[0]['disponible']}, se necesita: {cantidad_a_enviar}.",
         )
         return redirect("App_LUMINOVA:deposito_view")
-
-    producto_terminado.stock -= cantidad_a_enviar
-    producto_terminado.save(update_fields=["stock"])
     logger.info(
         f"Stock de '{producto_terminado.descripcion}' descontado en {cantidad_a_enviar}."
     )
@@ -86,6 +86,7 @@ from .signals import get_client_ip
 
 from .services.document_services import generar_siguiente_numero_documento
 from .services.pdf_services import generar_pdf_factura
+from .services.libro_stock import unidad_de_trabajo
 from .utils import es_admin, es_admin_o_rol, annotate_producto_stock
 from .empresa_filters import (
     get_depositos_empresa,
@@ -362,7 +363,8 @@ def produccion_detalle_op_view(request, op_id):
             cantidad_total_requerida_para_op = (
                 comp.cantidad_necesaria * op.cantidad_a_producir
             )
-            suficiente = comp.insumo.stock >= cantidad_total_requerida_para_op
+            stock_insumo = comp.insumo.stock
+            suficiente = stock_insumo >= cantidad_total_requerida_para_op
             if not suficiente:
                 todos_los_insumos_disponibles = False
             insumos_necesarios_data.append(
@@ -370,7 +372,7 @@ def produccion_detalle_op_view(request, op_id):
                     "insumo_descripcion": comp.insumo.descripcion,
                     "cantidad_por_unidad_pt": comp.cantidad_necesaria,
                     "cantidad_total_requerida_op": cantidad_total_requerida_para_op,
-                    "stock_actual_insumo": comp.insumo.stock,
+                    "stock_actual_insumo": stock_insumo,
                     "suficiente_stock": suficiente,
                     "insumo_id": comp.insumo.id,
                 }
@@ -502,13 +504,11 @@ def produccion_detalle_op_view(request, op_id):
                         # 1. Actualizar el stock en StockProductoTerminado (normalizado)
                         deposito_producto = producto_terminado_obj.deposito
                         if deposito_producto:
-                            stock_record, created = StockProductoTerminado.objects.get_or_create(
-                                producto=producto_terminado_obj,
-                                deposito=deposito_producto,
-                                defaults={'cantidad': 0, 'empresa': deposito_producto.empresa}
-                            )
-                            stock_record.cantidad = F("cantidad") + cantidad_producida
-                            stock_record.save(update_fields=["cantidad"])
+                            with unidad_de_trabajo(usuario=request.user) as uow:
+                                uow.entrada(
+                                    producto_terminado_obj, deposito_producto.id, cantidad_producida,
+                                    motivo=f"Producción OP {op_actualizada.numero_op}",
+                                )
                             logger.info(
                                 f"Stock de '{producto_terminado_obj.descripcion}' incrementado en {cantidad_producida} (StockProductoTerminado)."
                             )
@@ -1,14 +1,16 @@
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
 from django.db.models import Q
 from .models import (
     MovimientoStock, Deposito, Insumo, ProductoTerminado, 
-    CategoriaProductoTerminado, StockInsumo, StockProductoTerminado
+    CategoriaProductoTerminado
 )
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db import transaction  # Ensure this import is present
 from .empresa_filters import get_depositos_empresa, filter_insumos_por_empresa, filter_productos_por_empresa
+from .services.libro_stock import StockInsuficienteError
+from .services.transferencia_lote import transferir_lote
 
 @login_required
 def historial_transferencias_view(request):
@@ -58,69 +60,24 @@ def historial_transferencias_view(request):
 
     if request.method == "POST":
         tipo_item = request.POST.get("tipo_item")  # "insumo" o "producto"
-        item_id = request.POST.get("item_id")
         deposito_origen_id = request.POST.get("deposito_origen")
         deposito_destino_id = request.POST.get("deposito_destino")
-        cantidad = int(request.POST.get("cantidad", 0))
+        # Una o varias líneas: item_id y cantidad se envían en paralelo
+        lineas = {}
+        for item_id, cantidad in zip(request.POST.getlist("item_id"), request.POST.getlist("cantidad")):
+            if item_id and int(cantidad or 0) > 0:
+                lineas[int(item_id)] = lineas.get(int(item_id), 0) + int(cantidad)
 
-        if item_id and deposito_origen_id and deposito_destino_id and cantidad > 0:
+        modelos_item = {"insumo": Insumo, "producto": ProductoTerminado}
+        if tipo_item in modelos_item and lineas and deposito_origen_id and deposito_destino_id:
             deposito_origen = Deposito.objects.get(id=deposito_origen_id)
             deposito_destino = Deposito.objects.get(id=deposito_destino_id)
-
-            with transaction.atomic():
-                if tipo_item == "insumo":
-                    insumo = Insumo.objects.get(id=item_id)
-                    
-                    # Obtener o crear registro de stock en origen
-                    stock_origen, _ = StockInsumo.objects.get_or_create(
-                        insumo=insumo,
-                        deposito=deposito_origen,
-                        defaults={'cantidad': 0, 'empresa': deposito_origen.empresa}
-                    )
-
-                    # Verificar stock suficiente en el depósito origen
-                    if stock_origen.cantidad >= cantidad:
-                        # Restar del origen
-                        stock_origen.cantidad -= cantidad
-                        stock_origen.save(update_fields=["cantidad"])
-
-                        # Sumar al destino
-                        stock_destino, _ = StockInsumo.objects.get_or_create(
-                            insumo=insumo,
-                            deposito=deposito_destino,
-                            defaults={'cantidad': 0, 'empresa': deposito_destino.empresa}
-                        )
-                        stock_destino.cantidad += cantidad
-                        stock_destino.save(update_fields=["cantidad"])
-                    else:
-                        raise ValueError("Stock insuficiente en el depósito origen para el insumo.")
-
-                elif tipo_item == "producto":
-                    producto = ProductoTerminado.objects.get(id=item_id)
-                    
-                    # Obtener o crear registro de stock en origen
-                    stock_origen, _ = StockProductoTerminado.objects.get_or_create(
-                        producto=producto,
-                        deposito=deposito_origen,
-                        defaults={'cantidad': 0, 'empresa': deposito_origen.empresa}
-                    )
-
-                    # Verificar stock suficiente en el depósito origen
-                    if stock_origen.cantidad >= cantidad:
-                        # Restar del origen
-                        stock_origen.cantidad -= cantidad
-                        stock_origen.save(update_fields=["cantidad"])
-
-                        # Sumar al destino
-                        stock_destino, _ = StockProductoTerminado.objects.get_or_create(
-                            producto=producto,
-                            deposito=deposito_destino,
-                            defaults={'cantidad': 0, 'empresa': deposito_destino.empresa}
-                        )
-                        stock_destino.cantidad += cantidad
-                        stock_destino.save(update_fields=["cantidad"])
-                    else:
-                        raise ValueError("Stock insuficiente en el depósito origen para el producto terminado.")
+            try:
+                transferir_lote(
+                    modelos_item[tipo_item], deposito_origen, deposito_destino, lineas, usuario=request.user
+                )
+            except (ValueError, StockInsuficienteError) as e:
+                messages.error(request, f"Error en transferencia: {str(e)}")
 
     context = {
         "transferencias": transferencias,
@@ -2,12 +2,13 @@ import logging
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
 from django.http import JsonResponse
 
 # Django Contrib Imports
 from django.db import IntegrityError as DjangoIntegrityError
 from django.db import transaction
-from django.db.models import Prefetch, Q, Sum
+from django.db.models import Count, Prefetch, Q, Sum
 
 # Django Core Imports
 from django.shortcuts import get_object_or_404, redirect, render
@@ -36,8 +37,12 @@ from .models import (
     StockProductoTerminado,
 )
 from .signals import get_client_ip
+from .threadlocals import get_current_empresa
 
-from .services.document_services import generar_siguiente_numero_documento
+from .services.document_services import (
+    generar_siguiente_numero_documento,
+    reservar_numeros_documento,
+)
 from .services.pdf_services import generar_pdf_factura
 from .utils import es_admin, es_admin_o_rol
 from .empresa_filters import (
@@ -167,10 +172,24 @@ def ventas_lista_ov_view(request):
         ("CANCELADA", "Cancelada"),
     ])
     
+    # Solapa activa (el estado de las OV se deriva al cambiar sus OPs: esta vista solo lee)
+    estado_activo = request.GET.get("estado")
+    if estado_activo not in ESTADOS_OV:
+        estado_activo = next(iter(ESTADOS_OV))
+
     # FILTRO POR EMPRESA: Solo OVs de productos de esta empresa
-    ordenes_de_venta_query = filter_ordenes_venta_por_empresa(
-        request,
-        OrdenVenta.objects.select_related("cliente")
+    ordenes_empresa = filter_ordenes_venta_por_empresa(request, OrdenVenta.objects.all())
+
+    # Conteo por solapa en una sola consulta agrupada
+    conteos = dict(
+        ordenes_empresa.order_by()
+        .values_list("estado")
+        .annotate(total=Count("id", distinct=True))
+    )
+
+    ordenes_de_venta_query = (
+        ordenes_empresa.filter(estado=estado_activo)
+        .select_related("cliente")
         .prefetch_related(
             "items_ov__producto_terminado",
             Prefetch(
@@ -190,29 +209,24 @@ def ventas_lista_ov_view(request):
                 to_attr="lista_ops_con_reportes_y_estado",
             ),
         )
-        .order_by("-fecha_creacion")
+        .order_by("-fecha_creacion", "-id")
     )
 
-    # Actualizar estados de OV basado en sus OPs asociadas usando el método centralizado
-    for ov in ordenes_de_venta_query:
-        ov.actualizar_estado_por_ops()
-
-    ordenes_por_estado = {estado: [] for estado in ESTADOS_OV.keys()}
-    for ov in ordenes_de_venta_query:
-        ov.tiene_algun_reporte_asociado = False
-        if hasattr(ov, "lista_ops_con_reportes_y_estado"):
-            for op in ov.lista_ops_con_reportes_y_estado:
-                if op.reportes_incidencia.all().exists():
-                    ov.tiene_algun_reporte_asociado = True
-                    break
-        if ov.estado in ordenes_por_estado:
-            ordenes_por_estado[ov.estado].append(ov)
-    estados_ov_tabs = []
-    for estado, nombre in ESTADOS_OV.items():
-        ovs = ordenes_por_estado.get(estado, [])
-        estados_ov_tabs.append((estado, nombre, ovs))
+    paginator = Paginator(ordenes_de_venta_query, 25)  # 25 OVs por página
+    page_obj = paginator.get_page(request.GET.get("page"))
+
+    for ov in page_obj:
+        ov.tiene_algun_reporte_asociado = any(
+            op.reportes_incidencia.all() for op in ov.lista_ops_con_reportes_y_estado
+        )
+
+    estados_ov_tabs = [
+        (estado, nombre, conteos.get(estado, 0)) for estado, nombre in ESTADOS_OV.items()
+    ]
     context = {
         "estados_ov_tabs": estados_ov_tabs,
+        "estado_activo": estado_activo,
+        "ordenes_list": page_obj,
         "titulo_seccion": "Órdenes de Venta",
     }
     return render(request, "ventas/ventas_lista_ov.html", context)
@@ -237,43 +251,31 @@ def ventas_crear_ov_view(request):
                 with transaction.atomic():
                     ov_instance = form_ov.save(commit=False)
                     ov_instance.estado = "PENDIENTE"
+                    # El formulario solo muestra una sugerencia: el número se reserva aquí
+                    ov_instance.numero_ov = generar_siguiente_numero_documento(OrdenVenta, 'OV', 'numero_ov')
                     ov_instance.save() # Se necesita ID para la relación
 
                     items_a_procesar = []
-                    total_ov = 0
                     for form in formset_items:
                         if form.is_valid() and form.cleaned_data and not form.cleaned_data.get('DELETE'):
                             item = form.save(commit=False)
                             item.orden_venta = ov_instance
                             item.subtotal = item.cantidad * item.producto_terminado.precio_unitario
-                            total_ov += item.subtotal
                             items_a_procesar.append(item)
 
                     if not items_a_procesar:
                         raise ValueError("Se debe añadir al menos un producto a la orden.")
 
                     ItemOrdenVenta.objects.bulk_create(items_a_procesar)
-                    ov_instance.total_ov = total_ov
-                    ov_instance.save(update_fields=['total_ov'])
 
                     estado_op_inicial = EstadoOrden.objects.get(nombre__iexact="Pendiente")
 
-                    # Obtener el último número OP existente y generar secuencialmente en memoria
-                    from django.db.models import Max
-                    ultimo_numero_op = (
-                        OrdenProduccion.objects.filter(numero_op__startswith='OP-')
-                        .aggregate(max_num=Max('numero_op'))['max_num']
+                    # Reservar en bloque un número de OP por ítem (un solo bloqueo de la secuencia)
+                    numeros_op = reservar_numeros_documento(
+                        OrdenProduccion, 'OP', 'numero_op', len(items_a_procesar)
                     )
-                    if ultimo_numero_op:
-                        try:
-                            ultimo_num = int(ultimo_numero_op.split('-')[1])
-                        except Exception:
-                            ultimo_num = 0
-                    else:
-                        ultimo_num = 0
                     ops_a_crear = []
-                    for i, item_procesado in enumerate(items_a_procesar, start=1):
-                        next_op_number = f"OP-{ultimo_num + i:05d}"
+                    for item_procesado, next_op_number in zip(items_a_procesar, numeros_op):
                         ops_a_crear.append(
                             OrdenProduccion(
                                 numero_op=next_op_number,
@@ -296,8 +298,8 @@ def ventas_crear_ov_view(request):
                 messages.error(request, f"Ocurrió un error inesperado. Por favor, intente de nuevo. Detalle: {e}")
                 logger.exception("Error grave en la creación de OV/OPs")
     else: # GET
-        initial_data = {'numero_ov': generar_siguiente_numero_documento(OrdenVenta, 'OV', 'numero_ov')}
-        form_ov = OrdenVentaForm(prefix="ov", initial=initial_data)
+        # El formulario sugiere el número sin reservarlo
+        form_ov = OrdenVentaForm(prefix="ov")
         formset_items = ItemOrdenVentaFormSetCreacion(prefix="items", queryset=ItemOrdenVenta.objects.none())
 
     context = {
@@ -361,7 +363,7 @@ def ventas_detalle_ov_view(request, ov_id):
                 puede_facturar = True
 
         if puede_facturar:
-            factura_form = FacturaForm()
+            factura_form = FacturaForm(empresa=orden_venta.empresa)
             # Si hay detalle de cancelación, podrías pasarlo al form o al contexto
             # para incluirlo en notas de la factura si el form lo permite.
             # form.fields['notas_factura'].initial = detalle_cancelacion_factura (si tuvieras ese campo)
@@ -431,7 +433,7 @@ def ventas_generar_factura_view(request, ov_id):
                 puede_facturar = True
 
         if puede_facturar:
-            factura_form = FacturaForm()
+            factura_form = FacturaForm(empresa=orden_venta.empresa)
             # Si hay detalle de cancelación, podrías pasarlo al form o al contexto
             # para incluirlo en notas de la factura si el form lo permite.
             # form.fields['notas_factura'].initial = detalle_cancelacion_factura (si tuvieras ese campo)
@@ -514,6 +516,10 @@ def ventas_generar_factura_view(request, ov_id):
             try:
                 factura = form.save(commit=False)
                 factura.orden_venta = orden_venta
+                factura.numero_factura = generar_siguiente_numero_documento(
+                    Factura, 'FACT', 'numero_factura',
+                    empresa=orden_venta.empresa or get_current_empresa(),
+                )
                 # El total a facturar es el total de la OV, ya que solo se factura cuando todo está listo.
                 factura.total_facturado = orden_venta.total_ov
                 factura.fecha_emision = timezone.now()
@@ -658,10 +664,12 @@ def ventas_editar_ov_view(request, ov_id):
                             )
                         else:
                             # --- INICIO DE LA CORRECCIÓN ---
-                            for item_guardado in ov_actualizada.items_ov.all():
-                                # Lógica correcta para generar número de OP secuencial
-                                next_op_number = generar_siguiente_numero_documento(OrdenProduccion, 'OP', 'numero_op')
-
+                            items_guardados = list(ov_actualizada.items_ov.all())
+                            # Reservar en bloque un número de OP por ítem
+                            numeros_op = reservar_numeros_documento(
+                                OrdenProduccion, 'OP', 'numero_op', len(items_guardados)
+                            )
+                            for item_guardado, next_op_number in zip(items_guardados, numeros_op):
                                 OrdenProduccion.objects.create(
                                     numero_op=next_op_number,
                                     orden_venta_origen=ov_actualizada,
@@ -134,6 +134,36 @@ if USE_TENANTS:
     DATABASE_ROUTERS = ['django_tenants.routers.TenantSyncRouter']
 
 
+# =============================================================================
+# CACHE
+# =============================================================================
+
+# Roles, contadores del sidebar, feed de notificaciones y ofertas se cachean y se
+# invalidan por señales: con más de un worker la caché tiene que ser compartida,
+# o cada proceso seguiría sirviendo su copia vieja (por ejemplo, un rol revocado).
+# Las claves llevan el schema del tenant (ver utils.clave_tenant).
+REDIS_URL = os.getenv("REDIS_URL")  # ej: redis://localhost:6379/0
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+elif DEBUG:
+    # Solo para desarrollo con un único proceso
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+else:
+    from django.core.exceptions import ImproperlyConfigured
+
+    raise ImproperlyConfigured("REDIS_URL es obligatorio con DEBUG=False (caché compartida entre workers).")
+
+
 # =============================================================================
 # URL CONFIGURATION
 # =============================================================================
@@ -13,78 +13,19 @@ sys.path.append('/home/daseg/Documentos/mis_proyectos/TP_LUMINOVA-main')
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
 django.setup()
 
-from App_LUMINOVA.models import OrdenVenta, OrdenProduccion
+from App_LUMINOVA.models import OrdenVenta
+from App_LUMINOVA.services.estado_ov import sincronizar_todas_las_ov
 
 def sincronizar_estados_ov():
     """
-    Sincroniza los estados de todas las OV basándose en el estado más avanzado 
-    de sus OPs asociadas.
+    Sincroniza los estados de todas las OV basándose en el estado de sus OPs asociadas.
+    Usa el mismo cálculo que la señal de OPs, por lotes (una consulta agrupada y un
+    bulk_update por lote), por lo que escala a decenas de miles de órdenes.
     """
-    # Mapeo de estados de OP a estados de OV y su prioridad
-    MAPEO_ESTADOS_OP_A_OV = {
-        "Completada": "COMPLETADA",
-        "En Proceso": "PRODUCCION_INICIADA", 
-        "Producción Iniciada": "PRODUCCION_INICIADA",
-        "Insumos Recibidos": "INSUMOS_SOLICITADOS",
-        "Insumos Solicitados": "INSUMOS_SOLICITADOS",
-        "Planificada": "CONFIRMADA",
-        "Pendiente": "PENDIENTE",
-        "Cancelada": "CANCELADA",
-    }
-    
-    ESTADOS_PRIORIDAD = {
-        "COMPLETADA": 6,
-        "LISTA_ENTREGA": 5,
-        "PRODUCCION_INICIADA": 4,
-        "INSUMOS_SOLICITADOS": 3,
-        "CONFIRMADA": 2,
-        "PENDIENTE": 1,
-        "CANCELADA": 0,
-    }
+    print(f"Procesando {OrdenVenta.objects.count()} Órdenes de Venta...")
 
-    # Obtener todas las OV
-    ovs = OrdenVenta.objects.all()
-    actualizadas = 0
-    
-    print(f"Procesando {ovs.count()} Órdenes de Venta...")
-    
-    for ov in ovs:
-        # Obtener OPs asociadas a esta OV
-        ops_asociadas = OrdenProduccion.objects.filter(orden_venta_origen=ov).select_related('estado_op')
-        
-        if not ops_asociadas.exists():
-            print(f"OV {ov.numero_ov}: Sin OPs asociadas, mantiene estado {ov.estado}")
-            continue
-        
-        # Obtener todos los estados de las OPs y mapearlos a estados de OV
-        estados_ops = []
-        for op in ops_asociadas:
-            if op.estado_op and op.estado_op.nombre:
-                estado_ov_mapeado = MAPEO_ESTADOS_OP_A_OV.get(op.estado_op.nombre)
-                if estado_ov_mapeado:
-                    estados_ops.append(estado_ov_mapeado)
-                    print(f"  OP {op.numero_op}: {op.estado_op.nombre} -> {estado_ov_mapeado}")
-        
-        if not estados_ops:
-            print(f"OV {ov.numero_ov}: Sin estados válidos para mapear")
-            continue
+    actualizadas = sincronizar_todas_las_ov()
 
-        # Encontrar el estado más avanzado
-        estado_mas_avanzado = max(
-            estados_ops,
-            key=lambda estado: ESTADOS_PRIORIDAD.get(estado, 0),
-        )
-
-        # Solo actualizar si el estado cambió
-        if estado_mas_avanzado and estado_mas_avanzado != ov.estado:
-            estado_anterior = ov.estado
-            ov.estado = estado_mas_avanzado
-            ov.save(update_fields=["estado"])
-            actualizadas += 1
-            print(f"OV {ov.numero_ov}: {estado_anterior} -> {estado_mas_avanzado}")
-        else:
-            print(f"OV {ov.numero_ov}: Estado {ov.estado} sin cambios")
-    
     print(f"\nSincronización completada. {actualizadas} OV actualizadas.")
 
 if __name__ == "__main__":
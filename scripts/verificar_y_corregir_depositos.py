@@ -6,6 +6,7 @@ Ejecutar con: python manage.py shell < verificar_y_corregir_depositos.py
 
 from App_LUMINOVA.models import Insumo, Deposito, CategoriaInsumo, StockInsumo, ProductoTerminado, StockProductoTerminado
 from django.db import transaction
+from App_LUMINOVA.utils import UMBRAL_STOCK_BAJO
 
 print("=== VERIFICACIÓN Y CORRECCIÓN DE DEPÓSITOS E INSUMOS ===")
 
@@ -66,7 +67,6 @@ if categorias_sin_deposito.exists():
             print(f"  - Categoría {categoria.nombre} -> {deposito_central.nombre}")
 
 # 6. Verificar insumos con stock bajo en el depósito central
-UMBRAL_STOCK_BAJO = 15000
 insumos_stock_bajo = Insumo.objects.filter(
     deposito=deposito_central,
     stock__lt=UMBRAL_STOCK_BAJO
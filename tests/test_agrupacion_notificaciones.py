@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Pruebas de la agrupación de notificaciones repetidas (stock bajo por insumo y depósito)
+"""
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from App_LUMINOVA.models import CategoriaInsumo, Deposito, Empresa, Insumo, NotificacionSistema
+from App_LUMINOVA.services.notificaciones_feed import calcular_etag
+from App_LUMINOVA.services.notification_service import NotificationService
+
+
+class TestAgrupacionNotificaciones(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.usuario = User.objects.create_user('deposito', password='x')
+        self.deposito = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        self.otro_deposito = Deposito.objects.create(nombre='Norte', empresa=self.empresa)
+        categoria = CategoriaInsumo.objects.create(nombre='Drivers', deposito=self.deposito)
+        self.insumo = Insumo.objects.create(descripcion='Driver', categoria=categoria, deposito=self.deposito)
+
+    def _notificar(self, deposito=None):
+        return NotificationService.notificar_stock_bajo(
+            self.insumo, deposito or self.deposito, self.usuario
+        )
+
+    def test_repeticiones_se_agrupan_en_la_notificacion_abierta(self):
+        primera = self._notificar()
+        for _ in range(4):
+            ultima = self._notificar()
+
+        self.assertEqual(ultima.pk, primera.pk)
+        self.assertEqual(ultima.repeticiones, 5)
+        self.assertEqual(NotificacionSistema.objects.filter(tipo='stock_bajo').count(), 1)
+
+        # Otro depósito es otra clave
+        self.assertNotEqual(self._notificar(self.otro_deposito).pk, primera.pk)
+
+        # Una vez resuelta, la siguiente ocurrencia abre una notificación nueva
+        primera.marcar_como_leida()
+        nueva = self._notificar()
+        self.assertNotEqual(nueva.pk, primera.pk)
+        self.assertEqual(nueva.repeticiones, 1)
+
+    def test_repeticion_vuelve_a_quedar_no_leida_para_quien_la_leyo(self):
+        cache.clear()
+        compras = User.objects.create_user('compras', password='x')
+        compras.groups.add(Group.objects.create(name='Compras'))
+        grupos = NotificationService.grupos_notificacion(compras)
+
+        self._notificar()
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificationService.marcar_notificaciones_como_leidas(compras)
+        self.assertEqual(NotificationService.contar_no_leidas(compras), 0)
+        etag = calcular_etag(None, grupos, compras.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._notificar()
+        self.assertEqual(NotificationService.contar_no_leidas(compras), 1)
+        self.assertNotEqual(calcular_etag(None, grupos, compras.pk), etag)
+
+    def test_indice_parcial_impide_duplicar_abiertas(self):
+        abierta = self._notificar()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            NotificacionSistema.objects.create(
+                tipo='stock_bajo', titulo='Duplicada', mensaje='-', remitente=self.usuario,
+                destinatario_grupo='compras', clave_agrupacion=abierta.clave_agrupacion,
+            )
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Pruebas del consumo de insumos de una OP con bloqueo de filas de stock
+"""
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from App_LUMINOVA.models import (
+    CategoriaInsumo, CategoriaProductoTerminado, ComponenteProducto, Deposito, Empresa,
+    Insumo, MovimientoStock, OrdenProduccion, ProductoTerminado, StockInsumo,
+)
+from App_LUMINOVA.services.consumo_insumos_op import consumir_insumos_op
+from App_LUMINOVA.services.libro_stock import StockInsuficienteError
+
+
+class TestConsumoInsumosOP(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.usuario = User.objects.create_user('deposito', password='x')
+        self.deposito = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        self.otro_deposito = Deposito.objects.create(nombre='Sucursal', empresa=self.empresa)
+        self.categoria = CategoriaInsumo.objects.create(nombre='Drivers', deposito=self.deposito)
+        categoria_pt = CategoriaProductoTerminado.objects.create(nombre='Paneles', deposito=self.deposito)
+        self.producto = ProductoTerminado.objects.create(
+            descripcion='Panel 60x60', categoria=categoria_pt, deposito=self.deposito
+        )
+
+    def _componente(self, descripcion, cantidad_necesaria, stock):
+        insumo = Insumo.objects.create(descripcion=descripcion, categoria=self.categoria, deposito=self.deposito)
+        ComponenteProducto.objects.create(
+            producto_terminado=self.producto, insumo=insumo, cantidad_necesaria=cantidad_necesaria
+        )
+        StockInsumo.objects.update_or_create(insumo=insumo, deposito=self.deposito, defaults={'cantidad': stock})
+        return insumo
+
+    def _op(self, numero, cantidad):
+        return OrdenProduccion.objects.create(
+            numero_op=numero, producto_a_producir=self.producto, cantidad_a_producir=cantidad,
+            empresa=self.empresa,
+        )
+
+    def test_todo_o_nada_sobre_el_deposito_de_la_op(self):
+        driver = self._componente('Driver', 2, 10)
+        chapa = self._componente('Chapa', 1, 3)
+        # El stock de otro depósito no cuenta para la OP
+        StockInsumo.objects.create(insumo=chapa, deposito=self.otro_deposito, cantidad=50)
+
+        with self.assertRaises(StockInsuficienteError) as error:
+            consumir_insumos_op(self._op('OP-1', 5), usuario=self.usuario)
+        self.assertEqual(
+            error.exception.faltantes,
+            [{'item_id': chapa.id, 'deposito_id': self.deposito.id, 'descripcion': 'Chapa',
+              'requerido': 5, 'disponible': 3}],
+        )
+        self.assertEqual(StockInsumo.objects.get(insumo=driver, deposito=self.deposito).cantidad, 10)
+        self.assertFalse(MovimientoStock.objects.exists())
+
+        descontados = consumir_insumos_op(self._op('OP-2', 3), usuario=self.usuario)
+
+        self.assertEqual(descontados, {driver.id: 6, chapa.id: 3})
+        self.assertEqual(StockInsumo.objects.get(insumo=driver, deposito=self.deposito).cantidad, 4)
+        self.assertEqual(Insumo.objects.get(pk=chapa.pk).stock_total, 50)
+        self.assertEqual(
+            MovimientoStock.objects.filter(
+                tipo='salida', deposito_origen=self.deposito, empresa=self.empresa
+            ).count(),
+            2,
+        )
+
+    def test_sin_bom_no_descuenta(self):
+        with self.assertRaises(ValueError):
+            consumir_insumos_op(self._op('OP-1', 1))
+
+    def test_consultas_no_crecen_con_el_bom(self):
+        def contar_consultas(componentes, numero):
+            for i in range(componentes):
+                self._componente(f'{numero} insumo {i}', 1, 10)
+            op = self._op(numero, 1)
+            with CaptureQueriesContext(connection) as consultas:
+                consumir_insumos_op(op)
+            return len(consultas)
+
+        self.assertEqual(contar_consultas(2, 'OP-1'), contar_consultas(6, 'OP-2'))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Pruebas de los contadores cacheados del sidebar (notificaciones_context)
+"""
+import os
+from unittest import mock
+
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from App_LUMINOVA.models import CategoriaInsumo, Deposito, Empresa, Insumo
+from App_LUMINOVA.services.contadores_sidebar import obtener_contadores
+
+
+class TestContadoresSidebar(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.deposito = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        self.categoria = CategoriaInsumo.objects.create(nombre='Drivers', deposito=self.deposito)
+
+    def test_contadores_cacheados_e_invalidados_por_senales(self):
+        self.assertEqual(obtener_contadores(self.empresa)['insumos_stock_bajo_count'], 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            obtener_contadores(self.empresa)
+        self.assertEqual(len(queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Insumo.objects.create(
+                descripcion='Driver 12V', categoria=self.categoria,
+                deposito=self.deposito, empresa=self.empresa
+            )
+
+        contadores = obtener_contadores(self.empresa)
+        self.assertEqual(contadores['insumos_stock_bajo_count'], 1)
+        self.assertEqual(contadores['total_notificaciones'], 1)
+
+    def test_claves_separadas_por_tenant(self):
+        obtener_contadores(self.empresa)
+        # Otro schema con los mismos ids no reutiliza los contadores cacheados
+        with mock.patch.object(connection, 'schema_name', 'otro_tenant', create=True):
+            with CaptureQueriesContext(connection) as queries:
+                obtener_contadores(self.empresa)
+        self.assertGreater(len(queries), 0)
+
+
+class TestContextProcessorsPerezosos(TestCase):
+    def setUp(self):
+        cache.clear()
+        from django.contrib.auth.models import User
+        from django.test import RequestFactory
+        self.user = User.objects.create_superuser('admin_test', 'admin@test.com', 'clave-segura-123')
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+        self.request.session = {}
+
+    def test_sin_consultas_hasta_leer_la_variable(self):
+        from django.template import Context, Template
+        from App_LUMINOVA.context_processors import empresa_actual_context, notificaciones_context
+
+        with CaptureQueriesContext(connection) as queries:
+            context = {**notificaciones_context(self.request), **empresa_actual_context(self.request)}
+        self.assertEqual(len(queries), 0)
+
+        template = Template('{{ total_notificaciones }}|{{ empresas_disponibles|length }}|{{ es_multi_empresa }}')
+        activas = Empresa.objects.filter(activa=True).count()
+        self.assertEqual(template.render(Context(context)), f'0|{activas}|{activas > 1}')
+
+        # Un segundo render dentro del mismo request reutiliza lo ya calculado
+        context = notificaciones_context(self.request)
+        with CaptureQueriesContext(connection) as queries:
+            Template('{% if total_notificaciones > 0 %}x{% endif %}').render(Context(context))
+        self.assertEqual(len(queries), 0)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Pruebas del dashboard global de depósitos (consultas agrupadas por depósito)
+"""
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from App_LUMINOVA.models import CategoriaInsumo, Deposito, Empresa, Insumo, StockInsumo
+from App_LUMINOVA.services.dashboard_deposito import construir_dashboard_global
+
+
+class TestDashboardGlobalDepositos(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+
+    def _crear_deposito(self, nombre, stocks):
+        deposito = Deposito.objects.create(nombre=nombre, empresa=self.empresa)
+        categoria = CategoriaInsumo.objects.create(nombre=f'Cat {nombre}', deposito=deposito)
+        for i, cantidad in enumerate(stocks):
+            insumo = Insumo.objects.create(
+                descripcion=f'{nombre} insumo {i}', categoria=categoria, deposito=deposito
+            )
+            StockInsumo.objects.filter(insumo=insumo, deposito=deposito).update(cantidad=cantidad)
+            Insumo.recalcular_stock_total([insumo.id])
+        return deposito
+
+    def _consultas(self):
+        with CaptureQueriesContext(connection) as queries:
+            context = construir_dashboard_global(self.empresa)
+            list(context['ocs_en_transito_list'])
+            list(context['ops_solicitudes_list'])
+            list(context['ocs_por_aprobar_list'])
+        return context, len(queries)
+
+    def test_metricas_por_deposito(self):
+        deposito = self._crear_deposito('Central', [10, 20000, 5, 1, 2, 3, 4])
+        self._crear_deposito('Norte', [30000])
+
+        context, _ = self._consultas()
+
+        self.assertEqual(context['insumos_count'], 8)
+        self.assertEqual(context['depositos_count'], 2)
+        self.assertEqual(len(context['depositos_con_stock_critico']), 1)
+        critico = context['depositos_con_stock_critico'][0]
+        self.assertEqual(critico['deposito'], deposito)
+        self.assertEqual(critico['insumos_criticos_count'], 6)
+        self.assertEqual([i.stock for i in critico['insumos_criticos']], [1, 2, 3, 4, 5])
+        resumen = {item['deposito'].nombre: item for item in context['depositos_resumen']}
+        self.assertEqual(resumen['Central']['total_insumos'], 7)
+        self.assertEqual(resumen['Norte']['insumos_criticos'], 0)
+
+    def test_consultas_no_dependen_de_cantidad_de_depositos(self):
+        self._crear_deposito('D1', [1])
+        _, consultas_uno = self._consultas()
+
+        for i in range(5):
+            self._crear_deposito(f'D{i + 2}', [1, 2])
+        _, consultas_seis = self._consultas()
+
+        self.assertEqual(consultas_uno, consultas_seis)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Pruebas de la numeración de documentos por secuencia (services/document_services.py)
+"""
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from django.test import TestCase
+
+from App_LUMINOVA.models import Cliente, Empresa, Factura, OrdenProduccion, OrdenVenta, SecuenciaDocumento
+from App_LUMINOVA.services.document_services import (
+    generar_siguiente_numero_documento,
+    previsualizar_numero_documento,
+    reservar_numeros_documento,
+)
+
+
+class TestSecuenciaDocumento(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        cliente = Cliente.objects.create(nombre='Cliente Test', empresa=self.empresa)
+        OrdenVenta.objects.create(numero_ov='OV-00007', cliente=cliente, empresa=self.empresa)
+
+    def test_continua_desde_los_documentos_existentes(self):
+        self.assertEqual(previsualizar_numero_documento(OrdenVenta, 'OV', 'numero_ov'), 'OV-00008')
+        self.assertEqual(generar_siguiente_numero_documento(OrdenVenta, 'OV', 'numero_ov'), 'OV-00008')
+        self.assertEqual(generar_siguiente_numero_documento(OrdenVenta, 'OV', 'numero_ov'), 'OV-00009')
+        self.assertEqual(SecuenciaDocumento.objects.get(prefijo='OV', empresa=None).ultimo_numero, 9)
+
+    def test_reserva_en_bloque(self):
+        numeros = reservar_numeros_documento(OrdenProduccion, 'OP', 'numero_op', 3)
+        self.assertEqual(numeros, ['OP-00001', 'OP-00002', 'OP-00003'])
+        self.assertEqual(generar_siguiente_numero_documento(OrdenProduccion, 'OP', 'numero_op'), 'OP-00004')
+
+    def test_secuencias_por_empresa(self):
+        otra = Empresa.objects.create(nombre='Otra Empresa', schema_name='otra_empresa')
+        self.assertEqual(generar_siguiente_numero_documento(Factura, 'FACT', 'numero_factura', empresa=self.empresa), 'FACT-00001')
+        self.assertEqual(generar_siguiente_numero_documento(Factura, 'FACT', 'numero_factura', empresa=otra), 'FACT-00001')
+        self.assertEqual(generar_siguiente_numero_documento(Factura, 'FACT', 'numero_factura', empresa=self.empresa), 'FACT-00002')
+
+    def test_altas_por_api_usan_la_secuencia(self):
+        from App_LUMINOVA.api.serializers import OrdenProduccionCreateSerializer, OrdenVentaCreateSerializer
+        from App_LUMINOVA.models import CategoriaProductoTerminado, Deposito, ProductoTerminado
+
+        cliente = Cliente.objects.get()
+        numeros_ov = []
+        for _ in range(2):
+            serializer = OrdenVentaCreateSerializer(data={'cliente': cliente.id})
+            serializer.is_valid(raise_exception=True)
+            numeros_ov.append(serializer.save(empresa=self.empresa).numero_ov)
+        self.assertEqual(numeros_ov, ['OV-00008', 'OV-00009'])
+
+        deposito = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        categoria = CategoriaProductoTerminado.objects.create(nombre='Lámparas', deposito=deposito)
+        producto = ProductoTerminado.objects.create(
+            descripcion='Lámpara', categoria=categoria, deposito=deposito, precio_unitario=1
+        )
+        numeros_op = []
+        for _ in range(2):
+            serializer = OrdenProduccionCreateSerializer(
+                data={'producto_a_producir': producto.id, 'cantidad_a_producir': 1}
+            )
+            serializer.is_valid(raise_exception=True)
+            numeros_op.append(serializer.save(empresa=self.empresa).numero_op)
+        self.assertEqual(numeros_op, ['OP-00001', 'OP-00002'])
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Pruebas de la derivación del estado de la OV a partir de sus OPs
+"""
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase
+
+from App_LUMINOVA.models import (
+    CategoriaProductoTerminado, Cliente, Deposito, Empresa, EstadoOrden,
+    OrdenProduccion, OrdenVenta, ProductoTerminado
+)
+from App_LUMINOVA.services import estado_ov
+
+
+class TestEstadoOVDerivado(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        deposito = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        categoria = CategoriaProductoTerminado.objects.create(nombre='Paneles', deposito=deposito)
+        self.producto = ProductoTerminado.objects.create(
+            descripcion='Panel 60x60', categoria=categoria, deposito=deposito, precio_unitario=100
+        )
+        self.cliente = Cliente.objects.create(nombre='Cliente Test', empresa=self.empresa)
+        self.ov = OrdenVenta.objects.create(numero_ov='OV-00001', cliente=self.cliente, empresa=self.empresa)
+        self.estados = {
+            nombre: EstadoOrden.objects.get_or_create(nombre=nombre)[0]
+            for nombre in ('Pendiente', 'Insumos Solicitados', 'Completada', 'Cancelada')
+        }
+
+    def _crear_op(self, numero, estado):
+        return OrdenProduccion.objects.create(
+            numero_op=numero, orden_venta_origen=self.ov, producto_a_producir=self.producto,
+            cantidad_a_producir=1, estado_op=self.estados[estado], empresa=self.empresa,
+        )
+
+    def test_recalculo_coalescido_al_confirmar(self):
+        with mock.patch(
+            'App_LUMINOVA.services.estado_ov.resumir_ops_por_ov',
+            side_effect=estado_ov.resumir_ops_por_ov,
+        ) as resumen:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    self._crear_op('OP-00001', 'Insumos Solicitados')
+                    self._crear_op('OP-00002', 'Pendiente')
+        self.assertEqual(resumen.call_count, 1)
+
+        self.ov.refresh_from_db()
+        self.assertEqual(self.ov.estado, 'INSUMOS_SOLICITADOS')
+
+    def test_sincronizacion_por_lotes(self):
+        self._crear_op('OP-00001', 'Completada')
+        self._crear_op('OP-00002', 'Cancelada')
+        otra = OrdenVenta.objects.create(numero_ov='OV-00002', cliente=self.cliente, empresa=self.empresa)
+        OrdenProduccion.objects.create(
+            numero_op='OP-00003', orden_venta_origen=otra, producto_a_producir=self.producto,
+            cantidad_a_producir=1, estado_op=self.estados['Cancelada'], empresa=self.empresa,
+        )
+        OrdenVenta.objects.update(estado='PENDIENTE')
+
+        # ids + resumen agrupado + carga de OVs + bulk_update
+        with self.assertNumQueries(4):
+            actualizadas = estado_ov.sincronizar_todas_las_ov(empresa=self.empresa)
+
+        self.assertEqual(actualizadas, 1)
+        self.ov.refresh_from_db()
+        otra.refresh_from_db()
+        self.assertEqual(self.ov.estado, 'LISTA_ENTREGA')
+        # CANCELADA tiene menor prioridad que PENDIENTE: no se degrada
+        self.assertEqual(otra.estado, 'PENDIENTE')
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Pruebas del bus de eventos en tiempo real y del flujo SSE
+"""
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+import asyncio
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase
+
+from App_LUMINOVA.models import CategoriaInsumo, Deposito, Empresa, Insumo, StockInsumo
+from App_LUMINOVA.services.eventos_tiempo_real import BusEventos, bus, flujo_eventos
+from App_LUMINOVA.services.notification_service import NotificationService
+from App_LUMINOVA.threadlocals import set_current_empresa
+from App_LUMINOVA.views_compras import eventos_tiempo_real_view
+
+
+class TestBusEventos(TestCase):
+    def test_reenvio_desde_cursor_y_resincronizacion(self):
+        bus_prueba = BusEventos(historial=3)
+        canal = ('empresa_test', 1, 'compras')
+        ids = [bus_prueba.publicar([canal], 'feed', {'n': n}) for n in range(5)]
+
+        async def leer(desde_id, cantidad):
+            flujo = flujo_eventos([canal], desde_id, bus_eventos=bus_prueba)
+            try:
+                return [await flujo.__anext__() for _ in range(cantidad)]
+            finally:
+                await flujo.aclose()
+
+        # Cursor dentro del historial: se reenvía solo lo posterior
+        partes = asyncio.run(leer(ids[3], 2))
+        self.assertTrue(partes[0].startswith('retry:'))
+        self.assertEqual(partes[1], f'id: {ids[4]}\nevent: feed\ndata: {{"n": 4}}\n\n')
+
+        # Cursor más viejo que el historial: se pide resincronizar
+        partes = asyncio.run(leer(ids[0], 3))
+        self.assertIn('event: resincronizar', partes[1])
+        self.assertIn(f'id: {ids[2]}\n', partes[2])
+
+
+class TestPublicacionEventos(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.usuario = User.objects.create_user('compras', password='x')
+        self.usuario.groups.add(Group.objects.create(name='Compras'))
+        self.deposito = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        categoria = CategoriaInsumo.objects.create(nombre='Drivers', deposito=self.deposito)
+        self.insumo = Insumo.objects.create(descripcion='Driver', categoria=categoria, deposito=self.deposito)
+
+    def _canal(self, grupo):
+        return (getattr(connection, 'schema_name', 'public'), self.empresa.id, grupo)
+
+    def _historial(self, grupo):
+        return [e['tipo'] for e in bus._historial.get(self._canal(grupo), [])]
+
+    def test_publica_al_confirmar(self):
+        # Como en un request: la notificación toma la empresa actual
+        set_current_empresa(self.empresa)
+        self.addCleanup(set_current_empresa, None)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            NotificationService.notificar_stock_bajo(self.insumo, self.deposito, self.usuario)
+            stock = StockInsumo.objects.get(insumo=self.insumo, deposito=self.deposito)
+            stock.cantidad = 7
+            stock.save()
+        self.assertNotIn('notificacion', self._historial('compras'))
+
+        for callback in callbacks:
+            callback()
+        self.assertIn('notificacion', self._historial('compras'))
+        ultimo_stock = [e for e in bus._historial[self._canal('deposito')] if e['tipo'] == 'stock'][-1]
+        self.assertEqual(
+            ultimo_stock['datos']['items'],
+            [{'tipo': 'insumo', 'id': self.insumo.id, 'deposito_id': self.deposito.id, 'cantidad': 7}],
+        )
+
+    def _request(self, tenant):
+        request = AsyncRequestFactory().get('/')
+        request.user = self.usuario
+        request.empresa_actual = self.empresa
+        if tenant is not None:
+            request.tenant = tenant
+
+        async def auser():
+            return self.usuario
+        request.auser = auser
+        return request
+
+    def test_vista_transmite_eventos_del_grupo(self):
+        request = self._request(self.empresa)
+
+        async def consumir():
+            response = await eventos_tiempo_real_view(request)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            contenido = response.streaming_content
+            try:
+                await contenido.__anext__()  # retry: suscripto
+                # El mismo grupo y empresa en otro tenant no llega a este flujo
+                bus.publicar([('otro_tenant', self.empresa.id, 'compras')], 'stock', {})
+                bus.publicar([('empresa_test', self.empresa.id, 'compras')], 'feed', {})
+                return await asyncio.wait_for(contenido.__anext__(), 1)
+            finally:
+                await contenido.aclose()
+
+        evento = async_to_sync(consumir)()
+        self.assertIn(b'event: feed', evento)
+
+    def test_vista_sin_tenant_no_transmite(self):
+        publico = Empresa(nombre='Público', schema_name='public')
+        for tenant in (None, publico):
+            response = async_to_sync(eventos_tiempo_real_view)(self._request(tenant))
+            self.assertEqual(response.status_code, 204)
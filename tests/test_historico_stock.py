@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Pruebas del stock a una fecha pasada (snapshots diarios + libro de movimientos)
+"""
+import os
+from io import StringIO
+
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from App_LUMINOVA.models import (
+    CategoriaInsumo, CategoriaProductoTerminado, Deposito, Empresa, Insumo, MovimientoStock,
+    PerfilUsuario, ProductoTerminado, SnapshotStock, StockInsumo,
+)
+from App_LUMINOVA.services.historico_stock import corte_del_dia, generar_snapshots, stock_a_fecha
+from App_LUMINOVA.services.libro_stock import unidad_de_trabajo
+from App_LUMINOVA.services.transferencia_lote import transferir_lote
+
+
+class TestHistoricoStock(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.central = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        self.sucursal = Deposito.objects.create(nombre='Sucursal', empresa=self.empresa)
+        self.categoria = CategoriaInsumo.objects.create(nombre='Drivers', deposito=self.central)
+        self.driver = Insumo.objects.create(descripcion='Driver', categoria=self.categoria, deposito=self.central)
+        self.hoy = timezone.localdate()
+
+    def _dia(self, dias_atras):
+        """Mediodía de hace ``dias_atras`` días."""
+        return corte_del_dia(self.hoy - timedelta(days=dias_atras)) - timedelta(hours=12)
+
+    def _registrar(self, dias_atras, operacion):
+        with unidad_de_trabajo() as uow:
+            operacion(uow)
+        ids = [movimiento.id for movimiento in uow.movimientos_registrados]
+        MovimientoStock.objects.filter(id__in=ids).update(fecha=self._dia(dias_atras))
+
+    def _cargar_historia(self):
+        # Hace 3 días entran 10, hace 2 se transfieren 4 y hoy sale 1
+        self._registrar(3, lambda uow: uow.entrada(self.driver, self.central.id, 10))
+        self._registrar(2, lambda uow: uow.transferencia(self.driver, self.central.id, self.sucursal.id, 4))
+        self._registrar(0, lambda uow: uow.salida(self.driver, self.central.id, 1))
+
+    def _cantidades(self, momento):
+        return stock_a_fecha(self.empresa.id, momento)['cantidades']
+
+    def test_snapshots_incrementales_y_stock_a_fecha(self):
+        self._cargar_historia()
+        central, sucursal = ('insumo', self.driver.id, self.central.id), ('insumo', self.driver.id, self.sucursal.id)
+
+        # Sin snapshots se retrocede desde el stock actual
+        self.assertEqual(self._cantidades(corte_del_dia(self.hoy - timedelta(days=3))), {central: 10})
+
+        # Línea de base y luego solo los días con movimientos desde el punto de control
+        resumen, = generar_snapshots(self.empresa.id, hasta=self.hoy - timedelta(days=3))
+        self.assertEqual(resumen['fechas'], [self.hoy - timedelta(days=3)])
+        resumen, = generar_snapshots(self.empresa.id)
+        self.assertEqual((resumen['fechas'], resumen['movimientos']), ([self.hoy - timedelta(days=2)], 1))
+        resumen, = generar_snapshots(self.empresa.id)
+        self.assertEqual(resumen['fechas'], [])
+
+        consulta = stock_a_fecha(self.empresa.id, corte_del_dia(self.hoy - timedelta(days=1)))
+        self.assertEqual(consulta['snapshot'].fecha, self.hoy - timedelta(days=2))
+        self.assertEqual((consulta['cantidades'], consulta['movimientos']), ({central: 6, sucursal: 4}, 0))
+
+        consulta = stock_a_fecha(self.empresa.id, timezone.now() + timedelta(seconds=1))
+        self.assertEqual((consulta['cantidades'], consulta['movimientos']), ({central: 5, sucursal: 4}, 1))
+        self.assertEqual(self._cantidades(self._dia(5)), {})
+        self.assertEqual(
+            stock_a_fecha(self.empresa.id, self._dia(1), deposito_id=self.sucursal.id)['cantidades'], {sucursal: 4}
+        )
+
+    def test_transferencia_a_una_copia_del_item(self):
+        StockInsumo.objects.filter(insumo=self.driver, deposito=self.central).update(cantidad=10)
+        generar_snapshots(self.empresa.id)
+
+        copia = transferir_lote(Insumo, self.central, self.sucursal, {self.driver.id: 3})[0]['item_destino']
+
+        self.assertEqual(MovimientoStock.objects.get().insumo_destino, copia)
+        self.assertEqual(
+            self._cantidades(timezone.now() + timedelta(seconds=1)),
+            {('insumo', self.driver.id, self.central.id): 7, ('insumo', copia.id, self.sucursal.id): 3},
+        )
+
+    def test_consultas_no_crecen_con_los_movimientos(self):
+        def contar_consultas(cantidad_movimientos):
+            for _ in range(cantidad_movimientos):
+                self._registrar(1, lambda uow: uow.entrada(self.driver, self.central.id, 1))
+            with CaptureQueriesContext(connection) as consultas:
+                stock_a_fecha(self.empresa.id, timezone.now())
+            return len(consultas)
+
+        generar_snapshots(self.empresa.id, hasta=self.hoy - timedelta(days=2))
+        self.assertEqual(contar_consultas(2), contar_consultas(20))
+
+    def test_comando_api_y_vista(self):
+        categoria_pt = CategoriaProductoTerminado.objects.create(nombre='Paneles', deposito=self.central)
+        panel = ProductoTerminado.objects.create(
+            descripcion='Panel', categoria=categoria_pt, deposito=self.central, precio_unitario=Decimal('100')
+        )
+        self._registrar(2, lambda uow: uow.entrada(panel, self.central.id, 3))
+        self._registrar(0, lambda uow: uow.entrada(panel, self.central.id, 5))
+        call_command('generar_snapshots_stock', empresa_id=self.empresa.id, stdout=StringIO())
+        self.assertEqual(SnapshotStock.objects.filter(empresa=self.empresa).count(), 1)
+
+        from rest_framework.test import APIClient
+
+        usuario = User.objects.create_superuser('admin', password='x')
+        PerfilUsuario.objects.create(user=usuario, empresa=self.empresa)
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+        respuesta = cliente.get('/api/v1/movimientos-stock/stock_a_fecha/', {
+            'fecha': (self.hoy - timedelta(days=1)).isoformat(), 'tipo_item': 'producto',
+        })
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        datos = respuesta.json()
+        self.assertEqual([linea['cantidad'] for linea in datos['lineas']], [3])
+        self.assertEqual(Decimal(str(datos['valor_total'])), Decimal('300'))
+        self.assertEqual(cliente.get('/api/v1/movimientos-stock/stock_a_fecha/', {'fecha': 'ayer'}).status_code, 400)
+
+        self.client.force_login(usuario)
+        session = self.client.session
+        session['deposito_seleccionado'] = self.central.id
+        session.save()
+        respuesta = self.client.get(reverse('App_LUMINOVA:stock_a_fecha'), {'fecha': self.hoy.isoformat()})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['valor_total'], Decimal('800'))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+Pruebas del kardex (ficha de stock) por ítem y depósito
+"""
+import os
+from unittest import mock
+
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from App_LUMINOVA.models import (
+    CategoriaInsumo, Deposito, Empresa, Insumo, MovimientoStock, PerfilUsuario, StockInsumo,
+)
+from App_LUMINOVA.services.historico_stock import corte_del_dia
+from App_LUMINOVA.services.kardex import (
+    CursorKardexInvalido, alcance_kardex, filas_csv, movimientos_kardex, pagina_kardex, saldo_inicial,
+)
+from App_LUMINOVA.services.libro_stock import unidad_de_trabajo
+from App_LUMINOVA.services.transferencia_lote import transferir_lote
+
+
+class TestKardex(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.central = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        self.sucursal = Deposito.objects.create(nombre='Sucursal', empresa=self.empresa)
+        categoria = CategoriaInsumo.objects.create(nombre='Drivers', deposito=self.central)
+        self.driver = Insumo.objects.create(descripcion='Driver', categoria=categoria, deposito=self.central)
+        # Stock cargado antes de existir el libro
+        StockInsumo.objects.filter(insumo=self.driver, deposito=self.central).update(cantidad=5)
+        self.hoy = timezone.localdate()
+
+        self._registrar(3, lambda uow: uow.entrada(self.driver, self.central.id, 10))
+        self._registrar(2, lambda uow: uow.transferencia(self.driver, self.central.id, self.sucursal.id, 4))
+        self._registrar(1, lambda uow: uow.salida(self.driver, self.central.id, 1))
+        self._registrar(0, lambda uow: uow.transferencia(self.driver, self.sucursal.id, self.central.id, 2))
+
+    def _registrar(self, dias_atras, operacion):
+        with unidad_de_trabajo() as uow:
+            operacion(uow)
+        fecha = corte_del_dia(self.hoy - timedelta(days=dias_atras)) - timedelta(hours=12)
+        MovimientoStock.objects.filter(id__in=[m.id for m in uow.movimientos_registrados]).update(fecha=fecha)
+
+    def _kardex(self, deposito, desde=None, hasta=None):
+        movimientos = movimientos_kardex(Insumo, self.driver.id, deposito.id, desde, hasta)
+        _, saldo = saldo_inicial(Insumo, self.driver, deposito, desde)
+        return movimientos, saldo, alcance_kardex(Insumo, self.driver.id, deposito.id, desde, hasta)
+
+    def test_saldo_acumulado_y_paginacion_por_cursor(self):
+        movimientos, saldo, alcance = self._kardex(self.central)
+        self.assertEqual(saldo, 5)
+
+        pagina, cursor = pagina_kardex(movimientos, alcance, saldo, tamano=3)
+        self.assertEqual([(m.delta, m.saldo) for m in pagina], [(10, 15), (-4, 11), (-1, 10)])
+        # La página siguiente no necesita el saldo inicial: lo trae el cursor
+        pagina, siguiente = pagina_kardex(movimientos, alcance, cursor=cursor, tamano=3)
+        self.assertEqual(([(m.delta, m.saldo) for m in pagina], siguiente), ([(2, 12)], None))
+
+        movimientos, saldo, alcance = self._kardex(self.sucursal)
+        self.assertEqual([m.saldo for m in pagina_kardex(movimientos, alcance, saldo)[0]], [4, 2])
+
+        # Un cursor alterado o emitido para otro depósito se rechaza
+        with self.assertRaises(CursorKardexInvalido):
+            pagina_kardex(movimientos, alcance, cursor=cursor)
+        with self.assertRaises(CursorKardexInvalido):
+            pagina_kardex(movimientos, alcance, cursor=cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B'))
+
+    def test_rango_de_fechas(self):
+        desde = corte_del_dia(self.hoy - timedelta(days=3))
+        hasta = corte_del_dia(self.hoy - timedelta(days=1))
+        movimientos, saldo, alcance = self._kardex(self.central, desde, hasta)
+        self.assertEqual(saldo, 15)
+        self.assertEqual([m.saldo for m in pagina_kardex(movimientos, alcance, saldo)[0]], [11, 10])
+
+    def test_transferencia_a_una_copia(self):
+        copia = transferir_lote(Insumo, self.central, self.sucursal, {self.driver.id: 3})[0]['item_destino']
+
+        movimientos = movimientos_kardex(Insumo, copia.id, self.sucursal.id)
+        _, saldo = saldo_inicial(Insumo, copia, self.sucursal)
+        alcance = alcance_kardex(Insumo, copia.id, self.sucursal.id)
+        self.assertEqual([(m.delta, m.saldo) for m in pagina_kardex(movimientos, alcance, saldo)[0]], [(3, 3)])
+
+    def test_csv_en_streaming(self):
+        movimientos, saldo, _ = self._kardex(self.central)
+        lineas = list(filas_csv(movimientos, saldo))
+        self.assertEqual(len(lineas), 6)
+        self.assertTrue(lineas[-1].startswith(timezone.localtime(timezone.now()).strftime('%d/%m/%Y')))
+        self.assertEqual(lineas[-1].split(',')[-2], '12')
+
+    def test_vista_y_api(self):
+        usuario = User.objects.create_superuser('admin', password='x')
+        PerfilUsuario.objects.create(user=usuario, empresa=self.empresa)
+        self.client.force_login(usuario)
+        session = self.client.session
+        session['deposito_seleccionado'] = self.central.id
+        session.save()
+
+        url = reverse('App_LUMINOVA:kardex', args=['insumo', self.driver.id])
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([m.saldo for m in respuesta.context['movimientos']], [15, 11, 10, 12])
+
+        respuesta = self.client.get(url, {'deposito': self.sucursal.id, 'formato': 'csv'})
+        self.assertIsInstance(respuesta, StreamingHttpResponse)
+        self.assertEqual(len(b''.join(respuesta.streaming_content).decode().splitlines()), 4)
+
+        from rest_framework.test import APIClient
+
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+        api = '/api/v1/movimientos-stock/kardex/'
+        parametros = {'tipo_item': 'insumo', 'item': self.driver.id, 'deposito': self.central.id}
+        datos = cliente.get(api, parametros).json()
+        self.assertEqual((datos['saldo_inicial'], [m['saldo'] for m in datos['movimientos']]), (5, [15, 11, 10, 12]))
+        self.assertIsNone(datos['siguiente_cursor'])
+        respuesta = cliente.get(api, {**parametros, 'formato': 'csv'})
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+
+    def test_paginas_siguientes_sin_saldo_inicial_y_cursor_firmado(self):
+        from rest_framework.test import APIClient
+
+        usuario = User.objects.create_superuser('admin', password='x')
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+        api = '/api/v1/movimientos-stock/kardex/'
+        parametros = {'tipo_item': 'insumo', 'item': self.driver.id, 'deposito': self.central.id}
+
+        # Cursor emitido tras una primera página de 3 movimientos
+        cursor = pagina_kardex(
+            movimientos_kardex(Insumo, self.driver.id, self.central.id),
+            alcance_kardex(Insumo, self.driver.id, self.central.id), 5, tamano=3,
+        )[1]
+        with mock.patch('App_LUMINOVA.api.viewsets.saldo_inicial', wraps=saldo_inicial) as calculo:
+            cliente.get(api, parametros)
+            self.assertEqual(calculo.call_count, 1)
+            segunda = cliente.get(api, {**parametros, 'cursor': cursor}).json()
+            self.assertEqual(calculo.call_count, 1)
+        self.assertIsNone(segunda['saldo_inicial'])
+        self.assertEqual([m['saldo'] for m in segunda['movimientos']], [12])
+
+        # Un saldo falsificado en el cursor no pasa la firma
+        respuesta = cliente.get(api, {**parametros, 'cursor': cursor.replace(cursor[0], 'x', 1)})
+        self.assertEqual(respuesta.status_code, 400)
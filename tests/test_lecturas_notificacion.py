@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Pruebas de las lecturas de notificaciones por usuario y del marcado masivo
+"""
+import json
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from App_LUMINOVA.models import Empresa, LecturaNotificacion, NotificacionSistema
+from App_LUMINOVA.services.notification_service import NotificationService
+from App_LUMINOVA.views_compras import ajax_notificaciones_no_leidas
+
+
+class TestLecturasNotificacion(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        grupo = Group.objects.create(name='Compras')
+        self.ana = User.objects.create_user('ana', password='x')
+        self.beto = User.objects.create_user('beto', password='x')
+        for usuario in (self.ana, self.beto):
+            usuario.groups.add(grupo)
+        NotificacionSistema.objects.bulk_create([
+            NotificacionSistema(
+                titulo=f'Aviso {i}', mensaje='-', remitente=self.ana,
+                destinatario_grupo='compras', empresa=self.empresa,
+            )
+            for i in range(30)
+        ])
+
+    def test_marcar_todas_es_una_consulta_y_solo_afecta_al_usuario(self):
+        # Los grupos del usuario quedan cacheados (roles_usuario)
+        NotificationService.grupos_notificacion(self.ana)
+        with self.assertNumQueries(1):
+            marcadas = NotificationService.marcar_notificaciones_como_leidas(self.ana)
+        self.assertEqual(marcadas, 30)
+        self.assertEqual(NotificationService.contar_no_leidas(self.ana), 0)
+        self.assertEqual(NotificationService.contar_no_leidas(self.beto), 30)
+        self.assertFalse(NotificacionSistema.objects.filter(leida=True).exists())
+
+        # Repetir no duplica lecturas
+        self.assertEqual(NotificationService.marcar_notificaciones_como_leidas(self.ana), 0)
+        self.assertEqual(LecturaNotificacion.objects.filter(usuario=self.ana).count(), 30)
+
+    def test_marcar_una_actualiza_el_feed_del_usuario(self):
+        def consultar(usuario, etag=None):
+            headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+            request = RequestFactory().get('/', **headers)
+            request.user = usuario
+            request.empresa_actual = self.empresa
+            return ajax_notificaciones_no_leidas(request)
+
+        etag_ana = consultar(self.ana)['ETag']
+        etag_beto = consultar(self.beto)['ETag']
+        notificacion = NotificacionSistema.objects.order_by('-fecha_creacion', '-id').first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notificacion.marcar_como_leida(self.ana)
+
+        response = consultar(self.ana, etag_ana)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(notificacion.id, [n['id'] for n in json.loads(response.content)['notificaciones']])
+        self.assertEqual(consultar(self.beto, etag_beto).status_code, 304)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Pruebas de la unidad de trabajo del libro de stock
+"""
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from App_LUMINOVA.models import (
+    CategoriaInsumo, CategoriaProductoTerminado, Deposito, Empresa, Insumo, MovimientoStock,
+    ProductoTerminado, StockInsumo, StockProductoTerminado,
+)
+from App_LUMINOVA.services.libro_stock import StockInsuficienteError, unidad_de_trabajo
+
+
+class TestLibroStock(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.usuario = User.objects.create_user('deposito', password='x')
+        self.central = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        self.sucursal = Deposito.objects.create(nombre='Sucursal', empresa=self.empresa)
+        self.categoria = CategoriaInsumo.objects.create(nombre='Drivers', deposito=self.central)
+        categoria_pt = CategoriaProductoTerminado.objects.create(nombre='Paneles', deposito=self.central)
+        self.producto = ProductoTerminado.objects.create(
+            descripcion='Panel 60x60', categoria=categoria_pt, deposito=self.central
+        )
+
+    def _insumo(self, descripcion):
+        return Insumo.objects.create(descripcion=descripcion, categoria=self.categoria, deposito=self.central)
+
+    def _stock(self, modelo, **filtros):
+        return modelo.objects.filter(**filtros).values_list('cantidad', flat=True).first()
+
+    def test_agrupa_deltas_y_registra_cada_movimiento(self):
+        insumo = self._insumo('Driver')
+        with unidad_de_trabajo(usuario=self.usuario) as uow:
+            uow.entrada(insumo, self.central.id, 10, motivo='Compra')
+            uow.transferencia(insumo, self.central.id, self.sucursal.id, 4)
+            uow.entrada(self.producto, self.sucursal.id, 3)
+            # Las unidades anidadas se suman a la exterior
+            with unidad_de_trabajo() as anidada:
+                self.assertIs(anidada, uow)
+                anidada.salida(insumo, self.central.id, 1)
+
+        self.assertEqual(self._stock(StockInsumo, insumo=insumo, deposito=self.central), 5)
+        self.assertEqual(self._stock(StockInsumo, insumo=insumo, deposito=self.sucursal), 4)
+        self.assertEqual(self._stock(StockProductoTerminado, producto=self.producto, deposito=self.sucursal), 3)
+        self.assertEqual(Insumo.objects.get(pk=insumo.pk).stock_total, 9)
+        self.assertEqual(ProductoTerminado.objects.get(pk=self.producto.pk).stock_total, 3)
+        self.assertEqual(
+            sorted(MovimientoStock.objects.filter(empresa=self.empresa, usuario=self.usuario).values_list('tipo', flat=True)),
+            ['entrada', 'entrada', 'salida', 'transferencia'],
+        )
+
+    def test_stock_negativo_revierte_toda_la_unidad(self):
+        driver, chapa = self._insumo('Driver'), self._insumo('Chapa')
+        StockInsumo.objects.filter(insumo=driver, deposito=self.central).update(cantidad=5)
+
+        with self.assertRaises(StockInsuficienteError) as error:
+            with unidad_de_trabajo() as uow:
+                uow.salida(driver, self.central.id, 2)
+                uow.transferencia(chapa, self.central.id, self.sucursal.id, 1)
+
+        self.assertEqual([f['descripcion'] for f in error.exception.faltantes], ['Chapa'])
+        self.assertEqual(self._stock(StockInsumo, insumo=driver, deposito=self.central), 5)
+        self.assertIsNone(self._stock(StockInsumo, insumo=chapa, deposito=self.sucursal))
+        self.assertFalse(MovimientoStock.objects.exists())
+
+    def test_consultas_no_crecen_con_las_lineas(self):
+        def contar_consultas(cantidad_insumos, prefijo):
+            insumos = [self._insumo(f'{prefijo} {i}') for i in range(cantidad_insumos)]
+            with CaptureQueriesContext(connection) as consultas:
+                with unidad_de_trabajo() as uow:
+                    for insumo in insumos:
+                        uow.entrada(insumo, self.central.id, 5)
+                        uow.transferencia(insumo, self.central.id, self.sucursal.id, 2)
+                    uow.entrada(self.producto, self.central.id, 1)
+            return len(consultas)
+
+        self.assertEqual(contar_consultas(2, 'A'), contar_consultas(10, 'B'))
+
+    def test_api_aplica_el_movimiento_al_stock(self):
+        from rest_framework.test import APIClient
+
+        insumo = self._insumo('Driver')
+        cliente = APIClient()
+        cliente.force_authenticate(User.objects.create_superuser('admin', password='x'))
+        url = '/api/v1/movimientos-stock/'
+
+        respuesta = cliente.post(url, {
+            'insumo': insumo.id, 'deposito_destino': self.central.id, 'cantidad': 7, 'tipo': 'entrada',
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.assertEqual(self._stock(StockInsumo, insumo=insumo, deposito=self.central), 7)
+
+        respuesta = cliente.post(url, {
+            'insumo': insumo.id, 'deposito_origen': self.central.id, 'cantidad': 8, 'tipo': 'salida',
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(MovimientoStock.objects.count(), 1)
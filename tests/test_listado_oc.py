@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Pruebas del listado de OCs por pestañas (conteo agrupado y paginación por cursor)
+"""
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from App_LUMINOVA.models import Empresa, Orden, Proveedor
+from App_LUMINOVA.services.listado_oc import construir_pestanas, pagina_ocs
+from App_LUMINOVA.views_compras import compras_lista_oc_fragmento_view
+
+
+class TestListadoOC(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.proveedor = Proveedor.objects.create(nombre='Proveedor', empresa=self.empresa)
+        ahora = timezone.now()
+        # Cinco OCs con la misma fecha de creación, para ejercitar el desempate por id
+        for i in range(7):
+            Orden.objects.create(
+                numero_orden=f'OC-T{i}', tipo='compra', proveedor=self.proveedor,
+                estado='BORRADOR' if i < 6 else 'APROBADA', empresa=self.empresa,
+                fecha_creacion=ahora if i < 5 else ahora - timedelta(days=i),
+            )
+        self.ocs = Orden.objects.filter(empresa=self.empresa, tipo='compra')
+
+    def test_pestanas_con_una_consulta(self):
+        with self.assertNumQueries(1):
+            pestanas = construir_pestanas(self.ocs)
+
+        totales = {estado: total for estado, _, total in pestanas}
+        self.assertEqual(totales['BORRADOR'], 6)
+        self.assertEqual(totales['APROBADA'], 1)
+        self.assertEqual(totales['CANCELADA'], 0)
+        self.assertEqual(len(construir_pestanas(self.ocs, solo_con_ocs=True)), 2)
+
+    def test_paginacion_por_cursor_recorre_todo_sin_repetir(self):
+        vistos = []
+        cursor = None
+        while True:
+            pagina, cursor = pagina_ocs(self.ocs, 'BORRADOR', cursor, tamano=2)
+            vistos.extend(oc.numero_orden for oc in pagina)
+            if not cursor:
+                break
+
+        esperado = list(
+            self.ocs.filter(estado='BORRADOR')
+            .order_by('-fecha_creacion', '-id')
+            .values_list('numero_orden', flat=True)
+        )
+        self.assertEqual(vistos, esperado)
+
+    def test_fragmento_filtra_por_empresa_y_estado(self):
+        request = RequestFactory().get('/', {'estado': 'APROBADA'})
+        request.user = User.objects.create_user('compras', password='x')
+        request.empresa_actual = self.empresa
+
+        response = compras_lista_oc_fragmento_view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'OC-T6')
+        self.assertNotContains(response, 'OC-T0')
+
+        request = RequestFactory().get('/', {'estado': 'BORRADOR', 'vista': 'seguimiento'})
+        request.user = User.objects.get(username='compras')
+        request.empresa_actual = self.empresa
+        self.assertEqual(compras_lista_oc_fragmento_view(request).status_code, 400)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+Pruebas del cacheo de PasswordChangeMiddleware
+"""
+import os
+from unittest import mock
+
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from App_LUMINOVA.middleware import requiere_cambio_password
+from App_LUMINOVA.models import PasswordChangeRequired
+
+
+class TestMiddlewareCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('nuevo', password='clave-segura-123')
+
+    def test_cambio_password_cacheado_e_invalidado(self):
+        self.assertFalse(requiere_cambio_password(self.user))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(requiere_cambio_password(self.user))
+        self.assertEqual(len(queries), 0)
+
+        PasswordChangeRequired.objects.create(user=self.user)
+        self.assertTrue(requiere_cambio_password(self.user))
+
+        PasswordChangeRequired.objects.filter(user=self.user).delete()
+        self.assertFalse(requiere_cambio_password(self.user))
+
+    def test_cambio_password_separado_por_tenant(self):
+        PasswordChangeRequired.objects.create(user=self.user)
+        self.assertTrue(requiere_cambio_password(self.user))
+
+        # Otro schema con el mismo id de usuario no hereda el valor cacheado
+        with mock.patch.object(connection, 'schema_name', 'otro_tenant', create=True):
+            with CaptureQueriesContext(connection) as queries:
+                requiere_cambio_password(self.user)
+        self.assertEqual(len(queries), 1)
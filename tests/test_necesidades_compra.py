@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Pruebas del cálculo de necesidades de compra (stock, cantidad en OC y OC en borrador)
+"""
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from django.test import TestCase
+
+from App_LUMINOVA.models import (
+    CategoriaInsumo, Deposito, Empresa, Insumo, Orden, Proveedor, StockInsumo,
+)
+from App_LUMINOVA.services.necesidades_compra import (
+    agrupar_insumos_criticos, insumos_que_necesitan_compra,
+)
+
+
+class TestNecesidadesCompra(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.deposito = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        self.categoria = CategoriaInsumo.objects.create(nombre='Drivers', deposito=self.deposito)
+        self.proveedor = Proveedor.objects.create(nombre='Proveedor', empresa=self.empresa)
+        self.numero = 0
+
+    def _insumo(self, descripcion, stock):
+        insumo = Insumo.objects.create(
+            descripcion=descripcion, categoria=self.categoria, deposito=self.deposito
+        )
+        StockInsumo.objects.filter(insumo=insumo, deposito=self.deposito).update(cantidad=stock)
+        Insumo.recalcular_stock_total([insumo.id])
+        return insumo
+
+    def _oc(self, insumo, estado, cantidad, deposito=None):
+        self.numero += 1
+        return Orden.objects.create(
+            numero_orden=f'OC-T{self.numero}', tipo='compra', estado=estado,
+            proveedor=self.proveedor, insumo_principal=insumo,
+            cantidad_principal=cantidad, deposito=deposito, empresa=self.empresa,
+        )
+
+    def test_excluye_insumos_cubiertos_por_ocs_en_firme(self):
+        cubierto = self._insumo('Cubierto', 100)
+        self._oc(cubierto, 'APROBADA', 10000, self.deposito)
+        self._oc(cubierto, 'EN_TRANSITO', 5000)
+        parcial = self._insumo('Parcial', 100)
+        self._oc(parcial, 'APROBADA', 1000, self.deposito)
+        self._oc(parcial, 'BORRADOR', 50000, self.deposito)
+        self._insumo('Sin OC', 10)
+        self._insumo('Con stock', 20000)
+
+        with self.assertNumQueries(1):
+            insumos = {i.descripcion: i for i in insumos_que_necesitan_compra()}
+
+        self.assertEqual(set(insumos), {'Parcial', 'Sin OC'})
+        self.assertEqual(insumos['Parcial'].cantidad_en_oc, 1000)
+        self.assertTrue(insumos['Parcial'].tiene_oc_borrador)
+        self.assertEqual(insumos['Sin OC'].cantidad_en_oc, 0)
+        self.assertFalse(insumos['Sin OC'].tiene_oc_borrador)
+
+    def test_insumo_sin_deposito_ve_sus_ocs(self):
+        sin_deposito = Insumo.objects.create(descripcion='Sin depósito', categoria=self.categoria)
+        self._oc(sin_deposito, 'APROBADA', 300)
+        self._oc(sin_deposito, 'BORRADOR', 1000)
+        otro = self._insumo('Con depósito', 10)
+        self._oc(otro, 'BORRADOR', 1000, Deposito.objects.create(nombre='Norte', empresa=self.empresa))
+
+        insumos = {i.descripcion: i for i in insumos_que_necesitan_compra()}
+
+        self.assertIsNone(insumos['Sin depósito'].deposito_id)
+        self.assertEqual(insumos['Sin depósito'].cantidad_en_oc, 300)
+        self.assertTrue(insumos['Sin depósito'].tiene_oc_borrador)
+        # Una OC en borrador de otro depósito no cuenta
+        self.assertFalse(insumos['Con depósito'].tiene_oc_borrador)
+
+    def test_agrupa_por_descripcion_y_categoria(self):
+        otro = Deposito.objects.create(nombre='Norte', empresa=self.empresa)
+        self._insumo('LED', 5)
+        insumo_norte = Insumo.objects.create(
+            descripcion='LED', categoria=self.categoria, deposito=otro
+        )
+        StockInsumo.objects.filter(insumo=insumo_norte, deposito=otro).update(cantidad=7)
+        Insumo.recalcular_stock_total([insumo_norte.id])
+        self._oc(insumo_norte, 'BORRADOR', 100, otro)
+
+        grupos = agrupar_insumos_criticos(
+            insumos_que_necesitan_compra().select_related('categoria', 'deposito')
+        )
+
+        self.assertEqual(len(grupos), 1)
+        self.assertEqual(grupos[0]['stock_total'], 12)
+        self.assertEqual(len(grupos[0]['desglose_depositos']), 2)
+        self.assertTrue(grupos[0]['tiene_oc_borrador'])
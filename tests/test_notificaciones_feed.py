@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Pruebas del feed de notificaciones con ETag y de la resolución de stock bajo al confirmar OCs
+"""
+import os
+from unittest import mock
+
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase
+
+from App_LUMINOVA.models import (
+    CategoriaInsumo, Deposito, Empresa, Insumo, NotificacionSistema, Orden, Proveedor,
+)
+from App_LUMINOVA.views_compras import ajax_notificaciones_no_leidas
+
+
+class TestFeedNotificaciones(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.usuario = User.objects.create_user('compras', password='x')
+        self.usuario.groups.add(Group.objects.create(name='Compras'))
+        deposito = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        categoria = CategoriaInsumo.objects.create(nombre='Drivers', deposito=deposito)
+        self.insumo = Insumo.objects.create(descripcion='Driver', categoria=categoria, deposito=deposito)
+        self.proveedor = Proveedor.objects.create(nombre='Proveedor', empresa=self.empresa)
+
+    def _notificar(self, titulo, **extra):
+        with self.captureOnCommitCallbacks(execute=True):
+            return NotificacionSistema.objects.create(
+                titulo=titulo, mensaje='-', remitente=self.usuario,
+                destinatario_grupo='compras', empresa=self.empresa, **extra,
+            )
+
+    def _consultar(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        request = RequestFactory().get('/', **headers)
+        request.user = self.usuario
+        request.empresa_actual = self.empresa
+        return ajax_notificaciones_no_leidas(request)
+
+    def test_poll_sin_cambios_responde_304_sin_consultas(self):
+        self._notificar('Primera')
+        response = self._consultar()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Primera', response.content.decode())
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._consultar(etag).status_code, 304)
+
+        self._notificar('Segunda')
+        response = self._consultar(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Segunda', response.content.decode())
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_feed_cacheado_por_tenant(self):
+        self._notificar('Primera')
+        self.assertIn('Primera', self._consultar().content.decode())
+
+        # Otro schema con los mismos ids no recibe el feed cacheado de este tenant
+        with mock.patch.object(connection, 'schema_name', 'otro_tenant', create=True):
+            with mock.patch('App_LUMINOVA.services.notificaciones_feed.calcular_feed', return_value=[]) as calcular:
+                self.assertNotIn('Primera', self._consultar().content.decode())
+        calcular.assert_called_once()
+
+    def test_oc_fuera_de_borrador_resuelve_stock_bajo(self):
+        notificacion = self._notificar(
+            'Stock crítico', tipo='stock_bajo', datos_contexto={'insumo_id': self.insumo.id}
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            oc = Orden.objects.create(
+                numero_orden='OC-T1', tipo='compra', estado='BORRADOR', proveedor=self.proveedor,
+                insumo_principal=self.insumo, empresa=self.empresa,
+            )
+        notificacion.refresh_from_db()
+        self.assertFalse(notificacion.leida)
+        etag = self._consultar()['ETag']
+
+        oc = Orden.objects.get(pk=oc.pk)
+        oc.estado = 'APROBADA'
+        with self.captureOnCommitCallbacks(execute=True):
+            oc.save()
+
+        notificacion.refresh_from_db()
+        self.assertTrue(notificacion.leida)
+        response = self._consultar(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Stock crítico', response.content.decode())
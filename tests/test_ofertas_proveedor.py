@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Pruebas del índice de mejores ofertas de proveedor y su consulta cacheada
+"""
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from App_LUMINOVA.models import (
+    CategoriaInsumo, Deposito, Empresa, IndiceOfertaInsumo, Insumo, OfertaProveedor, Proveedor,
+)
+from App_LUMINOVA.services.ofertas_proveedor import (
+    obtener_mejor_oferta, obtener_oferta, obtener_ofertas_insumo, proveedores_con_oferta,
+)
+
+
+class TestIndiceOfertas(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        deposito = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        categoria = CategoriaInsumo.objects.create(nombre='Drivers', deposito=deposito)
+        self.insumo = Insumo.objects.create(descripcion='Driver', categoria=categoria, deposito=deposito)
+        self.barato = Proveedor.objects.create(nombre='Barato', empresa=self.empresa)
+        self.rapido = Proveedor.objects.create(nombre='Rápido', empresa=self.empresa)
+
+    def _oferta(self, proveedor, precio, dias):
+        return OfertaProveedor.objects.create(
+            insumo=self.insumo, proveedor=proveedor,
+            precio_unitario_compra=Decimal(precio), tiempo_entrega_estimado_dias=dias,
+        )
+
+    def test_indice_se_actualiza_al_guardar_ofertas(self):
+        barata = self._oferta(self.barato, '10', 30)
+        rapida = self._oferta(self.rapido, '11', 1)
+
+        indice = IndiceOfertaInsumo.objects.get(insumo=self.insumo)
+        self.assertEqual(indice.oferta_menor_precio, barata)
+        self.assertEqual(indice.oferta_menor_entrega, rapida)
+        # 0.7·1.1 + 0.3·1 = 1.07 contra 0.7·1 + 0.3·15.5 = 5.35
+        self.assertEqual(indice.oferta_mejor_puntaje, rapida)
+        self.assertEqual(indice.cantidad_ofertas, 2)
+
+        rapida.delete()
+        indice.refresh_from_db()
+        self.assertEqual(indice.oferta_mejor_puntaje, barata)
+
+        barata.delete()
+        self.assertFalse(IndiceOfertaInsumo.objects.filter(insumo=self.insumo).exists())
+
+    def test_consulta_cacheada_se_invalida(self):
+        self._oferta(self.barato, '10', 5)
+
+        obtener_ofertas_insumo(self.insumo.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(obtener_oferta(self.insumo.id, self.barato.id)['precio_unitario_compra'], Decimal('10'))
+            self.assertIsNone(obtener_oferta(self.insumo.id, self.rapido.id))
+            self.assertEqual(obtener_mejor_oferta(self.insumo.id)['proveedor_id'], self.barato.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._oferta(self.rapido, '9', 5)
+        self.assertEqual(
+            [p['nombre'] for p in proveedores_con_oferta(self.insumo.id)], ['Barato', 'Rápido']
+        )
+        self.assertEqual(obtener_mejor_oferta(self.insumo.id, 'menor_precio')['proveedor_id'], self.rapido.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rapido.nombre = 'Veloz'
+            self.rapido.save()
+        self.assertEqual(obtener_oferta(self.insumo.id, self.rapido.id)['proveedor']['nombre'], 'Veloz')
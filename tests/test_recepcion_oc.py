@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Pruebas de la recepción de Órdenes de Compra en lote
+"""
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from App_LUMINOVA.models import (
+    CategoriaInsumo, Deposito, Empresa, Insumo, MovimientoStock, Orden, Proveedor, StockInsumo,
+)
+from App_LUMINOVA.services.recepcion_oc import recibir_ocs
+
+
+class TestRecepcionOC(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.usuario = User.objects.create_user('deposito', password='x')
+        self.deposito = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        self.categoria = CategoriaInsumo.objects.create(nombre='Drivers', deposito=self.deposito)
+        self.proveedor = Proveedor.objects.create(nombre='Proveedor', empresa=self.empresa)
+
+    def _oc(self, numero, cantidad, estado='EN_TRANSITO', insumo=None):
+        insumo = insumo or Insumo.objects.create(
+            descripcion=f'Insumo {numero}', categoria=self.categoria, deposito=self.deposito,
+            cantidad_en_pedido=cantidad,
+        )
+        return Orden.objects.create(
+            numero_orden=numero, tipo='compra', estado=estado, proveedor=self.proveedor,
+            insumo_principal=insumo, cantidad_principal=cantidad, deposito=self.deposito,
+            empresa=self.empresa,
+        )
+
+    def test_recepcion_parcial_total_y_errores_por_oc(self):
+        parcial = self._oc('OC-1', 100)
+        total = self._oc('OC-2', 50)
+        borrador = self._oc('OC-3', 10, estado='BORRADOR')
+
+        resultados = recibir_ocs(
+            {parcial.id: 40, total.id: None, borrador.id: None, 999999: None}, usuario=self.usuario
+        )
+
+        self.assertEqual([r['ok'] for r in resultados], [True, True, False, False])
+        self.assertEqual(resultados[0]['estado'], 'RECIBIDA_PARCIAL')
+        self.assertEqual(resultados[1]['estado'], 'COMPLETADA')
+        self.assertEqual(
+            StockInsumo.objects.get(insumo=parcial.insumo_principal, deposito=self.deposito).cantidad, 40
+        )
+        insumo = Insumo.objects.get(pk=total.insumo_principal_id)
+        self.assertEqual((insumo.stock_total, insumo.cantidad_en_pedido), (50, 0))
+        self.assertEqual(MovimientoStock.objects.filter(tipo='entrada', empresa=self.empresa).count(), 2)
+
+        # El resto de la OC parcial, y una cantidad que supera lo pendiente
+        exceso, = recibir_ocs({parcial.id: 61})
+        self.assertIn('supera lo pendiente', exceso['error'])
+        resto, = recibir_ocs({parcial.id: None})
+        self.assertEqual((resto['cantidad'], resto['estado']), (60, 'COMPLETADA'))
+        parcial.refresh_from_db()
+        self.assertEqual(parcial.cantidad_recibida, 100)
+
+    def test_consultas_no_crecen_con_la_cantidad_de_ocs(self):
+        def contar_consultas(cantidad_ocs, prefijo):
+            ocs = [self._oc(f'{prefijo}-{i}', 10) for i in range(cantidad_ocs)]
+            with CaptureQueriesContext(connection) as consultas:
+                resultados = recibir_ocs({oc.id: None for oc in ocs}, usuario=self.usuario)
+            self.assertTrue(all(r['ok'] for r in resultados))
+            return len(consultas)
+
+        self.assertEqual(contar_consultas(2, 'A'), contar_consultas(8, 'B'))
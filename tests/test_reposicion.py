@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Pruebas del planificador de reposición (punto de reorden, EOQ y OCs sugeridas)
+"""
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from decimal import Decimal
+
+from django.test import TestCase
+
+from App_LUMINOVA.models import (
+    CategoriaInsumo, Deposito, Empresa, Insumo, MovimientoStock, OfertaProveedor,
+    Orden, Proveedor, StockInsumo,
+)
+from App_LUMINOVA.services.reposicion import planificar_reposicion
+
+
+class TestPlanificadorReposicion(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.deposito = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        self.categoria = CategoriaInsumo.objects.create(nombre='Drivers', deposito=self.deposito)
+        self.barato = Proveedor.objects.create(nombre='Barato', empresa=self.empresa)
+        self.caro = Proveedor.objects.create(nombre='Caro', empresa=self.empresa)
+
+    def _insumo(self, descripcion, stock, stock_minimo=0):
+        insumo = Insumo.objects.create(
+            descripcion=descripcion, categoria=self.categoria, deposito=self.deposito,
+            stock_minimo=stock_minimo, empresa=self.empresa,
+        )
+        StockInsumo.objects.filter(insumo=insumo, deposito=self.deposito).update(cantidad=stock)
+        Insumo.recalcular_stock_total([insumo.id])
+        return insumo
+
+    def _consumo(self, insumo, cantidad_diaria, dias=90):
+        MovimientoStock.objects.bulk_create([
+            MovimientoStock(
+                insumo=insumo, deposito_origen=self.deposito, cantidad=cantidad_diaria,
+                tipo='salida', empresa=self.empresa,
+            )
+            for _ in range(dias)
+        ])
+
+    def test_calcula_parametros_y_crea_oc_borrador(self):
+        insumo = self._insumo('Driver', stock=50)
+        self._consumo(insumo, 10)
+        OfertaProveedor.objects.create(
+            insumo=insumo, proveedor=self.caro, precio_unitario_compra=Decimal('20'),
+            tiempo_entrega_estimado_dias=2,
+        )
+        OfertaProveedor.objects.create(
+            insumo=insumo, proveedor=self.barato, precio_unitario_compra=Decimal('10'),
+            tiempo_entrega_estimado_dias=5,
+        )
+
+        plan, ocs = planificar_reposicion(self.empresa)
+
+        fila = plan.loc[insumo.id]
+        # Todas las salidas caen el mismo día: demanda 900/90 = 10 por día
+        self.assertAlmostEqual(fila['demanda_diaria'], 10)
+        self.assertEqual(fila['lead_time'], 5)
+        self.assertEqual(fila['proveedor_id'], self.barato.id)
+        self.assertGreater(fila['punto_reorden'], 50)
+        self.assertEqual(len(ocs), 1)
+        oc = Orden.objects.get(insumo_principal=insumo)
+        self.assertEqual(oc.estado, 'BORRADOR')
+        self.assertEqual(oc.proveedor, self.barato)
+        self.assertEqual(oc.cantidad_principal, fila['nivel_objetivo'] - 50)
+
+        # Con la OC en borrador la posición cubre el reorden: no se duplica
+        _, ocs = planificar_reposicion(self.empresa)
+        self.assertEqual(ocs, [])
+
+    def test_stock_minimo_es_piso_del_punto_de_reorden(self):
+        sin_consumo = self._insumo('LED', stock=5, stock_minimo=100)
+        cubierto = self._insumo('Chip', stock=1000)
+        for insumo in (sin_consumo, cubierto):
+            OfertaProveedor.objects.create(
+                insumo=insumo, proveedor=self.barato, precio_unitario_compra=Decimal('1'),
+            )
+
+        plan, ocs = planificar_reposicion(self.empresa, persistir=False)
+
+        self.assertEqual(plan.loc[sin_consumo.id, 'punto_reorden'], 100)
+        self.assertEqual(plan.loc[sin_consumo.id, 'cantidad_sugerida'], 95)
+        self.assertEqual(plan.loc[cubierto.id, 'cantidad_sugerida'], 0)
+        self.assertEqual(ocs, [])
+        self.assertFalse(Orden.objects.exists())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Pruebas de la purga por lotes de notificaciones con retención por tipo
+"""
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from App_LUMINOVA.models import Empresa, LecturaNotificacion, NotificacionSistema
+from App_LUMINOVA.services.notification_service import NotificationService
+from App_LUMINOVA.services.retencion_notificaciones import purgar_notificaciones
+
+
+class TestRetencionNotificaciones(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.usuario = User.objects.create_user('compras', password='x')
+        self.usuario.groups.add(Group.objects.create(name='Compras'))
+        ahora = timezone.now()
+        self.expirada = self._crear('Expirada', fecha_expiracion=ahora - timedelta(days=1))
+        self.stock_viejo = self._crear('Stock viejo', tipo='stock_bajo', leida=True, dias=40)
+        self.stock_reciente = self._crear('Stock reciente', tipo='stock_bajo', leida=True, dias=10)
+        self.general_vieja = self._crear('General vieja', dias=20)
+        self.general_sin_leer = self._crear('General sin leer', dias=20)
+        self.pendiente = self._crear('Pendiente', dias=400)
+        LecturaNotificacion.objects.create(usuario=self.usuario, notificacion=self.stock_viejo)
+        # Como en la bandeja: la lectura es por usuario y no toca ``leida``
+        NotificationService.marcar_notificaciones_como_leidas(self.usuario, [self.general_vieja.id])
+
+    def _crear(self, titulo, dias=0, **extra):
+        notificacion = NotificacionSistema.objects.create(
+            titulo=titulo, mensaje='-', remitente=self.usuario,
+            destinatario_grupo='compras', empresa=self.empresa, **extra,
+        )
+        NotificacionSistema.objects.filter(pk=notificacion.pk).update(
+            fecha_creacion=timezone.now() - timedelta(days=dias)
+        )
+        return notificacion
+
+    def test_purga_por_lotes_respeta_retencion_y_archiva(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            archivo = os.path.join(directorio, 'notificaciones.jsonl.gz')
+            resumen = purgar_notificaciones(
+                retencion={'general': 15}, tamano_lote=2, pausa=0, archivo=archivo
+            )
+            with gzip.open(archivo, 'rt', encoding='utf-8') as entrada:
+                archivadas = [json.loads(linea)['titulo'] for linea in entrada]
+
+        self.assertEqual(resumen['total'], 4)
+        self.assertEqual(resumen['por_tipo'], {'general': 3, 'stock_bajo': 1})
+        self.assertEqual(sorted(archivadas), ['Expirada', 'General vieja', 'Pendiente', 'Stock viejo'])
+        self.assertEqual(
+            set(NotificacionSistema.objects.values_list('titulo', flat=True)),
+            {'Stock reciente', 'General sin leer'},
+        )
+        self.assertFalse(LecturaNotificacion.objects.exists())
+
+    def test_comando_dry_run_no_borra(self):
+        salida = StringIO()
+        call_command('purgar_notificaciones', '--dry-run', '--pausa', '0', stdout=salida)
+        self.assertIn('3 notificaciones a purgar', salida.getvalue())
+        self.assertEqual(NotificacionSistema.objects.count(), 6)
+
+    def test_leidas_por_usuario_se_purgan_por_antiguedad(self):
+        self.assertFalse(NotificacionSistema.objects.filter(pk=self.general_vieja.pk, leida=True).exists())
+        purgar_notificaciones(retencion={'general': 15}, pausa=0)
+        self.assertFalse(NotificacionSistema.objects.filter(pk=self.general_vieja.pk).exists())
+        self.assertTrue(NotificacionSistema.objects.filter(pk=self.general_sin_leer.pk).exists())
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Pruebas de la resolución cacheada de roles (es_admin, tiene_rol, es_admin_o_rol)
+"""
+import os
+from unittest import mock
+
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from App_LUMINOVA.utils import es_admin, es_admin_o_rol, tiene_rol
+
+
+class TestRolesCacheados(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('operario', password='clave-segura-123')
+        self.grupo_deposito = Group.objects.create(name='2__Depósito')
+        self.grupo_admin = Group.objects.create(name='2__Administrador')
+        self.user.groups.add(self.grupo_deposito)
+
+    def test_roles_resueltos_una_vez(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(tiene_rol(self.user, 'deposito'))
+            self.assertTrue(es_admin_o_rol(self.user, ['ventas', 'deposito']))
+            self.assertFalse(es_admin(self.user))
+        self.assertEqual(len(queries), 1)
+
+        # Otro request (nueva instancia) usa la caché compartida
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(tiene_rol(User.objects.get(pk=self.user.pk), 'Depósito'))
+        self.assertEqual(len(queries), 1)  # solo la carga del usuario
+
+    def test_cambio_de_grupos_invalida_la_cache(self):
+        self.assertFalse(es_admin(self.user))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(self.grupo_admin)
+        self.assertTrue(es_admin(User.objects.get(pk=self.user.pk)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.grupo_admin.user_set.clear()
+        self.assertFalse(es_admin(User.objects.get(pk=self.user.pk)))
+
+    def test_roles_no_se_comparten_entre_tenants(self):
+        self.user.groups.add(self.grupo_admin)
+        self.assertTrue(es_admin(User.objects.get(pk=self.user.pk)))
+
+        # El mismo id de usuario en otro schema resuelve sus propios grupos
+        with mock.patch.object(connection, 'schema_name', 'otro_tenant', create=True):
+            with CaptureQueriesContext(connection) as queries:
+                es_admin(User.objects.get(pk=self.user.pk))
+        self.assertEqual(len(queries), 2)  # usuario + grupos, sin pasar por la caché del otro tenant
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Pruebas del stock total materializado (Insumo.stock_total / ProductoTerminado.stock_total)
+"""
+import os
+from io import StringIO
+
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from App_LUMINOVA.models import (
+    CategoriaInsumo, CategoriaProductoTerminado, Deposito, Empresa, Insumo,
+    ProductoTerminado, StockInsumo, StockProductoTerminado
+)
+from App_LUMINOVA.services.stock_snapshot import adjuntar_snapshot_stock
+
+
+class TestStockTotal(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.deposito_1 = Deposito.objects.create(nombre='Depósito 1', empresa=self.empresa)
+        self.deposito_2 = Deposito.objects.create(nombre='Depósito 2', empresa=self.empresa)
+        categoria = CategoriaInsumo.objects.create(nombre='Drivers', deposito=self.deposito_1)
+        self.insumo = Insumo.objects.create(descripcion='Driver 12V', categoria=categoria, deposito=self.deposito_1)
+
+    def test_stock_total_se_mantiene_con_filas_de_stock(self):
+        stock = StockInsumo.objects.get(insumo=self.insumo, deposito=self.deposito_1)
+        stock.cantidad = 10
+        stock.save()
+        StockInsumo.objects.create(insumo=self.insumo, deposito=self.deposito_2, cantidad=5)
+
+        self.insumo.refresh_from_db()
+        self.assertEqual(self.insumo.stock, 15)
+
+        StockInsumo.objects.filter(insumo=self.insumo, deposito=self.deposito_2).first().delete()
+        self.insumo.refresh_from_db()
+        self.assertEqual(self.insumo.stock, 10)
+
+    def test_guardar_insumo_no_pisa_stock_total(self):
+        desactualizado = Insumo.objects.get(id=self.insumo.id)
+        StockInsumo.objects.create(insumo=self.insumo, deposito=self.deposito_2, cantidad=7)
+
+        desactualizado.descripcion = 'Driver 12V (nuevo)'
+        desactualizado.save()
+
+        self.insumo.refresh_from_db()
+        self.assertEqual(self.insumo.stock, 7)
+
+    def test_stock_no_consulta_la_base(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.insumo.stock
+            self.insumo.stock
+        self.assertEqual(len(queries), 0)
+
+    def test_snapshot_stock_por_deposito_en_una_consulta(self):
+        StockInsumo.objects.create(insumo=self.insumo, deposito=self.deposito_2, cantidad=6)
+        otro = Insumo.objects.create(descripcion='Driver 24V', categoria=self.insumo.categoria, deposito=self.deposito_1)
+        insumos = list(Insumo.objects.filter(id__in=[self.insumo.id, otro.id]))
+
+        with CaptureQueriesContext(connection) as queries:
+            adjuntar_snapshot_stock(insumos)
+            valores = {i.id: (i.stock, i.get_stock_by_deposito(self.deposito_2)) for i in insumos}
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(valores[self.insumo.id], (6, 6))
+        self.assertEqual(valores[otro.id], (0, 0))
+
+    def test_comando_reconciliacion(self):
+        categoria_pt = CategoriaProductoTerminado.objects.create(nombre='Paneles', deposito=self.deposito_1)
+        producto = ProductoTerminado.objects.create(descripcion='Panel 60x60', categoria=categoria_pt, deposito=self.deposito_1)
+        StockProductoTerminado.objects.create(producto=producto, deposito=self.deposito_1, cantidad=4)
+        StockInsumo.objects.create(insumo=self.insumo, deposito=self.deposito_2, cantidad=3)
+
+        Insumo.objects.update(stock_total=0)
+        ProductoTerminado.objects.update(stock_total=99)
+        call_command('recalcular_stock_totales', stdout=StringIO())
+
+        self.insumo.refresh_from_db()
+        producto.refresh_from_db()
+        self.assertEqual(self.insumo.stock, 3)
+        self.assertEqual(producto.stock, 4)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Pruebas de la transferencia de muchos ítems entre depósitos (manifiesto)
+"""
+import os
+import django
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Proyecto_LUMINOVA.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from App_LUMINOVA.models import (
+    CategoriaInsumo, Deposito, Empresa, Insumo, MovimientoStock, OfertaProveedor, Proveedor, StockInsumo,
+)
+from App_LUMINOVA.services.libro_stock import StockInsuficienteError
+from App_LUMINOVA.services.transferencia_lote import transferir_lote
+
+
+class TestTransferenciaLote(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Empresa Test', schema_name='empresa_test')
+        self.usuario = User.objects.create_user('deposito', password='x')
+        self.central = Deposito.objects.create(nombre='Central', empresa=self.empresa)
+        self.sucursal = Deposito.objects.create(nombre='Sucursal', empresa=self.empresa)
+        self.drivers = CategoriaInsumo.objects.create(nombre='Drivers', deposito=self.central)
+        self.chapas = CategoriaInsumo.objects.create(nombre='Chapas', deposito=self.central)
+        self.proveedor = Proveedor.objects.create(nombre='Proveedor', empresa=self.empresa)
+
+    def _insumo(self, descripcion, stock, categoria=None):
+        insumo = Insumo.objects.create(
+            descripcion=descripcion, categoria=categoria or self.drivers, deposito=self.central
+        )
+        StockInsumo.objects.filter(insumo=insumo, deposito=self.central).update(cantidad=stock)
+        return insumo
+
+    def _stock(self, insumo, deposito):
+        return StockInsumo.objects.filter(insumo=insumo, deposito=deposito).values_list('cantidad', flat=True).first()
+
+    def test_crea_categorias_insumos_y_ofertas_en_el_destino(self):
+        driver = self._insumo('Driver', 10)
+        chapa = self._insumo('Chapa', 5, categoria=self.chapas)
+        OfertaProveedor.objects.create(insumo=driver, proveedor=self.proveedor, precio_unitario_compra=3)
+
+        lineas = transferir_lote(Insumo, self.central, self.sucursal, {driver.id: 4, chapa.id: 5}, usuario=self.usuario)
+
+        driver_destino = lineas[0]['item_destino']
+        self.assertEqual(
+            (driver_destino.deposito, driver_destino.categoria.nombre, driver_destino.empresa_id),
+            (self.sucursal, 'Drivers', self.empresa.id),
+        )
+        self.assertEqual(CategoriaInsumo.objects.filter(deposito=self.sucursal).count(), 2)
+        self.assertTrue(OfertaProveedor.objects.filter(insumo=driver_destino, proveedor=self.proveedor).exists())
+        self.assertEqual((self._stock(driver, self.central), self._stock(driver_destino, self.sucursal)), (6, 4))
+        self.assertEqual(Insumo.objects.get(pk=driver_destino.pk).stock_total, 4)
+        self.assertEqual(MovimientoStock.objects.filter(tipo='transferencia', empresa=self.empresa).count(), 2)
+
+        # Una segunda transferencia reutiliza las copias del destino
+        otra, = transferir_lote(Insumo, self.central, self.sucursal, {driver.id: 1})
+        self.assertEqual(otra['item_destino'], driver_destino)
+        self.assertEqual(Insumo.objects.filter(deposito=self.sucursal).count(), 2)
+        self.assertEqual(OfertaProveedor.objects.count(), 2)
+
+    def test_falta_de_stock_no_transfiere_ni_crea_nada(self):
+        driver = self._insumo('Driver', 10)
+        chapa = self._insumo('Chapa', 1, categoria=self.chapas)
+
+        with self.assertRaises(StockInsuficienteError):
+            transferir_lote(Insumo, self.central, self.sucursal, {driver.id: 4, chapa.id: 2})
+
+        self.assertEqual(self._stock(driver, self.central), 10)
+        self.assertFalse(Insumo.objects.filter(deposito=self.sucursal).exists())
+        self.assertFalse(CategoriaInsumo.objects.filter(deposito=self.sucursal).exists())
+
+    def test_manifiesto_invalido(self):
+        driver = self._insumo('Driver', 10)
+        for lineas in ({}, {driver.id: 0}, {999999: 1}):
+            with self.assertRaises(ValueError):
+                transferir_lote(Insumo, self.central, self.sucursal, lineas)
+        with self.assertRaises(ValueError):
+            transferir_lote(Insumo, self.central, self.central, {driver.id: 1})
+
+    def test_consultas_no_crecen_con_el_manifiesto(self):
+        def contar_consultas(cantidad_items, prefijo):
+            insumos = [self._insumo(f'{prefijo} {i}', 5) for i in range(cantidad_items)]
+            for insumo in insumos:
+                OfertaProveedor.objects.create(insumo=insumo, proveedor=self.proveedor, precio_unitario_compra=1)
+            # Destino nuevo en cada corrida: siempre se crean categorías e insumos
+            destino = Deposito.objects.create(nombre=f'Destino {prefijo}', empresa=self.empresa)
+            with CaptureQueriesContext(connection) as consultas:
+                transferir_lote(Insumo, self.central, destino, {insumo.id: 2 for insumo in insumos})
+            return len(consultas)
+
+        self.assertEqual(contar_consultas(3, 'A'), contar_consultas(12, 'B'))
+
+    def test_api_transferir_lote(self):
+        from rest_framework.test import APIClient
+
+        driver = self._insumo('Driver', 10)
+        cliente = APIClient()
+        cliente.force_authenticate(User.objects.create_superuser('admin', password='x'))
+        url = '/api/v1/movimientos-stock/transferir_lote/'
+        datos = {
+            'tipo_item': 'insumo', 'deposito_origen': self.central.id, 'deposito_destino': self.sucursal.id,
+            'lineas': [{'item': driver.id, 'cantidad': 3}],
+        }
+
+        respuesta = cliente.post(url, datos, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(respuesta.json()['transferidos'], 1)
+        self.assertEqual(self._stock(driver, self.central), 7)
+
+        datos['lineas'] = [{'item': driver.id, 'cantidad': 50}]
+        respuesta = cliente.post(url, datos, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()['faltantes'][0]['disponible'], 7)
+
+    def test_vista_manifiesto(self):
+        driver = self._insumo('Driver', 10)
+        chapa = self._insumo('Chapa', 5, categoria=self.chapas)
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        session = self.client.session
+        session['deposito_seleccionado'] = self.central.id
+        session['empresa_actual_id'] = self.empresa.id
+        session.save()
+
+        url = reverse('App_LUMINOVA:transferencia_lote')
+        respuesta = self.client.get(url)
+        self.assertContains(respuesta, 'name="cantidad_%d"' % driver.id)
+        self.assertContains(respuesta, '<option value="%d"' % self.sucursal.id)
+
+        respuesta = self.client.post(url, {
+            'tipo_item': 'insumo', 'deposito_destino': self.sucursal.id,
+            'items': [driver.id, chapa.id], f'cantidad_{driver.id}': '2', f'cantidad_{chapa.id}': '5',
+        })
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual((self._stock(driver, self.central), self._stock(chapa, self.central)), (8, 0))